@@ -12,12 +12,16 @@ from starlette.routing import BaseRoute
 from polar import receivers, worker  # noqa
 from polar.api import router
 from polar.config import settings
+from polar.eventstream.multiplexer import close_multiplexer
+from polar.eventstream.publisher import close_publisher
 from polar.exception_handlers import (
     polar_exception_handler,
     polar_redirection_exception_handler,
 )
 from polar.exceptions import PolarError, PolarRedirectionError
 from polar.health.endpoints import router as health_router
+from polar.http_client import close_http_clients
+from polar.integrations.stripe.gateway import close_stripe_gateway
 from polar.kit.db.postgres import (
     AsyncEngine,
     AsyncSession,
@@ -67,6 +71,10 @@ async def lifespan(app: FastAPI) -> AsyncIterator[State]:
 
         yield {"engine": engine, "sessionmaker": sessionmaker}
 
+        await close_multiplexer()
+        await close_publisher()
+        await close_http_clients()
+        close_stripe_gateway()
         await engine.dispose()
 
         log.info("Polar API stopped")
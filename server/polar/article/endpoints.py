@@ -76,16 +76,25 @@ async def list(
         session, auth.subject, pagination=pagination
     )
 
+    can_write_articles = await authz.can_many(
+        auth.subject, AccessType.write, [art for art, _ in results]
+    )
+    pending_view_counts = await article_service.get_pending_view_counts(
+        [
+            art.id
+            for (art, _), can_write in zip(results, can_write_articles)
+            if can_write
+        ]
+    )
     return ListResource.from_paginated_results(
         [
             ArticleSchema.from_db(
                 art,
-                include_admin_fields=await authz.can(
-                    auth.subject, AccessType.write, art
-                ),
+                include_admin_fields=can_write,
                 is_paid_subscriber=is_paid_subscriber,
+                pending_view_count=pending_view_counts.get(art.id, 0),
             )
-            for art, is_paid_subscriber in results
+            for (art, is_paid_subscriber), can_write in zip(results, can_write_articles)
         ],
         count,
         pagination,
@@ -125,16 +134,25 @@ async def search(
         organization_id=org.id,
     )
 
+    can_write_articles = await authz.can_many(
+        auth.subject, AccessType.write, [art for art, _ in results]
+    )
+    pending_view_counts = await article_service.get_pending_view_counts(
+        [
+            art.id
+            for (art, _), can_write in zip(results, can_write_articles)
+            if can_write
+        ]
+    )
     return ListResource.from_paginated_results(
         [
             ArticleSchema.from_db(
                 art,
-                include_admin_fields=await authz.can(
-                    auth.subject, AccessType.write, art
-                ),
+                include_admin_fields=can_write,
                 is_paid_subscriber=is_paid_subscriber,
+                pending_view_count=pending_view_counts.get(art.id, 0),
             )
-            for art, is_paid_subscriber in results
+            for (art, is_paid_subscriber), can_write in zip(results, can_write_articles)
         ],
         count,
         pagination,
@@ -170,10 +188,16 @@ async def lookup(
 
     art, is_paid_subscriber = result
 
+    include_admin_fields = await authz.can(auth.subject, AccessType.write, art)
+    pending_view_counts = await article_service.get_pending_view_counts(
+        [art.id] if include_admin_fields else []
+    )
+
     return ArticleSchema.from_db(
         art,
-        include_admin_fields=await authz.can(auth.subject, AccessType.write, art),
+        include_admin_fields=include_admin_fields,
         is_paid_subscriber=is_paid_subscriber,
+        pending_view_count=pending_view_counts.get(art.id, 0),
     )
 
 
@@ -268,10 +292,16 @@ async def get(
 
     art, is_paid_subscriber = result
 
+    include_admin_fields = await authz.can(auth.subject, AccessType.write, art)
+    pending_view_counts = await article_service.get_pending_view_counts(
+        [art.id] if include_admin_fields else []
+    )
+
     return ArticleSchema.from_db(
         art,
-        include_admin_fields=await authz.can(auth.subject, AccessType.write, art),
+        include_admin_fields=include_admin_fields,
         is_paid_subscriber=is_paid_subscriber,
+        pending_view_count=pending_view_counts.get(art.id, 0),
     )
 
 
@@ -293,12 +323,7 @@ async def viewed(
     if not result:
         raise ResourceNotFound()
 
-    # Track view
-    # TODO: very simplistic for now, might need some improvements later :-)
-    await article_service.track_view(
-        session,
-        id,
-    )
+    await article_service.track_view(id)
 
     return ArticleViewedResponse(ok=True)
 
@@ -404,11 +429,14 @@ async def update(
     if not art:
         raise ResourceNotFound()
 
+    pending_view_counts = await article_service.get_pending_view_counts([art.id])
+
     return ArticleSchema.from_db(
         art,
         include_admin_fields=await authz.can(auth.subject, AccessType.write, art),
         # TODO
         is_paid_subscriber=await authz.can(auth.subject, AccessType.write, art),
+        pending_view_count=pending_view_counts.get(art.id, 0),
     )
 
 
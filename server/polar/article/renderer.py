@@ -0,0 +1,133 @@
+import hashlib
+import html
+
+import httpx
+import structlog
+
+from polar.auth.service import AuthService
+from polar.config import settings
+from polar.locker import Locker
+from polar.logging import Logger
+from polar.models import Article, User
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+
+log: Logger = structlog.get_logger()
+
+_CACHE_TTL_SECONDS = 3600 * 24  # 1 day, i.e. the duration of a send
+
+UNSUBSCRIBE_LINK_PLACEHOLDER = "https://polar.sh/unsubscribe/__POLAR_UNSUBSCRIBE__"
+
+
+class ArticleEmailRenderer:
+    """
+    Render article emails once per send, instead of once per recipient.
+
+    The frontend renders the article as the authenticated user, which only
+    affects whether paid content is shown. We thus render one template per
+    variant (paid content or not, unsubscribe link or not), with a placeholder
+    for the unsubscribe link, and cache it in Redis for the duration of the send.
+    Recipients emails are then only a string substitution away.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self.locker = Locker(redis)
+
+    async def render(
+        self,
+        client: httpx.AsyncClient,
+        article: Article,
+        user: User,
+        *,
+        paid_content: bool,
+        unsubscribe: bool,
+        use_cache: bool = True,
+    ) -> str | None:
+        """
+        Get the rendered template of an article.
+
+        Args:
+            client: The HTTP client to use to call the frontend renderer.
+            article: The article to render.
+            user: The user to authenticate as on the frontend renderer.
+            It should be a user with the same access level as the variant,
+            i.e. able to read paid content if `paid_content` is set.
+            paid_content: Whether the template should include paid content.
+            unsubscribe: Whether the template should include an unsubscribe link.
+            use_cache: Whether to use the cached template.
+            Set it to `False` to always get the latest version, e.g. for previews.
+
+        Returns:
+            The rendered template, or `None` if the rendering failed.
+        """
+        if not use_cache:
+            return await self._render_frontend(client, article, user, unsubscribe)
+
+        cache_key = (
+            f"polar:article-email-cache:{article.id}:{self._get_content_hash(article)}"
+            f":{int(paid_content)}:{int(unsubscribe)}"
+        )
+        cached_template = await self.redis.get(cache_key)
+        if cached_template is not None:
+            return cached_template
+
+        # Concurrent chunks of the same send wait for the first one to render
+        async with self.locker.lock(cache_key, timeout=90, blocking_timeout=90):
+            cached_template = await self.redis.get(cache_key)
+            if cached_template is not None:
+                return cached_template
+
+            template = await self._render_frontend(client, article, user, unsubscribe)
+            if template is not None:
+                await self.redis.set(cache_key, template, ex=_CACHE_TTL_SECONDS)
+
+        return template
+
+    def personalize(self, template: str, *, unsubscribe_link: str | None) -> str:
+        if unsubscribe_link is None:
+            return template
+        return template.replace(
+            UNSUBSCRIBE_LINK_PLACEHOLDER, html.escape(unsubscribe_link)
+        )
+
+    def _get_content_hash(self, article: Article) -> str:
+        content = "\n".join((article.title, article.body, article.byline))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    async def _render_frontend(
+        self,
+        client: httpx.AsyncClient,
+        article: Article,
+        user: User,
+        unsubscribe: bool,
+    ) -> str | None:
+        log.debug("render article email from frontend", article=article.id)
+
+        (jwt, _) = AuthService.generate_token(user)
+
+        render_data = {
+            # Add pre-authenticated tokens to the end of all links in the email
+            # "inject_magic_link_token": magic_link_token,
+        }
+        if unsubscribe:
+            render_data["unsubscribe_link"] = UNSUBSCRIBE_LINK_PLACEHOLDER
+
+        response = await client.post(
+            f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}",
+            json=render_data,
+            # Authenticating to the renderer as the user we're sending the email to
+            headers={"Cookie": f"polar_session={jwt};"},
+            # Increase the default timeout because it can be slow to render
+            timeout=60,
+        )
+
+        if not response.is_success:
+            log.error(f"failed to get rendered article: code={response.status_code}")
+            return None
+
+        return response.text
+
+
+def get_article_email_renderer() -> ArticleEmailRenderer:
+    return ArticleEmailRenderer(redis_client)
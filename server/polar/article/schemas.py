@@ -65,7 +65,11 @@ class Article(Schema):
 
     @classmethod
     def from_db(
-        cls, i: ArticleModel, include_admin_fields: bool, is_paid_subscriber: bool
+        cls,
+        i: ArticleModel,
+        include_admin_fields: bool,
+        is_paid_subscriber: bool,
+        pending_view_count: int = 0,
     ) -> Self:
         byline: Byline | None = None
 
@@ -110,7 +114,9 @@ class Article(Schema):
             if include_admin_fields
             else None,
             email_sent_to_count=i.email_sent_to_count if include_admin_fields else None,
-            web_view_count=i.web_view_count if include_admin_fields else None,
+            web_view_count=i.web_view_count + pending_view_count
+            if include_admin_fields
+            else None,
         )
 
 
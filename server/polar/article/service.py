@@ -1,24 +1,29 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Sequence
 from datetime import datetime
 from operator import and_, or_
 from uuid import UUID
 
 import structlog
+from redis.exceptions import ResponseError
 from slugify import slugify
 from sqlalchemy import (
+    Integer,
     Select,
+    column,
     desc,
     false,
     func,
     nullsfirst,
     select,
+    values,
 )
 from sqlalchemy.orm import contains_eager, joinedload
 
 from polar.authz.service import Subject
 from polar.exceptions import BadRequest
+from polar.kit.extensions.sqlalchemy import PostgresUUID
 from polar.kit.pagination import PaginationParams, paginate
 from polar.kit.utils import utc_now
 from polar.models import ArticlesSubscription
@@ -27,12 +32,30 @@ from polar.models.organization import Organization
 from polar.models.user import User
 from polar.models.user_organization import UserOrganization
 from polar.postgres import AsyncSession, sql
+from polar.redis import redis
 from polar.worker import enqueue_job
 
 from .schemas import ArticleCreate, ArticleUpdate, Visibility
 
 log = structlog.get_logger()
 
+ARTICLE_SEND_CHUNK_SIZE = 500
+ARTICLE_SEND_CHECKPOINT_TTL = 60 * 60 * 24 * 7  # 7 days
+ARTICLE_VIEWS_FLUSH_CHUNK_SIZE = 1000
+
+# Views not yet added to `Article.web_view_count`, by article ID
+_VIEWS_PENDING_KEY = "articles:views:pending"
+# Views being added to `Article.web_view_count` by the current flush
+_VIEWS_FLUSHING_KEY = "articles:views:flushing"
+
+
+def _get_send_checkpoint_key(article_id: UUID) -> str:
+    return f"articles:send:{article_id}:checkpoint"
+
+
+def _get_send_sent_key(article_id: UUID) -> str:
+    return f"articles:send:{article_id}:sent"
+
 
 def polar_slugify(input: str) -> str:
     return slugify(
@@ -264,18 +287,93 @@ class ArticleService:
             case "public":
                 return Article.Visibility.public
 
-    async def track_view(
+    async def track_view(self, id: UUID) -> None:
+        """
+        Count a view of the article.
+
+        It's counted in Redis, and added to the database
+        by the periodic `flush_view_counts`.
+        """
+        await redis.hincrby(_VIEWS_PENDING_KEY, str(id), 1)
+
+    async def get_pending_view_counts(self, ids: Sequence[UUID]) -> dict[UUID, int]:
+        """
+        Returns the views of the articles not yet added to their `web_view_count`.
+        """
+        if not ids:
+            return {}
+
+        fields = [str(id) for id in ids]
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hmget(_VIEWS_PENDING_KEY, fields)
+            pipe.hmget(_VIEWS_FLUSHING_KEY, fields)
+            pending, flushing = await pipe.execute()
+
+        return {
+            id: int(pending_count or 0) + int(flushing_count or 0)
+            for id, pending_count, flushing_count in zip(ids, pending, flushing)
+        }
+
+    async def flush_view_counts(
         self,
         session: AsyncSession,
-        id: UUID,
-    ) -> None:
-        statement = (
-            sql.update(Article)
-            .where(Article.id == id)
-            .values({"web_view_count": Article.web_view_count + 1})
-        )
-        await session.execute(statement)
-        await session.commit()
+        *,
+        chunk_size: int = ARTICLE_VIEWS_FLUSH_CHUNK_SIZE,
+    ) -> int:
+        """
+        Add the views counted in Redis to the articles `web_view_count`.
+
+        Views are removed from Redis right before the commit: if the flush is
+        interrupted in between, they are lost instead of being added twice.
+
+        Returns:
+            The number of added views.
+        """
+        # Views of an interrupted flush are added first,
+        # otherwise take the pending views, while new ones keep being counted
+        if not await redis.exists(_VIEWS_FLUSHING_KEY):
+            try:
+                await redis.rename(_VIEWS_PENDING_KEY, _VIEWS_FLUSHING_KEY)
+            except ResponseError:
+                # No pending views
+                return 0
+
+        counts = [
+            (UUID(id), int(count))
+            for id, count in (await redis.hgetall(_VIEWS_FLUSHING_KEY)).items()
+        ]
+
+        for i in range(0, len(counts), chunk_size):
+            views = (
+                values(
+                    column("id", PostgresUUID),
+                    column("count", Integer),
+                    name="views",
+                )
+                .data(counts[i : i + chunk_size])
+                .alias("views")
+            )
+            statement = (
+                sql.update(Article)
+                .where(Article.id == views.c.id)
+                .values({"web_view_count": Article.web_view_count + views.c.count})
+            )
+            await session.execute(statement)
+
+        await redis.delete(_VIEWS_FLUSHING_KEY)
+        try:
+            await session.commit()
+        except Exception:
+            # Not added, count them back for the next flush
+            async with redis.pipeline(transaction=True) as pipe:
+                for id, count in counts:
+                    pipe.hincrby(_VIEWS_PENDING_KEY, str(id), count)
+                await pipe.execute()
+            raise
+
+        total = sum(count for _, count in counts)
+        log.info("articles.views.flushed", articles=len(counts), views=total)
+        return total
 
     async def list_scheduled_unsent_posts(
         self, session: AsyncSession
@@ -293,40 +391,39 @@ class ArticleService:
     async def list_receivers(
         self, session: AsyncSession, organization_id: UUID, paid_subscribers_only: bool
     ) -> Sequence[tuple[UUID, bool, bool]]:
-        user_subscription_clause = (
-            ArticlesSubscription.organization_id == organization_id
+        statement = self._get_receivers_statement(
+            organization_id, paid_subscribers_only
         )
-        if paid_subscribers_only:
-            user_subscription_clause &= ArticlesSubscription.paid_subscriber.is_(True)
+        result = await session.execute(statement)
+        return result.tuples().all()
 
+    async def stream_receiver_chunks(
+        self,
+        session: AsyncSession,
+        organization_id: UUID,
+        paid_subscribers_only: bool,
+        *,
+        chunk_size: int = ARTICLE_SEND_CHUNK_SIZE,
+        after: UUID | None = None,
+    ) -> AsyncIterator[Sequence[UUID]]:
+        """
+        Stream the receivers user IDs, ordered by ID, in chunks of `chunk_size`.
+
+        Receivers are read through a server-side cursor, so we never hold
+        the full list in memory. `after` allows to resume the iteration
+        after a given user ID.
+        """
         statement = (
-            select(
-                User.id,
-                func.coalesce(ArticlesSubscription.paid_subscriber, False),
-                UserOrganization.user_id.is_not(None),
-            )
-            .join(
-                UserOrganization,
-                onclause=(UserOrganization.user_id == User.id)
-                & (UserOrganization.organization_id == organization_id),
-                isouter=True,
-            )
-            .join(
-                ArticlesSubscription,
-                onclause=(ArticlesSubscription.user_id == User.id)
-                & (ArticlesSubscription.organization_id == organization_id)
-                & (ArticlesSubscription.emails_unsubscribed_at.is_(None)),
-                isouter=True,
-            )
-        ).where(
-            or_(
-                user_subscription_clause,
-                UserOrganization.organization_id == organization_id,
-            )
+            self._get_receivers_statement(organization_id, paid_subscribers_only)
+            .with_only_columns(User.id)
+            .order_by(User.id)
         )
+        if after is not None:
+            statement = statement.where(User.id > after)
 
-        result = await session.execute(statement)
-        return result.tuples().all()
+        result = await session.stream_scalars(statement)
+        async for chunk in result.partitions(chunk_size):
+            yield chunk
 
     async def count_receivers(
         self, session: AsyncSession, organization_id: UUID, paid_subscribers_only: bool
@@ -364,26 +461,149 @@ class ArticleService:
             raise BadRequest("article is scheduled to be published in the future")
 
         article.notifications_sent_at = utc_now()
+        article.email_sent_to_count = 0
         await article.save(session)
         await session.commit()
 
-        receivers = await article_service.list_receivers(
-            session, article.organization_id, article.paid_subscribers_only
+        await enqueue_job(
+            "articles.send_to_subscribers",
+            article_id=article.id,
+            _job_id=f"articles.send_to_subscribers:{article.id}",
         )
 
-        for receiver_user_id, _, _ in receivers:
+    async def enqueue_send_chunks(
+        self,
+        session: AsyncSession,
+        article: Article,
+        *,
+        chunk_size: int = ARTICLE_SEND_CHUNK_SIZE,
+    ) -> None:
+        """
+        Fan-out the delivery of an article to its receivers, one job per chunk.
+
+        Progress is checkpointed in Redis after each enqueued chunk, so if we're
+        interrupted, we resume after the last enqueued chunk. Chunk jobs have
+        a deterministic ID, preventing a chunk to be enqueued twice.
+        """
+        checkpoint_key = _get_send_checkpoint_key(article.id)
+        checkpoint = await redis.hgetall(checkpoint_key)
+        after = UUID(checkpoint["cursor"]) if "cursor" in checkpoint else None
+        count = int(checkpoint.get("count", 0))
+
+        async for chunk in self.stream_receiver_chunks(
+            session,
+            article.organization_id,
+            article.paid_subscribers_only,
+            chunk_size=chunk_size,
+            after=after,
+        ):
+            user_ids = list(chunk)
             await enqueue_job(
-                "articles.send_to_user",
+                "articles.send_to_users",
                 article_id=article.id,
-                user_id=receiver_user_id,
-                is_test=False,
+                user_ids=user_ids,
+                _job_id=f"articles.send_to_users:{article.id}:{user_ids[0]}",
             )
+            count += len(user_ids)
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(
+                    checkpoint_key,
+                    mapping={"cursor": str(user_ids[-1]), "count": count},
+                )
+                pipe.expire(checkpoint_key, ARTICLE_SEND_CHECKPOINT_TTL)
+                await pipe.execute()
 
         # after scheduling is complete
-        article.email_sent_to_count = len(receivers)
+        article.email_sent_to_count = count
         await article.save(session)
         await session.commit()
 
+    async def get_send_chunk_receivers(
+        self, session: AsyncSession, article: Article, user_ids: Sequence[UUID]
+    ) -> Sequence[tuple[User, ArticlesSubscription | None, bool]]:
+        """
+        Bulk-load the users of a delivery chunk with their subscription, if any,
+        and whether they are a member of the organization.
+        """
+        statement = (
+            select(User, ArticlesSubscription, UserOrganization.user_id.is_not(None))
+            .join(
+                ArticlesSubscription,
+                onclause=(ArticlesSubscription.user_id == User.id)
+                & (ArticlesSubscription.organization_id == article.organization_id),
+                isouter=True,
+            )
+            .join(
+                UserOrganization,
+                onclause=(UserOrganization.user_id == User.id)
+                & (UserOrganization.organization_id == article.organization_id),
+                isouter=True,
+            )
+            .where(User.id.in_(user_ids), User.deleted_at.is_(None))
+            .order_by(User.id)
+        )
+        result = await session.execute(statement)
+        return result.tuples().all()
+
+    async def filter_unsent_receivers(
+        self, article: Article, user_ids: Sequence[UUID]
+    ) -> Sequence[UUID]:
+        """
+        Return the user IDs to which the article has not been sent yet.
+        """
+        if not user_ids:
+            return []
+        sent = await redis.smismember(
+            _get_send_sent_key(article.id), [str(user_id) for user_id in user_ids]
+        )
+        return [user_id for user_id, is_sent in zip(user_ids, sent) if not is_sent]
+
+    async def mark_receivers_sent(
+        self, article: Article, user_ids: Sequence[UUID]
+    ) -> None:
+        if not user_ids:
+            return
+        sent_key = _get_send_sent_key(article.id)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(sent_key, *(str(user_id) for user_id in user_ids))
+            pipe.expire(sent_key, ARTICLE_SEND_CHECKPOINT_TTL)
+            await pipe.execute()
+
+    def _get_receivers_statement(
+        self, organization_id: UUID, paid_subscribers_only: bool
+    ) -> Select[tuple[UUID, bool, bool]]:
+        user_subscription_clause = (
+            ArticlesSubscription.organization_id == organization_id
+        )
+        if paid_subscribers_only:
+            user_subscription_clause &= ArticlesSubscription.paid_subscriber.is_(True)
+
+        return (
+            select(
+                User.id,
+                func.coalesce(ArticlesSubscription.paid_subscriber, False),
+                UserOrganization.user_id.is_not(None),
+            )
+            .join(
+                UserOrganization,
+                onclause=(UserOrganization.user_id == User.id)
+                & (UserOrganization.organization_id == organization_id),
+                isouter=True,
+            )
+            .join(
+                ArticlesSubscription,
+                onclause=(ArticlesSubscription.user_id == User.id)
+                & (ArticlesSubscription.organization_id == organization_id)
+                & (ArticlesSubscription.emails_unsubscribed_at.is_(None)),
+                isouter=True,
+            )
+        ).where(
+            or_(
+                user_subscription_clause,
+                UserOrganization.organization_id == organization_id,
+            )
+        )
+
     def _get_readable_articles_statement(
         self, auth_subject: Subject
     ) -> Select[tuple[Article, bool]]:
@@ -3,12 +3,16 @@ from uuid import UUID
 import httpx
 import structlog
 
-from polar.auth.service import AuthService
 from polar.config import settings
-from polar.email.sender import get_email_sender
+from polar.email.sender import EmailMessage, get_email_sender
+from polar.http_client import get_http_client
 from polar.logging import Logger
+from polar.models import ArticlesSubscription, User
 from polar.models.article import Article
 from polar.user.service import user as user_service
+from polar.user_organization.service import (
+    user_organization as user_organization_service,
+)
 from polar.worker import (
     AsyncSessionMaker,
     JobContext,
@@ -17,11 +21,79 @@ from polar.worker import (
     task,
 )
 
+from .renderer import get_article_email_renderer
 from .service import article_service
 
 log: Logger = structlog.get_logger()
 
 
+async def _get_article_email(
+    client: httpx.AsyncClient,
+    article: Article,
+    user: User,
+    subscriber: ArticlesSubscription | None,
+    *,
+    paid_content: bool,
+    is_test: bool,
+) -> EmailMessage | None:
+    subject = "[TEST] " if is_test else ""
+    subject += article.title
+
+    # _, magic_link_token = await magic_link_service.request(
+    #     session,
+    #     user.email,
+    #     source="article_links",
+    #     expires_at=utc_now() + timedelta(hours=24),
+    # )
+
+    email_headers: dict[str, str] = {}
+
+    unsubscribe_link: str | None = None
+    if subscriber:
+        unsubscribe_link = f"https://polar.sh/unsubscribe?org={article.organization.name}&id={subscriber.id}"
+        email_headers["List-Unsubscribe"] = f"<{unsubscribe_link}>"
+
+    renderer = get_article_email_renderer()
+    template = await renderer.render(
+        client,
+        article,
+        user,
+        paid_content=paid_content,
+        unsubscribe=unsubscribe_link is not None,
+        # Always render previews from scratch, the article may have been edited
+        use_cache=not is_test,
+    )
+    if template is None:
+        return None
+
+    from_name = ""
+    if article.byline == Article.Byline.organization:
+        from_name = article.organization.pretty_name or article.organization.name
+    else:
+        from_name = article.created_by_user.username
+
+    return EmailMessage(
+        to_email_addr=user.email,
+        subject=subject,
+        html_content=renderer.personalize(template, unsubscribe_link=unsubscribe_link),
+        from_name=from_name,
+        from_email_addr=f"{article.organization.name}@posts.polar.sh",
+        email_headers=email_headers,
+    )
+
+
+def _can_read_paid_content(
+    subscriber: ArticlesSubscription | None, is_organization_member: bool
+) -> bool:
+    if is_organization_member:
+        return True
+    return (
+        subscriber is not None
+        and subscriber.paid_subscriber
+        and subscriber.deleted_at is None
+    )
+
+
 @task("articles.send_to_user")
 async def articles_send_to_user(
     ctx: JobContext,
@@ -40,63 +112,95 @@ async def articles_send_to_user(
         if not article:
             return
 
-        subject = "[TEST] " if is_test else ""
-        subject += article.title
+        # Get subscriber ID (if exists)
+        subscriber = await article_service.get_subscriber(
+            session, user_id, article.organization_id
+        )
 
-        (jwt, _) = AuthService.generate_token(user)
+        is_organization_member = (
+            await user_organization_service.get_by_user_and_org(
+                session, user_id, article.organization_id
+            )
+            is not None
+        )
 
-        # _, magic_link_token = await magic_link_service.request(
-        #     session,
-        #     user.email,
-        #     source="article_links",
-        #     expires_at=utc_now() + timedelta(hours=24),
-        # )
+        message = await _get_article_email(
+            get_http_client(settings.FRONTEND_BASE_URL),
+            article,
+            user,
+            subscriber,
+            paid_content=_can_read_paid_content(subscriber, is_organization_member),
+            is_test=is_test,
+        )
 
-        email_headers: dict[str, str] = {}
+        if message is not None:
+            email_sender = get_email_sender("article")
+            await email_sender.send_batch([message])
 
-        render_data = {
-            # Add pre-authenticated tokens to the end of all links in the email
-            # "inject_magic_link_token": magic_link_token,
-        }
 
-        # Get subscriber ID (if exists)
-        subscriber = await article_service.get_subscriber(
-            session, user_id, article.organization_id
+@task("articles.send_to_subscribers")
+async def articles_send_to_subscribers(
+    ctx: JobContext,
+    article_id: UUID,
+    polar_context: PolarWorkerContext,
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        article = await article_service.get_loaded(session, article_id)
+        if not article:
+            return
+
+        await article_service.enqueue_send_chunks(session, article)
+
+
+@task("articles.send_to_users")
+async def articles_send_to_users(
+    ctx: JobContext,
+    article_id: UUID,
+    user_ids: list[UUID],
+    polar_context: PolarWorkerContext,
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        article = await article_service.get_loaded(session, article_id)
+        if not article:
+            return
+
+        # Skip receivers already handled by a previous, interrupted, run
+        unsent_user_ids = await article_service.filter_unsent_receivers(
+            article, user_ids
         )
-        if subscriber:
-            unsubscribe_link = f"https://polar.sh/unsubscribe?org={article.organization.name}&id={subscriber.id}"
-            render_data["unsubscribe_link"] = unsubscribe_link
-            email_headers["List-Unsubscribe"] = f"<{unsubscribe_link}>"
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}",
-                json=render_data,
-                # Authenticating to the renderer as the user we're sending the email to
-                headers={"Cookie": f"polar_session={jwt};"},
-                # Increase the default timeout because it can be slow to render
-                timeout=60,
-            )
+        if not unsent_user_ids:
+            return
 
-        if not response.is_success:
-            log.error(f"failed to get rendered article: code={response.status_code}")
-            return None
+        receivers = await article_service.get_send_chunk_receivers(
+            session, article, unsent_user_ids
+        )
 
-        from_name = ""
-        if article.byline == Article.Byline.organization:
-            from_name = article.organization.pretty_name or article.organization.name
-        else:
-            from_name = article.created_by_user.username
+        messages: list[EmailMessage] = []
+        message_user_ids: list[UUID] = []
+        client = get_http_client(settings.FRONTEND_BASE_URL)
+        for user, subscriber, is_organization_member in receivers:
+            message = await _get_article_email(
+                client,
+                article,
+                user,
+                subscriber,
+                paid_content=_can_read_paid_content(subscriber, is_organization_member),
+                is_test=False,
+            )
+            if message is not None:
+                messages.append(message)
+                message_user_ids.append(user.id)
 
         email_sender = get_email_sender("article")
-
-        email_sender.send_to_user(
-            to_email_addr=user.email,
-            subject=subject,
-            html_content=response.text,
-            from_name=from_name,
-            from_email_addr=f"{article.organization.name}@posts.polar.sh",
-            email_headers=email_headers,
+        results = await email_sender.send_batch(messages)
+
+        await article_service.mark_receivers_sent(
+            article,
+            [
+                user_id
+                for user_id, result in zip(message_user_ids, results)
+                if result.success
+            ],
         )
 
 
@@ -108,3 +212,11 @@ async def articles_send_scheduled(
         articles = await article_service.list_scheduled_unsent_posts(session)
         for article in articles:
             await article_service.send_to_subscribers(session, article)
+
+
+@interval(second={0, 30})
+async def articles_flush_view_counts(
+    ctx: JobContext,
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        await article_service.flush_view_counts(session)
@@ -0,0 +1,164 @@
+import datetime
+import hashlib
+import json
+import time
+import uuid
+from dataclasses import dataclass
+
+import structlog
+
+from polar.authz.service import Scope
+from polar.config import settings
+from polar.kit.cache import LocalCache
+from polar.kit.extensions.sqlalchemy import sql
+from polar.logging import Logger
+from polar.models import User
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+
+log: Logger = structlog.get_logger()
+
+
+@dataclass
+class CachedSubject:
+    user: User
+    scopes: list[Scope]
+    pat_id: uuid.UUID
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class AuthCache:
+    """
+    Cache of personal access token subjects, keyed by a hash of the token.
+
+    It saves the lookup of the personal access token on each request.
+    Only the user ID and the scopes are cached, never the user data nor its
+    OAuth tokens: the user is loaded by its primary key. Subjects are stored
+    in an in-process cache, in front of Redis.
+
+    Cookie tokens aren't cached: they're validated without a query,
+    and the user would be loaded by its primary key anyway.
+
+    Entries are invalidated when the personal access token is revoked.
+    Since in-process caches of other processes can't be invalidated,
+    they may serve a revoked token for up to `local_ttl`.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_cache: LocalCache,
+        *,
+        ttl: datetime.timedelta,
+        local_ttl: datetime.timedelta,
+    ) -> None:
+        self.redis = redis
+        self.local_cache = local_cache
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+
+    async def get(self, session: AsyncSession, token: str) -> CachedSubject | None:
+        token_hash = _hash_token(token)
+        value = self.local_cache.get(token_hash)
+        if value is None:
+            value = await self.redis.get(self._get_key(token_hash))
+            if value is None:
+                return None
+            self.local_cache.set(token_hash, value, self.local_ttl)
+
+        data = json.loads(value)
+        if data["expires_at"] <= time.time():
+            self.local_cache.delete(token_hash)
+            return None
+
+        user = await self._get_user(session, uuid.UUID(data["user_id"]))
+        if user is None:
+            self.local_cache.delete(token_hash)
+            return None
+
+        return CachedSubject(
+            user=user,
+            scopes=[Scope(scope) for scope in data["scopes"]],
+            pat_id=uuid.UUID(data["pat_id"]),
+        )
+
+    async def set(
+        self, token: str, subject: CachedSubject, *, expires_at: datetime.datetime
+    ) -> None:
+        """
+        Cache a subject until the expiration of its token, at most for `ttl`.
+        """
+        ttl = min(
+            self.ttl,
+            expires_at - datetime.datetime.now(datetime.UTC),
+        )
+        if ttl.total_seconds() < 1:
+            return
+
+        token_hash = _hash_token(token)
+        value = json.dumps(
+            {
+                "user_id": str(subject.user.id),
+                "scopes": list(subject.scopes),
+                "pat_id": str(subject.pat_id),
+                "expires_at": expires_at.timestamp(),
+            }
+        )
+
+        self.local_cache.set(token_hash, value, min(ttl, self.local_ttl))
+
+        index_key = self._get_pat_index_key(subject.pat_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.setex(self._get_key(token_hash), ttl, value)
+            pipe.sadd(index_key, token_hash)
+            pipe.expire(index_key, self.ttl)
+            await pipe.execute()
+
+    async def invalidate_personal_access_token(self, pat_id: uuid.UUID) -> None:
+        index_key = self._get_pat_index_key(pat_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.smembers(index_key)
+            pipe.delete(index_key)
+            token_hashes, _ = await pipe.execute()
+
+        if not token_hashes:
+            return
+
+        for token_hash in token_hashes:
+            self.local_cache.delete(token_hash)
+        await self.redis.delete(
+            *(self._get_key(token_hash) for token_hash in token_hashes)
+        )
+        log.debug("auth.cache.invalidated", count=len(token_hashes))
+
+    async def _get_user(self, session: AsyncSession, user_id: uuid.UUID) -> User | None:
+        statement = sql.select(User).where(
+            User.id == user_id, User.deleted_at.is_(None)
+        )
+        result = await session.execute(statement)
+        return result.unique().scalar_one_or_none()
+
+    def _get_key(self, token_hash: str) -> str:
+        return f"auth:cache:{token_hash}"
+
+    def _get_pat_index_key(self, pat_id: uuid.UUID) -> str:
+        return f"auth:cache:pat:{pat_id}"
+
+
+_local_cache = LocalCache(settings.AUTH_CACHE_LOCAL_MAX_ENTRIES)
+
+
+def get_auth_cache() -> AuthCache:
+    return AuthCache(
+        redis_client,
+        _local_cache,
+        ttl=datetime.timedelta(seconds=settings.AUTH_CACHE_TTL_SECONDS),
+        local_ttl=datetime.timedelta(seconds=settings.AUTH_CACHE_LOCAL_TTL_SECONDS),
+    )
+
+
+__all__ = ["AuthCache", "CachedSubject", "get_auth_cache"]
@@ -1,10 +1,11 @@
-from datetime import datetime
+from datetime import UTC, datetime
 from uuid import UUID
 
 import structlog
 from fastapi import Request, Response
 from fastapi.responses import RedirectResponse
 
+from polar.auth.cache import CachedSubject, get_auth_cache
 from polar.authz.service import Scope, ScopedSubject
 from polar.config import settings
 from polar.kit import jwt
@@ -129,6 +130,16 @@ class AuthService:
 
             # Personal Access Token in the Authorization header.
             if "pat_id" in decoded:
+                auth_cache = get_auth_cache()
+                cached_subject = await auth_cache.get(session, token)
+                if cached_subject is not None:
+                    await personal_access_token_service.record_usage(
+                        cached_subject.pat_id
+                    )
+                    return ScopedSubject(
+                        subject=cached_subject.user, scopes=cached_subject.scopes
+                    )
+
                 pat = await personal_access_token_service.get(
                     session, id=decoded["pat_id"], load_user=True
                 )
@@ -140,7 +151,14 @@ class AuthService:
                 else:
                     scopes = [Scope.web_default]
 
-                await personal_access_token_service.record_usage(session, id=pat.id)
+                await personal_access_token_service.record_usage(pat.id)
+                await auth_cache.set(
+                    token,
+                    CachedSubject(user=pat.user, scopes=scopes, pat_id=pat.id),
+                    expires_at=min(
+                        datetime.fromtimestamp(decoded["exp"], UTC), pat.expires_at
+                    ),
+                )
 
                 return ScopedSubject(subject=pat.user, scopes=scopes)
 
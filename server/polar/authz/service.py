@@ -1,8 +1,10 @@
+from collections.abc import Iterable, Sequence
 from enum import Enum
 from typing import Self
 from uuid import UUID
 
 from fastapi import Depends
+from sqlalchemy import inspect
 
 from polar.issue.service import issue as issue_service
 from polar.models.account import Account
@@ -16,6 +18,7 @@ from polar.models.subscription import Subscription
 from polar.models.subscription_benefit import SubscriptionBenefit
 from polar.models.subscription_tier import SubscriptionTier
 from polar.models.user import User
+from polar.models.user_organization import UserOrganization
 from polar.postgres import AsyncSession, get_db_session
 from polar.repository.service import repository as repository_service
 from polar.user_organization.service import (
@@ -69,20 +72,63 @@ class Authz:
     session: AsyncSession
 
     # request scoped caches
-    _cache_can_user_read_repository_id: dict[tuple[UUID, UUID], bool]
-    _cache_is_member: dict[tuple[UUID, UUID], bool]
-    _cache_is_member_and_admin: dict[tuple[UUID, UUID], bool]
+    _memberships: dict[UUID, dict[UUID, UserOrganization]]
+    _repositories: dict[UUID, Repository | None]
+    _issues: dict[UUID, Issue | None]
 
     def __init__(self, session: AsyncSession):
         self.session = session
-        self._cache_can_user_read_repository_id = {}
-        self._cache_is_member = {}
-        self._cache_is_member_and_admin = {}
+        self._memberships = {}
+        self._repositories = {}
+        self._issues = {}
 
     @classmethod
     async def authz(cls, session: AsyncSession = Depends(get_db_session)) -> Self:
         return cls(session=session)
 
+    async def can_many(
+        self, subject: Subject, accessType: AccessType, objects: Sequence[Object]
+    ) -> list[bool]:
+        """
+        Check the access of a subject to a list of objects.
+
+        The memberships of the subject, and the repositories and issues
+        the objects depend on, are loaded in bulk beforehand:
+        the number of queries doesn't depend on the number of objects.
+
+        Returns:
+            The decision for each object, in the same order.
+        """
+        if isinstance(subject, User):
+            await self._get_memberships(subject.id)
+
+        issue_ids: set[UUID] = set()
+        repository_ids: set[UUID] = set()
+        for object in objects:
+            if isinstance(object, Issue):
+                self._cache_loaded_repository(object)
+                repository_ids.add(object.repository_id)
+            elif isinstance(object, IssueReward):
+                issue_ids.add(object.issue_id)
+
+        await self._load_issues(issue_ids)
+        for issue in self._issues.values():
+            if issue is not None:
+                repository_ids.add(issue.repository_id)
+        await self._load_repositories(repository_ids)
+
+        return [await self.can(subject, accessType, object) for object in objects]
+
+    async def list_memberships(self, subject: Subject) -> list[UserOrganization]:
+        """
+        Returns the memberships of the subject.
+
+        They're loaded once per Authz instance, and shared with the access checks.
+        """
+        if not isinstance(subject, User):
+            return []
+        return list((await self._get_memberships(subject.id)).values())
+
     async def can(
         self, subject: Subject, accessType: AccessType, object: Object
     ) -> bool:
@@ -269,19 +315,11 @@ class Authz:
     async def _can_user_read_repository_id(
         self, subject: User, repository_id: UUID
     ) -> bool:
-        key = (subject.id, repository_id)
-
-        if key in self._cache_can_user_read_repository_id:
-            return self._cache_can_user_read_repository_id[key]
-
-        repo = await repository_service.get(self.session, repository_id)
+        repo = await self._get_repository(repository_id)
         if not repo:
-            self._cache_can_user_read_repository_id[key] = False
             return False
 
-        res = await self._can_user_read_repository(subject, repo)
-        self._cache_can_user_read_repository_id[key] = res
-        return res
+        return await self._can_user_read_repository(subject, repo)
 
     async def _can_user_write_repository(
         self, subject: User, object: Repository
@@ -304,38 +342,21 @@ class Authz:
         return False
 
     async def _is_member(self, user_id: UUID, organization_id: UUID) -> bool:
-        key = (user_id, organization_id)
-        if key in self._cache_is_member:
-            return self._cache_is_member[key]
-
-        memberships = await user_organization_service.list_by_user_id(
-            self.session, user_id
-        )
-
-        for m in memberships:
-            if m.organization_id == organization_id:
-                self._cache_is_member[key] = True
-                return True
-
-        self._cache_is_member[key] = False
-        return False
+        memberships = await self._get_memberships(user_id)
+        return organization_id in memberships
 
     async def _is_member_and_admin(self, user_id: UUID, organization_id: UUID) -> bool:
-        key = (user_id, organization_id)
-        if key in self._cache_is_member_and_admin:
-            return self._cache_is_member_and_admin[key]
-
-        memberships = await user_organization_service.list_by_user_id(
-            self.session, user_id
-        )
-
-        for m in memberships:
-            if m.organization_id == organization_id and m.is_admin:
-                self._cache_is_member_and_admin[key] = True
-                return True
-
-        self._cache_is_member_and_admin[key] = False
-        return False
+        memberships = await self._get_memberships(user_id)
+        membership = memberships.get(organization_id)
+        return membership is not None and membership.is_admin
+
+    async def _get_memberships(self, user_id: UUID) -> dict[UUID, UserOrganization]:
+        if user_id not in self._memberships:
+            memberships = await user_organization_service.list_by_user_id(
+                self.session, user_id
+            )
+            self._memberships[user_id] = {m.organization_id: m for m in memberships}
+        return self._memberships[user_id]
 
     #
     # Account
@@ -357,7 +378,7 @@ class Authz:
     # Issue
     #
     async def _can_anonymous_read_issue(self, object: Issue) -> bool:
-        repo = await repository_service.get(self.session, object.repository_id)
+        repo = await self._get_repository(object.repository_id)
         if not repo:
             return False
 
@@ -376,7 +397,7 @@ class Authz:
         return False
 
     async def _can_user_write_issue(self, subject: User, object: Issue) -> bool:
-        repo = await repository_service.get(self.session, object.repository_id)
+        repo = await self._get_repository(object.repository_id)
         if not repo:
             return False
 
@@ -406,7 +427,7 @@ class Authz:
             return True
 
         # Can read reward if can write issue
-        issue = await issue_service.get(self.session, object.issue_id)
+        issue = await self._get_issue(object.issue_id)
         if issue and await self._can_user_write_issue(subject, issue):
             return True
 
@@ -468,3 +489,40 @@ class Authz:
             return True
 
         return False
+
+    #
+    # Loaders
+    #
+
+    async def _get_repository(self, id: UUID) -> Repository | None:
+        if id not in self._repositories:
+            self._repositories[id] = await repository_service.get(self.session, id)
+        return self._repositories[id]
+
+    async def _get_issue(self, id: UUID) -> Issue | None:
+        if id not in self._issues:
+            self._issues[id] = await issue_service.get(self.session, id)
+        return self._issues[id]
+
+    async def _load_repositories(self, ids: Iterable[UUID]) -> None:
+        ids = [id for id in ids if id not in self._repositories]
+        if not ids:
+            return
+        repositories = await repository_service.list_by_ids(self.session, ids)
+        self._repositories.update({id: None for id in ids})
+        self._repositories.update({r.id: r for r in repositories})
+
+    async def _load_issues(self, ids: Iterable[UUID]) -> None:
+        ids = [id for id in ids if id not in self._issues]
+        if not ids:
+            return
+        issues = await issue_service.list_by_ids(self.session, ids)
+        self._issues.update({id: None for id in ids})
+        self._issues.update({i.id: i for i in issues})
+
+    def _cache_loaded_repository(self, issue: Issue) -> None:
+        if "repository" in inspect(issue).unloaded:
+            return
+        repository = issue.repository
+        if repository.deleted_at is None:
+            self._repositories.setdefault(issue.repository_id, repository)
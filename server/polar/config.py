@@ -16,6 +16,7 @@ class Environment(str, Enum):
 class EmailSender(str, Enum):
     logger = "logger"
     resend = "resend"
+    fake = "fake"
 
 
 env = Environment(os.getenv("POLAR_ENV", Environment.development))
@@ -49,6 +50,12 @@ class Settings(BaseSettings):
     AUTH_COOKIE_KEY: str = "polar_session"
     AUTH_COOKIE_TTL_SECONDS: int = 60 * 60 * 24 * 31  # 31 days
     AUTH_COOKIE_DOMAIN: str = "127.0.0.1"
+    # Cache of personal access token subjects, keyed by token.
+    # A revoked token may be served from the in-process cache
+    # of other processes for up to AUTH_CACHE_LOCAL_TTL_SECONDS.
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_LOCAL_TTL_SECONDS: int = 5
+    AUTH_CACHE_LOCAL_MAX_ENTRIES: int = 1000
 
     # Magic link
     MAGIC_LINK_TTL_SECONDS: int = 60 * 30  # 30 minutes
@@ -65,6 +72,10 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "127.0.0.1"
     REDIS_PORT: int = 6379
 
+    # Events published to the SSE streams are sent by batches, in this window
+    EVENTSTREAM_PUBLISH_WINDOW_SECONDS: float = 0.05
+    EVENTSTREAM_PUBLISH_MAX_BATCH_SIZE: int = 500
+
     # Github App
     GITHUB_APP_IDENTIFIER: str = ""
     GITHUB_APP_WEBHOOK_SECRET: str = ""
@@ -72,11 +83,60 @@ class Settings(BaseSettings):
     GITHUB_CLIENT_ID: str = ""
     GITHUB_CLIENT_SECRET: str = ""
     GITHUB_POLAR_USER_ACCESS_TOKEN: str | None = None
+    # Bursts of webhook events on the same issue are handled once in this window
+    GITHUB_WEBHOOK_COALESCE_WINDOW_SECONDS: float = 5.0
+    # Requests of the installations rate limit kept for non-background work
+    GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE: int = 1000
+    # In-process cache of GitHub tokens, in front of Redis
+    GITHUB_CACHE_LOCAL_MAX_ENTRIES: int = 1000
+    # Cache of GitHub responses, to make conditional requests
+    GITHUB_HTTP_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 7  # 7 days
+    GITHUB_HTTP_CACHE_LOCAL_TTL_SECONDS: int = 60 * 5  # 5 minutes
+    GITHUB_HTTP_CACHE_LOCAL_MAX_ENTRIES: int = 1000
+    GITHUB_HTTP_CACHE_MAX_SIZE: int = 1024 * 1024  # 1 MB
+    # Pre-rendered SVG badges of the issues, served to GitHub readers
+    GITHUB_BADGE_SVG_CACHE_TTL_SECONDS: int = 60 * 60  # 1 hour
+    GITHUB_BADGE_SVG_LOCAL_TTL_SECONDS: int = 10
+    GITHUB_BADGE_SVG_LOCAL_MAX_ENTRIES: int = 1000
+    GITHUB_BADGE_SVG_MAX_AGE_SECONDS: int = 60
+    GITHUB_BADGE_SVG_STALE_WHILE_REVALIDATE_SECONDS: int = 60 * 10  # 10 minutes
+    GITHUB_BADGE_AVATAR_CACHE_TTL_SECONDS: int = 60 * 60 * 24  # 1 day
+    # Issues recommended to the users, from the repositories they starred
+    GITHUB_RECOMMENDATIONS_TTL_SECONDS: int = 60 * 60 * 24  # 24 hours
+    GITHUB_RECOMMENDATIONS_REFRESH_AFTER_SECONDS: int = 60 * 60 * 12  # 12 hours
+    # Short, so new pledges and updated issues show up quickly.
+    # Also dropped when the recommendations are refreshed.
+    GITHUB_RECOMMENDATIONS_RESPONSE_TTL_SECONDS: int = 60 * 5  # 5 minutes
+    # Lookups of external issues: fresh ones don't call GitHub,
+    # stale ones are served while they're refreshed in the background
+    GITHUB_ISSUE_LOOKUP_FRESH_TTL_SECONDS: int = 60 * 5  # 5 minutes
+    GITHUB_ISSUE_LOOKUP_STALE_TTL_SECONDS: int = 60 * 60 * 24  # 24 hours
+    # Bodies of the issues are rendered in background batches, after this delay
+    GITHUB_ISSUE_BODY_RENDER_DELAY_SECONDS: int = 10
+    GITHUB_ISSUE_BODY_RENDER_BATCH_SIZE: int = 100
+    GITHUB_ISSUE_BODY_RENDER_CONCURRENCY: int = 4
+    # Periodic crawls of the issues: the ones not fetched for this long are stale,
+    # and the budget of each installation is spread over the crawl intervals
+    GITHUB_CRAWL_INTERVAL_SECONDS: int = 60 * 10  # 10 minutes
+    GITHUB_CRAWL_STALE_AFTER_SECONDS: int = 60 * 60 * 12  # 12 hours
+    GITHUB_CRAWL_MAX_ISSUES_PER_INTERVAL: int = 100
+
+    # Outbound HTTP clients, pooled by host and shared by the integrations
+    HTTP_CLIENT_TIMEOUT_SECONDS: float = 30.0
+    HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST: int = 20
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS_PER_HOST: int = 10
 
     # Discord
     DISCORD_CLIENT_ID: str = ""
     DISCORD_CLIENT_SECRET: str = ""
     DISCORD_BOT_TOKEN: str = ""
+    # Rate limited requests are retried in place if the wait is short enough,
+    # otherwise they fail and the job is retried later.
+    DISCORD_RATE_LIMIT_MAX_RETRIES: int = 3
+    DISCORD_RATE_LIMIT_MAX_WAIT_SECONDS: float = 30.0
+    # Lifetime of the snapshot of the guild members, shared by the sync jobs
+    DISCORD_MEMBERS_CACHE_TTL_SECONDS: int = 300
     DISCORD_BOT_PERMISSIONS: str = (
         "268435459"  # Manage Roles, Kick Members, Create Instant Invite
     )
@@ -86,6 +146,10 @@ class Settings(BaseSettings):
     # Stripe webhook secrets
     STRIPE_WEBHOOK_SECRET: str = ""
     STRIPE_CONNECT_WEBHOOK_SECRET: str = ""
+    # Stripe calls run in a pool of threads, and are retried on network errors
+    STRIPE_GATEWAY_MAX_WORKERS: int = 16
+    STRIPE_MAX_NETWORK_RETRIES: int = 2
+    STRIPE_TIMEOUT_SECONDS: int = 30
 
     # Open Collective
     OPEN_COLLECTIVE_PERSONAL_TOKEN: str | None = None
@@ -104,6 +168,8 @@ class Settings(BaseSettings):
 
     # Application behaviours
     API_PAGINATION_MAX_LIMIT: int = 100
+    # Total count is capped to this value when paginating by cursor
+    API_PAGINATION_MAX_COUNT: int = 10000
 
     GITHUB_BADGE_EMBED: bool = False
     GITHUB_BADGE_EMBED_DEFAULT_LABEL: str = "Fund"
@@ -114,6 +180,8 @@ class Settings(BaseSettings):
     ACCOUNT_TRANSFERS_REVIEW_THRESHOLD: int = 10000
 
     SUBSCRIPTION_FEE_PERCENT: int = 5
+    # Number of grants processed by each benefit grants job
+    SUBSCRIPTION_BENEFIT_GRANTS_BATCH_SIZE: int = 100
     PLEDGE_FEE_PERCENT: int = 5
 
     # Default organization setting for minimum pledge amount ($20)
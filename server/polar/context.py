@@ -17,8 +17,17 @@ class ExecutionContext:
     # found during the initial syncing.
     is_during_installation: bool
 
-    def __init__(self, is_during_installation: bool = False) -> None:
+    # is_low_priority is True for background work, like periodic crawls.
+    #
+    # It allows us to, for example, keep the GitHub rate limit budget
+    # for the work triggered by users and webhooks.
+    is_low_priority: bool
+
+    def __init__(
+        self, is_during_installation: bool = False, is_low_priority: bool = False
+    ) -> None:
         self.is_during_installation = is_during_installation
+        self.is_low_priority = is_low_priority
 
     def __enter__(self) -> "ExecutionContext":
         self.token = ExecutionContext._contextvar.set(self)
@@ -0,0 +1,168 @@
+from collections.abc import Sequence
+from uuid import UUID
+
+from polar.authz.service import AccessType, Authz, Subject
+from polar.dashboard.schemas import Entry, IssueListResponse, PaginationResponse
+from polar.funding.schemas import PledgesTypeSummaries
+from polar.issue.schemas import Issue as IssueSchema
+from polar.issue.schemas import IssueReferenceRead
+from polar.models.issue import Issue
+from polar.models.pledge import PledgeState
+from polar.models.user import User
+from polar.models.user_organization import UserOrganization
+from polar.pledge.endpoints import to_schema as pledge_to_schema
+from polar.pledge.schemas import Pledge as PledgeSchema
+from polar.pledge.service import pledge as pledge_service
+from polar.postgres import AsyncSession
+from polar.reward.endpoints import to_resource
+from polar.reward.schemas import Reward
+from polar.reward.service import reward_service
+
+
+class DashboardAssembler:
+    """
+    Build the dashboard response of a page of issues.
+
+    It only runs a fixed set of bulk queries, whatever the number
+    of issues and pledges on the page:
+
+    * the memberships of the subject, shared with `Authz`;
+    * the pledges summaries, only if the pledges of the issues were filtered;
+    * the rewards, if requested.
+
+    The issues are expected to be loaded with their references, pledges
+    and repository, as done by `issue_service.list_by_repository_type_and_status`.
+    """
+
+    def __init__(self, session: AsyncSession, authz: Authz, subject: Subject) -> None:
+        self.session = session
+        self.authz = authz
+        self.subject = subject
+
+    async def assemble(
+        self,
+        issues: Sequence[Issue],
+        *,
+        total_count: int,
+        page: int,
+        limit: int,
+        pledges_filtered: bool = False,
+        include_rewards: bool = False,
+    ) -> IssueListResponse:
+        """
+        Args:
+            pledges_filtered: Whether the pledges loaded on the issues were filtered,
+            e.g. by pledger. In that case, they're loaded again for the summaries.
+            include_rewards: Whether to include the rewards of the issues.
+        """
+        memberships = await self.authz.list_memberships(self.subject)
+
+        issue_pledges = await self._get_pledges(issues, memberships)
+        issue_references = self._get_references(issues)
+        issue_pledge_summaries = await self._get_pledge_summaries(
+            issues, pledges_filtered
+        )
+        issue_rewards: dict[UUID, list[Reward]] = {}
+        if include_rewards:
+            issue_rewards = await self._get_rewards(issues)
+
+        next_page = page + 1 if total_count > page * limit else None
+
+        return IssueListResponse(
+            data=[
+                Entry(
+                    id=i.id,
+                    type="issue",
+                    attributes=IssueSchema.from_db(i),
+                    rewards=issue_rewards.get(i.id, None),
+                    pledges_summary=issue_pledge_summaries.get(i.id, None),
+                    references=issue_references.get(i.id, None),
+                    pledges=issue_pledges.get(i.id, None),
+                )
+                for i in issues
+            ],
+            pagination=PaginationResponse(
+                total_count=total_count,
+                page=page,
+                next_page=next_page,
+            ),
+        )
+
+    async def _get_pledges(
+        self, issues: Sequence[Issue], memberships: Sequence[UserOrganization]
+    ) -> dict[UUID, list[PledgeSchema]]:
+        pledge_statuses = set(PledgeState.active_states()) | {PledgeState.disputed}
+
+        issue_pledges: dict[UUID, list[PledgeSchema]] = {}
+        for i in issues:
+            for pled in i.pledges:
+                # Filter out invalid pledges
+                if pled.state not in pledge_statuses:
+                    continue
+
+                pledge_schema = await pledge_to_schema(
+                    self.session, self.subject, pled, memberships=memberships
+                )
+
+                # Add user-specific metadata
+                if isinstance(self.subject, User):
+                    pledge_schema.authed_can_admin_sender = (
+                        pledge_service.user_can_admin_sender_pledge(
+                            self.subject, pled, memberships
+                        )
+                    )
+                    pledge_schema.authed_can_admin_received = (
+                        pledge_service.user_can_admin_received_pledge(pled, memberships)
+                    )
+
+                issue_pledges.setdefault(i.id, []).append(pledge_schema)
+
+        return issue_pledges
+
+    def _get_references(
+        self, issues: Sequence[Issue]
+    ) -> dict[UUID, list[IssueReferenceRead]]:
+        issue_references: dict[UUID, list[IssueReferenceRead]] = {}
+        for i in issues:
+            for ref in i.references:
+                issue_references.setdefault(ref.issue_id, []).append(
+                    IssueReferenceRead.from_model(ref)
+                )
+        return issue_references
+
+    async def _get_pledge_summaries(
+        self, issues: Sequence[Issue], pledges_filtered: bool
+    ) -> dict[UUID, PledgesTypeSummaries]:
+        # Public data, vs pledges who are dependent on who you are
+        if pledges_filtered:
+            return await pledge_service.issues_pledge_type_summary(
+                self.session, issues=issues
+            )
+
+        # The active pledges are already loaded, with their pledgers
+        return {i.id: pledge_service.pledge_type_summary(i.pledges) for i in issues}
+
+    async def _get_rewards(self, issues: Sequence[Issue]) -> dict[UUID, list[Reward]]:
+        rewards = await reward_service.list(
+            self.session, issue_ids=[i.id for i in issues]
+        )
+        can_write_pledges = await self.authz.can_many(
+            self.subject, AccessType.write, [pledge for pledge, _, _ in rewards]
+        )
+
+        issue_rewards: dict[UUID, list[Reward]] = {}
+        for (pledge, reward, transaction), can_write_pledge in zip(
+            rewards, can_write_pledges
+        ):
+            issue_rewards.setdefault(pledge.issue_id, []).append(
+                to_resource(
+                    pledge,
+                    reward,
+                    transaction,
+                    include_receiver_admin_fields=can_write_pledge,
+                )
+            )
+        return issue_rewards
+
+
+__all__ = ["DashboardAssembler"]
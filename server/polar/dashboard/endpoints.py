@@ -1,41 +1,26 @@
 from collections.abc import Sequence
-from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 
 from polar.auth.dependencies import Auth, UserRequiredAuth
 from polar.authz.service import AccessType, Authz
+from polar.dashboard.assembler import DashboardAssembler
 from polar.dashboard.schemas import (
-    Entry,
     IssueListResponse,
     IssueListType,
     IssueSortBy,
     IssueStatus,
-    PaginationResponse,
 )
 from polar.enums import Platforms
 from polar.exceptions import ResourceNotFound, Unauthorized
 from polar.funding.schemas import PledgesTypeSummaries
-from polar.issue.schemas import Issue as IssueSchema
-from polar.issue.schemas import IssueReferenceRead
 from polar.issue.service import issue
 from polar.models.organization import Organization
-from polar.models.pledge import PledgeState
 from polar.models.repository import Repository
 from polar.models.user import User
-from polar.models.user_organization import UserOrganization
 from polar.organization.service import organization as organization_service
-from polar.pledge.endpoints import to_schema as pledge_to_schema
-from polar.pledge.schemas import Pledge as PledgeSchema
-from polar.pledge.service import pledge as pledge_service
 from polar.postgres import AsyncSession, get_db_session
 from polar.repository.service import repository
-from polar.reward.endpoints import to_resource
-from polar.reward.schemas import Reward
-from polar.reward.service import reward_service
-from polar.user_organization.service import (
-    user_organization as user_organization_service,
-)
 
 router = APIRouter(tags=["dashboard"])
 
@@ -102,11 +87,8 @@ async def get_dashboard(
         raise ResourceNotFound()
 
     # only if user is a member of this org
-    if not await user_organization_service.get_by_user_and_org(
-        session,
-        auth.user.id,
-        organization_id=org.id,
-    ):
+    memberships = await authz.list_memberships(auth.user)
+    if not any(m.organization_id == org.id for m in memberships):
         raise Unauthorized()
 
     repositories: Sequence[Repository] = []
@@ -133,8 +115,11 @@ async def get_dashboard(
         )
 
     # Limit to repositories that the authed subject can read
+    can_read_repositories = await authz.can_many(
+        auth.subject, AccessType.read, repositories
+    )
     repositories = [
-        r for r in repositories if await authz.can(auth.subject, AccessType.read, r)
+        r for r, can_read in zip(repositories, can_read_repositories) if can_read
     ]
 
     if not repositories:
@@ -221,103 +206,13 @@ async def dashboard(
         offset=offset,
     )
 
-    pledge_statuses = list(
-        set(PledgeState.active_states()) | set([PledgeState.disputed])
-    )
-
-    # load user memberships
-    user_memberships: Sequence[UserOrganization] = []
-    if auth.user:
-        user_memberships = await user_organization_service.list_by_user_id(
-            session,
-            auth.user.id,
-        )
-
-    # add pledges to included
-    issue_pledges: dict[UUID, list[PledgeSchema]] = {}
-    for i in issues:
-        for pled in i.pledges:
-            # Filter out invalid pledges
-            if pled.state not in pledge_statuses:
-                continue
-
-            pledge_schema = await pledge_to_schema(session, auth.subject, pled)
-
-            # Add user-specific metadata
-            if auth.user:
-                pledge_schema.authed_can_admin_sender = (
-                    pledge_service.user_can_admin_sender_pledge(
-                        auth.user, pled, user_memberships
-                    )
-                )
-                pledge_schema.authed_can_admin_received = (
-                    pledge_service.user_can_admin_received_pledge(
-                        pled, user_memberships
-                    )
-                )
-
-            irefs = issue_pledges.get(i.id, [])
-            irefs.append(pledge_schema)
-            issue_pledges[i.id] = irefs
-
-    # get linked pull requests
-    issue_references: dict[UUID, list[IssueReferenceRead]] = {}
-    for i in issues:
-        refs = i.references
-        for ref in refs:
-            issue_refs = issue_references.get(ref.issue_id, [])
-            issue_refs.append(IssueReferenceRead.from_model(ref))
-            issue_references[ref.issue_id] = issue_refs
-
-    # get pledge summary (public data, vs pledges who are dependent on who you are)
-    pledge_summaries = await pledge_service.issues_pledge_type_summary(
-        session,
-        issues=issues,
-    )
-    issue_pledge_summaries: dict[UUID, PledgesTypeSummaries] = {}
-    for issue_id, summary in pledge_summaries.items():
-        issue_pledge_summaries[issue_id] = summary
-
-    # get rewards
-    issue_rewards: dict[UUID, list[Reward]] = {}
-    if for_org:
-        rewards = await reward_service.list(session, issue_ids=[i.id for i in issues])
-        for pledge, reward, transaction in rewards:
-            reward_resource = to_resource(
-                pledge,
-                reward,
-                transaction,
-                include_receiver_admin_fields=await authz.can(
-                    auth.subject, AccessType.write, pledge
-                ),
-            )
-
-            ir2 = issue_rewards.get(pledge.issue_id, [])
-            ir2.append(reward_resource)
-            issue_rewards[pledge.issue_id] = ir2
-
-    next_page = page + 1 if total_issue_count > page * limit else None
-
-    data: list[Entry] = [
-        Entry(
-            id=i.id,
-            type="issue",
-            attributes=IssueSchema.from_db(i),
-            rewards=issue_rewards.get(i.id, None),
-            pledges_summary=issue_pledge_summaries.get(i.id, None),
-            references=issue_references.get(i.id, None),
-            pledges=issue_pledges.get(i.id, None),
-        )
-        for i in issues
-    ]
-
-    return IssueListResponse(
-        data=data,
-        pagination=PaginationResponse(
-            total_count=total_issue_count,
-            page=page,
-            next_page=next_page,
-        ),
+    return await DashboardAssembler(session, authz, auth.subject).assemble(
+        issues,
+        total_count=total_issue_count,
+        page=page,
+        limit=limit,
+        pledges_filtered=for_user is not None,
+        include_rewards=for_org is not None,
     )
 
 
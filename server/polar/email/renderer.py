@@ -8,6 +8,7 @@ from jinja2 import (
     PackageLoader,
     PrefixLoader,
     StrictUndefined,
+    Template,
     select_autoescape,
 )
 
@@ -49,8 +50,14 @@ class EmailRenderer:
     def render_from_string(
         self, subject: str, body: str, context: dict[str, Any]
     ) -> tuple[str, str]:
-        rendered_subject = self.env.from_string(subject).render(context).strip()
+        subject_template, body_template = self.compile_from_string(subject, body)
+        return self.render_compiled(subject_template, body_template, context)
 
+    def compile_from_string(self, subject: str, body: str) -> tuple[Template, Template]:
+        """
+        Compile the subject and body, wrapped in the base layout, once,
+        so they can be rendered for many recipients with `render_compiled`.
+        """
         wrapped_body = f"""
         {{% extends 'base.html' %}}
 
@@ -59,9 +66,16 @@ class EmailRenderer:
         {{% endblock %}}
         """
 
+        return self.env.from_string(subject), self.env.from_string(wrapped_body)
+
+    def render_compiled(
+        self, subject: Template, body: Template, context: dict[str, Any]
+    ) -> tuple[str, str]:
+        rendered_subject = subject.render(context).strip()
+
         context["current_year"] = datetime.datetime.now().year
 
-        rendered_body = self.env.from_string(wrapped_body).render(context).strip()
+        rendered_body = body.render(context).strip()
         return rendered_subject, rendered_body
 
     def render_from_template(
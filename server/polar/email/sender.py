@@ -1,34 +1,63 @@
+import asyncio
+import dataclasses
+import functools
+import random
+import time
+import uuid
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any
 
-import resend
+import httpx
 import structlog
 
 from polar.config import EmailSender as EmailSenderType
 from polar.config import settings
+from polar.exceptions import PolarError
+from polar.http_client import get_http_client
 from polar.logging import Logger
 
 log: Logger = structlog.get_logger()
 
 
-class EmailSender(ABC):
-    @abstractmethod
-    def send_to_user(
-        self,
-        *,
-        to_email_addr: str,
-        subject: str,
-        html_content: str,
-        from_name: str = "Polar",
-        from_email_addr: str = "notifications@polar.sh",
-        email_headers: dict[str, str] = {},
-        reply_to_name: str | None = None,
-        reply_to_email_addr: str | None = None,
-    ) -> None:
-        pass
+class EmailSenderError(PolarError):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
 
 
-class LoggingEmailSender(EmailSender):
-    def send_to_user(
+class RetriableEmailSenderError(EmailSenderError):
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+@dataclasses.dataclass
+class EmailMessage:
+    to_email_addr: str
+    subject: str
+    html_content: str
+    from_name: str = "Polar"
+    from_email_addr: str = "notifications@polar.sh"
+    email_headers: dict[str, str] = dataclasses.field(default_factory=dict)
+    reply_to_name: str | None = None
+    reply_to_email_addr: str | None = None
+
+
+@dataclasses.dataclass
+class EmailSendResult:
+    message: EmailMessage
+    id: str | None = None
+    error: str | None = None
+    # Whether the message could be sent again later
+    retriable: bool = False
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+class EmailSender(ABC):
+    async def send_to_user(
         self,
         *,
         to_email_addr: str,
@@ -40,58 +69,278 @@ class LoggingEmailSender(EmailSender):
         reply_to_name: str | None = None,
         reply_to_email_addr: str | None = None,
     ) -> None:
-        log.info(
-            "logging email",
+        message = EmailMessage(
             to_email_addr=to_email_addr,
             subject=subject,
             html_content=html_content,
             from_name=from_name,
             from_email_addr=from_email_addr,
             email_headers=email_headers,
+            reply_to_name=reply_to_name,
+            reply_to_email_addr=reply_to_email_addr,
         )
+        [result] = await self.send_batch([message])
+        if result.error is not None:
+            raise EmailSenderError(result.error)
+
+    @abstractmethod
+    async def send_batch(
+        self, messages: Sequence[EmailMessage]
+    ) -> list[EmailSendResult]:
+        """
+        Send a batch of emails.
+
+        Returns:
+            The result of each message, in the same order as `messages`.
+        """
+        pass
 
 
-class ResendEmailSender(EmailSender):
-    def __init__(self) -> None:
-        super().__init__()
-        resend.api_key = settings.RESEND_API_KEY
+class LoggingEmailSender(EmailSender):
+    async def send_batch(
+        self, messages: Sequence[EmailMessage]
+    ) -> list[EmailSendResult]:
+        for message in messages:
+            log.info(
+                "logging email",
+                to_email_addr=message.to_email_addr,
+                subject=message.subject,
+                html_content=message.html_content,
+                from_name=message.from_name,
+                from_email_addr=message.from_email_addr,
+                email_headers=message.email_headers,
+            )
+        return [EmailSendResult(message=message) for message in messages]
+
 
-    def send_to_user(
+class BatchingEmailSender(EmailSender):
+    """
+    Base class for senders backed by a provider supporting batch sending.
+
+    Messages are split in batches of `batch_size`, and up to `max_concurrency`
+    batches are sent in parallel. Batches failing with a retriable error are
+    retried with an exponential backoff, up to `max_retries` times, with the
+    same idempotency key so the provider doesn't send them twice.
+    """
+
+    def __init__(
         self,
         *,
-        to_email_addr: str,
-        subject: str,
-        html_content: str,
-        from_name: str = "Polar",
-        from_email_addr: str = "polarsource@posts.polar.sh",
-        email_headers: dict[str, str] = {},
-        reply_to_name: str | None = None,
-        reply_to_email_addr: str | None = None,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
     ) -> None:
-        params = {
-            "from": f"{from_name} <{from_email_addr}>",
-            "to": [to_email_addr],
-            "subject": subject,
-            "html": html_content,
-            "headers": email_headers,
-        }
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
 
-        if reply_to_name and reply_to_email_addr:
-            params["reply_to"] = f"{reply_to_name} <{reply_to_email_addr}>"
+    async def send_batch(
+        self, messages: Sequence[EmailMessage]
+    ) -> list[EmailSendResult]:
+        batches = [
+            messages[i : i + self.batch_size]
+            for i in range(0, len(messages), self.batch_size)
+        ]
+        results = await asyncio.gather(
+            *(self._send_batch_with_retries(batch) for batch in batches)
+        )
+        return [result for batch_results in results for result in batch_results]
 
-        email = resend.Emails.send(params)
+    async def _send_batch_with_retries(
+        self, batch: Sequence[EmailMessage]
+    ) -> list[EmailSendResult]:
+        error = ""
+        retriable = False
+        idempotency_key = uuid.uuid4().hex
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    ids = await self._send_batch(batch, idempotency_key)
+                    _check_ids(batch, ids)
+                    return [
+                        EmailSendResult(message=message, id=id)
+                        for message, id in zip(batch, ids)
+                    ]
+                except RetriableEmailSenderError as e:
+                    if attempt == self.max_retries:
+                        error = str(e)
+                        retriable = True
+                        break
+                    delay = e.retry_after or self.retry_base_delay * 2**attempt
+                    log.warning(
+                        "email.send_batch.retry",
+                        attempt=attempt,
+                        delay=delay,
+                        error=str(e),
+                    )
+                    await asyncio.sleep(delay + random.uniform(0, delay / 10))
+                except EmailSenderError as e:
+                    error = str(e)
+                    break
 
-        log.info(
-            "resend.send",
-            to_email_addr=to_email_addr,
-            subject=subject,
-            email_id=email["id"],
+        log.error("email.send_batch.failed", size=len(batch), error=error)
+        return [
+            EmailSendResult(message=message, error=error, retriable=retriable)
+            for message in batch
+        ]
+
+    @abstractmethod
+    async def _send_batch(
+        self, batch: Sequence[EmailMessage], idempotency_key: str
+    ) -> list[str]:
+        """
+        Send a single batch to the provider.
+
+        The idempotency key is the same for every attempt of a batch.
+
+        Returns:
+            The provider ID of each message.
+
+        Raises:
+            RetriableEmailSenderError: The batch can be retried.
+            EmailSenderError: The batch failed and should not be retried.
+        """
+        pass
+
+
+def _check_ids(batch: Sequence[EmailMessage], ids: Sequence[str]) -> None:
+    # Results are matched to the messages by position
+    if len(ids) != len(batch):
+        raise EmailSenderError(
+            f"Email provider returned {len(ids)} IDs for {len(batch)} messages"
         )
 
 
-def get_email_sender(type: str = "notification") -> EmailSender:
-    if settings.EMAIL_SENDER == EmailSenderType.resend:
+class ResendEmailSender(BatchingEmailSender):
+    base_url = "https://api.resend.com"
+
+    async def _send_batch(
+        self, batch: Sequence[EmailMessage], idempotency_key: str
+    ) -> list[str]:
+        # Single emails go through the regular endpoint, which supports more options
+        if len(batch) == 1:
+            response = await self._request(
+                "/emails", self._get_params(batch[0]), idempotency_key
+            )
+            ids = [response["id"]]
+        else:
+            response = await self._request(
+                "/emails/batch",
+                [self._get_params(message) for message in batch],
+                idempotency_key,
+            )
+            ids = [email["id"] for email in response["data"]]
+
+        for message, id in zip(batch, ids):
+            log.info(
+                "resend.send",
+                to_email_addr=message.to_email_addr,
+                subject=message.subject,
+                email_id=id,
+            )
+        return ids
+
+    async def _request(self, endpoint: str, json: Any, idempotency_key: str) -> Any:
+        url = f"{self.base_url}{endpoint}"
+        try:
+            response = await get_http_client(url).post(
+                url,
+                json=json,
+                headers={
+                    "Authorization": f"Bearer {settings.RESEND_API_KEY}",
+                    "Idempotency-Key": idempotency_key,
+                },
+            )
+        except httpx.TransportError as e:
+            raise RetriableEmailSenderError(str(e)) from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            raise RetriableEmailSenderError(
+                f"Resend API error: {response.status_code}",
+                retry_after=float(retry_after) if retry_after is not None else None,
+            )
+        if not response.is_success:
+            raise EmailSenderError(
+                f"Resend API error: {response.status_code} {response.text}"
+            )
+
+        return response.json()
+
+    def _get_params(self, message: EmailMessage) -> dict[str, Any]:
+        params: dict[str, Any] = {
+            "from": f"{message.from_name} <{message.from_email_addr}>",
+            "to": [message.to_email_addr],
+            "subject": message.subject,
+            "html": message.html_content,
+            "headers": message.email_headers,
+        }
+
+        if message.reply_to_name and message.reply_to_email_addr:
+            params[
+                "reply_to"
+            ] = f"{message.reply_to_name} <{message.reply_to_email_addr}>"
+
+        return params
+
+
+class FakeEmailSender(BatchingEmailSender):
+    """
+    Local sender simulating a batch-sending provider, without sending anything.
+
+    It records every message it "sent" and the duration of each batch call,
+    so the sending throughput of our jobs can be benchmarked offline.
+
+    Args:
+        latency: Simulated duration in seconds of a provider call.
+        error_rate: Probability of a provider call to fail with a retriable error.
+    """
+
+    def __init__(
+        self, *, latency: float = 0.0, error_rate: float = 0.0, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.sent: list[EmailMessage] = []
+        self.timings: list[float] = []
+
+    async def _send_batch(
+        self, batch: Sequence[EmailMessage], idempotency_key: str
+    ) -> list[str]:
+        start = time.perf_counter()
+        await asyncio.sleep(self.latency)
+        self.timings.append(time.perf_counter() - start)
+
+        if random.random() < self.error_rate:
+            raise RetriableEmailSenderError("Fake provider error")
+
+        self.sent.extend(batch)
+        return [f"fake_{len(self.sent) - len(batch) + i}" for i in range(len(batch))]
+
+
+@functools.cache
+def _get_email_sender(sender_type: EmailSenderType) -> EmailSender:
+    if sender_type == EmailSenderType.resend:
         return ResendEmailSender()
+    if sender_type == EmailSenderType.fake:
+        return FakeEmailSender()
 
     # Logging in development
     return LoggingEmailSender()
+
+
+def get_email_sender(type: str = "notification") -> EmailSender:
+    # Senders are shared, so they share their concurrency limit
+    return _get_email_sender(settings.EMAIL_SENDER)
+
+
+__all__ = [
+    "EmailMessage",
+    "EmailSendResult",
+    "EmailSender",
+    "EmailSenderError",
+    "get_email_sender",
+]
@@ -1,77 +1,112 @@
-import asyncio
+import contextlib
+import time
 from collections.abc import AsyncGenerator
-from typing import Any
+from uuid import UUID
 
 import structlog
-from fastapi import APIRouter, Depends, Request
-from redis.exceptions import ConnectionError
+from fastapi import APIRouter, Depends
 from sse_starlette.sse import EventSourceResponse
 
 from polar.auth.dependencies import Auth, UserRequiredAuth
 from polar.enums import Platforms
 from polar.exceptions import ResourceNotFound, Unauthorized
 from polar.organization.service import organization as organization_service
-from polar.postgres import AsyncSession, get_db_session
-from polar.redis import Redis, get_redis
+from polar.postgres import (
+    AsyncSession,
+    AsyncSessionMaker,
+    get_db_session,
+    get_db_sessionmaker,
+)
 from polar.repository.service import repository as repository_service
 from polar.user_organization.service import (
     user_organization as user_organization_service,
 )
 
+from .multiplexer import HEARTBEAT_INTERVAL, get_multiplexer
 from .service import Receivers
 
 router = APIRouter(tags=["stream"])
 
 log = structlog.get_logger()
 
+# Interval in seconds between checks that the user is still a member
+# of the organizations they're listening to
+MEMBERSHIP_CHECK_INTERVAL = 60
 
-async def subscribe(
-    redis: Redis,
-    channels: list[str],
-    request: Request,
-) -> AsyncGenerator[Any, Any]:
-    async with redis.pubsub() as pubsub:
-        await pubsub.subscribe(*channels)
 
-        while True:
-            if await request.is_disconnected():
-                await pubsub.close()
-                break
+def subscribe(
+    receivers: Receivers, sessionmaker: AsyncSessionMaker
+) -> EventSourceResponse:
+    return EventSourceResponse(
+        listen_while_member(receivers, sessionmaker), ping=HEARTBEAT_INTERVAL
+    )
 
-            try:
-                message = await pubsub.get_message(
-                    ignore_subscribe_messages=True,
-                )
 
-                if message is not None:
-                    log.info("redis.pubsub", message=message["data"])
-                    yield message["data"]
-            except asyncio.CancelledError as e:
-                await pubsub.close()
-                raise e
-            except ConnectionError as e:
-                await pubsub.close()
-                raise e
+async def listen_while_member(
+    receivers: Receivers, sessionmaker: AsyncSessionMaker
+) -> AsyncGenerator[str, None]:
+    """
+    Listen to the channels of the receivers, until the user
+    is removed from one of the organizations they're listening to.
+
+    Memberships are resolved when the stream opens, so we check them again
+    before delivering a message if they're older than `MEMBERSHIP_CHECK_INTERVAL`.
+    The client will reconnect and get the channels of its current memberships.
+    """
+    assert receivers.user_id is not None
+    organization_ids = set(receivers.member_organization_ids)
+    if receivers.organization_id is not None:
+        organization_ids.add(receivers.organization_id)
+
+    multiplexer = get_multiplexer()
+    checked_at = time.monotonic()
+    async with contextlib.aclosing(
+        multiplexer.listen(receivers.get_channels())
+    ) as messages:
+        async for message in messages:
+            if time.monotonic() - checked_at >= MEMBERSHIP_CHECK_INTERVAL:
+                async with sessionmaker() as session:
+                    member_organization_ids = await get_member_organization_ids(
+                        session, receivers.user_id
+                    )
+                if not organization_ids.issubset(member_organization_ids):
+                    log.info(
+                        "eventstream.membership_removed", user_id=receivers.user_id
+                    )
+                    return
+                checked_at = time.monotonic()
+            yield message
+
+
+async def get_member_organization_ids(
+    session: AsyncSession, user_id: UUID
+) -> list[UUID]:
+    memberships = await user_organization_service.list_by_user_id(session, user_id)
+    return [membership.organization_id for membership in memberships]
 
 
 @router.get("/user/stream")
 async def user_stream(
-    request: Request,
     auth: UserRequiredAuth,
-    redis: Redis = Depends(get_redis),
+    session: AsyncSession = Depends(get_db_session),
+    sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
 ) -> EventSourceResponse:
-    receivers = Receivers(user_id=auth.user.id)
-    return EventSourceResponse(subscribe(redis, receivers.get_channels(), request))
+    receivers = Receivers(
+        user_id=auth.user.id,
+        member_organization_ids=await get_member_organization_ids(
+            session, auth.user.id
+        ),
+    )
+    return subscribe(receivers, sessionmaker)
 
 
 @router.get("/{platform}/{org_name}/stream")
 async def user_org_stream(
     platform: Platforms,
     org_name: str,
-    request: Request,
     auth: Auth = Depends(Auth.current_user),
-    redis: Redis = Depends(get_redis),
     session: AsyncSession = Depends(get_db_session),
+    sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
 ) -> EventSourceResponse:
     if not auth.user:
         raise Unauthorized()
@@ -88,8 +123,14 @@ async def user_org_stream(
     ):
         raise Unauthorized()
 
-    receivers = Receivers(user_id=auth.user.id, organization_id=org.id)
-    return EventSourceResponse(subscribe(redis, receivers.get_channels(), request))
+    receivers = Receivers(
+        user_id=auth.user.id,
+        organization_id=org.id,
+        member_organization_ids=await get_member_organization_ids(
+            session, auth.user.id
+        ),
+    )
+    return subscribe(receivers, sessionmaker)
 
 
 @router.get("/{platform}/{org_name}/{repo_name}/stream")
@@ -97,10 +138,9 @@ async def user_org_repo_stream(
     platform: Platforms,
     org_name: str,
     repo_name: str,
-    request: Request,
     auth: Auth = Depends(Auth.current_user),
-    redis: Redis = Depends(get_redis),
     session: AsyncSession = Depends(get_db_session),
+    sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
 ) -> EventSourceResponse:
     if not auth.user:
         raise Unauthorized()
@@ -127,5 +167,8 @@ async def user_org_repo_stream(
         user_id=auth.user.id,
         organization_id=org.id,
         repository_id=repo.id,
+        member_organization_ids=await get_member_organization_ids(
+            session, auth.user.id
+        ),
     )
-    return EventSourceResponse(subscribe(redis, receivers.get_channels(), request))
+    return subscribe(receivers, sessionmaker)
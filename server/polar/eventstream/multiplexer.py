@@ -0,0 +1,188 @@
+import asyncio
+import dataclasses
+from collections.abc import AsyncGenerator
+
+import structlog
+from redis.asyncio.client import PubSub
+from redis.exceptions import ConnectionError
+
+from polar.logging import Logger
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+
+log: Logger = structlog.get_logger()
+
+# Interval in seconds between keepalive comments sent on idle SSE connections
+HEARTBEAT_INTERVAL = 15
+
+
+@dataclasses.dataclass
+class EventStreamStats:
+    connected_clients: int = 0
+    subscribed_channels: int = 0
+    dropped_messages: int = 0
+    evicted_clients: int = 0
+
+
+class EventStreamClient:
+    def __init__(self, channels: list[str], max_queue_size: int) -> None:
+        self.channels = channels
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue_size)
+        self.evicted = False
+
+
+class EventStreamMultiplexer:
+    """
+    Share a single Redis pub/sub connection between all the SSE clients
+    of the process.
+
+    The connection is subscribed to the union of the clients channels,
+    ref-counted so we unsubscribe when the last client of a channel leaves.
+    Messages are fanned out to a bounded in-memory queue per client.
+    If a client doesn't consume its queue fast enough, it's evicted:
+    its stream is closed and the browser will reconnect.
+    """
+
+    def __init__(self, redis: Redis, *, max_queue_size: int = 100) -> None:
+        self.redis = redis
+        self.max_queue_size = max_queue_size
+        self.stats = EventStreamStats()
+
+        self._channels: dict[str, set[EventStreamClient]] = {}
+        self._pubsub: PubSub | None = None
+        self._reader: asyncio.Task[None] | None = None
+        self._lock = asyncio.Lock()
+
+    async def listen(self, channels: list[str]) -> AsyncGenerator[str, None]:
+        client = await self.connect(channels)
+        try:
+            while not (client.evicted and client.queue.empty()):
+                yield await client.queue.get()
+        finally:
+            await self.disconnect(client)
+
+    async def connect(self, channels: list[str]) -> EventStreamClient:
+        client = EventStreamClient(channels, self.max_queue_size)
+        async with self._lock:
+            new_channels: list[str] = []
+            for channel in channels:
+                if channel not in self._channels:
+                    self._channels[channel] = set()
+                    new_channels.append(channel)
+                self._channels[channel].add(client)
+
+            if new_channels:
+                pubsub = self._get_pubsub()
+                await pubsub.subscribe(*new_channels)
+
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+
+            self.stats.connected_clients += 1
+            self.stats.subscribed_channels = len(self._channels)
+
+        return client
+
+    async def disconnect(self, client: EventStreamClient) -> None:
+        async with self._lock:
+            self._remove_client(client)
+            self.stats.connected_clients -= 1
+
+            unused_channels = [
+                channel for channel, clients in self._channels.items() if not clients
+            ]
+            for channel in unused_channels:
+                del self._channels[channel]
+            self.stats.subscribed_channels = len(self._channels)
+
+            if unused_channels and self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(*unused_channels)
+                except ConnectionError:
+                    # Subscriptions are restored from `_channels` on reconnection
+                    log.warning("eventstream.unsubscribe.connection_error")
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()  # type: ignore[attr-defined]
+            self._pubsub = None
+
+    def _get_pubsub(self) -> PubSub:
+        if self._pubsub is None:
+            self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        return self._pubsub
+
+    def _remove_client(self, client: EventStreamClient) -> None:
+        for channel in client.channels:
+            clients = self._channels.get(channel)
+            if clients is not None:
+                clients.discard(client)
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        for client in list(self._channels.get(channel, ())):
+            try:
+                client.queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Slow consumer: stop feeding it, it'll close its stream
+                # once it has drained its queue.
+                client.evicted = True
+                self._remove_client(client)
+                self.stats.dropped_messages += 1
+                self.stats.evicted_clients += 1
+                log.warning(
+                    "eventstream.client_evicted",
+                    channels=client.channels,
+                    **dataclasses.asdict(self.stats),
+                )
+
+    async def _read(self) -> None:
+        pubsub = self._get_pubsub()
+        while True:
+            try:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except ConnectionError:
+                # The connection will be re-established, with its subscriptions,
+                # on the next read.
+                log.warning("eventstream.connection_error")
+                await asyncio.sleep(1.0)
+                continue
+
+            if message is None or message["type"] != "message":
+                continue
+
+            log.debug("redis.pubsub", message=message["data"])
+            self._dispatch(message["channel"], message["data"])
+
+
+_multiplexer: EventStreamMultiplexer | None = None
+
+
+def get_multiplexer() -> EventStreamMultiplexer:
+    global _multiplexer
+    if _multiplexer is None:
+        _multiplexer = EventStreamMultiplexer(redis_client)
+    return _multiplexer
+
+
+async def close_multiplexer() -> None:
+    global _multiplexer
+    if _multiplexer is not None:
+        await _multiplexer.close()
+        _multiplexer = None
+
+
+__all__ = [
+    "EventStreamMultiplexer",
+    "get_multiplexer",
+    "close_multiplexer",
+    "HEARTBEAT_INTERVAL",
+]
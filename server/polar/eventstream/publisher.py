@@ -0,0 +1,121 @@
+import asyncio
+import dataclasses
+
+import structlog
+from redis.exceptions import RedisError
+
+from polar.config import settings
+from polar.logging import Logger
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+
+log: Logger = structlog.get_logger()
+
+
+@dataclasses.dataclass
+class EventPublisherStats:
+    published_messages: int = 0
+    coalesced_messages: int = 0
+    batches: int = 0
+
+
+class EventPublisher:
+    """
+    Publish the events of the process to Redis by batches.
+
+    Messages are buffered for `window` seconds, or until `max_batch_size`
+    messages are pending, and published in a single pipeline.
+    Messages published with a coalesce key replace the pending message
+    with the same key on the same channel, so bursts of progress events
+    only send the last one.
+    """
+
+    def __init__(self, redis: Redis, *, window: float, max_batch_size: int) -> None:
+        self.redis = redis
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.stats = EventPublisherStats()
+
+        # Insertion ordered, so the messages of a channel keep their order
+        self._pending: dict[tuple[str, str], str] = {}
+        self._counter = 0
+        self._flusher: asyncio.Task[None] | None = None
+        self._lock = asyncio.Lock()
+
+    async def publish(
+        self, channels: list[str], message: str, *, coalesce_key: str | None = None
+    ) -> None:
+        for channel in channels:
+            if coalesce_key is not None:
+                key = (channel, f"coalesce:{coalesce_key}")
+                # Move it to the end, as it's sent after the current pending ones
+                if self._pending.pop(key, None) is not None:
+                    self.stats.coalesced_messages += 1
+            else:
+                self._counter += 1
+                key = (channel, str(self._counter))
+            self._pending[key] = message
+
+        if len(self._pending) >= self.max_batch_size:
+            await self.flush()
+        elif self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for (channel, _), message in pending.items():
+                        pipe.publish(channel, message)
+                    await pipe.execute()
+            except RedisError as e:
+                # Events are best effort: clients refetch on reconnection
+                log.error("eventstream.publish.error", error=str(e), count=len(pending))
+                return
+
+            self.stats.published_messages += len(pending)
+            self.stats.batches += 1
+            log.debug("eventstream.published", count=len(pending))
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        # Don't lose the batch if we're cancelled while sending it
+        await asyncio.shield(self.flush())
+
+
+_publisher: EventPublisher | None = None
+
+
+def get_publisher() -> EventPublisher:
+    global _publisher
+    if _publisher is None:
+        _publisher = EventPublisher(
+            redis_client,
+            window=settings.EVENTSTREAM_PUBLISH_WINDOW_SECONDS,
+            max_batch_size=settings.EVENTSTREAM_PUBLISH_MAX_BATCH_SIZE,
+        )
+    return _publisher
+
+
+async def close_publisher() -> None:
+    global _publisher
+    if _publisher is not None:
+        await _publisher.close()
+        _publisher = None
+
+
+__all__ = ["EventPublisher", "get_publisher", "close_publisher"]
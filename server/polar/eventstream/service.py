@@ -4,17 +4,15 @@ from uuid import UUID
 from pydantic import BaseModel
 
 from polar.kit.utils import generate_uuid
-from polar.postgres import AsyncSession
-from polar.redis import redis
-from polar.user_organization.service import (
-    user_organization as user_organization_service,
-)
+
+from .publisher import get_publisher
 
 
 class Receivers(BaseModel):
     user_id: UUID | None = None
     organization_id: UUID | None = None
     repository_id: UUID | None = None
+    member_organization_ids: list[UUID] = []
 
     def generate_channel_name(self, scope: str, resource_id: UUID) -> str:
         return f"{scope}:{resource_id}"
@@ -30,6 +28,10 @@ class Receivers(BaseModel):
         if self.repository_id:
             channels.append(self.generate_channel_name("repo", self.repository_id))
 
+        # Shared by all the members of the organization
+        for organization_id in self.member_organization_ids:
+            channels.append(self.generate_channel_name("org_members", organization_id))
+
         return channels
 
 
@@ -39,10 +41,12 @@ class Event(BaseModel):
     payload: dict[str, Any]
 
 
-async def send(event: Event, channels: list[str]) -> None:
-    event_json = event.model_dump_json()
-    for channel in channels:
-        await redis.publish(channel, event_json)
+async def send(
+    event: Event, channels: list[str], coalesce_key: str | None = None
+) -> None:
+    await get_publisher().publish(
+        channels, event.model_dump_json(), coalesce_key=coalesce_key
+    )
 
 
 async def publish(
@@ -51,7 +55,14 @@ async def publish(
     user_id: UUID | None = None,
     organization_id: UUID | None = None,
     repository_id: UUID | None = None,
+    coalesce_key: str | None = None,
 ) -> None:
+    """
+    Publish an event to the streams of the receivers.
+
+    With a `coalesce_key`, a pending event with the same key is replaced
+    by this one: use it for progress events, where only the last one matters.
+    """
     receivers = Receivers(
         user_id=user_id, organization_id=organization_id, repository_id=repository_id
     )
@@ -61,25 +72,22 @@ async def publish(
         key=key,
         payload=payload,
     )
-    await send(event, channels)
+    await send(event, channels, coalesce_key=coalesce_key)
 
 
 async def publish_members(
-    session: AsyncSession,
     key: str,
     payload: dict[str, Any],
     organization_id: UUID,
 ) -> None:
-    members = await user_organization_service.list_by_org(
-        session, org_id=organization_id
+    """
+    Publish an event to the streams of all the members of an organization,
+    through their shared channel.
+    """
+    receivers = Receivers(member_organization_ids=[organization_id])
+    event = Event(
+        id=generate_uuid(),
+        key=key,
+        payload=payload,
     )
-
-    for m in members:
-        receivers = Receivers(user_id=m.user_id)
-        channels = receivers.get_channels()
-        event = Event(
-            id=generate_uuid(),
-            key=key,
-            payload=payload,
-        )
-        await send(event, channels)
+    await send(event, receivers.get_channels())
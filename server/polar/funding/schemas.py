@@ -46,10 +46,11 @@ class IssueFunding(Schema):
         pledgers: dict[PledgeType, list[Pledger]] = {
             pledge_type: [] for pledge_type in PledgeType
         }
-        for pledge in issue.pledges:
-            pledger = Pledger.from_pledge(pledge)
-            if pledger:
-                pledgers[pledge.type].append(pledger)
+        if issue.pledge_summary is not None:
+            for pledge_type, top_pledgers in issue.pledge_summary.top_pledgers.items():
+                pledgers[PledgeType.from_str(pledge_type)] = [
+                    Pledger.model_validate(pledger) for pledger in top_pledgers
+                ]
 
         pay_upfront_summary = PledgesSummary(
             total=CurrencyAmount(currency="USD", amount=int(pay_upfront_total)),
@@ -12,7 +12,6 @@ from sqlalchemy import (
     nulls_last,
     or_,
     select,
-    text,
 )
 from sqlalchemy.orm import contains_eager
 
@@ -20,8 +19,14 @@ from polar.authz.service import Anonymous, Subject
 from polar.funding.schemas import FundingResultType
 from polar.issue.search import search_query
 from polar.kit.pagination import PaginationParams, paginate
-from polar.models import Issue, Organization, Pledge, Repository, UserOrganization
-from polar.models.pledge import PledgeState, PledgeType
+from polar.models import (
+    Issue,
+    IssuePledgeSummary,
+    Organization,
+    Repository,
+    UserOrganization,
+)
+from polar.models.pledge import PledgeType
 from polar.postgres import AsyncSession
 
 
@@ -100,9 +105,11 @@ class FundingService:
             elif criterion == ListFundingSortBy.newest:
                 order_by_clauses.append(Issue.created_at.desc())
             elif criterion == ListFundingSortBy.most_funded:
-                order_by_clauses.append(desc(text("total")))
+                order_by_clauses.append(nulls_last(desc(IssuePledgeSummary.total)))
             elif criterion == ListFundingSortBy.most_recently_funded:
-                order_by_clauses.append(nulls_last(desc(text("last_pledged_at"))))
+                order_by_clauses.append(
+                    nulls_last(desc(IssuePledgeSummary.last_pledged_at))
+                )
             elif criterion == ListFundingSortBy.most_engagement:
                 order_by_clauses.append(Issue.total_engagement_count.desc())
         statement = statement.order_by(*order_by_clauses)
@@ -162,47 +169,26 @@ class FundingService:
     def _apply_pledges_summary_statement(
         self, statement: Select[tuple[Issue]]
     ) -> Select[FundingResultType]:
-        issue_pledges_eager_loading_clause = contains_eager(Issue.pledges)
-        total_column = func.coalesce(
-            func.sum(Pledge.amount).over(partition_by=Issue.id),
-            0,
-        ).label("total")
-        last_pledged_at_column = func.coalesce(
-            func.max(Pledge.created_at).over(partition_by=Issue.id)
-        ).label("last_pledged_at")
         statement = (
             statement.join(
-                Pledge,
-                onclause=and_(
-                    Pledge.issue_id == Issue.id,
-                    Pledge.state.in_(PledgeState.active_states()),
-                ),
+                IssuePledgeSummary,
+                onclause=IssuePledgeSummary.issue_id == Issue.id,
                 isouter=True,
             )
             .options(
                 contains_eager(Issue.repository).contains_eager(Repository.organization)
             )
-            .options(issue_pledges_eager_loading_clause.joinedload(Pledge.user))
-            .options(
-                issue_pledges_eager_loading_clause.joinedload(Pledge.by_organization)
-            )
-            .options(
-                issue_pledges_eager_loading_clause.joinedload(
-                    Pledge.on_behalf_of_organization
-                )
+            .options(contains_eager(Issue.pledge_summary))
+            .add_columns(
+                func.coalesce(IssuePledgeSummary.total, 0).label("total"),
+                IssuePledgeSummary.last_pledged_at.label("last_pledged_at"),
             )
-            .add_columns(total_column, last_pledged_at_column)
         )
 
         for pledge_type in PledgeType:
             statement = statement.add_columns(
                 func.coalesce(
-                    func.sum(Pledge.amount)
-                    .filter(
-                        Pledge.type == pledge_type,
-                    )
-                    .over(partition_by=Issue.id),
-                    0,
+                    getattr(IssuePledgeSummary, f"{pledge_type}_total"), 0
                 ).label(f"{pledge_type}_total"),
             )
 
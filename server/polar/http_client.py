@@ -0,0 +1,153 @@
+import dataclasses
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import httpx
+import structlog
+
+from polar.config import settings
+from polar.logging import Logger
+
+log: Logger = structlog.get_logger()
+
+
+@dataclasses.dataclass
+class HTTPHostStats:
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+
+class _StatsTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: HTTPHostStats):
+        self.transport = transport
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError:
+            self.stats.errors += 1
+            raise
+        else:
+            if response.status_code >= 500:
+                self.stats.errors += 1
+            return response
+        finally:
+            duration = time.perf_counter() - start
+            self.stats.count += 1
+            self.stats.total_seconds += duration
+            self.stats.max_seconds = max(self.stats.max_seconds, duration)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class HTTPClientRegistry:
+    """
+    Keep one HTTP client by host, so the connections to the third-party
+    services are reused by all the integrations calling them.
+
+    Each host has its own pool, so a slow service can't starve the others,
+    and its own latency and error stats. The clients are closed with the
+    app or the worker.
+
+    The clients are shared: authentication should be passed by request,
+    and cookies are never stored.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float,
+        connect_timeout: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+    ) -> None:
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.stats: dict[str, HTTPHostStats] = {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def get_client(self, url: str) -> httpx.AsyncClient:
+        host = _get_host(url)
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            stats = self.stats.setdefault(host, HTTPHostStats())
+            transport = httpx.AsyncHTTPTransport(limits=self.limits)
+            client = httpx.AsyncClient(
+                transport=_StatsTransport(transport, stats),
+                timeout=self.timeout,
+                cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+            )
+            self._clients[host] = client
+        return client
+
+    async def close(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+        for host, stats in self.stats.items():
+            log.info(
+                "http_client.stats",
+                host=host,
+                count=stats.count,
+                errors=stats.errors,
+                mean_seconds=stats.mean_seconds,
+                max_seconds=stats.max_seconds,
+            )
+
+
+def _get_host(url: str) -> str:
+    parsed = httpx.URL(url)
+    return f"{parsed.scheme}://{parsed.netloc.decode()}"
+
+
+_registry: HTTPClientRegistry | None = None
+
+
+def get_http_client_registry() -> HTTPClientRegistry:
+    global _registry
+    if _registry is None:
+        _registry = HTTPClientRegistry(
+            timeout=settings.HTTP_CLIENT_TIMEOUT_SECONDS,
+            connect_timeout=settings.HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS,
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS_PER_HOST,
+        )
+    return _registry
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """
+    Returns the shared HTTP client for the host of the URL.
+
+    Requests should be made with absolute URLs.
+    """
+    return get_http_client_registry().get_client(url)
+
+
+async def close_http_clients() -> None:
+    global _registry
+    if _registry is not None:
+        await _registry.close()
+        _registry = None
+
+
+__all__ = [
+    "HTTPClientRegistry",
+    "HTTPHostStats",
+    "get_http_client",
+    "get_http_client_registry",
+    "close_http_clients",
+]
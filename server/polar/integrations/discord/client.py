@@ -1,25 +1,148 @@
+import asyncio
+import hashlib
+import re
+from collections.abc import AsyncIterator
 from typing import Any, Literal
 
 import httpx
 import structlog
 
 from polar.config import settings
+from polar.http_client import get_http_client
+from polar.redis import Redis, redis
 
 log = structlog.get_logger()
 
 BASE_URL = "https://discord.com/api/v10"
 
+# Rate limits are shared by the routes with the same major parameter
+_MAJOR_PARAMETER_REGEX = re.compile(r"^/(guilds|channels|webhooks)/(\d+)")
+_ID_REGEX = re.compile(r"/\d+")
+
+
+def _get_route(method: str, path: str) -> tuple[str, str]:
+    major_match = _MAJOR_PARAMETER_REGEX.match(path)
+    major = major_match.group(2) if major_match else ""
+    route = _ID_REGEX.sub("/:id", path.split("?", 1)[0])
+    return f"{method} {route}", major
+
+
+# Returns the number of milliseconds to wait before making the request, 0 if
+# it can be made now. A bucket expires at its reset: if we don't know it, or it
+# has been reset, we let the request through and its response tells the limits.
+_ACQUIRE_SCRIPT = """
+local global_wait = redis.call('PTTL', KEYS[2])
+if global_wait > 0 then
+    return global_wait
+end
+local remaining = redis.call('HGET', KEYS[1], 'remaining')
+if not remaining then
+    return 0
+end
+if tonumber(remaining) > 0 then
+    redis.call('HINCRBY', KEYS[1], 'remaining', -1)
+    return 0
+end
+return math.max(redis.call('PTTL', KEYS[1]), 0)
+"""
+
+
+class DiscordRateLimiter:
+    """
+    Follow the rate limits of the Discord API,
+    shared by all the processes using the same token.
+
+    Discord groups the routes in buckets, told by the `X-RateLimit-Bucket` header,
+    and counts them by major parameter, e.g. the guild. The requests on an
+    exhausted bucket wait for its reset; a 429 response blocks the bucket,
+    or every route if the limit is global, for its `Retry-After`.
+
+    https://discord.com/developers/docs/topics/rate-limits
+    """
+
+    def __init__(self, redis: Redis, token: str) -> None:
+        self.redis = redis
+        self._acquire_script = redis.register_script(_ACQUIRE_SCRIPT)
+        # Limits are counted by token
+        token_hash = hashlib.sha256(token.encode()).hexdigest()[:16]
+        self._key_prefix = f"discord:rate-limit:{token_hash}"
+        # Buckets of the routes don't change, cache them locally
+        self._route_buckets: dict[str, str] = {}
+
+    async def acquire(self, route: str, major: str) -> None:
+        bucket_key = await self._get_bucket_key(route, major)
+        wait_ms = await self._acquire_script(keys=[bucket_key, self._get_global_key()])
+        wait = int(wait_ms) / 1000
+        if wait > 0:
+            log.debug("discord.rate_limit.wait", route=route, wait=wait)
+            await asyncio.sleep(wait)
+
+    async def update(self, route: str, major: str, response: httpx.Response) -> float:
+        """
+        Update the limits from the response headers.
+
+        Returns:
+            The number of seconds to wait before retrying if it's rate limited,
+            0 otherwise.
+        """
+        headers = response.headers
+
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash is not None and self._route_buckets.get(route) != bucket_hash:
+            self._route_buckets[route] = bucket_hash
+            await self.redis.hset(self._get_routes_key(), route, bucket_hash)
+        bucket_key = await self._get_bucket_key(route, major)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if "X-RateLimit-Remaining" in headers:
+                reset_after = float(headers.get("X-RateLimit-Reset-After", 0))
+                pipe.hset(
+                    bucket_key, "remaining", int(headers["X-RateLimit-Remaining"])
+                )
+                pipe.pexpire(bucket_key, max(int(reset_after * 1000), 1))
+
+            retry_after = 0.0
+            if response.status_code == 429:
+                retry_after = float(headers.get("Retry-After", 1))
+                retry_after_ms = max(int(retry_after * 1000), 1)
+                if headers.get("X-RateLimit-Global") == "true":
+                    pipe.set(self._get_global_key(), 1, px=retry_after_ms)
+                else:
+                    pipe.hset(bucket_key, "remaining", 0)
+                    pipe.pexpire(bucket_key, retry_after_ms)
+
+            await pipe.execute()
+
+        return retry_after
+
+    async def _get_bucket_key(self, route: str, major: str) -> str:
+        bucket = self._route_buckets.get(route)
+        if bucket is None:
+            bucket = await self.redis.hget(self._get_routes_key(), route)
+            if bucket is not None:
+                self._route_buckets[route] = bucket
+        return f"{self._key_prefix}:bucket:{bucket or route}:{major}"
+
+    def _get_routes_key(self) -> str:
+        return f"{self._key_prefix}:routes"
+
+    def _get_global_key(self) -> str:
+        return f"{self._key_prefix}:global"
+
 
 class DiscordClient:
-    def __init__(self, scheme: Literal["Bot", "Bearer"], token: str) -> None:
-        self.client = httpx.AsyncClient(
-            base_url=BASE_URL,
-            headers={"Authorization": f"{scheme} {token}"},
-        )
+    def __init__(
+        self,
+        scheme: Literal["Bot", "Bearer"],
+        token: str,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self._client = client
+        self.headers = {"Authorization": f"{scheme} {token}"}
+        self.rate_limiter = DiscordRateLimiter(redis, token)
 
     async def get_me(self) -> dict[str, Any]:
-        response = await self.client.get("/users/@me")
-        self._handle_response(response)
+        response = await self._request("GET", "/users/@me")
         return response.json()
 
     async def get_guild(
@@ -27,8 +150,7 @@ class DiscordClient:
         id: str,
         exclude_bot_roles: bool = True,
     ) -> dict[str, Any]:
-        response = await self.client.get(f"/guilds/{id}")
-        self._handle_response(response)
+        response = await self._request("GET", f"/guilds/{id}")
 
         data = response.json()
         if not exclude_bot_roles:
@@ -45,6 +167,26 @@ class DiscordClient:
         data["roles"] = roles
         return data
 
+    async def list_members(self, guild_id: str) -> AsyncIterator[dict[str, Any]]:
+        """
+        Iterate over all the members of the guild, by pages of 1000.
+
+        Requires the `GUILD_MEMBERS` privileged intent.
+        """
+        after = "0"
+        while True:
+            response = await self._request(
+                "GET",
+                f"/guilds/{guild_id}/members",
+                params={"limit": 1000, "after": after},
+            )
+            members = response.json()
+            for member in members:
+                yield member
+            if len(members) < 1000:
+                return
+            after = members[-1]["user"]["id"]
+
     async def add_member(
         self,
         guild_id: str,
@@ -61,8 +203,7 @@ class DiscordClient:
         if nick:
             data["nick"] = nick
 
-        response = await self.client.put(endpoint, json=data)
-        self._handle_response(response)
+        response = await self._request("PUT", endpoint, json=data)
 
         if response.status_code == 201:
             log.info(
@@ -91,8 +232,7 @@ class DiscordClient:
     ) -> None:
         endpoint = f"/guilds/{guild_id}/members/{discord_user_id}/roles/{role_id}"
 
-        response = await self.client.put(endpoint)
-        self._handle_response(response)
+        await self._request("PUT", endpoint)
 
         log.info(
             "discord.add_member_role.success",
@@ -110,8 +250,7 @@ class DiscordClient:
     ) -> None:
         endpoint = f"/guilds/{guild_id}/members/{discord_user_id}/roles/{role_id}"
 
-        response = await self.client.delete(endpoint)
-        self._handle_response(response)
+        await self._request("DELETE", endpoint)
 
         log.info(
             "discord.remove_member_role.success",
@@ -121,6 +260,30 @@ class DiscordClient:
         )
         return None
 
+    async def _request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        route, major = _get_route(method, path)
+        retries = 0
+        while True:
+            await self.rate_limiter.acquire(route, major)
+            response = await self._get_client().request(
+                method, f"{BASE_URL}{path}", headers=self.headers, **kwargs
+            )
+            retry_after = await self.rate_limiter.update(route, major, response)
+            if (
+                response.status_code != 429
+                or retries >= settings.DISCORD_RATE_LIMIT_MAX_RETRIES
+                or retry_after > settings.DISCORD_RATE_LIMIT_MAX_WAIT_SECONDS
+            ):
+                return self._handle_response(response)
+
+            log.warning("discord.rate_limited", route=route, retry_after=retry_after)
+            retries += 1
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is not None:
+            return self._client
+        return get_http_client(BASE_URL)
+
     def _handle_response(self, response: httpx.Response) -> httpx.Response:
         response.raise_for_status()
         return response
@@ -128,4 +291,4 @@ class DiscordClient:
 
 bot_client = DiscordClient("Bot", settings.DISCORD_BOT_TOKEN)
 
-__all__ = ["DiscordClient", "bot_client"]
+__all__ = ["DiscordClient", "DiscordRateLimiter", "bot_client"]
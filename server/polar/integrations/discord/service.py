@@ -1,14 +1,19 @@
+from collections.abc import Sequence
 from typing import Any
 
+import httpx
 import structlog
 from httpx_oauth.oauth2 import OAuth2Token
 
+from polar.config import settings
 from polar.exceptions import PolarError
+from polar.locker import Locker
 from polar.logging import Logger
 from polar.models import OAuthAccount, User
 from polar.models.subscription_benefit import SubscriptionBenefitType
 from polar.models.user import OAuthPlatform
 from polar.postgres import AsyncSession
+from polar.redis import redis
 from polar.worker import enqueue_job
 
 from . import oauth
@@ -16,6 +21,34 @@ from .client import DiscordClient, bot_client
 
 log: Logger = structlog.get_logger()
 
+# Marks the snapshot of a guild whose members can't be listed by the bot
+_MEMBERS_UNAVAILABLE = "__unavailable__"
+
+# Adds and removes a role of a member in the snapshot, if it's loaded.
+# Atomic, so concurrent updates of the same member don't overwrite each other.
+_UPDATE_MEMBER_ROLES_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local roles = {}
+local value = redis.call('HGET', KEYS[1], ARGV[1]) or ''
+for role in string.gmatch(value, '[^,]+') do
+    if role ~= ARGV[3] then
+        roles[role] = true
+    end
+end
+if ARGV[2] ~= '' then
+    roles[ARGV[2]] = true
+end
+local sorted = {}
+for role in pairs(roles) do
+    table.insert(sorted, role)
+end
+table.sort(sorted)
+redis.call('HSET', KEYS[1], ARGV[1], table.concat(sorted, ','))
+return 1
+"""
+
 
 class DiscordError(PolarError):
     ...
@@ -96,6 +129,9 @@ class DiscordUserService:
         return account
 
 
+_update_member_roles_script = redis.register_script(_UPDATE_MEMBER_ROLES_SCRIPT)
+
+
 class DiscordBotService:
     async def get_guild(self, id: str) -> dict[str, Any]:
         return await bot_client.get_guild(id=id, exclude_bot_roles=True)
@@ -110,6 +146,17 @@ class DiscordBotService:
             discord_user_access_token=oauth_account.access_token,
             role_id=role_id,
         )
+        await self._update_member_roles(guild_id, oauth_account.account_id, add=role_id)
+
+    async def add_member_role(
+        self, guild_id: str, role_id: str, account_id: str
+    ) -> None:
+        await bot_client.add_member_role(
+            guild_id=guild_id,
+            discord_user_id=account_id,
+            role_id=role_id,
+        )
+        await self._update_member_roles(guild_id, account_id, add=role_id)
 
     async def remove_member_role(
         self, guild_id: str, role_id: str, account_id: str
@@ -119,6 +166,79 @@ class DiscordBotService:
             discord_user_id=account_id,
             role_id=role_id,
         )
+        await self._update_member_roles(guild_id, account_id, remove=role_id)
+
+    async def get_members_roles(
+        self, guild_id: str, account_ids: Sequence[str]
+    ) -> dict[str, set[str]] | None:
+        """
+        Returns the roles of the given Discord accounts in the guild,
+        from a snapshot of its members shared by the sync jobs.
+
+        Accounts missing from the result are not members of the guild.
+        Returns `None` if the bot is not allowed to list the members.
+        """
+        key = self._get_members_key(guild_id)
+        if not await redis.exists(key):
+            await self._load_members(guild_id)
+
+        if await redis.hexists(key, _MEMBERS_UNAVAILABLE):
+            return None
+
+        if not account_ids:
+            return {}
+        values = await redis.hmget(key, list(account_ids))
+        return {
+            account_id: set(filter(None, value.split(",")))
+            for account_id, value in zip(account_ids, values)
+            if value is not None
+        }
+
+    async def _load_members(self, guild_id: str) -> None:
+        key = self._get_members_key(guild_id)
+        async with Locker(redis).lock(
+            f"discord-members-{guild_id}", timeout=60, blocking_timeout=60
+        ):
+            # Loaded by another job while we were waiting
+            if await redis.exists(key):
+                return
+
+            members: dict[str, str] = {}
+            try:
+                async for member in bot_client.list_members(guild_id):
+                    members[member["user"]["id"]] = ",".join(member["roles"])
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 403:
+                    raise
+                log.warning("discord.list_members.forbidden", guild_id=guild_id)
+                members = {_MEMBERS_UNAVAILABLE: ""}
+
+            loading_key = f"{key}:loading"
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(loading_key)
+                for i in range(0, len(members), 1000):
+                    pipe.hset(
+                        loading_key, mapping=dict(list(members.items())[i : i + 1000])
+                    )
+                pipe.expire(loading_key, settings.DISCORD_MEMBERS_CACHE_TTL_SECONDS)
+                pipe.rename(loading_key, key)
+                await pipe.execute()
+
+    async def _update_member_roles(
+        self,
+        guild_id: str,
+        account_id: str,
+        *,
+        add: str | None = None,
+        remove: str | None = None,
+    ) -> None:
+        await _update_member_roles_script(
+            keys=[self._get_members_key(guild_id)],
+            args=[account_id, add or "", remove or ""],
+        )
+
+    def _get_members_key(self, guild_id: str) -> str:
+        return f"discord:guild:{guild_id}:members"
 
 
 discord_user = DiscordUserService()
@@ -77,12 +77,22 @@ class GithubBadge:
         return (True, "fallthrough")
 
     def generate_svg_url(self, darkmode: bool = False) -> str:
-        return "{base}/api/github/{org}/{repo}/issues/{number}/pledge.svg{maybeDarkmode}".format(  # noqa: E501
+        return settings.generate_external_url(
+            "/integrations/github/{org}/{repo}/issues/{number}/pledge.svg{maybeDarkmode}".format(  # noqa: E501
+                org=self.organization.name,
+                repo=self.repository.name,
+                number=self.issue.number,
+                maybeDarkmode="?darkmode=1" if darkmode else "",
+            )
+        )
+
+    def generate_legacy_svg_url(self) -> str:
+        # Badges embedded before 2023-05-08 point at the frontend route
+        return "{base}/api/github/{org}/{repo}/issues/{number}/pledge.svg".format(
             base=settings.FRONTEND_BASE_URL,
             org=self.organization.name,
             repo=self.repository.name,
             number=self.issue.number,
-            maybeDarkmode="?darkmode=1" if darkmode else "",
         )
 
     def generate_funding_url(self) -> str:
@@ -116,7 +126,7 @@ class GithubBadge:
 """
 
     def _legacy_badge_markdown(self) -> str:
-        svg_url = self.generate_svg_url()
+        svg_url = self.generate_legacy_svg_url()
         funding_url = self.generate_funding_url()
         svg_markdown = f"![Fund with Polar]({svg_url})"
         return f"{PLEDGE_BADGE_COMMENT_LEGACY}\n[{svg_markdown}]({funding_url})"
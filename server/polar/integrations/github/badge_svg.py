@@ -0,0 +1,455 @@
+import asyncio
+import base64
+import dataclasses
+import datetime
+import hashlib
+
+import httpx
+import structlog
+
+from polar.config import settings
+from polar.http_client import get_http_client
+from polar.kit import template
+from polar.kit.cache import LocalCache
+from polar.logging import Logger
+from polar.models import Issue, IssuePledgeSummary, Organization, Repository
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+from polar.worker import enqueue_job
+
+log: Logger = structlog.get_logger()
+
+# Served when the badge can't be rendered, to prevent broken images in browsers
+EMPTY_SVG = '<svg width="1" height="1" viewBox="0 0 1 1" xmlns="http://www.w3.org/2000/svg"></svg>'  # noqa: E501
+
+AVATAR_SIZE = 44
+AVATAR_MAX_SIZE = 64 * 1024  # 64 kB
+AVATAR_TIMEOUT = 5.0
+MAX_AVATARS = 4
+
+
+@dataclasses.dataclass(frozen=True)
+class BadgeColors:
+    background: str
+    border: str
+    text: str
+    muted: str
+    progress: str
+    progress_track: str
+    avatar_border: str
+    avatar_placeholder: str
+    extra_avatars_background: str
+    extra_avatars_text: str
+    logo: str
+    logo_background: str
+    logo_border: str | None
+    footer_background: str
+    footer_border: str
+    footer_text: str
+    footer_strong: str
+    footer_action: str
+
+
+LIGHT_COLORS = BadgeColors(
+    background="#FFFFFF",
+    border="rgba(0, 0, 0, 0.11)",
+    text="#3E3F42",
+    muted="#727374",
+    progress="#0062FF",
+    progress_track="#E5E5E1",
+    avatar_border="#FFFFFF",
+    avatar_placeholder="#E5E5E1",
+    extra_avatars_background="#C9DBF4",
+    extra_avatars_text="#0062FF",
+    logo="#0062FF",
+    logo_background="#FDFDFC",
+    logo_border="rgba(0, 0, 0, 0.05)",
+    footer_background="#F3F5FC",
+    footer_border="#E1EAF8",
+    footer_text="#3381FF",
+    footer_strong="#0062FF",
+    footer_action="#0062FF",
+)
+
+DARK_COLORS = BadgeColors(
+    background="#1D1E27",
+    border="rgba(255, 255, 255, 0.05)",
+    text="#D7D9E5",
+    muted="#9499AF",
+    progress="#3381FF",
+    progress_track="#343748",
+    avatar_border="#1B1D29",
+    avatar_placeholder="#343748",
+    extra_avatars_background="#2E4070",
+    extra_avatars_text="#A6C7EA",
+    logo="#FDFDFC",
+    logo_background="#343748",
+    logo_border=None,
+    footer_background="#1D1E27",
+    footer_border="rgba(255, 255, 255, 0.1)",
+    footer_text="#8186A4",
+    footer_strong="#D2D4DF",
+    footer_action="#3381FF",
+)
+
+
+@dataclasses.dataclass
+class BadgeSVGData:
+    organization_name: str
+    pledges_sum: int
+    funding_goal: int | None
+    show_amount_raised: bool
+    upfront_split_to_contributors: int | None
+    # Avatars of the pledgers, as data URIs. None if they couldn't be fetched.
+    avatars: list[str | None]
+    avatars_count: int
+
+
+def _format_amount(cents: int) -> str:
+    precision = 0 if cents % 100 == 0 else 2
+    return f"{cents / 100:,.{precision}f}"
+
+
+def _text_width(text: str, font_size: int) -> float:
+    # Average advance of the Inter font, we can't measure it without the font
+    return len(text) * font_size * 0.56
+
+
+def render_badge_svg(data: BadgeSVGData, *, darkmode: bool) -> str:
+    """
+    Render the pledge badge of an issue, as the `Badge` component of the frontend.
+    """
+    show_funding_goal = data.funding_goal is not None and data.funding_goal > 0
+    show_amount = not show_funding_goal and data.show_amount_raised
+
+    title = "Fund" if show_funding_goal or show_amount else "Fund this issue"
+    title_width = round(_text_width(title, 13) + 22)
+    content_x = 6 + title_width + 12
+
+    amount = _format_amount(data.pledges_sum) if show_amount else None
+
+    funding_goal: str | None = None
+    amount_pledged: str | None = None
+    progress = 0.0
+    progress_width = 0.0
+    if show_funding_goal and data.funding_goal is not None:
+        funding_goal = _format_amount(data.funding_goal)
+        amount_pledged = _format_amount(data.pledges_sum)
+        progress = max(min(data.pledges_sum / data.funding_goal * 100, 100), 1)
+        progress_width = round(
+            _text_width(f"${amount_pledged} / ${funding_goal} pledged", 12)
+        )
+
+    avatars = data.avatars
+    if data.avatars_count > MAX_AVATARS:
+        avatars = avatars[: MAX_AVATARS - 1]
+    extra_avatars = data.avatars_count - len(avatars)
+
+    # Avatars overlap and are aligned to the right, next to the logo
+    slots = len(avatars) + (1 if extra_avatars > 0 else 0)
+    avatars_x = 310 - (22 + (slots - 1) * 16) if slots else 310
+    avatar_slots = [
+        {"x": avatars_x + i * 16, "href": href} for i, href in enumerate(avatars)
+    ]
+
+    upfront_split_to_contributors = (
+        data.upfront_split_to_contributors
+        if data.upfront_split_to_contributors and data.upfront_split_to_contributors > 0
+        else None
+    )
+
+    return template.render(
+        template.path(__file__, "templates/badge/pledge.svg"),
+        height=64 if upfront_split_to_contributors else 40,
+        colors=DARK_COLORS if darkmode else LIGHT_COLORS,
+        title=title,
+        title_width=title_width,
+        content_x=content_x,
+        amount=amount,
+        amount_pledged=amount_pledged,
+        funding_goal=funding_goal,
+        progress=progress,
+        progress_width=progress_width,
+        avatars=avatar_slots,
+        extra_avatars=extra_avatars,
+        extra_avatars_x=avatars_x + len(avatars) * 16,
+        organization_name=data.organization_name,
+        upfront_split_to_contributors=upfront_split_to_contributors,
+    )
+
+
+@dataclasses.dataclass
+class BadgeSVG:
+    etag: str
+    content: str
+
+
+class BadgeSVGCache:
+    """
+    Content-addressed cache of rendered badges.
+
+    Each badge points to the hash of its current content, which is also its ETag.
+    Contents are kept in an in-process cache in front of Redis: they never change
+    for a given hash. Pointers are kept in-process for `local_ttl` only.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_cache: LocalCache,
+        *,
+        ttl: datetime.timedelta,
+        local_ttl: datetime.timedelta,
+    ) -> None:
+        self.redis = redis
+        self.local_cache = local_cache
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+
+    async def get_etag(
+        self, organization_name: str, repository_name: str, number: int, darkmode: bool
+    ) -> str | None:
+        key = self._get_key(organization_name, repository_name, number, darkmode)
+        etag = self.local_cache.get(key)
+        if etag is None:
+            etag = await self.redis.get(key)
+            if etag is not None:
+                self.local_cache.set(key, etag, self.local_ttl)
+        return etag
+
+    async def get_content(self, etag: str) -> str | None:
+        content = self.local_cache.get(etag)
+        if content is None:
+            content = await self.redis.get(self._get_content_key(etag))
+            if content is not None:
+                self.local_cache.set(etag, content, self.ttl)
+        return content
+
+    async def set(
+        self,
+        organization_name: str,
+        repository_name: str,
+        number: int,
+        darkmode: bool,
+        content: str,
+    ) -> BadgeSVG:
+        etag = hashlib.sha256(content.encode()).hexdigest()[:32]
+        key = self._get_key(organization_name, repository_name, number, darkmode)
+
+        organization_key = self._get_organization_key(organization_name)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.setex(self._get_content_key(etag), self.ttl, content)
+            pipe.setex(key, self.ttl, etag)
+            pipe.sadd(organization_key, key)
+            pipe.expire(organization_key, self.ttl)
+            await pipe.execute()
+
+        self.local_cache.set(etag, content, self.ttl)
+        self.local_cache.set(key, etag, self.local_ttl)
+        return BadgeSVG(etag=etag, content=content)
+
+    async def invalidate_organization(self, organization_name: str) -> None:
+        """
+        Drop the badges of all the issues of an organization,
+        e.g. when its badge settings change. They're rendered again on next request.
+        """
+        organization_key = self._get_organization_key(organization_name)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.smembers(organization_key)
+            pipe.delete(organization_key)
+            keys, _ = await pipe.execute()
+
+        if keys:
+            for key in keys:
+                self.local_cache.delete(key)
+            await self.redis.delete(*keys)
+        log.debug(
+            "github.badge.svg.invalidated",
+            organization_name=organization_name,
+            count=len(keys),
+        )
+
+    def _get_key(
+        self, organization_name: str, repository_name: str, number: int, darkmode: bool
+    ) -> str:
+        # GitHub names are case-insensitive
+        path = f"{organization_name}/{repository_name}".lower()
+        return f"github:badge:svg:ref:{path}/{number}:{'dark' if darkmode else 'light'}"
+
+    def _get_content_key(self, etag: str) -> str:
+        return f"github:badge:svg:{etag}"
+
+    def _get_organization_key(self, organization_name: str) -> str:
+        return f"github:badge:svg:organization:{organization_name.lower()}"
+
+
+_local_cache = LocalCache(settings.GITHUB_BADGE_SVG_LOCAL_MAX_ENTRIES)
+
+
+def get_badge_svg_cache() -> BadgeSVGCache:
+    return BadgeSVGCache(
+        redis_client,
+        _local_cache,
+        ttl=datetime.timedelta(seconds=settings.GITHUB_BADGE_SVG_CACHE_TTL_SECONDS),
+        local_ttl=datetime.timedelta(
+            seconds=settings.GITHUB_BADGE_SVG_LOCAL_TTL_SECONDS
+        ),
+    )
+
+
+async def _fetch_avatar(url: str) -> str | None:
+    """
+    Fetch an avatar as a data URI: images embedded in an SVG served as an image
+    can't be loaded from external URLs.
+    """
+    request_url = httpx.URL(url)
+    if request_url.host == "avatars.githubusercontent.com":
+        request_url = request_url.copy_set_param("s", AVATAR_SIZE)
+
+    try:
+        response = await get_http_client(url).get(
+            request_url, follow_redirects=True, timeout=AVATAR_TIMEOUT
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        log.warning("github.badge.svg.avatar_error", url=url, error=str(e))
+        return None
+
+    content_type = response.headers.get("Content-Type", "")
+    if not content_type.startswith("image/") or len(response.content) > AVATAR_MAX_SIZE:
+        return None
+
+    return f"data:{content_type};base64,{base64.b64encode(response.content).decode()}"
+
+
+async def _get_avatars(
+    urls: list[str], *, fetch: bool
+) -> tuple[list[str | None], bool]:
+    """
+    Get the avatars as data URIs, from the cache or fetched if `fetch` is set.
+
+    Returns:
+        The avatars, None if they couldn't be fetched,
+        and whether some weren't cached and were left out.
+    """
+    if not urls:
+        return [], False
+
+    keys = [
+        f"github:badge:avatar:{hashlib.sha256(url.encode()).hexdigest()}"
+        for url in urls
+    ]
+    # Avatars that couldn't be fetched are cached as empty strings
+    cached: list[str | None] = await redis_client.mget(keys)
+
+    missing = [i for i, value in enumerate(cached) if value is None]
+    if missing and fetch:
+        fetched = await asyncio.gather(*(_fetch_avatar(urls[i]) for i in missing))
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for i, avatar in zip(missing, fetched):
+                cached[i] = avatar or ""
+                pipe.setex(
+                    keys[i],
+                    settings.GITHUB_BADGE_AVATAR_CACHE_TTL_SECONDS,
+                    avatar or "",
+                )
+            await pipe.execute()
+        missing = []
+
+    return [avatar or None for avatar in cached], len(missing) > 0
+
+
+async def get_badge_svg_data(
+    session: AsyncSession,
+    *,
+    organization: Organization,
+    issue: Issue,
+    fetch_avatars: bool = True,
+) -> tuple[BadgeSVGData, bool]:
+    """
+    Returns:
+        The data of the badge, and whether some avatars were left out
+        because they weren't cached and `fetch_avatars` isn't set.
+    """
+    summary = await session.get(IssuePledgeSummary, issue.id)
+
+    avatar_urls: list[str] = []
+    if summary is not None:
+        for pledgers in summary.top_pledgers.values():
+            for pledger in pledgers:
+                avatar_url = pledger.get("avatar_url")
+                if avatar_url and avatar_url not in avatar_urls:
+                    avatar_urls.append(avatar_url)
+
+    shown_avatar_urls = (
+        avatar_urls[: MAX_AVATARS - 1]
+        if len(avatar_urls) > MAX_AVATARS
+        else avatar_urls
+    )
+    avatars, incomplete = await _get_avatars(shown_avatar_urls, fetch=fetch_avatars)
+
+    data = BadgeSVGData(
+        organization_name=organization.name,
+        pledges_sum=summary.total if summary is not None else 0,
+        funding_goal=issue.funding_goal,
+        show_amount_raised=organization.pledge_badge_show_amount,
+        upfront_split_to_contributors=(
+            issue.upfront_split_to_contributors
+            if issue.upfront_split_to_contributors is not None
+            else organization.default_upfront_split_to_contributors
+        ),
+        avatars=avatars,
+        avatars_count=len(avatar_urls),
+    )
+    return data, incomplete
+
+
+async def render_issue_badges(
+    session: AsyncSession,
+    cache: BadgeSVGCache,
+    *,
+    organization: Organization,
+    repository: Repository,
+    issue: Issue,
+    fetch_avatars: bool = True,
+) -> dict[bool, BadgeSVG]:
+    """
+    Render the light and dark badges of an issue, and store them in the cache.
+
+    Without `fetch_avatars`, e.g. while serving a request, the avatars which
+    aren't cached are left out, and a job is enqueued to render them.
+
+    Returns:
+        The rendered badges, by darkmode.
+    """
+    data, incomplete = await get_badge_svg_data(
+        session, organization=organization, issue=issue, fetch_avatars=fetch_avatars
+    )
+
+    badges: dict[bool, BadgeSVG] = {}
+    for darkmode in (False, True):
+        badges[darkmode] = await cache.set(
+            organization.name,
+            repository.name,
+            issue.number,
+            darkmode,
+            render_badge_svg(data, darkmode=darkmode),
+        )
+
+    if incomplete:
+        await enqueue_job("github.badge.render_svg", issue.id)
+
+    log.debug("github.badge.svg.rendered", issue_id=issue.id)
+    return badges
+
+
+__all__ = [
+    "EMPTY_SVG",
+    "BadgeSVG",
+    "BadgeSVGCache",
+    "BadgeSVGData",
+    "get_badge_svg_cache",
+    "render_badge_svg",
+    "render_issue_badges",
+]
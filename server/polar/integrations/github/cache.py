@@ -1,24 +1,295 @@
+import base64
+import dataclasses
 import datetime
+import hashlib
+import json
+import re
 
+import httpx
+import structlog
 from githubkit.cache.base import BaseCache
 
-from polar.redis import redis
+from polar.config import settings
+from polar.kit.cache import LocalCache
+from polar.logging import Logger
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+
+log: Logger = structlog.get_logger()
+
+
+_local_cache = LocalCache(settings.GITHUB_CACHE_LOCAL_MAX_ENTRIES)
 
 
 class RedisCache(BaseCache):
-    """Redis Backed Cache"""
+    """
+    Redis Backed Cache, with an in-process cache in front of it.
 
-    def __init__(self) -> None:
-        pass
+    The synchronous methods only use the in-process cache.
+    """
+
+    def __init__(self, local_cache: LocalCache = _local_cache) -> None:
+        self.local_cache = local_cache
 
     def get(self, key: str) -> str | None:
-        raise NotImplementedError()
+        return self.local_cache.get(key)
 
     async def aget(self, key: str) -> str | None:
-        return await redis.get("githubkit:" + key)
+        value = self.local_cache.get(key)
+        if value is not None:
+            return value
+
+        value = await redis_client.get("githubkit:" + key)
+        if value is not None:
+            ttl = await redis_client.ttl("githubkit:" + key)
+            if ttl > 0:
+                self.local_cache.set(key, value, datetime.timedelta(seconds=ttl))
+        return value
 
     def set(self, key: str, value: str, ex: datetime.timedelta) -> None:
-        raise NotImplementedError()
+        self.local_cache.set(key, value, ex)
 
     async def aset(self, key: str, value: str, ex: datetime.timedelta) -> None:
-        await redis.setex("githubkit:" + key, time=ex, value=value)
+        self.local_cache.set(key, value, ex)
+        await redis_client.setex("githubkit:" + key, time=ex, value=value)
+
+
+@dataclasses.dataclass
+class HTTPCacheEntry:
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    etag: str | None
+    last_modified: str | None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "status_code": self.status_code,
+                "headers": self.headers,
+                "content": base64.b64encode(self.content).decode(),
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, value: str) -> "HTTPCacheEntry":
+        data = json.loads(value)
+        return cls(
+            status_code=data["status_code"],
+            headers=[(name, value) for name, value in data["headers"]],
+            content=base64.b64decode(data["content"]),
+            etag=data["etag"],
+            last_modified=data["last_modified"],
+        )
+
+
+_STATS_KEY = "github:http-cache:stats"
+
+# Headers describing the raw payload, which don't apply to the decoded content
+_CONTENT_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+_ID_SEGMENT = re.compile(r"^\d+$")
+
+
+def get_endpoint(path: str) -> str:
+    """
+    Returns the endpoint of a GitHub API path, without its parameters,
+    e.g. `/repos/{owner}/{repo}/issues/{id}`.
+    """
+    segments = path.strip("/").split("/")
+    parameters: dict[int, str] = {}
+    if segments[0] == "repos":
+        parameters = {1: "{owner}", 2: "{repo}"}
+    elif segments[0] in {"orgs", "users"}:
+        parameters = {1: "{name}"}
+    return "/" + "/".join(
+        parameters.get(i, "{id}" if _ID_SEGMENT.match(segment) else segment)
+        for i, segment in enumerate(segments)
+    )
+
+
+class HTTPCache:
+    """
+    Two-tier cache of GitHub responses, to make conditional requests.
+
+    Entries are stored in an in-process LRU cache, in front of Redis,
+    so they're shared between processes and survive restarts.
+    Hits and misses are counted per endpoint in Redis.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_cache: LocalCache,
+        *,
+        ttl: datetime.timedelta,
+        local_ttl: datetime.timedelta,
+        max_size: int,
+    ) -> None:
+        self.redis = redis
+        self.local_cache = local_cache
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_size = max_size
+
+    async def get(self, key: str) -> HTTPCacheEntry | None:
+        value = self.local_cache.get(key)
+        if value is None:
+            value = await self.redis.get(self._get_key(key))
+            if value is None:
+                return None
+            self.local_cache.set(key, value, self.local_ttl)
+        return HTTPCacheEntry.from_json(value)
+
+    async def set(self, key: str, entry: HTTPCacheEntry) -> None:
+        if len(entry.content) > self.max_size:
+            return
+        value = entry.to_json()
+        self.local_cache.set(key, value, self.local_ttl)
+        await self.redis.setex(self._get_key(key), self.ttl, value)
+
+    async def record(self, endpoint: str, hit: bool) -> None:
+        await self.redis.hincrby(_STATS_KEY, f"{endpoint}:{'hit' if hit else 'miss'}")
+
+    async def get_stats(self) -> dict[str, dict[str, int]]:
+        stats: dict[str, dict[str, int]] = {}
+        for field, value in (await self.redis.hgetall(_STATS_KEY)).items():
+            endpoint, outcome = field.rsplit(":", 1)
+            stats.setdefault(endpoint, {"hit": 0, "miss": 0})[outcome] = int(value)
+        return stats
+
+    def _get_key(self, key: str) -> str:
+        return f"github:http-cache:{key}"
+
+
+_http_local_cache = LocalCache(settings.GITHUB_HTTP_CACHE_LOCAL_MAX_ENTRIES)
+
+
+def get_http_cache() -> HTTPCache:
+    return HTTPCache(
+        redis_client,
+        _http_local_cache,
+        ttl=datetime.timedelta(seconds=settings.GITHUB_HTTP_CACHE_TTL_SECONDS),
+        local_ttl=datetime.timedelta(
+            seconds=settings.GITHUB_HTTP_CACHE_LOCAL_TTL_SECONDS
+        ),
+        max_size=settings.GITHUB_HTTP_CACHE_MAX_SIZE,
+    )
+
+
+class HTTPCacheTransport(httpx.AsyncBaseTransport):
+    """
+    Make conditional GET requests to GitHub, using the `ETag`
+    and `Last-Modified` headers of the cached responses.
+
+    If the resource didn't change, GitHub answers with a `304 Not Modified`,
+    which doesn't count against the rate limit, and we serve the cached response.
+
+    Requests already carrying a conditional header are left untouched,
+    so the caller gets the `304 Not Modified` it asked for.
+
+    Args:
+        transport: The transport actually sending the requests.
+        cache: The cache of responses.
+        namespace: Identifier of the credentials making the requests,
+        since responses depend on them. Defaults to a hash of the `Authorization` header.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        cache: HTTPCache,
+        namespace: str | None = None,
+    ) -> None:
+        self.transport = transport
+        self.cache = cache
+        self.namespace = namespace
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self.transport.handle_async_request(request)
+
+        key = self._get_cache_key(request)
+        endpoint = get_endpoint(request.url.path)
+        conditional = (
+            "If-None-Match" in request.headers or "If-Modified-Since" in request.headers
+        )
+        entry = None if conditional else await self.cache.get(key)
+        if entry is not None:
+            if entry.etag is not None:
+                request.headers["If-None-Match"] = entry.etag
+            if entry.last_modified is not None:
+                request.headers["If-Modified-Since"] = entry.last_modified
+
+        response = await self.transport.handle_async_request(request)
+
+        if entry is not None and response.status_code == 304:
+            await response.aclose()
+            await self.cache.record(endpoint, hit=True)
+            log.debug("github.http_cache.hit", endpoint=endpoint)
+            cached_headers = httpx.Headers(entry.headers)
+            # Keep the fresh rate limit headers
+            for name, value in response.headers.items():
+                if name.lower().startswith("x-ratelimit-"):
+                    cached_headers[name] = value
+            return httpx.Response(
+                entry.status_code,
+                headers=cached_headers,
+                content=entry.content,
+                request=request,
+                extensions=response.extensions,
+            )
+
+        if conditional and response.status_code == 304:
+            await self.cache.record(endpoint, hit=True)
+            return response
+
+        await self.cache.record(endpoint, hit=False)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or (etag is None and last_modified is None):
+            return response
+
+        content = await response.aread()
+        await response.aclose()
+        headers = [
+            (name, value)
+            for name, value in response.headers.items()
+            if name.lower() not in _CONTENT_HEADERS
+        ]
+        await self.cache.set(
+            key,
+            HTTPCacheEntry(
+                status_code=response.status_code,
+                headers=headers,
+                content=content,
+                etag=etag,
+                last_modified=last_modified,
+            ),
+        )
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            content=content,
+            request=request,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    def _get_cache_key(self, request: httpx.Request) -> str:
+        namespace = self.namespace or request.headers.get("Authorization", "")
+        parts = [namespace, str(request.url), request.headers.get("Accept", "")]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+__all__ = [
+    "RedisCache",
+    "HTTPCache",
+    "HTTPCacheTransport",
+    "get_http_cache",
+]
@@ -1,6 +1,7 @@
 import time
-from typing import Any
+from typing import Any, TypeVar
 
+import httpx
 import structlog
 from githubkit import (
     AppAuthStrategy,
@@ -11,11 +12,22 @@ from githubkit import (
     utils,
     webhooks,
 )
+from githubkit.auth import BaseAuthStrategy
+from githubkit.core import GitHubCore
 from githubkit.typing import Missing
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 from polar.config import settings
-from polar.integrations.github.cache import RedisCache
+from polar.http_client import get_http_client
+from polar.integrations.github.cache import (
+    HTTPCacheTransport,
+    RedisCache,
+    get_http_cache,
+)
+from polar.integrations.github.rate_limit import (
+    RateLimitedAuth,
+    get_rate_limit_scheduler,
+)
 from polar.models.user import OAuthAccount, OAuthPlatform, User
 from polar.postgres import AsyncSession
 from polar.user.oauth_service import oauth_account_service
@@ -105,9 +117,8 @@ async def get_refreshed_oauth_client(
         and oauth.refresh_token
         and oauth.expires_at <= (time.time() + 60 * 30)
     ):
-        refresh = await GitHub().arequest(
-            method="POST",
-            url="https://github.com/login/oauth/access_token",
+        response = await get_http_client("https://github.com").post(
+            "https://github.com/login/oauth/access_token",
             params={
                 "client_id": settings.GITHUB_CLIENT_ID,
                 "client_secret": settings.GITHUB_CLIENT_SECRET,
@@ -115,11 +126,15 @@ async def get_refreshed_oauth_client(
                 "grant_type": "refresh_token",
             },
             headers={"Accept": "application/json"},
-            response_model=RefreshAccessToken,
         )
 
-        if refresh:
-            r = refresh.parsed_data
+        # GitHub answers errors with a 200 status and an `error` field
+        try:
+            response.raise_for_status()
+            r = RefreshAccessToken.model_validate(response.json())
+        except (httpx.HTTPStatusError, ValidationError):
+            log.error("github.auth.refresh.failed", user=user.id)
+        else:
             # update
             oauth.access_token = r.access_token
             oauth.expires_at = int(time.time()) + r.expires_in
@@ -128,14 +143,34 @@ async def get_refreshed_oauth_client(
 
             log.info("github.auth.refresh.succeeded", user=user.id)
             await oauth.save(session)
-        else:
-            log.error("github.auth.refresh.failed", user=user.id)
 
     return get_client(oauth.access_token)
 
 
+A = TypeVar("A", bound=BaseAuthStrategy)
+
+
+class CachedGitHub(GitHub[A]):
+    """
+    GitHub client making conditional requests from our shared HTTP cache,
+    instead of githubkit's in-memory one, which is lost with the client.
+    """
+
+    cache_namespace: str | None = None
+
+    def _create_async_client(self) -> httpx.AsyncClient:
+        # Not a shared client from polar.http_client: githubkit binds its auth
+        # flow and base URL to the client, and closes it after each request
+        return httpx.AsyncClient(
+            **self._get_client_defaults(),
+            transport=HTTPCacheTransport(
+                httpx.AsyncHTTPTransport(), get_http_cache(), self.cache_namespace
+            ),
+        )
+
+
 def get_client(access_token: str) -> GitHub[TokenAuthStrategy]:
-    return GitHub(access_token)
+    return CachedGitHub(access_token)
 
 
 def get_polar_client() -> GitHub[TokenAuthStrategy]:
@@ -160,6 +195,15 @@ def get_app_client() -> GitHub[AppAuthStrategy]:
     )
 
 
+class RateLimitedAppInstallationAuthStrategy(AppInstallationAuthStrategy):
+    def get_auth_flow(self, github: GitHubCore[Any]) -> httpx.Auth:
+        return RateLimitedAuth(
+            super().get_auth_flow(github),
+            self.installation_id,
+            get_rate_limit_scheduler(),
+        )
+
+
 def get_app_installation_client(
     installation_id: int,
 ) -> GitHub[AppInstallationAuthStrategy]:
@@ -169,8 +213,10 @@ def get_app_installation_client(
     # Using the RedisCache() below to cache generated JWTs
     # This improves ETag/If-None-Match cache hits over the default in-memory cache, as
     # they can be reused across restarts of the python process and by multiple workers.
-    return GitHub(
-        AppInstallationAuthStrategy(
+    #
+    # Requests consume the installation budget of the rate limit scheduler.
+    client: CachedGitHub[AppInstallationAuthStrategy] = CachedGitHub(
+        RateLimitedAppInstallationAuthStrategy(
             app_id=settings.GITHUB_APP_IDENTIFIER,
             private_key=settings.GITHUB_APP_PRIVATE_KEY,
             installation_id=installation_id,
@@ -179,6 +225,9 @@ def get_app_installation_client(
             cache=RedisCache(),
         )
     )
+    # Installation tokens are rotated: share the cached responses between them
+    client.cache_namespace = f"installation:{installation_id}"
+    return client
 
 
 __all__ = [
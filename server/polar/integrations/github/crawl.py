@@ -0,0 +1,269 @@
+import dataclasses
+import datetime
+import math
+import time
+from collections import defaultdict
+from collections.abc import Sequence
+from enum import StrEnum
+from uuid import UUID
+
+import structlog
+from sqlalchemy import Row, case, func, or_
+from sqlalchemy.orm import InstrumentedAttribute
+
+from polar.config import settings
+from polar.context import ExecutionContext
+from polar.kit.utils import utc_now
+from polar.logging import Logger
+from polar.models import Issue, Organization, Repository
+from polar.postgres import AsyncSession, sql
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+from polar.worker import BulkJob, enqueue_jobs
+
+from .rate_limit import RateLimitBudget, RateLimitScheduler, get_rate_limit_scheduler
+
+log: Logger = structlog.get_logger()
+
+# Weights of the activity of an issue: the more active,
+# the sooner it's crawled again for the same staleness.
+_PLEDGE_WEIGHT = 4.0
+_BADGE_WEIGHT = 2.0
+
+
+class CrawlKind(StrEnum):
+    issue = "issue"
+    timeline = "timeline"
+
+
+_TASKS: dict[CrawlKind, str] = {
+    CrawlKind.issue: "github.issue.sync",
+    CrawlKind.timeline: "github.issue.sync.issue_references",
+}
+
+
+def _get_fetched_at(kind: CrawlKind) -> InstrumentedAttribute[datetime.datetime | None]:
+    if kind == CrawlKind.issue:
+        return Issue.github_issue_fetched_at
+    return Issue.github_timeline_fetched_at
+
+
+@dataclasses.dataclass
+class CrawlLag:
+    organization_id: UUID
+    backlog: int
+    """Number of stale issues."""
+    lag: int
+    """Staleness of the oldest issue in seconds, 0 if there's no stale issue."""
+
+
+class CrawlScheduler:
+    """
+    Schedule the periodic crawls of the issues of the installed organizations.
+
+    Stale issues are ranked by their staleness weighted by their activity:
+    pledges, badge and engagement. Each installation crawls as many of them
+    as its rate limit budget allows, once the low priority reserve is set apart,
+    spread evenly over the crawl intervals left until the budget is reset,
+    and the jobs are spread evenly over the interval.
+    """
+
+    def __init__(self, redis: Redis, rate_limit_scheduler: RateLimitScheduler) -> None:
+        self.redis = redis
+        self.rate_limit_scheduler = rate_limit_scheduler
+
+    async def schedule(self, session: AsyncSession, kind: CrawlKind) -> int:
+        """
+        Enqueue the crawls of the most important stale issues.
+
+        Returns:
+            The number of enqueued jobs.
+        """
+        rows = await self._list_stale_issues(session, kind)
+
+        issues: dict[UUID, list[UUID]] = defaultdict(list)
+        installations: dict[UUID, int] = {}
+        lags: dict[UUID, CrawlLag] = {}
+        for row in rows:
+            issues[row.organization_id].append(row.id)
+            installations[row.organization_id] = row.installation_id
+            lags[row.organization_id] = CrawlLag(
+                row.organization_id, row.backlog, int(row.lag)
+            )
+
+        budgets = await self.rate_limit_scheduler.get_budgets(
+            list(set(installations.values()))
+        )
+
+        task = _TASKS[kind]
+        interval = settings.GITHUB_CRAWL_INTERVAL_SECONDS
+        jobs: list[BulkJob] = []
+        for organization_id, issue_ids in issues.items():
+            installation_id = installations[organization_id]
+            budget = self._get_interval_budget(budgets.get(installation_id))
+            issue_ids = issue_ids[:budget]
+
+            log.info(
+                "github.crawl.schedule",
+                kind=kind,
+                organization_id=organization_id,
+                installation_id=installation_id,
+                budget=budget,
+                count=len(issue_ids),
+                backlog=lags[organization_id].backlog,
+                lag=lags[organization_id].lag,
+            )
+
+            jobs += [
+                BulkJob(
+                    args=(issue_id,),
+                    job_id=f"{task}:{issue_id}",
+                    defer_by=datetime.timedelta(seconds=i * interval / len(issue_ids)),
+                )
+                for i, issue_id in enumerate(issue_ids)
+            ]
+
+        # Crawls yield the rate limit budget to webhooks
+        with ExecutionContext(is_low_priority=True):
+            count = await enqueue_jobs(task, jobs)
+
+        await self._set_lags(kind, list(lags.values()))
+
+        return count
+
+    async def get_lags(self, kind: CrawlKind) -> dict[UUID, CrawlLag]:
+        """
+        Returns the crawl lag of the organizations having stale issues,
+        as of the last schedule.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._get_key(kind, "backlog"))
+            pipe.hgetall(self._get_key(kind, "lag"))
+            backlogs, lags = await pipe.execute()
+
+        return {
+            UUID(organization_id): CrawlLag(
+                UUID(organization_id), int(backlog), int(lags.get(organization_id, 0))
+            )
+            for organization_id, backlog in backlogs.items()
+        }
+
+    def _get_interval_budget(self, budget: RateLimitBudget | None) -> int:
+        maximum = settings.GITHUB_CRAWL_MAX_ISSUES_PER_INTERVAL
+        # Unknown budget: the first responses will tell us
+        if budget is None:
+            return maximum
+
+        available = budget.remaining - settings.GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE
+        if available <= 0:
+            return 0
+
+        intervals = max(
+            math.ceil(
+                (budget.reset - time.time()) / settings.GITHUB_CRAWL_INTERVAL_SECONDS
+            ),
+            1,
+        )
+        # Shared by the crawl kinds
+        return min(available // intervals // len(CrawlKind), maximum)
+
+    async def _list_stale_issues(
+        self, session: AsyncSession, kind: CrawlKind
+    ) -> Sequence[Row[tuple[UUID, UUID, int, int, float]]]:
+        now = utc_now()
+        fetched_at = _get_fetched_at(kind)
+
+        staleness = func.extract(
+            "epoch", now - func.coalesce(fetched_at, Issue.created_at)
+        )
+        activity = (
+            1
+            + case((Issue.pledged_amount_sum > 0, _PLEDGE_WEIGHT), else_=0)
+            + case(
+                (
+                    or_(
+                        Issue.pledge_badge_embedded_at.is_not(None),
+                        Issue.has_pledge_badge_label.is_(True),
+                    ),
+                    _BADGE_WEIGHT,
+                ),
+                else_=0,
+            )
+            + func.ln(1 + Issue.total_engagement_count)
+        )
+
+        ranked = (
+            sql.select(
+                Issue.id,
+                Issue.organization_id,
+                Organization.installation_id,
+                func.row_number()
+                .over(
+                    partition_by=Issue.organization_id,
+                    order_by=(staleness * activity).desc(),
+                )
+                .label("rank"),
+                func.count().over(partition_by=Issue.organization_id).label("backlog"),
+                func.max(staleness)
+                .over(partition_by=Issue.organization_id)
+                .label("lag"),
+            )
+            .join(Issue.organization)
+            .join(Issue.repository)
+            .where(
+                or_(
+                    fetched_at.is_(None),
+                    fetched_at
+                    < now
+                    - datetime.timedelta(
+                        seconds=settings.GITHUB_CRAWL_STALE_AFTER_SECONDS
+                    ),
+                ),
+                Issue.deleted_at.is_(None),
+                Organization.deleted_at.is_(None),
+                Repository.deleted_at.is_(None),
+                Organization.installation_id.is_not(None),
+            )
+            .subquery()
+        )
+
+        statement = (
+            sql.select(
+                ranked.c.id,
+                ranked.c.organization_id,
+                ranked.c.installation_id,
+                ranked.c.backlog,
+                ranked.c.lag,
+            )
+            .where(ranked.c.rank <= settings.GITHUB_CRAWL_MAX_ISSUES_PER_INTERVAL)
+            .order_by(ranked.c.organization_id, ranked.c.rank)
+        )
+        res = await session.execute(statement)
+        return res.all()
+
+    async def _set_lags(self, kind: CrawlKind, lags: Sequence[CrawlLag]) -> None:
+        backlog_key = self._get_key(kind, "backlog")
+        lag_key = self._get_key(kind, "lag")
+        # Replace the previous values, so caught-up organizations are cleared
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(backlog_key, lag_key)
+            if lags:
+                pipe.hset(
+                    backlog_key,
+                    mapping={str(lag.organization_id): lag.backlog for lag in lags},
+                )
+                pipe.hset(
+                    lag_key,
+                    mapping={str(lag.organization_id): lag.lag for lag in lags},
+                )
+            await pipe.execute()
+
+    def _get_key(self, kind: CrawlKind, metric: str) -> str:
+        return f"github:crawl:{kind}:{metric}"
+
+
+def get_crawl_scheduler() -> CrawlScheduler:
+    return CrawlScheduler(redis_client, get_rate_limit_scheduler())
+
+
+__all__ = ["CrawlKind", "CrawlLag", "CrawlScheduler", "get_crawl_scheduler"]
@@ -5,6 +5,7 @@ import structlog
 from fastapi import (
     APIRouter,
     Depends,
+    Header,
     HTTPException,
     Request,
     Response,
@@ -20,21 +21,24 @@ from polar.auth.service import AuthService
 from polar.authz.service import AccessType, Authz
 from polar.config import settings
 from polar.context import ExecutionContext
-from polar.enums import UserSignupType
+from polar.enums import Platforms, UserSignupType
 from polar.exceptions import PolarRedirectionError, ResourceNotFound, Unauthorized
 from polar.integrations.github import client as github
 from polar.kit import jwt
-from polar.kit.http import ReturnTo
+from polar.kit.http import ReturnTo, etag_matches
 from polar.organization.schemas import Organization as OrganizationSchema
 from polar.pledge.service import pledge as pledge_service
 from polar.postgres import AsyncSession, get_db_session
 from polar.posthog import posthog
 from polar.reward.service import reward_service
 from polar.tags.api import Tags
-from polar.worker import enqueue_job
 
+from .badge_svg import EMPTY_SVG, get_badge_svg_cache, render_issue_badges
+from .ingestion import WebhookEvent, get_webhook_ingestion
 from .schemas import GithubUser, OAuthAccessToken
+from .service.issue import github_issue
 from .service.organization import github_organization
+from .service.repository import github_repository
 from .service.user import GithubUserServiceError, github_user
 
 log = structlog.get_logger()
@@ -233,6 +237,91 @@ async def install(
         return OrganizationSchema.from_db(organization)
 
 
+###############################################################################
+# BADGE
+###############################################################################
+
+
+def _badge_svg_response(
+    content: str | None, *, etag: str | None, status_code: int = 200
+) -> Response:
+    if etag is None:
+        headers = {"Cache-Control": "no-cache"}
+    else:
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": (
+                f"public, max-age={settings.GITHUB_BADGE_SVG_MAX_AGE_SECONDS}, "
+                "stale-while-revalidate="
+                f"{settings.GITHUB_BADGE_SVG_STALE_WHILE_REVALIDATE_SECONDS}"
+            ),
+        }
+    return Response(
+        content, status_code=status_code, headers=headers, media_type="image/svg+xml"
+    )
+
+
+@router.get(
+    "/{organization_name}/{repository_name}/issues/{number}/pledge.svg",
+    name="integrations.github.badge_svg",
+    tags=[Tags.INTERNAL],
+    response_class=Response,
+    responses={200: {"content": {"image/svg+xml": {}}}},
+)
+async def badge_svg(
+    organization_name: str,
+    repository_name: str,
+    number: int,
+    darkmode: bool = False,
+    if_none_match: str | None = Header(None),
+    session: AsyncSession = Depends(get_db_session),
+) -> Response:
+    cache = get_badge_svg_cache()
+
+    # Pre-rendered badges are served without touching the database
+    etag = await cache.get_etag(organization_name, repository_name, number, darkmode)
+    if etag is not None:
+        if etag_matches(if_none_match, etag):
+            return _badge_svg_response(None, etag=etag, status_code=304)
+        content = await cache.get_content(etag)
+        if content is not None:
+            return _badge_svg_response(content, etag=etag)
+
+    organization = await github_organization.get_by_name(
+        session, Platforms.github, organization_name
+    )
+    repository = (
+        await github_repository.get_by_org_and_name(
+            session, organization.id, repository_name
+        )
+        if organization is not None
+        else None
+    )
+    issue = (
+        await github_issue.get_by_number(
+            session, Platforms.github, repository.organization_id, repository.id, number
+        )
+        if repository is not None and not repository.is_private
+        else None
+    )
+    if organization is None or repository is None or issue is None:
+        return _badge_svg_response(EMPTY_SVG, etag=None, status_code=404)
+
+    # Don't wait for the avatars, they're rendered in the background
+    badges = await render_issue_badges(
+        session,
+        cache,
+        organization=organization,
+        repository=repository,
+        issue=issue,
+        fetch_avatars=False,
+    )
+    badge = badges[darkmode]
+    if etag_matches(if_none_match, badge.etag):
+        return _badge_svg_response(None, etag=badge.etag, status_code=304)
+    return _badge_svg_response(badge.content, etag=badge.etag)
+
+
 ###############################################################################
 # WEBHOOK
 ###############################################################################
@@ -284,20 +373,28 @@ def not_implemented() -> WebhookResponse:
 
 async def enqueue(request: Request) -> WebhookResponse:
     json_body = await request.json()
-    event_scope = request.headers["X-GitHub-Event"]
-    event_action = json_body["action"] if "action" in json_body else None
-    event_name = f"{event_scope}.{event_action}" if event_action else event_scope
+    event = WebhookEvent(
+        delivery_id=request.headers.get("X-GitHub-Delivery"),
+        scope=request.headers["X-GitHub-Event"],
+        action=json_body["action"] if "action" in json_body else None,
+        payload=json_body,
+    )
 
-    if event_name not in IMPLEMENTED_WEBHOOKS:
+    if event.name not in IMPLEMENTED_WEBHOOKS:
         return not_implemented()
 
-    task_name = f"github.webhook.{event_name}"
-    enqueued = await enqueue_job(task_name, event_scope, event_action, json_body)
-    if not enqueued:
+    result = await get_webhook_ingestion().ingest(event)
+    if not result:
         return WebhookResponse(success=False, message="Failed to enqueue task")
 
-    log.info("github.webhook.queued", task_name=task_name)
-    return WebhookResponse(success=True, job_id=enqueued.job_id)
+    if result.duplicate:
+        return WebhookResponse(success=True, message="Duplicate delivery")
+
+    if result.coalesced:
+        return WebhookResponse(success=True, message="Coalesced with pending event")
+
+    log.info("github.webhook.queued", task_name=event.task_name)
+    return WebhookResponse(success=True, job_id=result.job_id)
 
 
 @router.post("/webhook", response_model=WebhookResponse)
@@ -0,0 +1,279 @@
+import json
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+from arq.jobs import Job
+
+from polar.config import settings
+from polar.logging import Logger
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+from polar.worker import enqueue_job
+
+log: Logger = structlog.get_logger()
+
+_DELIVERY_TTL_SECONDS = 3600 * 24  # GitHub redeliveries are manual, within days
+_STATS_KEY = "github:webhook:ingestion:stats"
+
+# Events whose handler only depends on the latest state of the issue,
+# so only the last one of a burst needs to be processed.
+# They're grouped so events with different side effects are not merged together.
+_COALESCED_EVENTS = {
+    "issues.edited",
+    "issues.labeled",
+    "issues.unlabeled",
+    "issues.assigned",
+    "issues.unassigned",
+}
+
+# Store the latest payload of a group of events with the number of events
+# it replaces, and start a window if none is running, in one atomic step.
+# The payload is spliced in the JSON value as is, so it's not re-encoded by Lua.
+_COALESCE_SCRIPT = """
+local previous = redis.call('HGET', KEYS[1], ARGV[1])
+local count = 1
+if previous then
+    count = cjson.decode(previous)['count'] + 1
+end
+redis.call('HSET', KEYS[1], ARGV[1], '{"count": ' .. count .. ', ' .. string.sub(ARGV[2], 2))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local is_window_start = redis.call('SET', KEYS[2], 1, 'NX', 'PX', ARGV[4])
+if is_window_start then
+    return {count, 1}
+end
+return {count, 0}
+"""
+
+
+@dataclass
+class WebhookEvent:
+    delivery_id: str | None
+    scope: str
+    action: str | None
+    payload: dict[str, Any]
+
+    @property
+    def name(self) -> str:
+        return f"{self.scope}.{self.action}" if self.action else self.scope
+
+    @property
+    def task_name(self) -> str:
+        return f"github.webhook.{self.name}"
+
+    @property
+    def issue_key(self) -> str | None:
+        try:
+            installation_id = self.payload["installation"]["id"]
+            repository_id = self.payload["repository"]["id"]
+            issue_id = self.payload["issue"]["id"]
+        except (KeyError, TypeError):
+            return None
+        return f"{installation_id}:{repository_id}:{issue_id}"
+
+    @property
+    def coalesce_group(self) -> str | None:
+        if self.name not in _COALESCED_EVENTS:
+            return None
+        if self.action in {"labeled", "unlabeled"}:
+            # The badge is only updated when the event is about the badge label
+            label = self.payload.get("label") or {}
+            return f"label:{str(label.get('name', '')).lower()}"
+        if self.action in {"assigned", "unassigned"}:
+            return "assignees"
+        return self.action
+
+
+@dataclass
+class IngestionResult:
+    job_id: str | None = None
+    duplicate: bool = False
+    coalesced: bool = False
+
+
+class WebhookIngestion:
+    """
+    Deduplicate and coalesce GitHub webhook deliveries before enqueuing them.
+
+    * Deliveries are deduplicated on their `X-GitHub-Delivery` ID,
+    so redeliveries don't trigger the same job twice.
+    * Events on the same issue, like a burst of `issues.labeled`,
+    are debounced: the latest payload is kept in Redis and a single job is
+    enqueued at the end of the window.
+    When another event is received for the issue, pending events are
+    enqueued right away, so they're not handled after it.
+    """
+
+    def __init__(self, redis: Redis, *, window: float | None = None) -> None:
+        self.redis = redis
+        self._coalesce_script = redis.register_script(_COALESCE_SCRIPT)
+        self.window = (
+            window
+            if window is not None
+            else settings.GITHUB_WEBHOOK_COALESCE_WINDOW_SECONDS
+        )
+
+    async def ingest(self, event: WebhookEvent) -> IngestionResult | None:
+        await self.redis.hincrby(_STATS_KEY, "received", 1)
+
+        if event.delivery_id is not None and not await self._claim_delivery(
+            event.delivery_id
+        ):
+            await self.redis.hincrby(_STATS_KEY, "duplicates", 1)
+            log.info(
+                "github.webhook.duplicate",
+                delivery_id=event.delivery_id,
+                event_name=event.name,
+            )
+            return IngestionResult(duplicate=True)
+
+        issue_key = event.issue_key
+        group = event.coalesce_group
+        try:
+            if issue_key is not None and group is not None and self.window > 0:
+                result = await self._coalesce(event, issue_key, group)
+            else:
+                if issue_key is not None:
+                    await self.flush(issue_key)
+
+                job = await enqueue_job(
+                    event.task_name, event.scope, event.action, event.payload
+                )
+                result = IngestionResult(job_id=job.job_id) if job else None
+        except Exception:
+            await self._release_delivery(event.delivery_id)
+            raise
+
+        if result is None:
+            log.warning(
+                "github.webhook.not_enqueued",
+                delivery_id=event.delivery_id,
+                event_name=event.name,
+            )
+            await self._release_delivery(event.delivery_id)
+        return result
+
+    async def flush(self, issue_key: str, group: str | None = None) -> list[Job]:
+        """
+        Enqueue the pending events of an issue.
+
+        Args:
+            issue_key: The issue key, as returned by `WebhookEvent.issue_key`.
+            group: Only flush this group of events. If `None`, flush all of them.
+        """
+        pending_key = self._get_pending_key(issue_key)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if group is None:
+                pipe.hgetall(pending_key)
+                pipe.delete(pending_key)
+                pending, _ = await pipe.execute()
+            else:
+                pipe.hget(pending_key, group)
+                pipe.hdel(pending_key, group)
+                pipe.delete(self._get_window_key(issue_key, group))
+                value, _, _ = await pipe.execute()
+                pending = {group: value} if value is not None else {}
+
+        jobs: list[Job] = []
+        for value in pending.values():
+            data = json.loads(value)
+            job = await enqueue_job(
+                data["task_name"], data["scope"], data["action"], data["payload"]
+            )
+            if job is None:
+                log.warning(
+                    "github.webhook.coalesced.flush.not_enqueued",
+                    issue_key=issue_key,
+                    task_name=data["task_name"],
+                )
+                continue
+            jobs.append(job)
+            log.info(
+                "github.webhook.coalesced.flush",
+                issue_key=issue_key,
+                task_name=data["task_name"],
+                collapsed=data["count"] - 1,
+                job_id=job.job_id,
+            )
+        return jobs
+
+    async def get_stats(self) -> dict[str, int]:
+        stats = await self.redis.hgetall(_STATS_KEY)
+        return {key: int(value) for key, value in stats.items()}
+
+    async def _coalesce(
+        self, event: WebhookEvent, issue_key: str, group: str
+    ) -> IngestionResult | None:
+        window_key = self._get_window_key(issue_key, group)
+        value = json.dumps(
+            {
+                "task_name": event.task_name,
+                "scope": event.scope,
+                "action": event.action,
+                "payload": event.payload,
+            }
+        )
+        count, is_window_start = await self._coalesce_script(
+            keys=[self._get_pending_key(issue_key), window_key],
+            args=[
+                group,
+                value,
+                int(self.window * 10) + 60,
+                int(self.window * 1000),
+            ],
+        )
+
+        # A flush is already scheduled for this window, it'll pick up our payload
+        if not is_window_start:
+            await self.redis.hincrby(_STATS_KEY, "coalesced", 1)
+            log.info(
+                "github.webhook.coalesced",
+                issue_key=issue_key,
+                event_name=event.name,
+                count=count,
+            )
+            return IngestionResult(coalesced=True)
+
+        job = await enqueue_job(
+            "github.webhook.flush_coalesced",
+            issue_key,
+            group,
+            _defer_by=self.window,
+        )
+        if job is None:
+            # No flush is scheduled: let the next event start a new window
+            await self.redis.delete(window_key)
+            return None
+        return IngestionResult(job_id=job.job_id)
+
+    async def _claim_delivery(self, delivery_id: str) -> bool:
+        claimed = await self.redis.set(
+            self._get_delivery_key(delivery_id), 1, nx=True, ex=_DELIVERY_TTL_SECONDS
+        )
+        return bool(claimed)
+
+    async def _release_delivery(self, delivery_id: str | None) -> None:
+        # Let GitHub redeliver an event we failed to enqueue
+        if delivery_id is not None:
+            await self.redis.delete(self._get_delivery_key(delivery_id))
+
+    def _get_delivery_key(self, delivery_id: str) -> str:
+        return f"github:webhook:delivery:{delivery_id}"
+
+    def _get_pending_key(self, issue_key: str) -> str:
+        return f"github:webhook:coalesce:{issue_key}"
+
+    def _get_window_key(self, issue_key: str, group: str) -> str:
+        return f"github:webhook:coalesce:{issue_key}:{group}:window"
+
+
+def get_webhook_ingestion() -> WebhookIngestion:
+    return WebhookIngestion(redis_client)
+
+
+__all__ = [
+    "WebhookEvent",
+    "WebhookIngestion",
+    "IngestionResult",
+    "get_webhook_ingestion",
+]
@@ -0,0 +1,223 @@
+import asyncio
+import dataclasses
+import datetime
+import json
+from typing import Any
+from uuid import UUID
+
+import structlog
+from githubkit import GitHub
+
+from polar.config import settings
+from polar.locker import Locker
+from polar.logging import Logger
+from polar.postgres import AsyncSessionMaker
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+from polar.worker import enqueue_job
+
+from .service.issue import github_issue
+
+log: Logger = structlog.get_logger()
+
+_STATS_KEY = "github:issue:lookup:stats"
+
+# Syncs running in this process, shared by the concurrent lookups of an issue
+_in_flight: dict[str, asyncio.Task[UUID]] = {}
+
+
+@dataclasses.dataclass
+class IssueLookupEntry:
+    issue_id: UUID
+    synced_at: datetime.datetime
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"issue_id": str(self.issue_id), "synced_at": self.synced_at.isoformat()}
+        )
+
+    @classmethod
+    def from_json(cls, value: str) -> "IssueLookupEntry":
+        data = json.loads(value)
+        return cls(
+            issue_id=UUID(data["issue_id"]),
+            synced_at=datetime.datetime.fromisoformat(data["synced_at"]),
+        )
+
+
+class IssueLookup:
+    """
+    Resolve external issues from their URL, syncing them from GitHub
+    as few times as possible.
+
+    * Issues synced less than `fresh_ttl` ago are served without calling GitHub.
+    * Issues synced less than `stale_ttl` ago are served right away,
+    while they're refreshed in the background.
+    * Concurrent lookups of an unknown issue share the same sync:
+    in-process, by awaiting the same task, and across processes,
+    by waiting on a lock and reusing the result of the process holding it.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        fresh_ttl: datetime.timedelta,
+        stale_ttl: datetime.timedelta,
+    ) -> None:
+        self.redis = redis
+        self.locker = Locker(redis)
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+
+    async def lookup(
+        self,
+        sessionmaker: AsyncSessionMaker,
+        client: GitHub[Any],
+        *,
+        org_name: str,
+        repo_name: str,
+        issue_number: int,
+    ) -> UUID:
+        """
+        Returns:
+            The ID of the issue.
+
+        Raises:
+            ResourceNotFound: The issue doesn't exist or isn't accessible.
+        """
+        key = self._get_key(org_name, repo_name, issue_number)
+
+        entry = await self._get_entry(key)
+        if entry is not None:
+            if self._is_fresh(entry):
+                await self._record("fresh")
+            else:
+                await self._record("stale")
+                await enqueue_job(
+                    "github.issue.lookup.refresh",
+                    org_name=org_name,
+                    repo_name=repo_name,
+                    issue_number=issue_number,
+                    _job_id=f"github.issue.lookup.refresh:{key}",
+                )
+            return entry.issue_id
+
+        flight = _in_flight.get(key)
+        if flight is not None:
+            await self._record("coalesced")
+        else:
+            flight = asyncio.create_task(
+                self._sync(
+                    sessionmaker,
+                    client,
+                    key=key,
+                    org_name=org_name,
+                    repo_name=repo_name,
+                    issue_number=issue_number,
+                )
+            )
+            _in_flight[key] = flight
+            flight.add_done_callback(lambda _: _in_flight.pop(key, None))
+
+        # Don't cancel the sync for the others if this request is cancelled
+        return await asyncio.shield(flight)
+
+    async def refresh(
+        self,
+        sessionmaker: AsyncSessionMaker,
+        client: GitHub[Any],
+        *,
+        org_name: str,
+        repo_name: str,
+        issue_number: int,
+    ) -> UUID:
+        return await self._sync(
+            sessionmaker,
+            client,
+            key=self._get_key(org_name, repo_name, issue_number),
+            org_name=org_name,
+            repo_name=repo_name,
+            issue_number=issue_number,
+            refresh=True,
+        )
+
+    async def get_stats(self) -> dict[str, int]:
+        return {
+            field: int(value)
+            for field, value in (await self.redis.hgetall(_STATS_KEY)).items()
+        }
+
+    async def _sync(
+        self,
+        sessionmaker: AsyncSessionMaker,
+        client: GitHub[Any],
+        *,
+        key: str,
+        org_name: str,
+        repo_name: str,
+        issue_number: int,
+        refresh: bool = False,
+    ) -> UUID:
+        async with self.locker.lock(
+            f"sync_external_{key}", timeout=10.0, blocking_timeout=10.0
+        ):
+            # Another process may have synced it while we were waiting for the lock
+            entry = await self._get_entry(key)
+            if entry is not None and self._is_fresh(entry):
+                if not refresh:
+                    await self._record("coalesced")
+                return entry.issue_id
+
+            async with sessionmaker() as session:
+                issue = await github_issue.sync_external_org_with_repo_and_issue(
+                    session,
+                    client=client,
+                    org_name=org_name,
+                    repo_name=repo_name,
+                    issue_number=issue_number,
+                    refresh=refresh,
+                )
+                await session.commit()
+
+            entry = IssueLookupEntry(
+                issue_id=issue.id,
+                synced_at=datetime.datetime.now(datetime.UTC),
+            )
+            await self.redis.setex(key, self.stale_ttl, entry.to_json())
+            await self._record("synced")
+
+        log.debug("github.issue.lookup.synced", key=key, issue_id=issue.id)
+        return issue.id
+
+    async def _get_entry(self, key: str) -> IssueLookupEntry | None:
+        value = await self.redis.get(key)
+        if value is None:
+            return None
+        return IssueLookupEntry.from_json(value)
+
+    def _is_fresh(self, entry: IssueLookupEntry) -> bool:
+        return datetime.datetime.now(datetime.UTC) - entry.synced_at < self.fresh_ttl
+
+    async def _record(self, outcome: str) -> None:
+        await self.redis.hincrby(_STATS_KEY, outcome, 1)
+
+    def _get_key(self, org_name: str, repo_name: str, issue_number: int) -> str:
+        # GitHub names are case-insensitive
+        path = f"{org_name}/{repo_name}".lower()
+        return f"github:issue:lookup:{path}/{issue_number}"
+
+
+def get_issue_lookup() -> IssueLookup:
+    return IssueLookup(
+        redis_client,
+        fresh_ttl=datetime.timedelta(
+            seconds=settings.GITHUB_ISSUE_LOOKUP_FRESH_TTL_SECONDS
+        ),
+        stale_ttl=datetime.timedelta(
+            seconds=settings.GITHUB_ISSUE_LOOKUP_STALE_TTL_SECONDS
+        ),
+    )
+
+
+__all__ = ["IssueLookup", "get_issue_lookup"]
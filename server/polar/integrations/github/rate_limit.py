@@ -0,0 +1,206 @@
+import dataclasses
+import time
+from collections.abc import AsyncGenerator, Generator, Sequence
+from datetime import timedelta
+
+import httpx
+import structlog
+
+from polar.config import settings
+from polar.context import ExecutionContext
+from polar.exceptions import PolarError
+from polar.logging import Logger
+from polar.redis import Redis
+from polar.redis import redis as redis_client
+
+log: Logger = structlog.get_logger()
+
+# Returns -1 if the request can be made, the reset timestamp otherwise.
+# If we don't know the budget yet, or its window is over, we let the request
+# through: its response will tell us the new budget.
+_ACQUIRE_SCRIPT = """
+local remaining = redis.call('HGET', KEYS[1], 'remaining')
+local reset = redis.call('HGET', KEYS[1], 'reset')
+if not remaining or not reset then
+    return -1
+end
+if tonumber(ARGV[1]) >= tonumber(reset) then
+    return -1
+end
+if tonumber(remaining) > tonumber(ARGV[2]) then
+    redis.call('HINCRBY', KEYS[1], 'remaining', -1)
+    return -1
+end
+return tonumber(reset)
+"""
+
+# Responses may come back out of order:
+# within the same window, only keep the lowest remaining count.
+_UPDATE_SCRIPT = """
+local reset = redis.call('HGET', KEYS[1], 'reset')
+local remaining = tonumber(ARGV[1])
+if reset and tonumber(reset) == tonumber(ARGV[3]) then
+    local current = tonumber(redis.call('HGET', KEYS[1], 'remaining'))
+    if current and current < remaining then
+        remaining = current
+    end
+end
+redis.call('HSET', KEYS[1], 'remaining', remaining, 'limit', ARGV[2], 'reset', ARGV[3])
+redis.call('EXPIREAT', KEYS[1], tonumber(ARGV[3]) + 60)
+"""
+
+
+class RateLimitBudgetExhausted(PolarError):
+    def __init__(self, installation_id: int, retry_after: timedelta) -> None:
+        self.installation_id = installation_id
+        self.retry_after = retry_after
+        message = (
+            f"GitHub rate limit budget of installation {installation_id} "
+            f"is exhausted, retry in {retry_after}."
+        )
+        super().__init__(message)
+
+
+@dataclasses.dataclass
+class RateLimitBudget:
+    remaining: int
+    reset: int
+    """Timestamp of the reset of the budget."""
+
+
+class RateLimitScheduler:
+    """
+    Token bucket of GitHub API requests, shared by all the processes
+    and keyed by installation.
+
+    The bucket is refilled from the `X-RateLimit-*` headers of GitHub responses.
+    Low priority work, like periodic crawls, can't consume the last
+    `GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE` requests of the budget,
+    which are kept for the work triggered by users and webhooks.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self._acquire_script = redis.register_script(_ACQUIRE_SCRIPT)
+        self._update_script = redis.register_script(_UPDATE_SCRIPT)
+
+    async def acquire(self, installation_id: int, *, low_priority: bool) -> None:
+        """
+        Consume a request from the budget of the installation.
+
+        Raises:
+            RateLimitBudgetExhausted: The budget is exhausted until its reset.
+        """
+        reserve = settings.GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE if low_priority else 0
+        now = int(time.time())
+        reset = await self._acquire_script(
+            keys=[self._get_key(installation_id)], args=[now, reserve]
+        )
+        if reset != -1:
+            retry_after = timedelta(seconds=max(int(reset) - now, 0) + 1)
+            log.info(
+                "github.rate_limit.budget_exhausted",
+                installation_id=installation_id,
+                low_priority=low_priority,
+                retry_after=retry_after.total_seconds(),
+            )
+            raise RateLimitBudgetExhausted(installation_id, retry_after)
+
+    async def update(self, installation_id: int, headers: httpx.Headers) -> None:
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            limit = int(headers["X-RateLimit-Limit"])
+            reset = int(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        await self._update_script(
+            keys=[self._get_key(installation_id)], args=[remaining, limit, reset]
+        )
+
+    async def get_remaining(self, installation_id: int) -> int | None:
+        """
+        Returns the remaining budget of the installation,
+        or `None` if it's unknown or has been reset.
+        """
+        remaining, reset = await self.redis.hmget(
+            self._get_key(installation_id), ["remaining", "reset"]
+        )
+        if remaining is None or reset is None or time.time() >= int(reset):
+            return None
+        return int(remaining)
+
+    async def get_budgets(
+        self, installation_ids: Sequence[int]
+    ) -> dict[int, RateLimitBudget]:
+        """
+        Returns the budgets of the installations, in a single round trip.
+
+        Installations whose budget is unknown or has been reset are omitted.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for installation_id in installation_ids:
+                pipe.hmget(self._get_key(installation_id), ["remaining", "reset"])
+            results = await pipe.execute()
+
+        now = time.time()
+        budgets: dict[int, RateLimitBudget] = {}
+        for installation_id, (remaining, reset) in zip(installation_ids, results):
+            if remaining is None or reset is None or now >= int(reset):
+                continue
+            budgets[installation_id] = RateLimitBudget(int(remaining), int(reset))
+        return budgets
+
+    def _get_key(self, installation_id: int) -> str:
+        return f"github:rate-limit:{installation_id}"
+
+
+class RateLimitedAuth(httpx.Auth):
+    """
+    Wrap the authentication flow of an installation client,
+    so every request goes through the rate limit scheduler.
+    """
+
+    def __init__(
+        self, auth: httpx.Auth, installation_id: int, scheduler: RateLimitScheduler
+    ) -> None:
+        self.auth = auth
+        self.installation_id = installation_id
+        self.scheduler = scheduler
+
+    def sync_auth_flow(
+        self, request: httpx.Request
+    ) -> Generator[httpx.Request, httpx.Response, None]:
+        yield from self.auth.sync_auth_flow(request)
+
+    async def async_auth_flow(
+        self, request: httpx.Request
+    ) -> AsyncGenerator[httpx.Request, httpx.Response]:
+        await self.scheduler.acquire(
+            self.installation_id,
+            low_priority=ExecutionContext.current().is_low_priority,
+        )
+
+        flow = self.auth.async_auth_flow(request)
+        outgoing = await flow.__anext__()
+        while True:
+            response = yield outgoing
+            # Installation token requests are counted in the app budget
+            if outgoing is request:
+                await self.scheduler.update(self.installation_id, response.headers)
+            try:
+                outgoing = await flow.asend(response)
+            except StopAsyncIteration:
+                break
+
+
+def get_rate_limit_scheduler() -> RateLimitScheduler:
+    return RateLimitScheduler(redis_client)
+
+
+__all__ = [
+    "RateLimitBudget",
+    "RateLimitBudgetExhausted",
+    "RateLimitScheduler",
+    "RateLimitedAuth",
+    "get_rate_limit_scheduler",
+]
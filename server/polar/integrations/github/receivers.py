@@ -1,7 +1,9 @@
 import structlog
 
+from polar.issue.body import get_issue_body_renderer
 from polar.issue.hooks import IssueHook, issue_upserted
 from polar.organization.service import organization as organization_service
+from polar.pledge.hooks import PledgeHook, pledge_created, pledge_updated
 from polar.repository.service import repository as repository_service
 from polar.worker import enqueue_job
 
@@ -40,5 +42,20 @@ async def schedule_fetch_references_and_dependencies(
     await enqueue_job("github.issue.sync.issue_dependencies", hook.issue.id)
 
 
+async def schedule_render_body(hook: IssueHook) -> None:
+    # Unchanged bodies are skipped when rendering
+    await get_issue_body_renderer().schedule([hook.issue.id])
+
+
 issue_upserted.add(schedule_fetch_references_and_dependencies)
 issue_upserted.add(schedule_embed_badge_task)
+issue_upserted.add(schedule_render_body)
+
+
+async def schedule_render_badge_svg_task(hook: PledgeHook) -> None:
+    # Pledge totals changed, the pre-rendered badges need to be refreshed
+    await enqueue_job("github.badge.render_svg", hook.pledge.issue_id)
+
+
+pledge_created.add(schedule_render_badge_svg_task)
+pledge_updated.add(schedule_render_badge_svg_task)
@@ -1,16 +1,15 @@
 from __future__ import annotations
 
 import asyncio
-import datetime
 from collections.abc import Awaitable, Sequence
 from typing import Any, Literal
 from uuid import UUID
 
 import structlog
-from githubkit import GitHub, Paginator
+from githubkit import GitHub
 from githubkit.exception import RequestFailed
-from sqlalchemy import asc, or_
 
+from polar.config import settings
 from polar.dashboard.schemas import IssueSortBy
 from polar.enums import Platforms
 from polar.exceptions import ResourceNotFound
@@ -32,12 +31,18 @@ from polar.repository.hooks import (
     repository_issue_synced,
     repository_issues_sync_completed,
 )
+from polar.worker import enqueue_job
 
 from .. import client as github
 from .. import types
 from ..badge import GithubBadge
 from .organization import github_organization
-from .paginated import ErrorCount, SyncedCount, github_paginated_service
+from .paginated import (
+    ErrorCount,
+    SyncedCount,
+    github_paginated_service,
+    iterate_pages,
+)
 from .repository import github_repository
 
 log: Logger = structlog.get_logger()
@@ -379,68 +384,6 @@ class GithubIssueService(IssueService):
             issue.github_issue_etag = res.headers.get("etag", None)
             await issue.save(session)
 
-    async def list_issues_to_crawl_issue(
-        self,
-        session: AsyncSession,
-        organization: Organization,
-    ) -> Sequence[Issue]:
-        current_time = utc_now()
-        cutoff_time = current_time - datetime.timedelta(hours=12)
-
-        stmt = (
-            sql.select(Issue)
-            .join(Issue.organization)
-            .join(Issue.repository)
-            .where(
-                or_(
-                    Issue.github_issue_fetched_at.is_(None),
-                    Issue.github_issue_fetched_at < cutoff_time,
-                ),
-                Issue.deleted_at.is_(None),
-                Organization.deleted_at.is_(None),
-                Repository.deleted_at.is_(None),
-                Organization.installation_id.is_not(None),
-                Organization.id == organization.id,
-            )
-            .order_by(asc(Issue.github_issue_fetched_at))
-            .limit(100)
-        )
-
-        res = await session.execute(stmt)
-
-        return res.scalars().unique().all()
-
-    async def list_issues_to_crawl_timeline(
-        self,
-        session: AsyncSession,
-        organization: Organization,
-    ) -> Sequence[Issue]:
-        current_time = utc_now()
-        cutoff_time = current_time - datetime.timedelta(hours=12)
-
-        stmt = (
-            sql.select(Issue)
-            .join(Issue.organization)
-            .join(Issue.repository)
-            .where(
-                or_(
-                    Issue.github_timeline_fetched_at.is_(None),
-                    Issue.github_timeline_fetched_at < cutoff_time,
-                ),
-                Issue.deleted_at.is_(None),
-                Organization.deleted_at.is_(None),
-                Repository.deleted_at.is_(None),
-                Organization.installation_id.is_not(None),
-                Organization.id == organization.id,
-            )
-            .order_by(asc(Issue.github_timeline_fetched_at))
-            .limit(100)
-        )
-
-        res = await session.execute(stmt)
-
-        return res.scalars().unique().all()
-
     async def list_issues_to_add_badge_to_auto(
         self,
         session: AsyncSession,
@@ -576,7 +519,12 @@ class GithubIssueService(IssueService):
         org_name: str,
         repo_name: str,
         issue_number: int,
+        refresh: bool = False,
     ) -> Issue:
+        """
+        Get an issue from any public repository, syncing it from GitHub
+        if we don't know it yet, or if `refresh` is set.
+        """
         log.info(
             "syncing external issue",
             org_name=org_name,
@@ -587,7 +535,7 @@ class GithubIssueService(IssueService):
         issue = await self.get_by_external_lookup_key(
             session, Platforms.github, f"{org_name}/{repo_name}/{issue_number}"
         )
-        if issue is not None:
+        if issue is not None and not refresh:
             log.debug(
                 "external issue found by lookup key",
                 org_name=org_name,
@@ -673,7 +621,7 @@ class GithubIssueService(IssueService):
 
         client = github.get_app_installation_client(installation_id)
 
-        paginator: Paginator[types.Issue] = client.paginate(
+        pages = iterate_pages(
             client.rest.issues.async_list_for_repo,
             owner=organization.name,
             repo=repository.name,
@@ -684,8 +632,8 @@ class GithubIssueService(IssueService):
         )
         synced, errors = await github_paginated_service.store_paginated_resource(
             session,
-            paginator=paginator,
-            store_resource_method=github_issue.store,
+            pages=pages,
+            store_many_resource_method=github_issue.store_many,
             organization=organization,
             repository=repository,
             skip_condition=skip_if_pr,
@@ -700,18 +648,38 @@ class GithubIssueService(IssueService):
         session: AsyncSession,
         sessionmaker: AsyncSessionMaker,
         user: User,
-    ) -> list[Issue]:
-        # use cached result if we have one
-        cache_key = "recommendations:" + str(user.id)
-        val = await redis.lrange(cache_key, 0, -1)
-        if val:
-            res_issues: list[Issue] = []
-            for id in val:
-                issue = await github_issue.get(session, UUID(id))
-                if issue:
-                    res_issues.append(issue)
-            return res_issues
+    ) -> Sequence[Issue]:
+        """
+        List the issues recommended to the user, ranked.
+
+        Recommendations are crawled from the repositories starred by the user and
+        cached. They're refreshed in the background before the cache expires.
+        """
+        cache_key = self._get_recommendations_key(user.id)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(cache_key, 0, -1)
+            pipe.ttl(cache_key)
+            ids, ttl = await pipe.execute()
+
+        if ids:
+            await self._schedule_recommendations_refresh(user.id, ttl)
+        else:
+            ids = await self.refresh_recommendations(session, sessionmaker, user)
+
+        issues = await self.list_loaded(session, [UUID(id) for id in ids])
+        ranks = {id: rank for rank, id in enumerate(ids)}
+        return sorted(issues, key=lambda i: ranks[str(i.id)])
 
+    async def refresh_recommendations(
+        self,
+        session: AsyncSession,
+        sessionmaker: AsyncSessionMaker,
+        user: User,
+    ) -> list[str]:
+        """
+        Crawl the repositories starred by the user, and cache the IDs of
+        the recommended issues, ranked.
+        """
         client = await github.get_user_client(session, user)
 
         # get the latest starred repos
@@ -736,20 +704,65 @@ class GithubIssueService(IssueService):
         # collect the results from each coroutine
         results: list[list[Issue]] = await asyncio.gather(*jobs)
         await session.commit()
-        res = [i for sub in results for i in sub]
+        ids = [str(i.id) for i in _rank_recommendations(results)]
 
         # No recommendations, nothing to cache!
-        if len(res) == 0:
+        if len(ids) == 0:
             return []
 
         # set cache
+        cache_key = self._get_recommendations_key(user.id)
         async with redis.pipeline() as pipe:
             pipe.delete(cache_key)
-            pipe.rpush(cache_key, *[str(i.id) for i in res])
-            pipe.expire(cache_key, datetime.timedelta(hours=24))
+            pipe.rpush(cache_key, *ids)
+            pipe.expire(cache_key, settings.GITHUB_RECOMMENDATIONS_TTL_SECONDS)
+            pipe.delete(self._get_recommendations_response_key(user.id))
             await pipe.execute()
 
-        return res
+        return ids
+
+    async def get_recommendations_response(self, user_id: UUID) -> str | None:
+        """
+        Get the cached response of the recommendations of the user.
+
+        It only lives for a few minutes, since it holds the issues data,
+        and it's dropped when the recommendations are refreshed.
+        The refresh is scheduled from here too,
+        as the response is served without listing them.
+        """
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.get(self._get_recommendations_response_key(user_id))
+            pipe.ttl(self._get_recommendations_key(user_id))
+            content, ttl = await pipe.execute()
+
+        if content is not None:
+            await self._schedule_recommendations_refresh(user_id, ttl)
+        return content
+
+    async def _schedule_recommendations_refresh(self, user_id: UUID, ttl: int) -> None:
+        refresh_ttl = (
+            settings.GITHUB_RECOMMENDATIONS_TTL_SECONDS
+            - settings.GITHUB_RECOMMENDATIONS_REFRESH_AFTER_SECONDS
+        )
+        if ttl < refresh_ttl:
+            await enqueue_job(
+                "github.issue.recommendations.refresh",
+                user_id=user_id,
+                _job_id=f"github.issue.recommendations.refresh:{user_id}",
+            )
+
+    async def set_recommendations_response(self, user_id: UUID, content: str) -> None:
+        await redis.setex(
+            self._get_recommendations_response_key(user_id),
+            settings.GITHUB_RECOMMENDATIONS_RESPONSE_TTL_SECONDS,
+            content,
+        )
+
+    def _get_recommendations_key(self, user_id: UUID) -> str:
+        return f"recommendations:{user_id}"
+
+    def _get_recommendations_response_key(self, user_id: UUID) -> str:
+        return f"recommendations:response:{user_id}"
 
     async def create_or_update_from_github(
         self,
@@ -783,6 +796,46 @@ class GithubIssueService(IssueService):
         return issue
 
 
+def _rank_recommendations(results: list[list[Issue]]) -> list[Issue]:
+    """
+    Sort the recommended issues by thumbs up,
+    spreading out the repositories in the results.
+    """
+    issues = sorted(
+        (i for sub in results for i in sub),
+        key=lambda i: i.reactions.get("plus_one", 0)
+        if isinstance(i.reactions, dict)
+        else 0,
+        reverse=True,
+    )
+
+    penalties: dict[UUID, int] = {}
+    res: list[Issue] = []
+
+    while len(issues) > 0:
+        # In the next 5 issues, pick the one with the lowest penalty
+        lowest_penalty = 0
+        lowest: Issue | None = None
+        lowest_idx = 0
+
+        for idx, candidate in enumerate(issues[0:5]):
+            pen = penalties.get(candidate.repository_id, 0)
+
+            if lowest is None or pen < lowest_penalty:
+                lowest = candidate
+                lowest_penalty = pen
+                lowest_idx = idx
+
+        if lowest is None:
+            break
+
+        penalties[lowest.repository_id] = lowest_penalty + 1
+        res.append(lowest)
+        del issues[lowest_idx]
+
+    return res
+
+
 async def recommended_in_repo(
     sessionmaker: AsyncSessionMaker, r: types.Repository, client: GitHub[Any]
 ) -> list[Issue]:
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from collections.abc import Callable, Coroutine
-from typing import Any, Literal
+import asyncio
+import contextlib
+from collections.abc import AsyncGenerator, Awaitable, Callable, Coroutine, Sequence
+from typing import Any, Literal, TypeVar, cast
 
 import structlog
-from githubkit import Paginator
+from githubkit import Response
 
 from polar.kit.hook import Hook
 from polar.models import Issue, Organization, Repository
@@ -20,15 +22,54 @@ log = structlog.get_logger()
 SyncedCount = int
 ErrorCount = int
 
+T = TypeVar("T")
+
+
+async def iterate_pages(
+    request: Callable[..., Awaitable[Response[list[T]]]],
+    *,
+    per_page: int = 100,
+    **kwargs: Any,
+) -> AsyncGenerator[list[T], None]:
+    """
+    Iterate over the pages of a GitHub list endpoint, e.g.
+    `client.rest.issues.async_list_for_repo`, called with `kwargs`.
+
+    The next page is fetched in the background while the caller
+    processes the current one.
+    """
+
+    async def get_page(page: int) -> list[T]:
+        response = await request(page=page, per_page=per_page, **kwargs)
+        return response.parsed_data
+
+    page_number = 1
+    next_page = asyncio.create_task(get_page(page_number))
+    try:
+        while True:
+            page = await next_page
+            if not page:
+                return
+            page_number += 1
+            next_page = asyncio.create_task(get_page(page_number))
+            yield page
+    finally:
+        # Wait for the prefetch to stop: the page isn't needed anymore,
+        # nor is its error
+        next_page.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await next_page
+
 
 class GitHubPaginatedService:
     async def store_paginated_resource(
         self,
         session: AsyncSession,
         *,
-        paginator: Paginator[types.Issue] | Paginator[types.PullRequestSimple],
-        store_resource_method: Callable[
-            ..., Coroutine[Any, Any, Issue | PullRequest | None]
+        pages: AsyncGenerator[list[types.Issue], None]
+        | AsyncGenerator[list[types.PullRequestSimple], None],
+        store_many_resource_method: Callable[
+            ..., Coroutine[Any, Any, Sequence[Issue] | Sequence[PullRequest]]
         ],
         organization: Organization,
         repository: Repository,
@@ -38,35 +79,49 @@ class GitHubPaginatedService:
         on_sync_signal: Hook[SyncedHook] | None = None,
         on_completed_signal: Hook[SyncCompletedHook] | None = None,
     ) -> tuple[SyncedCount, ErrorCount]:
+        """
+        Store the resources of the pages given by `iterate_pages`, one at a time.
+
+        Each page is upserted in a single statement by `store_many_resource_method`,
+        while the next one is fetched from GitHub.
+        `on_sync_signal` is called once per page, with the last stored record.
+        """
         synced, errors = 0, 0
-        async for data in paginator:
-            synced += 1
+        async for page in cast(
+            AsyncGenerator[list[types.Issue | types.PullRequestSimple], None], pages
+        ):
+            synced += len(page)
 
-            if skip_condition and skip_condition(data):
+            data = [d for d in page if not (skip_condition and skip_condition(d))]
+            if not data:
                 continue
 
-            record = await store_resource_method(
+            records = await store_many_resource_method(
                 session,
                 data=data,
                 organization=organization,
                 repository=repository,
             )
 
-            if not record:
-                log.warning(
-                    f"{resource_type}.sync.failed",
-                    error="save was unsuccessful",
-                    received=data.model_dump(mode="json"),
-                )
-                errors += 1
+            if len(records) < len(data):
+                stored_ids = {record.external_id for record in records}
+                for d in data:
+                    if d.id not in stored_ids:
+                        log.warning(
+                            f"{resource_type}.sync.failed",
+                            error="save was unsuccessful",
+                            received=d.model_dump(mode="json"),
+                        )
+                errors += len(data) - len(records)
+
+            if not records:
                 continue
 
             log.debug(
                 f"{resource_type}.synced",
                 organization_id=organization.id,
                 repository_id=repository.id,
-                id=record.id,
-                title=record.title,
+                count=len(records),
             )
 
             if on_sync_signal:
@@ -74,7 +129,7 @@ class GitHubPaginatedService:
                     SyncedHook(
                         repository=repository,
                         organization=organization,
-                        record=record,
+                        record=records[-1],
                         synced=synced,
                     )
                 )
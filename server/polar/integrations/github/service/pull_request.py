@@ -2,7 +2,7 @@ from collections.abc import Sequence
 from typing import Any, Literal
 
 import structlog
-from githubkit import GitHub, Paginator
+from githubkit import GitHub
 
 from polar.enums import Platforms
 from polar.models import Organization, PullRequest, Repository
@@ -13,7 +13,12 @@ from polar.pull_request.service import PullRequestService, full_pull_request
 
 from .. import client as github
 from .. import types
-from .paginated import ErrorCount, SyncedCount, github_paginated_service
+from .paginated import (
+    ErrorCount,
+    SyncedCount,
+    github_paginated_service,
+    iterate_pages,
+)
 
 log = structlog.get_logger()
 
@@ -178,7 +183,7 @@ class GithubPullRequestService(PullRequestService):
 
         client = github.get_app_installation_client(installation_id)
 
-        paginator: Paginator[types.PullRequestSimple] = client.paginate(
+        pages = iterate_pages(
             client.rest.pulls.async_list,
             owner=organization.name,
             repo=repository.name,
@@ -190,8 +195,8 @@ class GithubPullRequestService(PullRequestService):
 
         synced, errors = await github_paginated_service.store_paginated_resource(
             session,
-            paginator=paginator,
-            store_resource_method=github_pull_request.store_simple,
+            pages=pages,
+            store_many_resource_method=github_pull_request.store_many_simple,
             organization=organization,
             repository=repository,
             resource_type="pull_request",
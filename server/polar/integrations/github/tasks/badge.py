@@ -4,6 +4,7 @@ import httpx
 import structlog
 from arq import Retry
 
+from polar.context import ExecutionContext
 from polar.worker import (
     AsyncSessionMaker,
     JobContext,
@@ -12,6 +13,7 @@ from polar.worker import (
     task,
 )
 
+from ..badge_svg import get_badge_svg_cache, render_issue_badges
 from ..service.issue import github_issue
 from .utils import get_organization_and_repo, github_rate_limit_retry
 
@@ -150,12 +152,19 @@ async def embed_badge_retroactively_on_repository(
                 )
                 return
 
-            for i in await github_issue.list_issues_to_add_badge_to_auto(
+            issues = await github_issue.list_issues_to_add_badge_to_auto(
                 session=session,
                 repository=repository,
                 organization=organization,
+            )
+
+            # Repository-wide updates yield the rate limit budget to webhooks
+            with ExecutionContext(
+                is_during_installation=polar_context.is_during_installation,
+                is_low_priority=True,
             ):
-                await enqueue_job("github.badge.embed_on_issue", i.id)
+                for i in issues:
+                    await enqueue_job("github.badge.embed_on_issue", i.id)
 
 
 @task("github.badge.remove_on_repository")
@@ -176,9 +185,47 @@ async def remove_badges_on_repository(
                 log.warn("github.remove_badges_on_repository.skip_repo_is_private")
                 return
 
-            for i in await github_issue.list_issues_to_remove_badge_from_auto(
+            issues = await github_issue.list_issues_to_remove_badge_from_auto(
                 session=session,
                 repository=repository,
                 organization=organization,
+            )
+
+            # Repository-wide updates yield the rate limit budget to webhooks
+            with ExecutionContext(
+                is_during_installation=polar_context.is_during_installation,
+                is_low_priority=True,
             ):
-                await enqueue_job("github.badge.remove_on_issue", i.id)
+                for i in issues:
+                    await enqueue_job("github.badge.remove_on_issue", i.id)
+
+
+@task("github.badge.render_svg")
+async def render_badge_svg(
+    ctx: JobContext,
+    issue_id: UUID,
+    polar_context: PolarWorkerContext,
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        issue = await github_issue.get(session, issue_id)
+        if not issue or not issue.organization_id or not issue.repository_id:
+            log.warning(
+                "github.badge.render_svg",
+                error="issue not found",
+                issue_id=issue_id,
+            )
+            return
+
+        organization, repository = await get_organization_and_repo(
+            session, issue.organization_id, issue.repository_id
+        )
+        if repository.is_private:
+            return
+
+        await render_issue_badges(
+            session,
+            get_badge_svg_cache(),
+            organization=organization,
+            repository=repository,
+            issue=issue,
+        )
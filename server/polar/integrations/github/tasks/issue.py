@@ -1,23 +1,23 @@
-import random
 from uuid import UUID
 
 import structlog
 
+from polar.exceptions import ResourceNotFound
 from polar.integrations.github import service
-from polar.integrations.github.client import get_app_installation_client
+from polar.integrations.github.client import get_polar_client
+from polar.integrations.github.crawl import CrawlKind, get_crawl_scheduler
+from polar.integrations.github.lookup import get_issue_lookup
 from polar.locker import Locker
-from polar.organization.service import organization as organization_service
 from polar.redis import get_redis
+from polar.user.service import user as user_service
 from polar.worker import (
     AsyncSessionMaker,
     JobContext,
     PolarWorkerContext,
-    enqueue_job,
     interval,
     task,
 )
 
-from ..service.api import github_api
 from ..service.issue import github_issue
 from .utils import get_organization_and_repo, github_rate_limit_retry
 
@@ -124,6 +124,58 @@ async def issue_sync_issue_dependencies(
             )
 
 
+# No result kept: it would prevent the next refresh from being enqueued
+@task("github.issue.recommendations.refresh", keep_result=0)
+@github_rate_limit_retry
+async def issue_recommendations_refresh(
+    ctx: JobContext,
+    user_id: UUID,
+    polar_context: PolarWorkerContext,
+) -> None:
+    with polar_context.to_execution_context():
+        async with AsyncSessionMaker(ctx) as session:
+            user = await user_service.get(session, user_id)
+            if not user:
+                log.warning(
+                    "github.issue.recommendations.refresh",
+                    error="user not found",
+                    user_id=user_id,
+                )
+                return
+
+            await github_issue.refresh_recommendations(
+                session, ctx["sessionmaker"], user
+            )
+
+
+@task("github.issue.lookup.refresh", keep_result=0)
+@github_rate_limit_retry
+async def issue_lookup_refresh(
+    ctx: JobContext,
+    org_name: str,
+    repo_name: str,
+    issue_number: int,
+    polar_context: PolarWorkerContext,
+) -> None:
+    with polar_context.to_execution_context():
+        try:
+            await get_issue_lookup().refresh(
+                ctx["sessionmaker"],
+                get_polar_client(),
+                org_name=org_name,
+                repo_name=repo_name,
+                issue_number=issue_number,
+            )
+        except ResourceNotFound:
+            log.info(
+                "github.issue.lookup.refresh",
+                error="issue not found",
+                org_name=org_name,
+                repo_name=repo_name,
+                issue_number=issue_number,
+            )
+
+
 @interval(
     minute={
         2,
@@ -135,53 +187,9 @@ async def issue_sync_issue_dependencies(
     },
     second=0,
 )
-@github_rate_limit_retry
 async def cron_refresh_issues(ctx: JobContext) -> None:
     async with AsyncSessionMaker(ctx) as session:
-        orgs = await organization_service.list_installed(session)
-        for org in orgs:
-            issues = await github_issue.list_issues_to_crawl_issue(session, org)
-            if len(issues) == 0:
-                log.info(
-                    "github.issue.sync.cron_refresh_issues",
-                    org_name=org.name,
-                    found_count=len(issues),
-                )
-                continue
-
-            client = get_app_installation_client(org.safe_installation_id)
-            try:
-                rate_limit = await github_api.get_rate_limit(client)
-            except Exception as e:
-                log.info(
-                    "failed to get rate limit, treating it as no remaining",
-                    org_name=org.name,
-                    err=e,
-                )
-                continue
-
-            if rate_limit.remaining < 1000:
-                log.info(
-                    "github.issue.sync.cron_refresh_issues.rate_limit_almost_exhausted",
-                    org_name=org.name,
-                    rate_limit_remaining=rate_limit.remaining,
-                )
-                continue
-
-            log.info(
-                "github.issue.sync.cron_refresh_issues",
-                org_name=org.name,
-                found_count=len(issues),
-                rate_limit_remaining=rate_limit.remaining,
-            )
-
-            for issue in issues:
-                await enqueue_job(
-                    "github.issue.sync",
-                    issue.id,
-                    _job_id=f"github.issue.sync:{issue.id}",
-                    _defer_by=random.randint(0, 60 * 5),
-                )
+        await get_crawl_scheduler().schedule(session, CrawlKind.issue)
 
 
 @interval(
@@ -195,51 +203,6 @@ async def cron_refresh_issues(ctx: JobContext) -> None:
     },
     second=0,
 )
-@github_rate_limit_retry
 async def cron_refresh_issue_timelines(ctx: JobContext) -> None:
     async with AsyncSessionMaker(ctx) as session:
-        orgs = await organization_service.list_installed(session)
-        for org in orgs:
-            issues = await github_issue.list_issues_to_crawl_timeline(session, org)
-            if len(issues) == 0:
-                log.info(
-                    "github.issue.sync.cron_refresh_issue_timelines",
-                    org_name=org.name,
-                    found_count=len(issues),
-                )
-                continue
-
-            client = get_app_installation_client(org.safe_installation_id)
-
-            try:
-                rate_limit = await github_api.get_rate_limit(client)
-            except Exception as e:
-                log.info(
-                    "failed to get rate limit, treating it as no remaining",
-                    org_name=org.name,
-                    err=e,
-                )
-                continue
-
-            if rate_limit.remaining < 1000:
-                log.info(
-                    "github.issue.sync.cron_refresh_issue_timelines.rate_limit_almost_exhausted",
-                    org_name=org.name,
-                    rate_limit_remaining=rate_limit.remaining,
-                )
-                continue
-
-            log.info(
-                "github.issue.sync.cron_refresh_issue_timelines",
-                org_name=org.name,
-                found_count=len(issues),
-                rate_limit_remaining=rate_limit.remaining,
-            )
-
-            for issue in issues:
-                await enqueue_job(
-                    "github.issue.sync.issue_references",
-                    issue.id,
-                    _job_id=f"github.issue.sync.issue_references:{issue.id}",
-                    _defer_by=random.randint(0, 60 * 5),
-                )
+        await get_crawl_scheduler().schedule(session, CrawlKind.timeline)
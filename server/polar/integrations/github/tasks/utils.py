@@ -5,9 +5,10 @@ from uuid import UUID
 
 import structlog
 from arq import Retry
-from githubkit.exception import RateLimitExceeded
+from githubkit.exception import RateLimitExceeded, RequestError
 
 from polar.integrations.github import service
+from polar.integrations.github.rate_limit import RateLimitBudgetExhausted
 from polar.models import Organization, Repository
 from polar.postgres import AsyncSession
 
@@ -45,5 +46,12 @@ def github_rate_limit_retry(
             return await func(*args, **kwargs)
         except RateLimitExceeded as e:
             raise Retry(e.retry_after)
+        except RateLimitBudgetExhausted as e:
+            raise Retry(e.retry_after)
+        except RequestError as e:
+            # githubkit wraps errors raised during the request
+            if isinstance(e.__cause__, RateLimitBudgetExhausted):
+                raise Retry(e.__cause__.retry_after) from e
+            raise
 
     return wrapper
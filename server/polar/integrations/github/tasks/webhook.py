@@ -22,6 +22,7 @@ from polar.worker import (
 )
 
 from .. import service, types
+from ..ingestion import get_webhook_ingestion
 from .utils import (
     get_organization_and_repo,
     github_rate_limit_retry,
@@ -576,6 +577,17 @@ async def handle_issue_transferred(
     return new_issue
 
 
+@task("github.webhook.flush_coalesced")
+async def flush_coalesced(
+    ctx: JobContext,
+    issue_key: str,
+    group: str,
+    polar_context: PolarWorkerContext,
+) -> None:
+    with polar_context.to_execution_context():
+        await get_webhook_ingestion().flush(issue_key, group)
+
+
 @task("github.webhook.issues.opened")
 async def issue_opened(
     ctx: JobContext,
@@ -4,6 +4,7 @@ import httpx
 import structlog
 
 from polar.config import settings
+from polar.http_client import get_http_client
 from polar.logging import Logger
 
 log: Logger = structlog.get_logger()
@@ -27,16 +28,20 @@ class Properties(TypedDict, total=False):
     issueBadged: bool
 
 
+BASE_URL = "https://app.loops.so/api/v1"
+
+
 class LoopsClient:
     def __init__(self, api_key: str | None) -> None:
-        self.client = httpx.AsyncClient(
-            base_url="https://app.loops.so/api/v1",
-            headers={"Authorization": f"Bearer {api_key}"},
-            # Set a MockTransport if API key is None
-            # Basically, we disable Loops request.
-            transport=httpx.MockTransport(lambda _: httpx.Response(200))
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        # Set a MockTransport if API key is None
+        # Basically, we disable Loops request.
+        self._client = (
+            httpx.AsyncClient(
+                transport=httpx.MockTransport(lambda _: httpx.Response(200))
+            )
             if api_key is None
-            else None,
+            else None
         )
 
     async def update_contact(
@@ -44,8 +49,10 @@ class LoopsClient:
     ) -> None:
         log.debug("update contact on Loops", email=email, id=id, **properties)
 
-        response = await self.client.post(
-            "/contacts/update", json={"email": email, "userId": id, **properties}
+        response = await self._get_client().post(
+            f"{BASE_URL}/contacts/update",
+            json={"email": email, "userId": id, **properties},
+            headers=self.headers,
         )
         self._handle_response(response)
 
@@ -56,11 +63,18 @@ class LoopsClient:
             "send event to Loops", email=email, event_name=event_name, **properties
         )
 
-        response = await self.client.post(
-            "/events/send", json={"email": email, "eventName": event_name, **properties}
+        response = await self._get_client().post(
+            f"{BASE_URL}/events/send",
+            json={"email": email, "eventName": event_name, **properties},
+            headers=self.headers,
         )
         self._handle_response(response)
 
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is not None:
+            return self._client
+        return get_http_client(BASE_URL)
+
     def _handle_response(self, response: httpx.Response) -> httpx.Response:
         response.raise_for_status()
         return response
@@ -1,11 +1,10 @@
-import contextlib
 import dataclasses
-from collections.abc import AsyncGenerator
 
 import httpx
 
 from polar.config import settings
 from polar.exceptions import PolarError
+from polar.http_client import get_http_client
 
 
 @dataclasses.dataclass
@@ -42,6 +41,8 @@ class CollectiveNotFoundError(OpenCollectiveServiceError):
 
 
 class OpenCollectiveService:
+    graphql_url = "https://api.opencollective.com/graphql/v2/"
+
     def __init__(self, personal_token: str | None = None) -> None:
         self.personal_token = personal_token
 
@@ -49,54 +50,50 @@ class OpenCollectiveService:
         return f"https://opencollective.com/{slug}"
 
     async def get_collective(self, slug: str) -> OpenCollectiveCollective:
-        async with self._get_graphql_client() as client:
-            query = """
-                query GetCollective($slug: String!) {
-                    collective(slug: $slug) {
+        query = """
+            query GetCollective($slug: String!) {
+                collective(slug: $slug) {
+                    slug
+                    host {
                         slug
-                        host {
-                            slug
-                        }
-                        isActive
-                        isApproved
-                        isArchived
-                        isFrozen
                     }
+                    isActive
+                    isApproved
+                    isArchived
+                    isFrozen
                 }
-            """
-
-            response = await client.post(
-                "/",
-                json={
-                    "query": query,
-                    "operationName": "GetCollective",
-                    "variables": {"slug": slug},
-                },
-            )
+            }
+        """
+
+        response = await get_http_client(self.graphql_url).post(
+            self.graphql_url,
+            headers=self._get_headers(),
+            json={
+                "query": query,
+                "operationName": "GetCollective",
+                "variables": {"slug": slug},
+            },
+        )
 
-            try:
-                response.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                raise OpenCollectiveAPIError(str(e)) from e
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise OpenCollectiveAPIError(str(e)) from e
 
-            json = response.json()
+        json = response.json()
 
-            if "errors" in json:
-                raise CollectiveNotFoundError(slug)
+        if "errors" in json:
+            raise CollectiveNotFoundError(slug)
 
-            collective = json["data"]["collective"]
-            host = collective.pop("host")
-            return OpenCollectiveCollective(**collective, host_slug=host["slug"])
+        collective = json["data"]["collective"]
+        host = collective.pop("host")
+        return OpenCollectiveCollective(**collective, host_slug=host["slug"])
 
-    @contextlib.asynccontextmanager
-    async def _get_graphql_client(self) -> AsyncGenerator[httpx.AsyncClient, None]:
+    def _get_headers(self) -> dict[str, str]:
         headers = {}
         if self.personal_token is not None:
             headers["Personal-Token"] = self.personal_token
-        async with httpx.AsyncClient(
-            base_url="https://api.opencollective.com/graphql/v2", headers=headers
-        ) as client:
-            yield client
+        return headers
 
 
 open_collective = OpenCollectiveService(settings.OPEN_COLLECTIVE_PERSONAL_TOKEN)
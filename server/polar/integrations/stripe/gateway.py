@@ -0,0 +1,125 @@
+import asyncio
+import dataclasses
+import functools
+import time
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import structlog
+
+from polar.config import settings
+from polar.logging import Logger
+
+if TYPE_CHECKING:
+    from stripe.api_resources.list_object import ListObject
+    from stripe.stripe_object import StripeObject
+
+log: Logger = structlog.get_logger()
+
+ReturnValue = TypeVar("ReturnValue")
+Item = TypeVar("Item", bound="StripeObject")
+
+
+@dataclasses.dataclass
+class StripeEndpointStats:
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+
+class StripeGateway:
+    """
+    Run the calls of the Stripe library, which is synchronous,
+    in a dedicated pool of threads, so they don't block the event loop.
+
+    The threads are kept alive, and so is the HTTP session to Stripe
+    each of them holds. Network errors, conflicts and server errors are retried
+    by the library, with the same idempotency key. The latency of the calls
+    is tracked by endpoint.
+    """
+
+    def __init__(self, *, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self.stats: dict[str, StripeEndpointStats] = {}
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def call(
+        self,
+        function: Callable[..., ReturnValue],
+        *args: Any,
+        **kwargs: Any,
+    ) -> ReturnValue:
+        endpoint = _get_endpoint(function)
+        stats = self.stats.setdefault(endpoint, StripeEndpointStats())
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), functools.partial(function, *args, **kwargs)
+            )
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stats.count += 1
+            stats.total_seconds += duration
+            stats.max_seconds = max(stats.max_seconds, duration)
+            log.debug("stripe.request", endpoint=endpoint, duration=duration)
+
+    async def stream(
+        self, function: Callable[..., "ListObject[Item]"], **params: Any
+    ) -> AsyncIterator[Item]:
+        """
+        Iterate over all the objects of a list endpoint,
+        fetching the pages as they're consumed.
+        """
+        while True:
+            page = await self.call(function, **params)
+            for item in page.data:
+                yield item
+            if not page.has_more or not page.data:
+                return
+            params["starting_after"] = page.data[-1]["id"]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="stripe"
+            )
+        return self._executor
+
+
+stripe_gateway = StripeGateway(max_workers=settings.STRIPE_GATEWAY_MAX_WORKERS)
+
+
+def close_stripe_gateway() -> None:
+    stripe_gateway.close()
+
+
+def _get_endpoint(function: Callable[..., Any]) -> str:
+    # Resources methods are inherited from mixins, name them after the resource
+    owner = getattr(function, "__self__", None)
+    if isinstance(owner, type):
+        return f"{owner.__name__}.{function.__name__}"
+    return getattr(function, "__qualname__", repr(function))
+
+
+__all__ = [
+    "StripeGateway",
+    "StripeEndpointStats",
+    "stripe_gateway",
+    "close_stripe_gateway",
+]
@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from stripe.http_client import HTTPClient
+
+# Recorded responses, keyed by `METHOD /path?sorted-query`
+StripeFixtures = dict[str, dict[str, Any]]
+
+
+def get_fixture_key(method: str, url: str, *, with_query: bool = True) -> str:
+    parsed = urlsplit(url)
+    key = f"{method.upper()} {parsed.path}"
+    if with_query and parsed.query:
+        key += f"?{urlencode(sorted(parse_qsl(parsed.query)))}"
+    return key
+
+
+def load_fixtures(path: Path) -> StripeFixtures:
+    with path.open() as f:
+        return json.load(f)
+
+
+def dump_fixtures(fixtures: StripeFixtures, path: Path) -> None:
+    with path.open("w") as f:
+        json.dump(fixtures, f, indent=2, sort_keys=True)
+
+
+class ReplayHTTPClient(HTTPClient):
+    """
+    Stand-in for the Stripe API, answering with recorded responses.
+
+    Set it as `stripe.default_http_client` to run the Stripe calls offline,
+    e.g. to benchmark the jobs calling Stripe.
+    A request is matched on its method, path and query; then on its method
+    and path only, so creations are answered whatever their body.
+    `latency` is slept on each request, to simulate the network.
+    """
+
+    name = "replay"
+
+    def __init__(self, fixtures: StripeFixtures, *, latency: float = 0.0) -> None:
+        super().__init__()
+        self.fixtures = fixtures
+        self.latency = latency
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        post_data: Any = None,
+    ) -> tuple[str, int, dict[str, str]]:
+        if self.latency:
+            time.sleep(self.latency)
+
+        fixture = self.fixtures.get(get_fixture_key(method, url))
+        if fixture is None:
+            fixture = self.fixtures.get(get_fixture_key(method, url, with_query=False))
+        if fixture is None:
+            return (
+                json.dumps(
+                    {
+                        "error": {
+                            "type": "invalid_request_error",
+                            "message": (
+                                f"No recorded response for {method.upper()} {url}"
+                            ),
+                        }
+                    }
+                ),
+                404,
+                {},
+            )
+
+        return json.dumps(fixture["body"]), fixture["status"], {}
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingHTTPClient(HTTPClient):
+    """
+    Forward the requests to another client, recording the responses
+    so they can be replayed by `ReplayHTTPClient`.
+    """
+
+    name = "recording"
+
+    def __init__(self, client: HTTPClient) -> None:
+        super().__init__()
+        self.client = client
+        self.fixtures: StripeFixtures = {}
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        post_data: Any = None,
+    ) -> tuple[str, int, dict[str, str]]:
+        content, status, response_headers = self.client.request(
+            method, url, headers, post_data
+        )
+        with self._lock:
+            self.fixtures[get_fixture_key(method, url)] = {
+                "status": status,
+                "body": json.loads(content),
+            }
+        return content, status, response_headers
+
+    def close(self) -> None:
+        self.client.close()
+
+
+__all__ = [
+    "StripeFixtures",
+    "ReplayHTTPClient",
+    "RecordingHTTPClient",
+    "load_fixtures",
+    "dump_fixtures",
+]
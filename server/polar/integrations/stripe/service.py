@@ -1,6 +1,7 @@
+import asyncio
 import uuid
-from collections.abc import Callable
-from typing import TYPE_CHECKING, Literal, TypedDict, Unpack, cast
+from collections.abc import AsyncIterator
+from typing import Literal, TypedDict, Unpack, cast
 from uuid import UUID
 
 import stripe as stripe_lib
@@ -9,6 +10,7 @@ from stripe import error as stripe_lib_error
 from polar.account.schemas import AccountCreate
 from polar.config import settings
 from polar.exceptions import PolarError
+from polar.integrations.stripe.gateway import StripeGateway, stripe_gateway
 from polar.integrations.stripe.schemas import (
     PledgePaymentIntentMetadata,
     ProductType,
@@ -20,11 +22,11 @@ from polar.models.repository import Repository
 from polar.models.user import User
 from polar.postgres import AsyncSession, sql
 
-if TYPE_CHECKING:
-    from stripe.api_resources.list_object import ListObject, T
-    from stripe.request_options import RequestOptions
-
 stripe_lib.api_key = settings.STRIPE_SECRET_KEY
+stripe_lib.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+stripe_lib.default_http_client = stripe_lib.http_client.RequestsClient(
+    timeout=settings.STRIPE_TIMEOUT_SECONDS
+)
 
 StripeError = stripe_lib_error.StripeError
 
@@ -42,7 +44,10 @@ class MissingOrganizationBillingEmail(PolarError):
 
 
 class StripeService:
-    def create_anonymous_intent(
+    def __init__(self, gateway: StripeGateway) -> None:
+        self.gateway = gateway
+
+    async def create_anonymous_intent(
         self,
         amount: int,
         transfer_group: str,
@@ -57,7 +62,8 @@ class StripeService:
             anonymous=True,
             anonymous_email=anonymous_email,
         )
-        return stripe_lib.PaymentIntent.create(
+        return await self.gateway.call(
+            stripe_lib.PaymentIntent.create,
             amount=amount,
             currency="USD",
             transfer_group=transfer_group,
@@ -92,7 +98,8 @@ class StripeService:
         if on_behalf_of_organization_id:
             metadata.on_behalf_of_organization_id = on_behalf_of_organization_id
 
-        return stripe_lib.PaymentIntent.create(
+        return await self.gateway.call(
+            stripe_lib.PaymentIntent.create,
             amount=amount,
             currency="USD",
             transfer_group=transfer_group,
@@ -102,7 +109,7 @@ class StripeService:
             description=f"Pledge to {pledge_issue_org.name}/{pledge_issue_repo.name}#{pledge_issue.number}",  # noqa: E501
         )
 
-    def create_organization_intent(
+    async def create_organization_intent(
         self,
         amount: int,
         transfer_group: str,
@@ -120,7 +127,8 @@ class StripeService:
             organization_name=organization.name,
         )
 
-        return stripe_lib.PaymentIntent.create(
+        return await self.gateway.call(
+            stripe_lib.PaymentIntent.create,
             amount=amount,
             currency="USD",
             transfer_group=transfer_group,
@@ -128,7 +136,7 @@ class StripeService:
             receipt_email=user.email,
         )
 
-    def modify_intent(
+    async def modify_intent(
         self,
         id: str,
         amount: int,
@@ -142,7 +150,8 @@ class StripeService:
             else "",  # Set to empty string to unset the value on Stripe.
         )
 
-        return stripe_lib.PaymentIntent.modify(
+        return await self.gateway.call(
+            stripe_lib.PaymentIntent.modify,
             id,
             amount=amount,
             receipt_email=receipt_email,
@@ -150,10 +159,10 @@ class StripeService:
             metadata=metadata.model_dump(exclude_none=True),
         )
 
-    def retrieve_intent(self, id: str) -> stripe_lib.PaymentIntent:
-        return stripe_lib.PaymentIntent.retrieve(id)
+    async def retrieve_intent(self, id: str) -> stripe_lib.PaymentIntent:
+        return await self.gateway.call(stripe_lib.PaymentIntent.retrieve, id)
 
-    def create_account(
+    async def create_account(
         self, account: AccountCreate, name: str | None
     ) -> stripe_lib.Account:
         create_params: stripe_lib.Account.CreateParams = {
@@ -167,51 +176,55 @@ class StripeService:
 
         if account.country != "US":
             create_params["tos_acceptance"] = {"service_agreement": "recipient"}
-        return stripe_lib.Account.create(**create_params)
+        return await self.gateway.call(stripe_lib.Account.create, **create_params)
 
-    def update_account(self, id: str, name: str | None) -> None:
+    async def update_account(self, id: str, name: str | None) -> None:
         obj = {}
         if name:
             obj["business_profile"] = {"name": name}
-        stripe_lib.Account.modify(id, **obj)
+        await self.gateway.call(stripe_lib.Account.modify, id, **obj)
 
-    def retrieve_account(self, id: str) -> stripe_lib.Account:
-        return stripe_lib.Account.retrieve(id)
+    async def retrieve_account(self, id: str) -> stripe_lib.Account:
+        return await self.gateway.call(stripe_lib.Account.retrieve, id)
 
-    def retrieve_balance(self, id: str) -> tuple[str, int]:
+    async def retrieve_balance(self, id: str) -> tuple[str, int]:
         # Return available balance in the account's default currency (we assume that
         # there is no balance in other currencies for now)
-        account = stripe_lib.Account.retrieve(id)
-        balance = stripe_lib.Balance.retrieve(stripe_account=id)
+        account, balance = await asyncio.gather(
+            self.gateway.call(stripe_lib.Account.retrieve, id),
+            self.gateway.call(stripe_lib.Balance.retrieve, stripe_account=id),
+        )
         for b in balance.available:
             if b.currency == account.default_currency:
                 return (b.currency, b.amount)
         return (cast(str, account.default_currency), 0)
 
-    def create_account_link(
+    async def create_account_link(
         self, stripe_id: str, return_path: str
     ) -> stripe_lib.AccountLink:
         refresh_url = settings.generate_external_url(
             f"/integrations/stripe/refresh?return_path={return_path}"
         )
         return_url = settings.generate_frontend_url(return_path)
-        return stripe_lib.AccountLink.create(
+        return await self.gateway.call(
+            stripe_lib.AccountLink.create,
             account=stripe_id,
             refresh_url=refresh_url,
             return_url=return_url,
             type="account_onboarding",
         )
 
-    def create_login_link(self, stripe_id: str) -> stripe_lib.LoginLink:
-        return stripe_lib.Account.create_login_link(stripe_id)
+    async def create_login_link(self, stripe_id: str) -> stripe_lib.LoginLink:
+        return await self.gateway.call(stripe_lib.Account.create_login_link, stripe_id)
 
-    def transfer(
+    async def transfer(
         self,
         destination_stripe_id: str,
         amount: int,
         *,
         source_transaction: str | None = None,
         metadata: dict[str, str] | None = None,
+        idempotency_key: str | None = None,
     ) -> stripe_lib.Transfer:
         create_params: stripe_lib.Transfer.CreateParams = {
             "amount": amount,
@@ -221,23 +234,33 @@ class StripeService:
         }
         if source_transaction is not None:
             create_params["source_transaction"] = source_transaction
-        return stripe_lib.Transfer.create(**create_params)
+        return await self.gateway.call(
+            stripe_lib.Transfer.create,
+            idempotency_key=idempotency_key,
+            **create_params,
+        )
 
-    def reverse_transfer(
+    async def reverse_transfer(
         self,
         transfer_id: str,
         amount: int,
         *,
         metadata: dict[str, str] | None = None,
+        idempotency_key: str | None = None,
     ) -> stripe_lib.Reversal:
         create_params: stripe_lib.Transfer.CreateReversalParams = {
             "amount": amount,
             "metadata": metadata or {},
         }
-        return stripe_lib.Transfer.create_reversal(transfer_id, **create_params)
+        return await self.gateway.call(
+            stripe_lib.Transfer.create_reversal,
+            transfer_id,
+            idempotency_key=idempotency_key,
+            **create_params,
+        )
 
-    def get_customer(self, customer_id: str) -> stripe_lib.Customer:
-        return stripe_lib.Customer.retrieve(customer_id)
+    async def get_customer(self, customer_id: str) -> stripe_lib.Customer:
+        return await self.gateway.call(stripe_lib.Customer.retrieve, customer_id)
 
     async def get_or_create_user_customer(
         self,
@@ -245,9 +268,10 @@ class StripeService:
         user: User,
     ) -> stripe_lib.Customer | None:
         if user.stripe_customer_id:
-            return self.get_customer(user.stripe_customer_id)
+            return await self.get_customer(user.stripe_customer_id)
 
-        customer = stripe_lib.Customer.create(
+        customer = await self.gateway.call(
+            stripe_lib.Customer.create,
             name=user.username,
             email=user.email,
             metadata={
@@ -274,12 +298,13 @@ class StripeService:
         self, session: AsyncSession, org: Organization
     ) -> stripe_lib.Customer | None:
         if org.stripe_customer_id:
-            return self.get_customer(org.stripe_customer_id)
+            return await self.get_customer(org.stripe_customer_id)
 
         if org.billing_email is None:
             raise MissingOrganizationBillingEmail(org.id)
 
-        customer = stripe_lib.Customer.create(
+        customer = await self.gateway.call(
+            stripe_lib.Customer.create,
             name=org.name,
             email=org.billing_email,
             metadata={
@@ -310,15 +335,16 @@ class StripeService:
         if not customer:
             return []
 
-        payment_methods = stripe_lib.PaymentMethod.list(
+        payment_methods = await self.gateway.call(
+            stripe_lib.PaymentMethod.list,
             customer=customer.id,
             type="card",
         )
 
         return payment_methods.data
 
-    def detach_payment_method(self, id: str) -> stripe_lib.PaymentMethod:
-        return stripe_lib.PaymentMethod.detach(id)
+    async def detach_payment_method(self, id: str) -> stripe_lib.PaymentMethod:
+        return await self.gateway.call(stripe_lib.PaymentMethod.detach, id)
 
     async def create_user_pledge_invoice(
         self,
@@ -335,12 +361,13 @@ class StripeService:
 
         # Sync user email
         if not customer.email or customer.email != user.email:
-            stripe_lib.Customer.modify(
+            await self.gateway.call(
+                stripe_lib.Customer.modify,
                 customer.id,
                 email=user.email,
             )
 
-        return self.create_pledge_invoice(
+        return await self.create_pledge_invoice(
             customer,
             pledge,
             pledge_issue,
@@ -366,12 +393,13 @@ class StripeService:
 
         # Sync billing email
         if not customer.email or customer.email != organization.billing_email:
-            stripe_lib.Customer.modify(
+            await self.gateway.call(
+                stripe_lib.Customer.modify,
                 customer.id,
                 email=organization.billing_email,
             )
 
-        return self.create_pledge_invoice(
+        return await self.create_pledge_invoice(
             customer,
             pledge,
             pledge_issue,
@@ -379,7 +407,7 @@ class StripeService:
             pledge_issue_org,
         )
 
-    def create_pledge_invoice(
+    async def create_pledge_invoice(
         self,
         customer: stripe_lib.Customer,
         pledge: Pledge,
@@ -388,7 +416,8 @@ class StripeService:
         pledge_issue_org: Organization,
     ) -> stripe_lib.Invoice | None:
         # Create an invoice, then add line items to it
-        invoice = stripe_lib.Invoice.create(
+        invoice = await self.gateway.call(
+            stripe_lib.Invoice.create,
             customer=customer.id,
             description=f"""You pledged to {pledge_issue_org.name}/{pledge_issue_repo.name}#{pledge_issue.number} on {pledge.created_at.strftime('%Y-%m-%d')}, which has now been fixed!
 
@@ -407,7 +436,8 @@ Thank you for your support!
 
         assert invoice.id is not None
 
-        stripe_lib.InvoiceItem.create(
+        await self.gateway.call(
+            stripe_lib.InvoiceItem.create,
             invoice=invoice.id,
             customer=customer.id,
             amount=pledge.amount_including_fee,
@@ -418,9 +448,13 @@ Thank you for your support!
             },
         )
 
-        stripe_lib.Invoice.finalize_invoice(invoice.id, auto_advance=True)
+        await self.gateway.call(
+            stripe_lib.Invoice.finalize_invoice, invoice.id, auto_advance=True
+        )
 
-        sent_invoice = stripe_lib.Invoice.send_invoice(invoice.id)
+        sent_invoice = await self.gateway.call(
+            stripe_lib.Invoice.send_invoice, invoice.id
+        )
 
         return sent_invoice
 
@@ -433,7 +467,8 @@ Thank you for your support!
         if not customer:
             return None
 
-        return stripe_lib.billing_portal.Session.create(
+        return await self.gateway.call(
+            stripe_lib.billing_portal.Session.create,
             customer=customer.id,
             return_url=f"{settings.FRONTEND_BASE_URL}/settings",
         )
@@ -447,12 +482,13 @@ Thank you for your support!
         if not customer:
             return None
 
-        return stripe_lib.billing_portal.Session.create(
+        return await self.gateway.call(
+            stripe_lib.billing_portal.Session.create,
             customer=customer.id,
             return_url=f"{settings.FRONTEND_BASE_URL}/team/{org.name}/settings",
         )
 
-    def create_product_with_price(
+    async def create_product_with_price(
         self,
         name: str,
         *,
@@ -472,9 +508,9 @@ Thank you for your support!
         }
         if description is not None:
             create_params["description"] = description
-        return stripe_lib.Product.create(**create_params)
+        return await self.gateway.call(stripe_lib.Product.create, **create_params)
 
-    def create_price_for_product(
+    async def create_price_for_product(
         self,
         product: str,
         price_amount: int,
@@ -482,28 +518,31 @@ Thank you for your support!
         *,
         set_default: bool = False,
     ) -> stripe_lib.Price:
-        price = stripe_lib.Price.create(
+        price = await self.gateway.call(
+            stripe_lib.Price.create,
             currency=price_currency,
             product=product,
             unit_amount=price_amount,
             recurring={"interval": "month"},
         )
         if set_default:
-            stripe_lib.Product.modify(product, default_price=price.id)
+            await self.gateway.call(
+                stripe_lib.Product.modify, product, default_price=price.id
+            )
         return price
 
-    def update_product(
+    async def update_product(
         self, product: str, **kwargs: Unpack[ProductUpdateKwargs]
     ) -> stripe_lib.Product:
-        return stripe_lib.Product.modify(product, **kwargs)
+        return await self.gateway.call(stripe_lib.Product.modify, product, **kwargs)
 
-    def archive_product(self, id: str) -> stripe_lib.Product:
-        return stripe_lib.Product.modify(id, active=False)
+    async def archive_product(self, id: str) -> stripe_lib.Product:
+        return await self.gateway.call(stripe_lib.Product.modify, id, active=False)
 
-    def archive_price(self, id: str) -> stripe_lib.Price:
-        return stripe_lib.Price.modify(id, active=False)
+    async def archive_price(self, id: str) -> stripe_lib.Price:
+        return await self.gateway.call(stripe_lib.Price.modify, id, active=False)
 
-    def create_subscription_checkout_session(
+    async def create_subscription_checkout_session(
         self,
         price: str,
         success_url: str,
@@ -535,18 +574,22 @@ Thank you for your support!
             create_params["customer_email"] = customer_email
         if subscription_metadata is not None:
             create_params["subscription_data"] = {"metadata": subscription_metadata}
-        return stripe_lib.checkout.Session.create(**create_params)
+        return await self.gateway.call(
+            stripe_lib.checkout.Session.create, **create_params
+        )
 
-    def get_checkout_session(self, id: str) -> stripe_lib.checkout.Session:
-        return stripe_lib.checkout.Session.retrieve(id)
+    async def get_checkout_session(self, id: str) -> stripe_lib.checkout.Session:
+        return await self.gateway.call(stripe_lib.checkout.Session.retrieve, id)
 
-    def get_subscription(self, id: str) -> stripe_lib.Subscription:
-        return stripe_lib.Subscription.retrieve(id, expand=["latest_invoice"])
+    async def get_subscription(self, id: str) -> stripe_lib.Subscription:
+        return await self.gateway.call(
+            stripe_lib.Subscription.retrieve, id, expand=["latest_invoice"]
+        )
 
-    def update_subscription_price(
+    async def update_subscription_price(
         self, id: str, *, old_price: str, new_price: str
     ) -> stripe_lib.Subscription:
-        subscription = stripe_lib.Subscription.retrieve(id)
+        subscription = await self.gateway.call(stripe_lib.Subscription.retrieve, id)
 
         old_items = subscription["items"]
         new_items: list[stripe_lib.Subscription.ModifyParamsItem] = []
@@ -555,22 +598,27 @@ Thank you for your support!
                 new_items.append({"id": item.id, "deleted": True})
         new_items.append({"price": new_price, "quantity": 1})
 
-        return stripe_lib.Subscription.modify(id, items=new_items)
+        return await self.gateway.call(
+            stripe_lib.Subscription.modify, id, items=new_items
+        )
 
-    def cancel_subscription(self, id: str) -> stripe_lib.Subscription:
-        return stripe_lib.Subscription.modify(
+    async def cancel_subscription(self, id: str) -> stripe_lib.Subscription:
+        return await self.gateway.call(
+            stripe_lib.Subscription.modify,
             id,
             cancel_at_period_end=True,
         )
 
-    def update_invoice(
+    async def update_invoice(
         self, id: str, *, metadata: dict[str, str] | None = None
     ) -> stripe_lib.Invoice:
-        return stripe_lib.Invoice.modify(id, metadata=metadata or {})
+        return await self.gateway.call(
+            stripe_lib.Invoice.modify, id, metadata=metadata or {}
+        )
 
-    def get_customer_credit_balance(self, customer_id: str) -> int:
-        transactions = stripe_lib.Customer.list_balance_transactions(
-            customer_id, limit=1
+    async def get_customer_credit_balance(self, customer_id: str) -> int:
+        transactions = await self.gateway.call(
+            stripe_lib.Customer.list_balance_transactions, customer_id, limit=1
         )
 
         for transaction in transactions:
@@ -587,8 +635,8 @@ Thank you for your support!
         if not customer:
             return 0
 
-        transactions = stripe_lib.Customer.list_balance_transactions(
-            customer.id, limit=1
+        transactions = await self.gateway.call(
+            stripe_lib.Customer.list_balance_transactions, customer.id, limit=1
         )
 
         for transaction in transactions:
@@ -596,11 +644,13 @@ Thank you for your support!
 
         return 0
 
-    def get_balance_transaction(self, id: str) -> stripe_lib.BalanceTransaction:
-        return stripe_lib.BalanceTransaction.retrieve(id)
+    async def get_balance_transaction(self, id: str) -> stripe_lib.BalanceTransaction:
+        return await self.gateway.call(stripe_lib.BalanceTransaction.retrieve, id)
 
-    def get_invoice(self, id: str) -> stripe_lib.Invoice:
-        return stripe_lib.Invoice.retrieve(id, expand=["total_tax_amounts.tax_rate"])
+    async def get_invoice(self, id: str) -> stripe_lib.Invoice:
+        return await self.gateway.call(
+            stripe_lib.Invoice.retrieve, id, expand=["total_tax_amounts.tax_rate"]
+        )
 
     def list_balance_transactions(
         self,
@@ -608,7 +658,7 @@ Thank you for your support!
         account_id: str | None = None,
         payout: str | None = None,
         type: str | None = None,
-    ) -> list[stripe_lib.BalanceTransaction]:
+    ) -> AsyncIterator[stripe_lib.BalanceTransaction]:
         params: stripe_lib.BalanceTransaction.ListParams = {
             "limit": 100,
             "stripe_account": account_id,
@@ -619,54 +669,46 @@ Thank you for your support!
         if type is not None:
             params["type"] = type
 
-        return self._list_all(stripe_lib.BalanceTransaction.list, params)
+        return self.gateway.stream(stripe_lib.BalanceTransaction.list, **params)
 
     def list_refunds(
         self,
         *,
         charge: str | None = None,
-    ) -> list[stripe_lib.Refund]:
+    ) -> AsyncIterator[stripe_lib.Refund]:
         params: stripe_lib.Refund.ListParams = {"limit": 100}
         if charge is not None:
             params["charge"] = charge  # type: ignore
 
-        return self._list_all(stripe_lib.Refund.list, params)
+        return self.gateway.stream(stripe_lib.Refund.list, **params)
 
-    def get_charge(
+    async def get_charge(
         self,
         id: str,
         *,
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Charge:
-        return stripe_lib.Charge.retrieve(
-            id, stripe_account=stripe_account, expand=expand or []
+        return await self.gateway.call(
+            stripe_lib.Charge.retrieve,
+            id,
+            stripe_account=stripe_account,
+            expand=expand or [],
         )
 
-    def get_refund(
+    async def get_refund(
         self,
         id: str,
         *,
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Refund:
-        return stripe_lib.Refund.retrieve(
-            id, stripe_account=stripe_account, expand=expand or []
+        return await self.gateway.call(
+            stripe_lib.Refund.retrieve,
+            id,
+            stripe_account=stripe_account,
+            expand=expand or [],
         )
 
-    def _list_all(
-        self, method: Callable[..., "ListObject[T]"], params: "RequestOptions"
-    ) -> list["T"]:
-        results: list["T"] = []
-        has_more = True
-        while has_more:
-            page = method(**params)
-            results += page.data
-            has_more = page.has_more
-            if has_more:
-                params["starting_after"] = page.data[-1].id  # type: ignore
-
-        return results
-
 
-stripe = StripeService()
+stripe = StripeService(stripe_gateway)
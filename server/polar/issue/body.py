@@ -1,59 +1,208 @@
-from typing import Any
+import asyncio
+import hashlib
+from collections.abc import Sequence
+from typing import Any, cast
+from uuid import UUID
 
 import structlog
 from githubkit import GitHub
+from githubkit.exception import GitHubException
 
-from polar.enums import Platforms
+from polar.config import settings
 from polar.integrations.github.badge import PLEDGE_BADGE_COMMENT_START
 from polar.integrations.github.client import (
     get_app_installation_client,
     get_polar_client,
 )
+from polar.integrations.github.rate_limit import RateLimitBudgetExhausted
+from polar.kit.markdown import render_markdown
+from polar.kit.utils import utc_now
 from polar.logging import Logger
-from polar.models import Issue, Organization, Repository
+from polar.models import Issue, IssueRenderedBody, Organization, Repository
+from polar.models.issue_rendered_body import RendererType
 from polar.models.organization import NotInstalledOrganization
+from polar.postgres import AsyncSession, sql
 from polar.redis import Redis
 from polar.redis import redis as redis_client
+from polar.worker import enqueue_job
+
+from .service import issue as issue_service
 
 log: Logger = structlog.get_logger()
 
-_CACHE_TTL_SECONDS = 3600 * 24 * 30  # 30 days
+_PENDING_KEY = "issue:body:render:pending"
 
 
 class IssueBodyRenderer:
+    """
+    Render the Markdown bodies of the issues to HTML.
+
+    Bodies are rendered by GitHub in background batches, when issues are
+    upserted, and stored by hash of their content. If GitHub can't be called,
+    they're rendered locally and rendered again by GitHub on the next batch.
+    """
+
     def __init__(self, redis: Redis) -> None:
         self.redis = redis
 
-    async def render(
-        self, issue: Issue, repository: Repository, organization: Organization
-    ) -> str:
-        bounded_logger = log.bind(
-            issue=issue.id, repository=repository.id, organization=organization.id
+    async def get(self, session: AsyncSession, issue: Issue) -> IssueRenderedBody:
+        """
+        Get the rendered body of an issue.
+
+        If it's not rendered yet, or outdated, it's rendered locally
+        and scheduled to be rendered by GitHub.
+        """
+        body = self._preprocess(issue.body)
+        body_hash = self._get_body_hash(body)
+
+        rendered_body = await session.get(IssueRenderedBody, issue.id)
+        if rendered_body is not None and rendered_body.body_hash == body_hash:
+            if rendered_body.renderer == RendererType.local:
+                await self.schedule([issue.id])
+            return rendered_body
+
+        html, renderer = self._render_local(body)
+        if renderer == RendererType.local:
+            await self.schedule([issue.id])
+
+        return IssueRenderedBody(
+            issue_id=issue.id, body_hash=body_hash, html=html, renderer=renderer
         )
-        bounded_logger.debug("render body")
 
-        if issue.body is None:
-            return ""
+    async def schedule(self, issue_ids: Sequence[UUID]) -> None:
+        """
+        Schedule the rendering of the bodies of issues.
+
+        They're collected in Redis, and rendered by a single job
+        after `GITHUB_ISSUE_BODY_RENDER_DELAY_SECONDS`.
+        """
+        if not issue_ids:
+            return
+
+        await self.redis.sadd(_PENDING_KEY, *(str(id) for id in issue_ids))
+        await enqueue_job(
+            "issue.body.render_pending",
+            _job_id="issue.body.render_pending",
+            _defer_by=settings.GITHUB_ISSUE_BODY_RENDER_DELAY_SECONDS,
+        )
 
-        cache_key = f"polar:issue-body-cache:{issue.id}{issue.issue_modified_at}"
-        cached_body = await self.redis.get(cache_key)
-        if cached_body is not None:
-            bounded_logger.debug("cache hit")
-            return cached_body
+    async def render_pending(self, session: AsyncSession) -> int:
+        """
+        Render the bodies of the scheduled issues, by batches.
+
+        Returns:
+            The number of rendered bodies.
+        """
+        count = 0
+        while True:
+            ids = cast(
+                list[str],
+                await self.redis.spop(
+                    _PENDING_KEY, settings.GITHUB_ISSUE_BODY_RENDER_BATCH_SIZE
+                ),
+            )
+            if not ids:
+                break
 
-        body = self._preprocess(issue.body)
+            issues = await issue_service.list_loaded(session, [UUID(id) for id in ids])
+            count += await self.render_many(session, issues)
+            await session.commit()
 
-        if issue.platform == Platforms.github:
-            bounded_logger.debug("render from GitHub API")
-            body = await self._render_github(body, repository, organization)
+        return count
 
-        await self.redis.set(cache_key, body, ex=_CACHE_TTL_SECONDS)
+    async def render_many(self, session: AsyncSession, issues: Sequence[Issue]) -> int:
+        """
+        Render the bodies of issues that changed since they were last rendered,
+        and save them. It doesn't commit.
 
-        return body
+        The issues should be loaded with their repository and organization.
 
-    def _preprocess(self, body: str) -> str:
+        Returns:
+            The number of rendered bodies.
+        """
+        if not issues:
+            return 0
+
+        statement = sql.select(IssueRenderedBody).where(
+            IssueRenderedBody.issue_id.in_([issue.id for issue in issues])
+        )
+        res = await session.execute(statement)
+        rendered_bodies = {
+            rendered_body.issue_id: rendered_body for rendered_body in res.scalars()
+        }
+
+        semaphore = asyncio.Semaphore(settings.GITHUB_ISSUE_BODY_RENDER_CONCURRENCY)
+
+        async def _render(issue: Issue, body: str, body_hash: str) -> dict[str, Any]:
+            async with semaphore:
+                html, renderer = await self._render(issue, body)
+            return {
+                "issue_id": issue.id,
+                "body_hash": body_hash,
+                "html": html,
+                "renderer": renderer,
+            }
+
+        jobs = []
+        for issue in issues:
+            body = self._preprocess(issue.body)
+            body_hash = self._get_body_hash(body)
+            rendered_body = rendered_bodies.get(issue.id)
+            if (
+                rendered_body is not None
+                and rendered_body.body_hash == body_hash
+                and rendered_body.renderer == RendererType.github
+            ):
+                continue
+            jobs.append(_render(issue, body, body_hash))
+
+        if not jobs:
+            return 0
+
+        values = await asyncio.gather(*jobs)
+        insert_stmt = sql.insert(IssueRenderedBody).values(values)
+        await session.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=[IssueRenderedBody.issue_id],
+                set_={
+                    "body_hash": insert_stmt.excluded.body_hash,
+                    "html": insert_stmt.excluded.html,
+                    "renderer": insert_stmt.excluded.renderer,
+                    "modified_at": utc_now(),
+                },
+            )
+        )
+
+        log.debug("issue.body.rendered", count=len(values))
+        return len(values)
+
+    async def _render(self, issue: Issue, body: str) -> tuple[str, RendererType]:
+        if not body.strip():
+            return self._render_local(body)
+
+        repository = issue.repository
+        try:
+            html = await self._render_github(body, repository, repository.organization)
+        except (RateLimitBudgetExhausted, GitHubException) as e:
+            log.info("issue.body.render_github_failed", issue=issue.id, error=str(e))
+            return render_markdown(body), RendererType.local
+
+        return html, RendererType.github
+
+    def _render_local(self, body: str) -> tuple[str, RendererType]:
+        # Nothing to render by GitHub
+        if not body.strip():
+            return "", RendererType.github
+        return render_markdown(body), RendererType.local
+
+    def _preprocess(self, body: str | None) -> str:
+        if body is None:
+            return ""
         return body.split(PLEDGE_BADGE_COMMENT_START)[0]
 
+    def _get_body_hash(self, body: str) -> str:
+        return hashlib.sha256(body.encode()).hexdigest()
+
     async def _render_github(
         self, body: str, repository: Repository, organization: Organization
     ) -> str:
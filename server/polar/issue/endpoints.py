@@ -1,7 +1,7 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import HTMLResponse, Response
 
 from polar.auth.dependencies import Auth, UserRequiredAuth
 from polar.authz.service import AccessType, Authz
@@ -10,11 +10,12 @@ from polar.enums import Platforms
 from polar.exceptions import ResourceNotFound, Unauthorized
 from polar.integrations.github.badge import GithubBadge
 from polar.integrations.github.client import get_polar_client
+from polar.integrations.github.lookup import IssueLookup, get_issue_lookup
 from polar.integrations.github.service.issue import github_issue as github_issue_service
 from polar.integrations.github.service.url import github_url
 from polar.issue.body import IssueBodyRenderer, get_issue_body_renderer
+from polar.kit.http import etag_matches
 from polar.kit.pagination import ListResource, Pagination
-from polar.locker import Locker, get_locker
 from polar.organization.service import organization as organization_service
 from polar.pledge.service import pledge as pledge_service
 from polar.postgres import (
@@ -28,6 +29,7 @@ from polar.tags.api import Tags
 from polar.user_organization.service import (
     user_organization as user_organization_service,
 )
+from polar.worker import enqueue_job
 
 from .schemas import (
     ConfirmIssue,
@@ -120,11 +122,12 @@ async def search(
         have_polar_badge=have_badge,
     )
 
+    can_read_issues = await authz.can_many(auth.subject, AccessType.read, issues)
     return ListResource(
         items=[
             IssueSchema.from_db(i)
-            for i in issues
-            if await authz.can(auth.subject, AccessType.read, i)
+            for i, can_read in zip(issues, can_read_issues)
+            if can_read
         ],
         pagination=Pagination(total_count=count, max_page=1),
     )
@@ -144,7 +147,8 @@ async def lookup(
     authz: Authz = Depends(Authz.authz),
     auth: Auth = Depends(Auth.optional_user),
     session: AsyncSession = Depends(get_db_session),
-    locker: Locker = Depends(get_locker),
+    sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
+    issue_lookup: IssueLookup = Depends(get_issue_lookup),
 ) -> IssueSchema:
     if not external_url:
         raise HTTPException(
@@ -168,25 +172,16 @@ async def lookup(
                 detail="Invalid external_url",
             )
 
-        client = get_polar_client()
-
-        async with locker.lock(
-            f"sync_external_{url.owner}_{url.repo}_{url.number}",
-            timeout=10.0,
-            blocking_timeout=10.0,
-        ):
-            tmp_issue = (
-                await github_issue_service.sync_external_org_with_repo_and_issue(
-                    session,
-                    client=client,
-                    org_name=url.owner,
-                    repo_name=url.repo,
-                    issue_number=url.number,
-                )
-            )
+        issue_id = await issue_lookup.lookup(
+            sessionmaker,
+            get_polar_client(),
+            org_name=url.owner,
+            repo_name=url.repo,
+            issue_number=url.number,
+        )
 
         # get for return
-        issue = await issue_service.get_loaded(session, tmp_issue.id)
+        issue = await issue_service.get_loaded(session, issue_id)
         if not issue:
             raise ResourceNotFound("Issue not found")
 
@@ -204,11 +199,12 @@ async def lookup(
 )
 async def get_body(
     id: UUID,
+    if_none_match: str | None = Header(None),
     authz: Authz = Depends(Authz.authz),
     auth: Auth = Depends(Auth.optional_user),
     session: AsyncSession = Depends(get_db_session),
     issue_body_renderer: IssueBodyRenderer = Depends(get_issue_body_renderer),
-) -> HTMLResponse:
+) -> Response:
     issue = await issue_service.get_loaded(session, id)
     if issue is None:
         raise ResourceNotFound()
@@ -216,11 +212,13 @@ async def get_body(
     if not await authz.can(auth.subject, AccessType.read, issue):
         raise Unauthorized()
 
-    content = await issue_body_renderer.render(
-        issue, issue.repository, issue.repository.organization
-    )
+    rendered_body = await issue_body_renderer.get(session, issue)
+
+    headers = {"ETag": f'"{rendered_body.etag}"', "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, rendered_body.etag):
+        return Response(status_code=304, headers=headers)
 
-    return HTMLResponse(content=content)
+    return HTMLResponse(content=rendered_body.html, headers=headers)
 
 
 @router.get(
@@ -232,57 +230,26 @@ async def for_you(
     auth: UserRequiredAuth,
     session: AsyncSession = Depends(get_db_session),
     sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
-) -> ListResource[IssueSchema]:
+) -> ListResource[IssueSchema] | Response:
+    content = await github_issue_service.get_recommendations_response(auth.user.id)
+    if content is not None:
+        return Response(content=content, media_type="application/json")
+
+    # Issues are already ranked
     issues = await github_issue_service.list_issues_from_starred(
         session, sessionmaker, auth.user
     )
-
-    # get loaded
-    issues = [
-        i for i in [await issue_service.get_loaded(session, i.id) for i in issues] if i
-    ]
     items = [IssueSchema.from_db(i) for i in issues]
-
-    # sort
-    items.sort(
-        key=lambda i: i.reactions.plus_one if i.reactions else 0,
-        reverse=True,
+    resource = ListResource(
+        items=items, pagination=Pagination(total_count=len(items), max_page=1)
     )
 
-    # hacky solution to spread out the repositories in the results
-    def spread(items: list[IssueSchema]) -> list[IssueSchema]:
-        penalties: dict[str, int] = {}
-        res: list[IssueSchema] = []
-
-        while len(items) > 0:
-            # In the next 5 issues, pick the one with the lowest penalty
-            lowest_penalty = 0
-            lowest: IssueSchema | None = None
-            lowest_idx = 0
-
-            for idx, candidate in enumerate(items[0:5]):
-                pen = penalties.get(candidate.repository.name, 0)
-
-                if lowest is None or pen < lowest_penalty:
-                    lowest = candidate
-                    lowest_penalty = pen
-                    lowest_idx = idx
-
-            if lowest is None:
-                break
-
-            # if lowest is not None:
-            penalties[lowest.repository.name] = lowest_penalty + 1
-            res.append(lowest)
-            del items[lowest_idx]
-
-        return res
-
-    items = spread(items)
+    if items:
+        await github_issue_service.set_recommendations_response(
+            auth.user.id, resource.model_dump_json()
+        )
 
-    return ListResource(
-        items=items, pagination=Pagination(total_count=len(items), max_page=1)
-    )
+    return resource
 
 
 @router.get(
@@ -361,6 +328,8 @@ async def update(
 
     if updated:
         await issue.save(session)
+        # Funding goal and split are shown on the badge
+        await enqueue_job("github.badge.render_svg", issue.id)
 
     return IssueSchema.from_db(issue)
 
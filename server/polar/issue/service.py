@@ -31,6 +31,9 @@ from polar.models.organization import Organization
 from polar.models.pledge import Pledge, PledgeState
 from polar.models.repository import Repository
 from polar.models.user import User
+from polar.pledge.summary_service import (
+    issue_pledge_summary as issue_pledge_summary_service,
+)
 from polar.postgres import AsyncSession, sql
 
 from .schemas import IssueCreate, IssueUpdate
@@ -94,6 +97,21 @@ class IssueService(ResourceService[Issue, IssueCreate, IssueUpdate]):
         res = await session.execute(statement)
         return res.scalars().unique().one_or_none()
 
+    async def list_loaded(
+        self, session: AsyncSession, ids: Sequence[UUID]
+    ) -> Sequence[Issue]:
+        statement = (
+            sql.select(Issue)
+            .where(Issue.id.in_(ids))
+            .where(Issue.deleted_at.is_(None))
+            .options(
+                joinedload(Issue.repository),
+                joinedload(Issue.repository).joinedload(Repository.organization),
+            )
+        )
+        res = await session.execute(statement)
+        return res.scalars().unique().all()
+
     async def get_by_platform(
         self, session: AsyncSession, platform: Platforms, external_id: int
     ) -> Issue | None:
@@ -554,6 +572,8 @@ class IssueService(ResourceService[Issue, IssueCreate, IssueUpdate]):
             )
             await session.execute(statement)
 
+        await issue_pledge_summary_service.update(session, [old_issue.id, new_issue.id])
+
         await session.commit()
 
         return new_issue
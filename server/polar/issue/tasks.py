@@ -0,0 +1,20 @@
+import structlog
+
+from polar.context import ExecutionContext
+from polar.logging import Logger
+from polar.worker import AsyncSessionMaker, JobContext, PolarWorkerContext, task
+
+from .body import get_issue_body_renderer
+
+log: Logger = structlog.get_logger()
+
+
+@task("issue.body.render_pending", keep_result=0)
+async def issue_body_render_pending(
+    ctx: JobContext, polar_context: PolarWorkerContext
+) -> None:
+    # Rendering yields the rate limit budget to webhooks
+    with ExecutionContext(is_low_priority=True):
+        async with AsyncSessionMaker(ctx) as session:
+            count = await get_issue_body_renderer().render_pending(session)
+            log.info("issue.body.render_pending", count=count)
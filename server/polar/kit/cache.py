@@ -0,0 +1,45 @@
+import datetime
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """
+    In-process LRU cache, with a TTL per entry.
+
+    It's bounded to `max_entries`: least recently used entries
+    are evicted first.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, ex: datetime.timedelta) -> None:
+        self._entries[key] = (value, time.monotonic() + ex.total_seconds())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+__all__ = ["LocalCache"]
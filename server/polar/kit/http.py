@@ -42,3 +42,16 @@ def add_query_parameters(url: str, **kwargs: str | list[str]) -> str:
             fragment,
         )
     )
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an `If-None-Match` header matches an unquoted ETag.
+    """
+    if if_none_match is None:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip().removeprefix("W/").strip('"')
+        if candidate in {"*", etag}:
+            return True
+    return False
@@ -0,0 +1,163 @@
+"""
+Minimal GitHub Flavored Markdown renderer.
+
+It covers the common subset of GFM: headings, paragraphs, lists, task lists,
+blockquotes, fenced code blocks, horizontal rules, emphasis, inline code,
+strikethrough and links. Raw HTML is escaped, and only HTTP(S) and mailto
+links are kept.
+"""
+
+import html
+import re
+
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})\s*([\w+-]*)")
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$")
+_HR_RE = re.compile(r"^ {0,3}([-*_])(\s*\1){2,}\s*$")
+_BLOCKQUOTE_RE = re.compile(r"^ {0,3}> ?(.*)$")
+_UNORDERED_ITEM_RE = re.compile(r"^ {0,3}[-*+]\s+(.*)$")
+_ORDERED_ITEM_RE = re.compile(r"^ {0,3}\d{1,9}[.)]\s+(.*)$")
+_TASK_RE = re.compile(r"^\[([ xX])\]\s+(.*)$")
+
+_CODE_SPAN_RE = re.compile(r"(`+)(.+?)\1")
+_LINK_RE = re.compile(r"!?\[([^\]]*)\]\(\s*([^)\s]+)\s*\)")
+_AUTOLINK_RE = re.compile(r"(?<![\"'=\w>])(https?://[^\s<]+[^\s<.,:;\"')\]])")
+_STRONG_RE = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+_EM_RE = re.compile(r"(?<![\w*])([*_])(?=\S)(.+?)(?<=\S)\1(?![\w*])")
+_STRIKETHROUGH_RE = re.compile(r"~~(?=\S)(.+?)(?<=\S)~~")
+
+_SAFE_URL_RE = re.compile(r"^(https?://|mailto:)", re.IGNORECASE)
+
+
+def _render_link(match: re.Match[str]) -> str:
+    # The text was escaped already, unescape the URL before escaping it as attribute
+    text, url = match.group(1), html.unescape(match.group(2))
+    if not _SAFE_URL_RE.match(url):
+        return text
+    return f'<a href="{html.escape(url)}">{text}</a>'
+
+
+def _render_autolink(match: re.Match[str]) -> str:
+    url = match.group(1)
+    return f'<a href="{html.escape(html.unescape(url))}">{url}</a>'
+
+
+def _render_inline(text: str) -> str:
+    # Code spans are rendered verbatim: keep them out of the other substitutions
+    code_spans: list[str] = []
+
+    def _stash_code_span(match: re.Match[str]) -> str:
+        code_spans.append(f"<code>{html.escape(match.group(2).strip())}</code>")
+        return f"\x00{len(code_spans) - 1}\x00"
+
+    text = _CODE_SPAN_RE.sub(_stash_code_span, text)
+    text = html.escape(text, quote=False)
+    text = _LINK_RE.sub(_render_link, text)
+    text = _AUTOLINK_RE.sub(_render_autolink, text)
+    text = _STRONG_RE.sub(r"<strong>\2</strong>", text)
+    text = _EM_RE.sub(r"<em>\2</em>", text)
+    text = _STRIKETHROUGH_RE.sub(r"<del>\1</del>", text)
+    return re.sub(r"\x00(\d+)\x00", lambda m: code_spans[int(m.group(1))], text)
+
+
+def _render_list_item(text: str) -> str:
+    task = _TASK_RE.match(text)
+    if task is None:
+        return f"<li>{_render_inline(text)}</li>"
+    checked = " checked" if task.group(1) != " " else ""
+    return (
+        '<li class="task-list-item">'
+        f'<input type="checkbox" disabled{checked}> {_render_inline(task.group(2))}'
+        "</li>"
+    )
+
+
+def render_markdown(text: str) -> str:
+    # NUL characters are used as placeholders when rendering inline elements
+    text = text.replace("\x00", "")
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    blocks: list[str] = []
+    paragraph: list[str] = []
+
+    def _flush_paragraph() -> None:
+        if paragraph:
+            content = "<br>\n".join(_render_inline(line.strip()) for line in paragraph)
+            blocks.append(f"<p>{content}</p>")
+            paragraph.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        fence = _FENCE_RE.match(line)
+        if fence is not None:
+            _flush_paragraph()
+            marker, language = fence.group(1), fence.group(2)
+            code: list[str] = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(marker):
+                code.append(lines[i])
+                i += 1
+            i += 1  # Closing fence
+            language_class = (
+                f' class="language-{html.escape(language)}"' if language else ""
+            )
+            blocks.append(
+                f"<pre><code{language_class}>"
+                f"{html.escape(chr(10).join(code), quote=False)}</code></pre>"
+            )
+            continue
+
+        if not line.strip():
+            _flush_paragraph()
+            i += 1
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading is not None:
+            _flush_paragraph()
+            level = len(heading.group(1))
+            blocks.append(f"<h{level}>{_render_inline(heading.group(2))}</h{level}>")
+            i += 1
+            continue
+
+        if _HR_RE.match(line):
+            _flush_paragraph()
+            blocks.append("<hr>")
+            i += 1
+            continue
+
+        if _BLOCKQUOTE_RE.match(line):
+            _flush_paragraph()
+            quoted: list[str] = []
+            while i < len(lines):
+                quote = _BLOCKQUOTE_RE.match(lines[i])
+                if quote is None:
+                    break
+                quoted.append(quote.group(1))
+                i += 1
+            blocks.append(
+                f"<blockquote>{render_markdown(chr(10).join(quoted))}</blockquote>"
+            )
+            continue
+
+        for item_re, tag in ((_UNORDERED_ITEM_RE, "ul"), (_ORDERED_ITEM_RE, "ol")):
+            if item_re.match(line):
+                _flush_paragraph()
+                items: list[str] = []
+                while i < len(lines):
+                    item = item_re.match(lines[i])
+                    if item is None:
+                        break
+                    items.append(_render_list_item(item.group(1)))
+                    i += 1
+                blocks.append(f"<{tag}>{''.join(items)}</{tag}>")
+                break
+        else:
+            paragraph.append(line)
+            i += 1
+
+    _flush_paragraph()
+    return "\n".join(blocks)
+
+
+__all__ = ["render_markdown"]
@@ -1,13 +1,42 @@
+import base64
+import hashlib
+import json
 import math
+import uuid
 from collections.abc import Sequence
-from typing import Annotated, Any, Generic, NamedTuple, Self, TypeVar, overload
+from datetime import datetime
+from enum import Enum
+from typing import (
+    Annotated,
+    Any,
+    Generic,
+    NamedTuple,
+    Self,
+    TypeVar,
+    cast,
+    overload,
+)
 
 from fastapi import Depends, Query
 from pydantic import BaseModel
-from sqlalchemy import Select, func, over
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    UnaryExpression,
+    and_,
+    asc,
+    false,
+    func,
+    or_,
+    over,
+    select,
+)
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql import operators
 from sqlalchemy.sql._typing import _ColumnsClauseArgument
 
 from polar.config import settings
+from polar.exceptions import BadRequest
 from polar.kit.db.models import RecordModel
 from polar.kit.db.postgres import AsyncSession
 from polar.kit.schemas import Schema
@@ -19,6 +48,7 @@ M = TypeVar("M", bound=RecordModel)
 class PaginationParams(NamedTuple):
     page: int
     limit: int
+    cursor: str | None = None
 
 
 @overload
@@ -50,7 +80,7 @@ async def paginate(
     pagination: PaginationParams,
     count_clause: _ColumnsClauseArgument[Any] | None = None,
 ) -> tuple[Sequence[Any], int]:
-    page, limit = pagination
+    page, limit = pagination.page, pagination.limit
     offset = limit * (page - 1)
     statement = statement.offset(offset).limit(limit)
 
@@ -73,6 +103,181 @@ async def paginate(
     return results, count
 
 
+class InvalidCursor(BadRequest):
+    def __init__(self) -> None:
+        super().__init__("Invalid pagination cursor.")
+
+
+async def keyset_paginate(
+    session: AsyncSession,
+    statement: Select[Any],
+    *,
+    pagination: PaginationParams,
+    order_by: Sequence[UnaryExpression[Any]],
+    id_column: ColumnElement[Any] | InstrumentedAttribute[Any],
+) -> tuple[Sequence[Any], int, str | None]:
+    """
+    Paginate a statement, either by page or by cursor.
+
+    Results are sorted by `order_by`, then by `id_column` to guarantee
+    a stable order. Alongside the results and the total count,
+    it returns an opaque cursor pointing after the last result,
+    or `None` if there are no more results. The cursor is only valid
+    with the same sorting: it raises `InvalidCursor` otherwise.
+
+    When `pagination.cursor` is set, `pagination.page` is ignored and we fetch
+    the rows after the cursor using a keyset condition instead of an `OFFSET`.
+    The total count is then capped to `API_PAGINATION_MAX_COUNT`,
+    so the cost of a page doesn't grow with the size of the result set.
+
+    Args:
+        session: The database session.
+        statement: The statement to paginate. It shouldn't be ordered.
+        pagination: The pagination parameters.
+        order_by: The `asc` or `desc` sorting clauses.
+        id_column: The unique column used to break ties.
+    """
+    keys = [_get_keyset_key(clause) for clause in order_by]
+    keys.append((id_column.expression, False))
+    sort = _get_keyset_sort(keys)
+    statement = statement.order_by(*order_by, asc(id_column))
+
+    limit = pagination.limit
+    count = 0
+    if pagination.cursor is None:
+        offset = limit * (pagination.page - 1)
+        statement = statement.offset(offset).limit(limit)
+        statement = statement.add_columns(over(func.count()))
+    else:
+        values = decode_cursor(pagination.cursor, sort, len(keys))
+        count = await _get_capped_count(session, statement)
+        statement = statement.where(_get_keyset_clause(keys, values)).limit(limit)
+    statement = statement.add_columns(*(column for column, _ in keys))
+
+    result = await session.execute(statement)
+
+    results: list[Any] = []
+    key_values: list[Any] = []
+    for row in result.unique().all():
+        queried_data = list(row._tuple())
+        key_values = queried_data[-len(keys) :]
+        queried_data = queried_data[: -len(keys)]
+        if pagination.cursor is None:
+            count = queried_data.pop()
+        if len(queried_data) == 1:
+            results.append(queried_data[0])
+        else:
+            results.append(queried_data)
+
+    next_cursor = encode_cursor(key_values, sort) if len(results) == limit else None
+
+    return results, count, next_cursor
+
+
+def encode_cursor(values: Sequence[Any], sort: str) -> str:
+    payload = json.dumps(
+        {"sort": sort, "values": [_encode_cursor_value(value) for value in values]}
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str, length: int) -> list[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_sort = payload["sort"]
+        values = [_decode_cursor_value(value) for value in payload["values"]]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor() from e
+    # The values of a cursor are only meaningful for the sorting it was built with
+    if cursor_sort != sort or len(values) != length:
+        raise InvalidCursor()
+    return values
+
+
+def _encode_cursor_value(value: Any) -> tuple[str, Any]:
+    if isinstance(value, Enum):
+        value = value.value
+    if value is None:
+        return ("null", None)
+    if isinstance(value, bool):
+        return ("bool", value)
+    if isinstance(value, int):
+        return ("int", value)
+    if isinstance(value, datetime):
+        return ("datetime", value.isoformat())
+    if isinstance(value, uuid.UUID):
+        return ("uuid", str(value))
+    if isinstance(value, str):
+        return ("str", value)
+    raise TypeError(f"Unsupported cursor value: {value!r}")
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    type, raw = value
+    match type:
+        case "null":
+            return None
+        case "bool":
+            return bool(raw)
+        case "int":
+            return int(raw)
+        case "datetime":
+            return datetime.fromisoformat(raw)
+        case "uuid":
+            return uuid.UUID(raw)
+        case "str":
+            return str(raw)
+    raise ValueError(f"Unsupported cursor value type: {type}")
+
+
+def _get_keyset_key(clause: UnaryExpression[Any]) -> tuple[ColumnElement[Any], bool]:
+    if clause.modifier not in {operators.asc_op, operators.desc_op}:
+        raise ValueError("Keyset pagination only supports asc and desc clauses")
+    column = cast(ColumnElement[Any], clause.element)
+    return column, clause.modifier == operators.desc_op
+
+
+def _get_keyset_sort(keys: Sequence[tuple[ColumnElement[Any], bool]]) -> str:
+    spec = ",".join(
+        f"{column} {'desc' if is_desc else 'asc'}" for column, is_desc in keys
+    )
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+
+def _get_keyset_clause(
+    keys: Sequence[tuple[ColumnElement[Any], bool]], values: Sequence[Any]
+) -> ColumnElement[bool]:
+    """
+    Build the condition selecting the rows after the cursor values.
+
+    It follows PostgreSQL default NULL ordering:
+    NULLS LAST for ascending order, NULLS FIRST for descending order.
+    """
+    clauses: list[ColumnElement[bool]] = []
+    for i, ((column, is_desc), value) in enumerate(zip(keys, values)):
+        equals = [
+            previous_column.is_(None)
+            if previous_value is None
+            else previous_column == previous_value
+            for (previous_column, _), previous_value in zip(keys[:i], values[:i])
+        ]
+        after: ColumnElement[bool]
+        if is_desc:
+            after = column.is_not(None) if value is None else column < value
+        else:
+            after = false() if value is None else or_(column > value, column.is_(None))
+        clauses.append(and_(*equals, after))
+    return or_(*clauses)
+
+
+async def _get_capped_count(session: AsyncSession, statement: Select[Any]) -> int:
+    subquery = (
+        statement.order_by(None).limit(settings.API_PAGINATION_MAX_COUNT).subquery()
+    )
+    result = await session.execute(select(func.count()).select_from(subquery))
+    return result.scalar_one()
+
+
 async def get_pagination_params(
     page: int = Query(1, description="Page number, defaults to 1.", gt=0),
     limit: int = Query(
@@ -90,9 +295,37 @@ async def get_pagination_params(
 PaginationParamsQuery = Annotated[PaginationParams, Depends(get_pagination_params)]
 
 
+async def get_cursor_pagination_params(
+    page: int = Query(1, description="Page number, defaults to 1.", gt=0),
+    limit: int = Query(
+        10,
+        description=(
+            f"Size of a page, defaults to 10. "
+            f"Maximum is {settings.API_PAGINATION_MAX_LIMIT}"
+        ),
+        gt=0,
+    ),
+    cursor: str | None = Query(
+        None,
+        description=(
+            "Opaque cursor returned in `pagination.next_cursor`. "
+            "If set, `page` is ignored and the results after the cursor are returned. "
+            "Prefer it over `page` to iterate through large result sets."
+        ),
+    ),
+) -> PaginationParams:
+    return PaginationParams(page, min(settings.API_PAGINATION_MAX_LIMIT, limit), cursor)
+
+
+CursorPaginationParamsQuery = Annotated[
+    PaginationParams, Depends(get_cursor_pagination_params)
+]
+
+
 class Pagination(Schema):
     total_count: int
     max_page: int
+    next_cursor: str | None = None
 
 
 class ListResource(BaseModel, Generic[T]):
@@ -101,12 +334,17 @@ class ListResource(BaseModel, Generic[T]):
 
     @classmethod
     def from_paginated_results(
-        cls, items: Sequence[T], total_count: int, pagination_params: PaginationParams
+        cls,
+        items: Sequence[T],
+        total_count: int,
+        pagination_params: PaginationParams,
+        next_cursor: str | None = None,
     ) -> Self:
         return cls(
             items=items,
             pagination=Pagination(
                 total_count=total_count,
                 max_page=math.ceil(total_count / pagination_params.limit),
+                next_cursor=next_cursor,
             ),
         )
@@ -33,6 +33,15 @@ class ResourceServiceReader(
         res = await session.execute(query)
         return res.scalars().unique().one_or_none()
 
+    async def list_by_ids(
+        self, session: AsyncSession, ids: Sequence[UUID], allow_deleted: bool = False
+    ) -> Sequence[ModelType]:
+        query = sql.select(self.model).where(self.model.id.in_(ids))
+        if not allow_deleted:
+            query = query.where(self.model.deleted_at.is_(None))
+        res = await session.execute(query)
+        return res.scalars().unique().all()
+
     async def get_by(self, session: AsyncSession, **clauses: Any) -> ModelType | None:
         query = sql.select(self.model).filter_by(**clauses)
         res = await session.execute(query)
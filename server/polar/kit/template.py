@@ -1,5 +1,6 @@
 from collections.abc import Callable
 from pathlib import Path
+from typing import Any
 
 import structlog
 from jinja2 import BaseLoader, Environment, TemplateNotFound
@@ -37,7 +38,7 @@ def path(__from_file__: str, relative_filename: str) -> Path:
     return Path(polar_package_root, base, relative_filename)
 
 
-def render(filename: Path | str, **kwargs: str) -> str:
+def render(filename: Path | str, **kwargs: Any) -> str:
     return env.get_template(str(filename)).render(**kwargs)
 
 
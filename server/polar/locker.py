@@ -89,8 +89,16 @@ class Locker:
 
         log.debug("acquired lock", name=name)
 
-        yield lock
-
+        try:
+            yield lock
+        except BaseException:
+            # Don't mask the error raised while holding the lock
+            with contextlib.suppress(ExpiredLockError):
+                await self._release(lock, name=name, timeout=timeout)
+            raise
+        await self._release(lock, name=name, timeout=timeout)
+
+    async def _release(self, lock: Lock, *, name: str, timeout: float) -> None:
         try:
             await lock.release()
         except LockNotOwnedError as e:
@@ -8,7 +8,9 @@ from .held_transfer import HeldTransfer
 from .invites import Invite
 from .issue import Issue
 from .issue_dependency import IssueDependency
+from .issue_pledge_summary import IssuePledgeSummary
 from .issue_reference import IssueReference
+from .issue_rendered_body import IssueRenderedBody
 from .issue_reward import IssueReward
 from .magic_link import MagicLink
 from .notification import Notification
@@ -39,7 +41,9 @@ __all__ = [
     "Invite",
     "Issue",
     "IssueDependency",
+    "IssuePledgeSummary",
     "IssueReference",
+    "IssueRenderedBody",
     "IssueReward",
     "MagicLink",
     "Model",
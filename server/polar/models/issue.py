@@ -34,6 +34,7 @@ from polar.kit.extensions.sqlalchemy import PostgresUUID, StringEnum
 from polar.types import JSONAny
 
 if TYPE_CHECKING:  # pragma: no cover
+    from polar.models.issue_pledge_summary import IssuePledgeSummary
     from polar.models.issue_reference import IssueReference
     from polar.models.organization import Organization
     from polar.models.pledge import Pledge
@@ -207,6 +208,15 @@ class Issue(IssueFields, RecordModel):
             viewonly=True,
         )
 
+    @declared_attr
+    def pledge_summary(cls) -> "Mapped[IssuePledgeSummary | None]":
+        return relationship(
+            "IssuePledgeSummary",
+            lazy="raise",
+            viewonly=True,
+            uselist=False,
+        )
+
     funding_goal: Mapped[int | None] = mapped_column(
         BigInteger, nullable=True, default=None
     )
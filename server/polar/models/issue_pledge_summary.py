@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import TIMESTAMP, BigInteger, ForeignKey, Integer
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from polar.kit.db.models import TimestampedModel
+from polar.kit.extensions.sqlalchemy import PostgresUUID
+
+
+class IssuePledgeSummary(TimestampedModel):
+    """
+    Summary of the active pledges of an issue.
+
+    Maintained by the pledge service on each pledge state transition,
+    so lists of issues don't have to aggregate the pledges.
+    """
+
+    __tablename__ = "issue_pledge_summaries"
+
+    issue_id: Mapped[UUID] = mapped_column(
+        PostgresUUID,
+        ForeignKey("issues.id", ondelete="CASCADE"),
+        nullable=False,
+        primary_key=True,
+    )
+
+    total: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, index=True
+    )
+    pay_upfront_total: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0
+    )
+    pay_on_completion_total: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0
+    )
+    pay_directly_total: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0
+    )
+
+    pledgers_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # Pledgers of the largest pledges, by pledge type
+    top_pledgers: Mapped[dict[str, list[dict[str, Any]]]] = mapped_column(
+        JSONB, nullable=False, default=dict
+    )
+
+    last_pledged_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True, default=None, index=True
+    )
@@ -0,0 +1,41 @@
+from enum import StrEnum
+from uuid import UUID
+
+from sqlalchemy import ForeignKey, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from polar.kit.db.models import TimestampedModel
+from polar.kit.extensions.sqlalchemy import PostgresUUID
+
+
+class RendererType(StrEnum):
+    github = "github"
+    # Fallback when GitHub can't be called, the body is rendered again later
+    local = "local"
+
+
+class IssueRenderedBody(TimestampedModel):
+    """
+    HTML rendering of the body of an issue.
+
+    Rendered in the background when the body changes,
+    so it can be served without calling GitHub.
+    """
+
+    __tablename__ = "issue_rendered_bodies"
+
+    issue_id: Mapped[UUID] = mapped_column(
+        PostgresUUID,
+        ForeignKey("issues.id", ondelete="CASCADE"),
+        nullable=False,
+        primary_key=True,
+    )
+
+    # Hash of the Markdown body it was rendered from
+    body_hash: Mapped[str] = mapped_column(String, nullable=False)
+    html: Mapped[str] = mapped_column(Text, nullable=False)
+    renderer: Mapped[RendererType] = mapped_column(String, nullable=False)
+
+    @property
+    def etag(self) -> str:
+        return f"{self.body_hash[:32]}-{self.renderer}"
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from collections.abc import Sequence
 from datetime import datetime
 from enum import StrEnum
 from typing import Annotated, Any, Literal
@@ -48,11 +49,21 @@ class NotificationPayloadBase(BaseModel):
         self,
         user: User,
     ) -> tuple[str, str]:
-        m: dict[str, str] = vars(self)
-        m["username"] = user.username
+        return self.render_many([user])[0]
 
+    def render_many(self, users: Sequence[User]) -> list[tuple[str, str]]:
+        """
+        Render the notification for each of the users,
+        compiling its templates only once.
+        """
         email_renderer = get_email_renderer()
-        return email_renderer.render_from_string(self.subject(), self.body(), m)
+        subject, body = email_renderer.compile_from_string(self.subject(), self.body())
+        return [
+            email_renderer.render_compiled(
+                subject, body, {**vars(self), "username": user.username}
+            )
+            for user in users
+        ]
 
 
 class NotificationBase(Schema):
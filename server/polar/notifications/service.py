@@ -38,6 +38,14 @@ class NotificationsService:
         res = await session.execute(stmt)
         return res.scalars().unique().one_or_none()
 
+    async def get_many(
+        self, session: AsyncSession, ids: Sequence[UUID]
+    ) -> Sequence[Notification]:
+        stmt = sql.select(Notification).where(Notification.id.in_(ids))
+
+        res = await session.execute(stmt)
+        return res.scalars().unique().all()
+
     async def get_for_user(
         self, session: AsyncSession, user_id: UUID
     ) -> Sequence[Notification]:
@@ -78,6 +86,45 @@ class NotificationsService:
         await enqueue_job("notifications.send", notification_id=notification.id)
         return True
 
+    async def send_to_users(
+        self,
+        session: AsyncSession,
+        user_ids: Sequence[UUID],
+        notif: PartialNotification,
+    ) -> None:
+        """
+        Send the same notification to many users at once.
+
+        The notifications are inserted in a single statement,
+        and delivered by a single job.
+        """
+        if not user_ids:
+            return
+
+        payload = notif.payload.model_dump(mode="json")
+        stmt = (
+            sql.insert(Notification)
+            .values(
+                [
+                    {
+                        "user_id": user_id,
+                        "type": notif.type,
+                        "issue_id": notif.issue_id,
+                        "pledge_id": notif.pledge_id,
+                        "pull_request_id": notif.pull_request_id,
+                        "payload": payload,
+                    }
+                    for user_id in user_ids
+                ]
+            )
+            .returning(Notification.id)
+        )
+        result = await session.execute(stmt)
+        notification_ids = list(result.scalars().all())
+
+        await session.commit()
+        await enqueue_job("notifications.send_batch", notification_ids=notification_ids)
+
     async def send_to_org_admins(
         self,
         session: AsyncSession,
@@ -89,12 +136,11 @@ class NotificationsService:
             org_id,
             is_admin=True,
         )
-        for member in members:
-            await self.send_to_user(
-                session=session,
-                user_id=member.user_id,
-                notif=notif,
-            )
+        await self.send_to_users(
+            session=session,
+            user_ids=[member.user_id for member in members],
+            notif=notif,
+        )
 
     async def send_to_anonymous_email(
         self,
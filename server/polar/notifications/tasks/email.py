@@ -1,14 +1,26 @@
+import json
+from datetime import timedelta
 from uuid import UUID
 
 import structlog
 
-from polar.email.sender import get_email_sender
+from polar.email.sender import EmailMessage, get_email_sender
+from polar.models import Notification, User
 from polar.notifications.service import notifications
 from polar.user.service import user as user_service
-from polar.worker import AsyncSessionMaker, JobContext, PolarWorkerContext, task
+from polar.worker import (
+    AsyncSessionMaker,
+    JobContext,
+    PolarWorkerContext,
+    enqueue_job,
+    task,
+)
 
 log = structlog.get_logger()
 
+# Number of times notifications failing with a retriable error are sent again
+SEND_BATCH_MAX_RETRIES = 5
+
 sender = get_email_sender()
 
 
@@ -48,7 +60,7 @@ async def notifications_send(
                 )
                 return
 
-            sender.send_to_user(
+            await sender.send_to_user(
                 to_email_addr=user.email,
                 subject=f"[Polar] {subject}",
                 html_content=body,
@@ -56,3 +68,98 @@ async def notifications_send(
                 reply_to_email_addr="support@polar.sh",
                 reply_to_name="Polar Support",
             )
+
+
+@task("notifications.send_batch")
+async def notifications_send_batch(
+    ctx: JobContext,
+    notification_ids: list[UUID],
+    polar_context: PolarWorkerContext,
+    attempt: int = 0,
+) -> None:
+    with polar_context.to_execution_context():
+        async with AsyncSessionMaker(ctx) as session:
+            notifs = await notifications.get_many(session, notification_ids)
+            users = {
+                user.id: user
+                for user in await user_service.list_by_ids(
+                    session, [notif.user_id for notif in notifs if notif.user_id]
+                )
+            }
+
+            # Notifications of a fan-out share their payload: render it once
+            groups: dict[str, tuple[Notification, list[tuple[User, UUID]]]] = {}
+            for notif in notifs:
+                user = users.get(notif.user_id)
+                if user is None:
+                    log.warning(
+                        "notifications.send.user_not_found", user_id=notif.user_id
+                    )
+                    continue
+                if not user.email:
+                    log.warning("notifications.send.user_no_email", user_id=user.id)
+                    continue
+
+                key = json.dumps([notif.type, notif.payload], sort_keys=True)
+                groups.setdefault(key, (notif, []))[1].append((user, notif.id))
+
+            messages: list[EmailMessage] = []
+            messages_notification_ids: list[UUID] = []
+            for notif, group_users in groups.values():
+                notification_type = notifications.parse_payload(notif)
+                rendered = notification_type.render_many(
+                    [user for user, _ in group_users]
+                )
+                for (user, notification_id), (subject, body) in zip(
+                    group_users, rendered
+                ):
+                    if not subject or not body:
+                        log.error(
+                            "notifications.send.could_not_render",
+                            user=user,
+                            notif=notif,
+                        )
+                        continue
+                    messages.append(
+                        EmailMessage(
+                            to_email_addr=user.email,
+                            subject=f"[Polar] {subject}",
+                            html_content=body,
+                            from_email_addr="notifications@notifications.polar.sh",
+                            reply_to_email_addr="support@polar.sh",
+                            reply_to_name="Polar Support",
+                        )
+                    )
+                    messages_notification_ids.append(notification_id)
+
+            results = await sender.send_batch(messages)
+            retry_notification_ids: list[UUID] = []
+            for notification_id, result in zip(messages_notification_ids, results):
+                if not result.success:
+                    log.error(
+                        "notifications.send.failed",
+                        notification_id=notification_id,
+                        to_email_addr=result.message.to_email_addr,
+                        error=result.error,
+                        retriable=result.retriable,
+                    )
+                    if result.retriable:
+                        retry_notification_ids.append(notification_id)
+
+            if not retry_notification_ids:
+                return
+
+            # Only send again the failed notifications, not the whole batch
+            if attempt >= SEND_BATCH_MAX_RETRIES:
+                log.error(
+                    "notifications.send_batch.gave_up",
+                    notification_ids=retry_notification_ids,
+                )
+                return
+
+            await enqueue_job(
+                "notifications.send_batch",
+                notification_ids=retry_notification_ids,
+                attempt=attempt + 1,
+                _defer_by=timedelta(minutes=2**attempt),
+            )
@@ -9,6 +9,7 @@ from polar.account.service import account as account_service
 from polar.authz.service import AccessType, Authz
 from polar.enums import Platforms
 from polar.exceptions import BadRequest, PolarError
+from polar.integrations.github.badge_svg import get_badge_svg_cache
 from polar.integrations.loops.service import loops as loops_service
 from polar.kit.services import ResourceService
 from polar.models import Organization, User, UserOrganization
@@ -213,6 +214,13 @@ class OrganizationService(
 
         updated = await organization.save(session)
 
+        # Both are shown on the issues badges
+        if (
+            settings.set_default_upfront_split_to_contributors
+            or settings.pledge_badge_show_amount is not None
+        ):
+            await get_badge_svg_cache().invalidate_organization(organization.name)
+
         log.info(
             "organization.update_settings",
             organization_id=organization.id,
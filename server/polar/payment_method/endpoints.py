@@ -44,5 +44,5 @@ async def detach(
     id: str,
     auth: UserRequiredAuth,
 ) -> PaymentMethod:
-    pm = stripe_service.detach_payment_method(id)
+    pm = await stripe_service.detach_payment_method(id)
     return PaymentMethod.from_stripe(pm)
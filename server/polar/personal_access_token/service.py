@@ -1,13 +1,26 @@
 from collections.abc import Sequence
-from datetime import timedelta
+from datetime import datetime, timedelta
 from uuid import UUID
 
 from sqlalchemy.orm import joinedload
 
+from polar.auth.cache import get_auth_cache
 from polar.kit.extensions.sqlalchemy import sql
 from polar.kit.utils import utc_now
 from polar.models.personal_access_token import PersonalAccessToken
 from polar.postgres import AsyncSession
+from polar.redis import redis
+
+_USAGE_KEY = "personal_access_token:usage"
+
+# Delete the flushed fields, unless they were updated since they were read
+_DELETE_FLUSHED_USAGE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call("HGET", KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call("HDEL", KEYS[1], ARGV[i])
+    end
+end
+"""
 
 
 class PersonalAccessTokenService:
@@ -59,14 +72,39 @@ class PersonalAccessTokenService:
         await session.execute(stmt)
         await session.commit()
 
-    async def record_usage(self, session: AsyncSession, id: UUID) -> None:
-        stmt = (
-            sql.update(PersonalAccessToken)
-            .where(PersonalAccessToken.id == id)
-            .values(last_used_at=utc_now())
+        await get_auth_cache().invalidate_personal_access_token(id)
+
+    async def record_usage(self, id: UUID) -> None:
+        """
+        Record the usage of a token.
+
+        It's only stored in Redis: `last_used_at` is written
+        in batches by `flush_usage`.
+        """
+        await redis.hset(_USAGE_KEY, str(id), utc_now().isoformat())
+
+    async def flush_usage(self, session: AsyncSession) -> int:
+        usage = await redis.hgetall(_USAGE_KEY)
+        if not usage:
+            return 0
+
+        await session.execute(
+            sql.update(PersonalAccessToken),
+            [
+                {"id": UUID(id), "last_used_at": datetime.fromisoformat(last_used_at)}
+                for id, last_used_at in usage.items()
+            ],
         )
-        await session.execute(stmt)
         await session.commit()
 
+        # Only once written, and unless the token was used again in the meantime
+        await redis.eval(
+            _DELETE_FLUSHED_USAGE_SCRIPT,
+            1,
+            _USAGE_KEY,
+            *(value for item in usage.items() for value in item),
+        )
+        return len(usage)
+
 
 personal_access_token_service = PersonalAccessTokenService()
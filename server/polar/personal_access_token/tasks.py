@@ -0,0 +1,15 @@
+import structlog
+
+from polar.logging import Logger
+from polar.worker import AsyncSessionMaker, JobContext, interval
+
+from .service import personal_access_token_service
+
+log: Logger = structlog.get_logger()
+
+
+@interval(second=0)
+async def personal_access_token_flush_usage(ctx: JobContext) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        count = await personal_access_token_service.flush_usage(session)
+        log.debug("personal_access_token.flush_usage", count=count)
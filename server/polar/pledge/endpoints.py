@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -12,6 +13,7 @@ from polar.issue.service import issue as issue_service
 from polar.kit.pagination import ListResource, Pagination
 from polar.models.pledge import Pledge
 from polar.models.user import User
+from polar.models.user_organization import UserOrganization
 from polar.organization.service import organization as organization_service
 from polar.postgres import AsyncSession, get_db_session
 from polar.repository.service import repository as repository_service
@@ -38,10 +40,19 @@ from .service import pledge as pledge_service
 router = APIRouter(tags=["pledges"])
 
 
-async def include_receiver_admin_fields(
-    session: AsyncSession,
+def _get_membership(
+    memberships: Sequence[UserOrganization], organization_id: UUID
+) -> UserOrganization | None:
+    for m in memberships:
+        if m.organization_id == organization_id:
+            return m
+    return None
+
+
+def include_receiver_admin_fields(
     subject: Subject,
     pledge: Pledge,
+    memberships: Sequence[UserOrganization],
 ) -> bool:
     if not isinstance(subject, User):
         return False
@@ -51,19 +62,17 @@ async def include_receiver_admin_fields(
 
     # is admin of receiver org
     if pledge.organization_id:
-        m = await user_organization_service.get_by_user_and_org(
-            session, subject.id, pledge.organization_id
-        )
+        m = _get_membership(memberships, pledge.organization_id)
         if m and m.is_admin:
             return True
 
     return False
 
 
-async def include_sender_admin_fields(
-    session: AsyncSession,
+def include_sender_admin_fields(
     subject: Subject,
     pledge: Pledge,
+    memberships: Sequence[UserOrganization],
 ) -> bool:
     if not isinstance(subject, User):
         return False
@@ -77,26 +86,22 @@ async def include_sender_admin_fields(
 
     # is member if sending org
     if pledge.by_organization_id:
-        m = await user_organization_service.get_by_user_and_org(
-            session, subject.id, pledge.by_organization_id
-        )
+        m = _get_membership(memberships, pledge.by_organization_id)
         if m and m.is_admin:
             return True
 
     if pledge.on_behalf_of_organization_id:
-        m = await user_organization_service.get_by_user_and_org(
-            session, subject.id, pledge.on_behalf_of_organization_id
-        )
+        m = _get_membership(memberships, pledge.on_behalf_of_organization_id)
         if m and m.is_admin:
             return True
 
     return False
 
 
-async def include_sender_fields(
-    session: AsyncSession,
+def include_sender_fields(
     subject: Subject,
     pledge: Pledge,
+    memberships: Sequence[UserOrganization],
 ) -> bool:
     if not isinstance(subject, User):
         return False
@@ -110,30 +115,49 @@ async def include_sender_fields(
 
     # is member if sending org
     if pledge.by_organization_id:
-        if await user_organization_service.get_by_user_and_org(
-            session, subject.id, pledge.by_organization_id
-        ):
+        if _get_membership(memberships, pledge.by_organization_id):
             return True
 
     if pledge.on_behalf_of_organization_id:
-        if await user_organization_service.get_by_user_and_org(
-            session, subject.id, pledge.on_behalf_of_organization_id
-        ):
+        if _get_membership(memberships, pledge.on_behalf_of_organization_id):
             return True
 
     return False
 
 
-async def to_schema(session: AsyncSession, subject: Subject, p: Pledge) -> PledgeSchema:
+async def list_memberships(
+    session: AsyncSession, subject: Subject
+) -> Sequence[UserOrganization]:
+    if not isinstance(subject, User):
+        return []
+    return await user_organization_service.list_by_user_id(session, subject.id)
+
+
+async def to_schema(
+    session: AsyncSession,
+    subject: Subject,
+    p: Pledge,
+    *,
+    memberships: Sequence[UserOrganization] | None = None,
+) -> PledgeSchema:
+    """
+    Serialize a pledge, with the fields the subject is allowed to see.
+
+    When serializing a list of pledges, pass the `memberships` of the subject,
+    from `list_memberships`, so they're not loaded for each pledge.
+    """
+    if memberships is None:
+        memberships = await list_memberships(session, subject)
+
     return PledgeSchema.from_db(
         p,
-        include_receiver_admin_fields=await include_receiver_admin_fields(
-            session, subject, p
+        include_receiver_admin_fields=include_receiver_admin_fields(
+            subject, p, memberships
         ),
-        include_sender_admin_fields=await include_sender_admin_fields(
-            session, subject, p
+        include_sender_admin_fields=include_sender_admin_fields(
+            subject, p, memberships
         ),
-        include_sender_fields=await include_sender_fields(session, subject, p),
+        include_sender_fields=include_sender_fields(subject, p, memberships),
     )
 
 
@@ -250,10 +274,12 @@ async def search(
         load_pledger=True,
     )
 
+    memberships = await authz.list_memberships(auth.subject)
+    decisions = await authz.can_many(auth.subject, AccessType.read, pledges)
     items = [
-        await to_schema(session, auth.subject, p)
-        for p in pledges
-        if await authz.can(auth.subject, AccessType.read, p)
+        await to_schema(session, auth.subject, p, memberships=memberships)
+        for p, allowed in zip(pledges, decisions)
+        if allowed
     ]
 
     return ListResource(
@@ -27,6 +27,7 @@ from .schemas import (
     PledgeStripePaymentIntentUpdate,
 )
 from .service import pledge as pledge_service
+from .summary_service import issue_pledge_summary as issue_pledge_summary_service
 
 log = structlog.get_logger()
 
@@ -76,7 +77,7 @@ class PaymentIntentService:
 
         # Create a payment intent with Stripe
         try:
-            payment_intent = stripe.create_anonymous_intent(
+            payment_intent = await stripe.create_anonymous_intent(
                 amount=amount_including_fee,
                 transfer_group=str(intent.issue_id),
                 pledge_issue=pledge_issue,
@@ -136,7 +137,7 @@ class PaymentIntentService:
         fee = self.calculate_fee(updates.amount)
         amount_including_fee = updates.amount + fee
 
-        payment_intent = stripe.modify_intent(
+        payment_intent = await stripe.modify_intent(
             payment_intent_id,
             amount=amount_including_fee,
             receipt_email=updates.email,
@@ -165,7 +166,7 @@ class PaymentIntentService:
         if pledge:
             return pledge
 
-        intent = stripe.retrieve_intent(payment_intent_id)
+        intent = await stripe.retrieve_intent(payment_intent_id)
         if not intent:
             raise ResourceNotFound()
 
@@ -208,6 +209,7 @@ class PaymentIntentService:
 
         pledge = await Pledge.create(
             session=session,
+            autocommit=False,
             payment_id=payment_intent_id,
             issue_id=issue.id,
             repository_id=repo.id,
@@ -221,6 +223,9 @@ class PaymentIntentService:
             by_organization_id=None,
             on_behalf_of_organization_id=metadata.on_behalf_of_organization_id,
         )
+        if state == PledgeState.created:
+            await issue_pledge_summary_service.update(session, [issue.id])
+        await session.commit()
 
         if state == PledgeState.created:
             await pledge_created.call(PledgeHook(session, pledge))
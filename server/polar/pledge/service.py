@@ -38,6 +38,7 @@ from polar.kit.services import ResourceServiceReader
 from polar.kit.utils import utc_now
 from polar.models.account import Account
 from polar.models.issue import Issue
+from polar.models.issue_pledge_summary import IssuePledgeSummary
 from polar.models.issue_reward import IssueReward
 from polar.models.pledge import Pledge, PledgeState, PledgeType
 from polar.models.pledge_transaction import PledgeTransaction, PledgeTransactionType
@@ -77,6 +78,7 @@ from .schemas import (
     Pledger,
     SummaryPledge,
 )
+from .summary_service import issue_pledge_summary as issue_pledge_summary_service
 
 log = structlog.get_logger()
 
@@ -286,6 +288,7 @@ class PledgeService(ResourceServiceReader[Pledge]):
                 .returning(Pledge)
             )
             await session.execute(statement)
+            await issue_pledge_summary_service.update(session, [issue_id])
             await session.commit()
 
             # FIXME: it would be cool if we could only trigger these events if the
@@ -684,6 +687,7 @@ class PledgeService(ResourceServiceReader[Pledge]):
             )
         )
         await session.execute(stmt)
+        await issue_pledge_summary_service.update(session, [pledge.issue_id])
         await session.commit()
         await pledge_created.call(PledgeHook(session, pledge))
 
@@ -727,6 +731,7 @@ class PledgeService(ResourceServiceReader[Pledge]):
                 transaction_id=transaction_id,
             )
         )
+        await issue_pledge_summary_service.update(session, [pledge.issue_id])
         await session.commit()
         await pledge_updated.call(PledgeHook(session, pledge))
 
@@ -756,6 +761,7 @@ class PledgeService(ResourceServiceReader[Pledge]):
                 transaction_id=transaction_id,
             )
         )
+        await issue_pledge_summary_service.update(session, [pledge.issue_id])
         await session.commit()
         await pledge_updated.call(PledgeHook(session, pledge))
 
@@ -779,6 +785,7 @@ class PledgeService(ResourceServiceReader[Pledge]):
                 transaction_id=transaction_id,
             )
         )
+        await issue_pledge_summary_service.update(session, [pledge.issue_id])
         await session.commit()
         await pledge_updated.call(PledgeHook(session, pledge))
 
@@ -1001,6 +1008,7 @@ class PledgeService(ResourceServiceReader[Pledge]):
             )
         )
         await session.execute(stmt)
+        await issue_pledge_summary_service.update(session, [pledge.issue_id])
         await session.commit()
 
         await pledge_disputed.call(PledgeHook(session, pledge))
@@ -1047,9 +1055,9 @@ class PledgeService(ResourceServiceReader[Pledge]):
             on_behalf_of_organization_id=on_behalf_of_organization_id,
             by_organization_id=by_organization_id,
             created_by_user_id=authenticated_user.id,
-        ).save(
-            session=session,
-        )
+        ).save(session=session, autocommit=False)
+        await issue_pledge_summary_service.update(session, [issue.id])
+        await session.commit()
 
         await loops_service.user_update(authenticated_user, isBacker=True)
 
@@ -1231,33 +1239,31 @@ class PledgeService(ResourceServiceReader[Pledge]):
     async def issues_pledge_summary(
         self, session: AsyncSession, issues: Sequence[Issue]
     ) -> dict[UUID, PledgePledgesSummary]:
-        all_pledges = await self.list_by(
-            session,
-            issue_ids=[i.id for i in issues],
-            load_pledger=True,
-        )
+        summaries = await self._get_issues_summaries(session, issues)
 
         res: dict[UUID, PledgePledgesSummary] = {}
-
-        pledges_by_issue: dict[UUID, list[Pledge]] = {}
-        for p in all_pledges:
-            exist = pledges_by_issue.get(p.issue_id, [])
-            exist.append(p)
-            pledges_by_issue[p.issue_id] = exist
-
         for i in issues:
-            pledges = pledges_by_issue.get(i.id, [])
-
-            sum_pledges = sum([p.amount for p in pledges])
+            summary = summaries.get(i.id)
 
             funding = Funding(
                 funding_goal=CurrencyAmount(currency="USD", amount=i.funding_goal)
                 if i.funding_goal
                 else None,
-                pledges_sum=CurrencyAmount(currency="USD", amount=sum_pledges),
+                pledges_sum=CurrencyAmount(
+                    currency="USD", amount=summary.total if summary else 0
+                ),
             )
 
-            summary_pledges = [SummaryPledge.from_db(p) for p in pledges]
+            summary_pledges = [
+                SummaryPledge(
+                    type=PledgeType.from_str(pledge_type),
+                    pledger=Pledger.model_validate(pledger),
+                )
+                for pledge_type, pledgers in (
+                    summary.top_pledgers.items() if summary else []
+                )
+                for pledger in pledgers
+            ]
 
             res[i.id] = PledgePledgesSummary(funding=funding, pledges=summary_pledges)
 
@@ -1266,40 +1272,70 @@ class PledgeService(ResourceServiceReader[Pledge]):
     async def issues_pledge_type_summary(
         self, session: AsyncSession, issues: Sequence[Issue]
     ) -> dict[UUID, PledgesTypeSummaries]:
-        all_pledges = await self.list_by(
-            session, issue_ids=[i.id for i in issues], load_pledger=True
-        )
+        summaries = await self._get_issues_summaries(session, issues)
 
-        res: dict[UUID, PledgesTypeSummaries] = {}
+        def summary(
+            issue_summary: IssuePledgeSummary | None, type: PledgeType
+        ) -> FundingPledgesSummary:
+            if issue_summary is None:
+                return FundingPledgesSummary(
+                    total=CurrencyAmount(currency="USD", amount=0), pledgers=[]
+                )
 
-        pledges_by_issue: dict[UUID, list[Pledge]] = {}
-        for p in all_pledges:
-            exist = pledges_by_issue.get(p.issue_id, [])
-            exist.append(p)
-            pledges_by_issue[p.issue_id] = exist
+            return FundingPledgesSummary(
+                total=CurrencyAmount(
+                    currency="USD", amount=getattr(issue_summary, f"{type}_total")
+                ),
+                pledgers=[
+                    Pledger.model_validate(pledger)
+                    for pledger in issue_summary.top_pledgers.get(type, [])
+                ],
+            )
 
-        for i in issues:
-            pledges = pledges_by_issue.get(i.id, [])
+        return {
+            i.id: PledgesTypeSummaries(
+                pay_upfront=summary(summaries.get(i.id), PledgeType.pay_upfront),
+                pay_on_completion=summary(
+                    summaries.get(i.id), PledgeType.pay_on_completion
+                ),
+                pay_directly=summary(summaries.get(i.id), PledgeType.pay_directly),
+            )
+            for i in issues
+        }
 
-            def summary(type: PledgeType) -> FundingPledgesSummary:
-                pledges_of_type = [p for p in pledges if p.type == type]
-                amount = sum([p.amount for p in pledges_of_type])
-                pledgers = [
-                    p for p in [Pledger.from_pledge(p) for p in pledges_of_type] if p
-                ]
+    async def _get_issues_summaries(
+        self, session: AsyncSession, issues: Sequence[Issue]
+    ) -> dict[UUID, IssuePledgeSummary]:
+        statement = sql.select(IssuePledgeSummary).where(
+            IssuePledgeSummary.issue_id.in_([i.id for i in issues])
+        )
+        res = await session.execute(statement)
+        return {summary.issue_id: summary for summary in res.scalars().all()}
 
-                return FundingPledgesSummary(
-                    total=CurrencyAmount(currency="USD", amount=amount),
-                    pledgers=pledgers,
-                )
+    def pledge_type_summary(self, pledges: Sequence[Pledge]) -> PledgesTypeSummaries:
+        """
+        Summarize the active pledges of an issue, by type.
+
+        The pledgers of the pledges need to be loaded.
+        """
 
-            res[i.id] = PledgesTypeSummaries(
-                pay_upfront=summary(PledgeType.pay_upfront),
-                pay_on_completion=summary(PledgeType.pay_on_completion),
-                pay_directly=summary(PledgeType.pay_directly),
+        def summary(type: PledgeType) -> FundingPledgesSummary:
+            pledges_of_type = [p for p in pledges if p.type == type]
+            amount = sum([p.amount for p in pledges_of_type])
+            pledgers = [
+                p for p in [Pledger.from_pledge(p) for p in pledges_of_type] if p
+            ]
+
+            return FundingPledgesSummary(
+                total=CurrencyAmount(currency="USD", amount=amount),
+                pledgers=pledgers,
             )
 
-        return res
+        return PledgesTypeSummaries(
+            pay_upfront=summary(PledgeType.pay_upfront),
+            pay_on_completion=summary(PledgeType.pay_on_completion),
+            pay_directly=summary(PledgeType.pay_directly),
+        )
 
     async def sum_pledges_period(
         self,
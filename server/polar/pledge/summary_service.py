@@ -0,0 +1,148 @@
+from collections.abc import Sequence
+from typing import Any
+from uuid import UUID
+
+import structlog
+from sqlalchemy.orm import joinedload
+
+from polar.kit.utils import utc_now
+from polar.logging import Logger
+from polar.models import IssuePledgeSummary, Pledge
+from polar.models.pledge import PledgeState, PledgeType
+from polar.postgres import AsyncSession, sql
+
+from .schemas import Pledger
+
+log: Logger = structlog.get_logger()
+
+# Number of pledgers kept in the summary, for each pledge type
+TOP_PLEDGERS_LIMIT = 100
+
+
+class IssuePledgeSummaryService:
+    async def update(self, session: AsyncSession, issue_ids: Sequence[UUID]) -> None:
+        """
+        Compute the summaries of the active pledges of issues and save them.
+
+        It doesn't commit: call it in the transaction changing the pledges,
+        so the summaries are always consistent with them.
+        """
+        if not issue_ids:
+            return
+
+        # Pending changes to the pledges need to be taken into account
+        await session.flush()
+
+        statement = (
+            sql.select(Pledge)
+            .where(
+                Pledge.issue_id.in_(issue_ids),
+                Pledge.state.in_(PledgeState.active_states()),
+            )
+            .options(
+                joinedload(Pledge.user),
+                joinedload(Pledge.by_organization),
+                joinedload(Pledge.on_behalf_of_organization),
+            )
+            # Pledges may have been updated with UPDATE statements in this session
+            .execution_options(populate_existing=True)
+        )
+        res = await session.execute(statement)
+
+        pledges_by_issue: dict[UUID, list[Pledge]] = {
+            issue_id: [] for issue_id in issue_ids
+        }
+        for pledge in res.scalars().unique().all():
+            pledges_by_issue[pledge.issue_id].append(pledge)
+
+        values = [
+            self._summarize(issue_id, pledges)
+            for issue_id, pledges in pledges_by_issue.items()
+        ]
+        insert_stmt = sql.insert(IssuePledgeSummary).values(values)
+        update_keys = set(values[0].keys()) - {"issue_id"}
+        await session.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=[IssuePledgeSummary.issue_id],
+                set_={
+                    **{k: getattr(insert_stmt.excluded, k) for k in update_keys},
+                    "modified_at": utc_now(),
+                },
+            )
+        )
+
+    async def rebuild(self, session: AsyncSession, *, batch_size: int = 100) -> int:
+        """
+        Recompute the summaries of all the issues having pledges.
+
+        Issues are processed by batches, each one committed separately.
+        """
+        issue_ids_statement = (
+            sql.select(Pledge.issue_id)
+            .union(sql.select(IssuePledgeSummary.issue_id))
+            .subquery()
+        )
+
+        count = 0
+        last_issue_id: UUID | None = None
+        while True:
+            statement = (
+                sql.select(issue_ids_statement.c.issue_id)
+                .order_by(issue_ids_statement.c.issue_id)
+                .limit(batch_size)
+            )
+            if last_issue_id is not None:
+                statement = statement.where(
+                    issue_ids_statement.c.issue_id > last_issue_id
+                )
+
+            res = await session.execute(statement)
+            issue_ids = res.scalars().all()
+            if not issue_ids:
+                break
+
+            await self.update(session, issue_ids)
+            await session.commit()
+
+            count += len(issue_ids)
+            last_issue_id = issue_ids[-1]
+            log.debug("issue_pledge_summary.rebuild.batch", count=count)
+
+        return count
+
+    def _summarize(self, issue_id: UUID, pledges: Sequence[Pledge]) -> dict[str, Any]:
+        totals = {pledge_type: 0 for pledge_type in PledgeType}
+        for pledge in pledges:
+            totals[PledgeType.from_str(pledge.type)] += pledge.amount
+
+        top_pledgers: dict[str, list[dict[str, Any]]] = {}
+        for pledge_type in PledgeType:
+            top_pledges = sorted(
+                (p for p in pledges if p.type == pledge_type),
+                key=lambda p: p.amount,
+                reverse=True,
+            )
+            pledgers = [Pledger.from_pledge(p) for p in top_pledges]
+            top_pledgers[pledge_type] = [
+                pledger.model_dump(mode="json") for pledger in pledgers if pledger
+            ][:TOP_PLEDGERS_LIMIT]
+
+        pledgers_ids = {
+            p.on_behalf_of_organization_id or p.by_user_id or p.by_organization_id
+            for p in pledges
+        }
+        pledgers_ids.discard(None)
+
+        return {
+            "issue_id": issue_id,
+            "total": sum(totals.values()),
+            "pay_upfront_total": totals[PledgeType.pay_upfront],
+            "pay_on_completion_total": totals[PledgeType.pay_on_completion],
+            "pay_directly_total": totals[PledgeType.pay_directly],
+            "pledgers_count": len(pledgers_ids),
+            "top_pledgers": top_pledgers,
+            "last_pledged_at": max((p.created_at for p in pledges), default=None),
+        }
+
+
+issue_pledge_summary = IssuePledgeSummaryService()
@@ -0,0 +1,17 @@
+import structlog
+
+from polar.logging import Logger
+from polar.worker import AsyncSessionMaker, JobContext, PolarWorkerContext, task
+
+from .summary_service import issue_pledge_summary as issue_pledge_summary_service
+
+log: Logger = structlog.get_logger()
+
+
+@task("pledge.issue_summary.rebuild")
+async def pledge_issue_summary_rebuild(
+    ctx: JobContext, polar_context: PolarWorkerContext
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        count = await issue_pledge_summary_service.rebuild(session)
+        log.info("pledge.issue_summary.rebuild", count=count)
@@ -33,6 +33,8 @@ async def on_issue_synced(hook: SyncedHook) -> None:
             "repository_id": hook.repository.id,
         },
         organization_id=hook.organization.id,
+        # Only the latest progress of the repository matters
+        coalesce_key=f"issue.synced:{hook.repository.id}",
     )
 
 
@@ -92,7 +94,6 @@ pull_request_upserted.add(on_pull_request_updated)
 
 async def on_organization_upserted(hook: OrganizationHook) -> None:
     await publish_members(
-        session=hook.session,
         key="organization.updated",
         payload={
             "organization_id": hook.organization.id,
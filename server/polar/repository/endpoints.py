@@ -85,7 +85,8 @@ async def search(
     # Anonymous requests can only see public repositories,
     # authed users can also see private repositories in orgs that they are a
     # member of
-    repos = [r for r in repos if await authz.can(auth.subject, AccessType.read, r)]
+    can_read_repos = await authz.can_many(auth.subject, AccessType.read, repos)
+    repos = [r for r, can_read in zip(repos, can_read_repos) if can_read]
 
     return ListResource(
         items=[RepositorySchema.from_db(r) for r in repos],
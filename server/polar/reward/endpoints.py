@@ -61,17 +61,23 @@ async def search(
         reward_org_id=rewards_to_org,
     )
 
+    can_read_rewards = await authz.can_many(
+        auth.subject, AccessType.read, [reward for _, reward, _ in rewards]
+    )
+    can_write_pledges = await authz.can_many(
+        auth.subject, AccessType.write, [pledge for pledge, _, _ in rewards]
+    )
     items = [
         to_resource(
             pledge,
             reward,
             transaction,
-            include_receiver_admin_fields=await authz.can(
-                auth.subject, AccessType.write, pledge
-            ),
+            include_receiver_admin_fields=can_write_pledge,
+        )
+        for (pledge, reward, transaction), can_read_reward, can_write_pledge in zip(
+            rewards, can_read_rewards, can_write_pledges
         )
-        for pledge, reward, transaction in rewards
-        if await authz.can(auth.subject, AccessType.read, reward)
+        if can_read_reward
     ]
 
     return ListResource(
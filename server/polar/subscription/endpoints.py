@@ -11,7 +11,12 @@ from polar.auth.dependencies import Auth, UserRequiredAuth
 from polar.authz.service import AccessType, Anonymous, Authz
 from polar.exceptions import BadRequest, ResourceNotFound, Unauthorized
 from polar.kit.csv import get_emails_from_csv, get_iterable_from_binary_io
-from polar.kit.pagination import ListResource, PaginationParams, PaginationParamsQuery
+from polar.kit.pagination import (
+    CursorPaginationParamsQuery,
+    ListResource,
+    PaginationParams,
+    PaginationParamsQuery,
+)
 from polar.kit.sorting import Sorting, SortingGetter
 from polar.models import Repository, Subscription, SubscriptionBenefit, SubscriptionTier
 from polar.models.organization import Organization
@@ -441,7 +446,7 @@ SearchSorting = Annotated[
 )
 async def search_subscriptions(
     auth: UserRequiredAuth,
-    pagination: PaginationParamsQuery,
+    pagination: CursorPaginationParamsQuery,
     sorting: SearchSorting,
     organization_name_platform: OrganizationNamePlatform,
     repository_name: OptionalRepositoryNameQuery = None,
@@ -472,7 +477,7 @@ async def search_subscriptions(
         if repository is None:
             raise ResourceNotFound("Repository not found")
 
-    results, count = await subscription_service.search(
+    results, count, next_cursor = await subscription_service.search(
         session,
         auth.user,
         type=type,
@@ -491,6 +496,7 @@ async def search_subscriptions(
         [SubscriptionSchema.model_validate(result) for result in results],
         count,
         pagination,
+        next_cursor,
     )
 
 
@@ -688,7 +694,7 @@ async def subscriptions_export(
         # CSV header
         yield "email,name,created_at,active,tier\n"
 
-        (subscribers, _) = await subscription_service.search(
+        (subscribers, _, _) = await subscription_service.search(
             session,
             user=auth.subject,
             organization=organization,
@@ -1,9 +1,11 @@
+from collections.abc import Sequence
 from typing import Any, Protocol, TypeVar
 
 from polar.exceptions import PolarError
 from polar.models import (
     Subscription,
     SubscriptionBenefit,
+    SubscriptionBenefitGrant,
     User,
 )
 from polar.models.subscription_benefit import SubscriptionBenefitProperties
@@ -143,6 +145,82 @@ class SubscriptionBenefitServiceProtocol(Protocol[SB, SBP]):
         """
         ...
 
+    async def grant_many(
+        self,
+        benefit: SB,
+        grants: Sequence[SubscriptionBenefitGrant],
+        *,
+        attempt: int = 1,
+    ) -> list[dict[str, Any] | SubscriptionBenefitServiceError]:
+        """
+        Executes the logic to grant a benefit to many backers at once.
+
+        By default, it calls `grant` for each of them. Benefit types able to grant
+        by batches, e.g. with bulk queries or API calls, should override it.
+
+        Args:
+            benefit: The SubscriptionBenefit to grant.
+            grants: The grants to fulfill, with their `subscription` and `user` loaded.
+            attempt: Number of times we attempted to grant the benefit.
+
+        Returns:
+            For each grant, in the same order, the properties to store,
+            or the error raised while granting it.
+        """
+        results: list[dict[str, Any] | SubscriptionBenefitServiceError] = []
+        for grant in grants:
+            try:
+                properties = await self.grant(
+                    benefit,
+                    grant.subscription,
+                    grant.user,
+                    grant.properties,
+                    attempt=attempt,
+                )
+            except SubscriptionBenefitServiceError as e:
+                results.append(e)
+            else:
+                results.append(properties)
+        return results
+
+    async def revoke_many(
+        self,
+        benefit: SB,
+        grants: Sequence[SubscriptionBenefitGrant],
+        *,
+        attempt: int = 1,
+    ) -> list[dict[str, Any] | SubscriptionBenefitServiceError]:
+        """
+        Executes the logic to revoke a benefit from many backers at once.
+
+        By default, it calls `revoke` for each of them. Benefit types able to revoke
+        by batches should override it.
+
+        Args:
+            benefit: The SubscriptionBenefit to revoke.
+            grants: The grants to revoke, with their `subscription` and `user` loaded.
+            attempt: Number of times we attempted to revoke the benefit.
+
+        Returns:
+            For each grant, in the same order, the properties to store,
+            or the error raised while revoking it.
+        """
+        results: list[dict[str, Any] | SubscriptionBenefitServiceError] = []
+        for grant in grants:
+            try:
+                properties = await self.revoke(
+                    benefit,
+                    grant.subscription,
+                    grant.user,
+                    grant.properties,
+                    attempt=attempt,
+                )
+            except SubscriptionBenefitServiceError as e:
+                results.append(e)
+            else:
+                results.append(properties)
+        return results
+
     async def requires_update(self, benefit: SB, previous_properties: SBP) -> bool:
         """
         Determines if a benefit update requires to trigger the granting logic again.
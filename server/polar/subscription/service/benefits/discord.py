@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from typing import Any
 
 import httpx
@@ -8,7 +9,7 @@ from polar.integrations.discord.service import DiscordAccountNotConnected
 from polar.integrations.discord.service import discord_bot as discord_bot_service
 from polar.integrations.discord.service import discord_user as discord_user_service
 from polar.logging import Logger
-from polar.models import Subscription, User
+from polar.models import OAuthAccount, Subscription, SubscriptionBenefitGrant, User
 from polar.models.subscription_benefit import (
     SubscriptionBenefitDiscord,
     SubscriptionBenefitDiscordProperties,
@@ -20,6 +21,7 @@ from polar.notifications.notification import (
 from .base import (
     SubscriptionBenefitPreconditionError,
     SubscriptionBenefitRetriableError,
+    SubscriptionBenefitServiceError,
     SubscriptionBenefitServiceProtocol,
 )
 
@@ -100,17 +102,7 @@ class SubscriptionBenefitDiscordService(
                     benefit, subscription, user, grant_properties, attempt=attempt
                 )
 
-        try:
-            account = await discord_user_service.get_oauth_account(self.session, user)
-        except DiscordAccountNotConnected as e:
-            raise SubscriptionBenefitPreconditionError(
-                "Discord account not linked",
-                payload=SubscriptionBenefitPreconditionErrorNotificationContextualPayload(
-                    subject_template=precondition_error_subject_template,
-                    body_template=precondition_error_body_template,
-                    extra_context={"url": settings.generate_frontend_url("/settings")},
-                ),
-            ) from e
+        account = await self._get_oauth_account(user)
 
         try:
             await discord_bot_service.add_member(self.session, guild_id, role_id, user)
@@ -156,6 +148,103 @@ class SubscriptionBenefitDiscordService(
 
         return {}
 
+    async def grant_many(
+        self,
+        benefit: SubscriptionBenefitDiscord,
+        grants: Sequence[SubscriptionBenefitGrant],
+        *,
+        attempt: int = 1,
+    ) -> list[dict[str, Any] | SubscriptionBenefitServiceError]:
+        guild_id = benefit.properties["guild_id"]
+        role_id = benefit.properties["role_id"]
+
+        results: list[dict[str, Any] | SubscriptionBenefitServiceError] = []
+        accounts: dict[int, OAuthAccount] = {}
+        for i, grant in enumerate(grants):
+            try:
+                accounts[i] = await self._get_oauth_account(grant.user)
+            except SubscriptionBenefitServiceError as e:
+                results.append(e)
+            else:
+                results.append({})
+
+        try:
+            members_roles = await discord_bot_service.get_members_roles(
+                guild_id, [account.account_id for account in accounts.values()]
+            )
+        except httpx.HTTPError:
+            raise SubscriptionBenefitRetriableError(2**attempt)
+
+        for i, account in accounts.items():
+            roles = (
+                members_roles.get(account.account_id)
+                if members_roles is not None
+                else None
+            )
+            try:
+                if roles is None:
+                    await discord_bot_service.add_member(
+                        self.session, guild_id, role_id, grants[i].user
+                    )
+                else:
+                    # Even if the snapshot has the role: it may be stale,
+                    # and adding a role the member already has is a no-op
+                    await discord_bot_service.add_member_role(
+                        guild_id, role_id, account.account_id
+                    )
+            except httpx.HTTPError:
+                results[i] = SubscriptionBenefitRetriableError(2**attempt)
+                continue
+
+            results[i] = {
+                "guild_id": guild_id,
+                "role_id": role_id,
+                "account_id": account.account_id,
+            }
+
+        log.debug(
+            "Benefit granted by batch",
+            benefit_id=str(benefit.id),
+            count=len(accounts),
+        )
+        return results
+
+    async def revoke_many(
+        self,
+        benefit: SubscriptionBenefitDiscord,
+        grants: Sequence[SubscriptionBenefitGrant],
+        *,
+        attempt: int = 1,
+    ) -> list[dict[str, Any] | SubscriptionBenefitServiceError]:
+        results: list[dict[str, Any] | SubscriptionBenefitServiceError] = []
+        for grant in grants:
+            # Never granted, nothing to remove
+            if not grant.properties:
+                results.append({})
+                continue
+
+            guild_id = grant.properties["guild_id"]
+            role_id = grant.properties["role_id"]
+            account_id = grant.properties["account_id"]
+
+            # Even if the snapshot doesn't have the role: it may be stale,
+            # and removing a role the member doesn't have is a no-op
+            try:
+                await discord_bot_service.remove_member_role(
+                    guild_id, role_id, account_id
+                )
+            except httpx.HTTPError:
+                results.append(SubscriptionBenefitRetriableError(2**attempt))
+            else:
+                results.append({})
+
+        log.debug(
+            "Benefit revoked by batch",
+            benefit_id=str(benefit.id),
+            count=len(grants),
+        )
+        return results
+
     async def requires_update(
         self,
         benefit: SubscriptionBenefitDiscord,
@@ -166,3 +255,16 @@ class SubscriptionBenefitDiscordService(
             new_properties["guild_id"] != previous_properties["guild_id"]
             or new_properties["role_id"] != previous_properties["role_id"]
         )
+
+    async def _get_oauth_account(self, user: User) -> OAuthAccount:
+        try:
+            return await discord_user_service.get_oauth_account(self.session, user)
+        except DiscordAccountNotConnected as e:
+            raise SubscriptionBenefitPreconditionError(
+                "Discord account not linked",
+                payload=SubscriptionBenefitPreconditionErrorNotificationContextualPayload(
+                    subject_template=precondition_error_subject_template,
+                    body_template=precondition_error_body_template,
+                    extra_context={"url": settings.generate_frontend_url("/settings")},
+                ),
+            ) from e
@@ -170,7 +170,7 @@ class SubscribeSessionService:
         elif customer_email is not None:
             customer_options["customer_email"] = customer_email
 
-        checkout_session = stripe_service.create_subscription_checkout_session(
+        checkout_session = await stripe_service.create_subscription_checkout_session(
             subscription_tier.stripe_price_id,
             success_url,
             is_tax_applicable=subscription_tier.is_tax_applicable,
@@ -184,7 +184,7 @@ class SubscribeSessionService:
     async def get_subscribe_session(
         self, session: AsyncSession, id: str
     ) -> SubscribeSession:
-        checkout_session = stripe_service.get_checkout_session(id)
+        checkout_session = await stripe_service.get_checkout_session(id)
 
         if checkout_session.metadata is None:
             raise ResourceNotFound()
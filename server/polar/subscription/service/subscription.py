@@ -31,7 +31,7 @@ from polar.integrations.loops.service import loops as loops_service
 from polar.integrations.stripe.service import stripe as stripe_service
 from polar.integrations.stripe.utils import get_expandable_id
 from polar.kit.db.postgres import AsyncSession
-from polar.kit.pagination import PaginationParams, paginate
+from polar.kit.pagination import PaginationParams, keyset_paginate, paginate
 from polar.kit.services import ResourceServiceReader
 from polar.kit.sorting import Sorting
 from polar.kit.utils import utc_now
@@ -61,9 +61,6 @@ from polar.transaction.service.transfer import (
     transfer_transaction as transfer_transaction_service,
 )
 from polar.user.service import user as user_service
-from polar.user_organization.service import (
-    user_organization as user_organization_service,
-)
 from polar.worker import enqueue_job
 
 from ..schemas import (
@@ -227,7 +224,7 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
         sorting: list[Sorting[SearchSortProperty]] = [
             (SearchSortProperty.started_at, True)
         ],
-    ) -> tuple[Sequence[Subscription], int]:
+    ) -> tuple[Sequence[Subscription], int, str | None]:
         statement = self._get_readable_subscriptions_statement(user).where(
             Subscription.started_at.is_not(None)
         )
@@ -285,7 +282,6 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
                 order_by_clauses.append(clause_function(SubscriptionTier.type))
             if criterion == SearchSortProperty.subscription_tier:
                 order_by_clauses.append(clause_function(SubscriptionTier.name))
-        statement = statement.order_by(*order_by_clauses)
 
         statement = statement.options(
             contains_eager(Subscription.subscription_tier),
@@ -293,9 +289,13 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             joinedload(Subscription.organization),
         )
 
-        results, count = await paginate(session, statement, pagination=pagination)
-
-        return results, count
+        return await keyset_paginate(
+            session,
+            statement,
+            pagination=pagination,
+            order_by=order_by_clauses,
+            id_column=Subscription.id,
+        )
 
     async def search_subscribed(
         self,
@@ -568,7 +568,7 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
         subscription.set_started_at()
 
         customer_id = get_expandable_id(stripe_subscription.customer)
-        customer = stripe_service.get_customer(customer_id)
+        customer = await stripe_service.get_customer(customer_id)
         customer_email = cast(str, customer.email)
 
         # Subscribe as organization
@@ -719,7 +719,7 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
         else:
             invoice_metadata["transfer_id"] = cast(str, incoming.transfer_id)
             assert invoice.id is not None
-            stripe_service.update_invoice(invoice.id, metadata=invoice_metadata)
+            await stripe_service.update_invoice(invoice.id, metadata=invoice_metadata)
 
     async def enqueue_benefits_grants(
         self, session: AsyncSession, subscription: Subscription
@@ -732,84 +732,39 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
         if subscription.is_incomplete():
             return
 
-        # Get granted benefits that are not part of this tier.
-        # It happens if the subscription has been upgraded/downgraded.
-        outdated_grants = await subscription_benefit_grant_service.get_outdated_grants(
-            session, subscription, subscription_tier
+        await self._ensure_articles_benefits(session, [subscription_tier])
+        await subscription_benefit_grant_service.enqueue_grants_diff(
+            session, subscription_id=subscription.id
         )
 
-        # Grant to all members of the organization if any, or the user
-        users_ids: list[uuid.UUID] = []
-        if subscription.organization_id is not None:
-            members = await user_organization_service.list_by_org(
-                session, subscription.organization_id
-            )
-            users_ids = [member.user_id for member in members]
-        else:
-            users_ids = [subscription.user_id]
-
-        for user_id in users_ids:
-            task = "grant" if subscription.active else "revoke"
-            for benefit in subscription_tier.benefits:
-                await enqueue_job(
-                    f"subscription.subscription_benefit.{task}",
-                    subscription_id=subscription.id,
-                    user_id=user_id,
-                    subscription_benefit_id=benefit.id,
-                )
-
-            for outdated_grant in outdated_grants:
-                await enqueue_job(
-                    "subscription.subscription_benefit.revoke",
-                    subscription_id=subscription.id,
-                    user_id=user_id,
-                    subscription_benefit_id=outdated_grant.subscription_benefit_id,
-                )
-
-            # Special hard-coded logic to make sure
-            # we always at least subscribe to public articles
-            if subscription_tier.get_articles_benefit() is None:
-                await session.refresh(subscription_tier, {"organization", "repository"})
-                (
-                    free_articles_benefit,
-                    _,
-                ) = await subscription_benefit_service.get_or_create_articles_benefits(
-                    session,
-                    subscription_tier.organization,
-                    subscription_tier.repository,
-                )
-                await enqueue_job(
-                    f"subscription.subscription_benefit.{task}",
-                    subscription_id=subscription.id,
-                    user_id=user_id,
-                    subscription_benefit_id=free_articles_benefit.id,
-                )
-
     async def update_subscription_tier_benefits_grants(
         self, session: AsyncSession, subscription_tier: SubscriptionTier
     ) -> None:
-        statement = select(Subscription).where(
-            Subscription.subscription_tier_id == subscription_tier.id,
-            Subscription.deleted_at.is_(None),
+        statement = select(SubscriptionTier).where(
+            SubscriptionTier.id == subscription_tier.id
+        )
+        result = await session.execute(statement)
+        await self._ensure_articles_benefits(session, result.scalars().all())
+        await subscription_benefit_grant_service.enqueue_grants_diff(
+            session, subscription_tier_id=subscription_tier.id
         )
-        subscriptions = await session.stream_scalars(statement)
-        async for subscription in subscriptions:
-            await enqueue_job(
-                "subscription.subscription.enqueue_benefits_grants", subscription.id
-            )
 
     async def update_organization_benefits_grants(
         self, session: AsyncSession, organization: Organization
     ) -> None:
-        statement = select(Subscription).where(
-            Subscription.organization_id == organization.id,
-            Subscription.deleted_at.is_(None),
-        )
-        subscriptions = await session.stream_scalars(statement)
-        async for subscription in subscriptions:
-            await enqueue_job(
-                "subscription.subscription.enqueue_benefits_grants", subscription.id
+        statement = select(SubscriptionTier).where(
+            SubscriptionTier.id.in_(
+                select(Subscription.subscription_tier_id).where(
+                    Subscription.organization_id == organization.id,
+                    Subscription.deleted_at.is_(None),
+                )
             )
+        )
+        result = await session.execute(statement)
+        await self._ensure_articles_benefits(session, result.scalars().all())
+        await subscription_benefit_grant_service.enqueue_grants_diff(
+            session, organization_id=organization.id
+        )
 
     async def upgrade_subscription(
         self,
@@ -856,7 +811,7 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             raise InvalidSubscriptionTierUpgrade(new_subscription_tier.id)
 
         assert old_subscription_tier.stripe_price_id is not None
-        stripe_service.update_subscription_price(
+        await stripe_service.update_subscription_price(
             subscription.stripe_subscription_id,
             old_price=old_subscription_tier.stripe_price_id,
             new_price=new_subscription_tier.stripe_price_id,
@@ -889,7 +844,9 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             raise AlreadyCanceledSubscription(subscription)
 
         if subscription.stripe_subscription_id is not None:
-            stripe_service.cancel_subscription(subscription.stripe_subscription_id)
+            await stripe_service.cancel_subscription(
+                subscription.stripe_subscription_id
+            )
         else:
             subscription.ended_at = utc_now()
             subscription.cancel_at_period_end = True
@@ -1153,5 +1110,19 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             )
         )
 
+    async def _ensure_articles_benefits(
+        self, session: AsyncSession, subscription_tiers: Sequence[SubscriptionTier]
+    ) -> None:
+        # Special hard-coded logic to make sure
+        # we always at least subscribe to public articles
+        for subscription_tier in subscription_tiers:
+            if subscription_tier.get_articles_benefit() is None:
+                await session.refresh(subscription_tier, {"organization", "repository"})
+                await subscription_benefit_service.get_or_create_articles_benefits(
+                    session,
+                    subscription_tier.organization,
+                    subscription_tier.repository,
+                )
+
 
 subscription = SubscriptionService(Subscription)
@@ -1,9 +1,16 @@
+import dataclasses
 from collections.abc import Sequence
+from typing import Any
+from uuid import UUID
 
 import structlog
-from sqlalchemy import select
+from sqlalchemy import Select, and_, literal, select, type_coerce, union_all
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import aliased, joinedload
 
+from polar.config import settings
 from polar.kit.services import ResourceServiceReader
+from polar.kit.utils import generate_uuid
 from polar.logging import Logger
 from polar.models import (
     Subscription,
@@ -12,7 +19,9 @@ from polar.models import (
     SubscriptionTier,
     SubscriptionTierBenefit,
     User,
+    UserOrganization,
 )
+from polar.models.subscription import SubscriptionStatus
 from polar.models.subscription_benefit import (
     SubscriptionBenefitProperties,
     SubscriptionBenefitType,
@@ -25,16 +34,32 @@ from polar.notifications.service import PartialNotification
 from polar.notifications.service import notifications as notification_service
 from polar.organization.service import organization as organization_service
 from polar.postgres import AsyncSession
+from polar.redis import redis
 from polar.user.service import user as user_service
-from polar.worker import enqueue_job
+from polar.worker import BulkJob, enqueue_job, enqueue_jobs
 
 from .benefits import (
     SubscriptionBenefitPreconditionError,
+    SubscriptionBenefitRetriableError,
+    SubscriptionBenefitServiceError,
     get_subscription_benefit_service,
 )
 
 log: Logger = structlog.get_logger()
 
+_PROGRESS_TTL_SECONDS = 60 * 60 * 24
+
+
+@dataclasses.dataclass
+class BenefitGrantsProgress:
+    total: int
+    processed: int
+    errors: int
+
+    @property
+    def done(self) -> bool:
+        return self.processed >= self.total
+
 
 class SubscriptionBenefitGrantService(ResourceServiceReader[SubscriptionBenefitGrant]):
     async def grant_benefit(
@@ -291,32 +316,180 @@ class SubscriptionBenefitGrantService(ResourceServiceReader[SubscriptionBenefitG
                     subscription_benefit_id=grant.subscription_benefit_id,
                 )
 
-    async def get_outdated_grants(
+    async def enqueue_grants_diff(
         self,
         session: AsyncSession,
-        subscription: Subscription,
-        current_subscription_tier: SubscriptionTier,
-    ) -> Sequence[SubscriptionBenefitGrant]:
-        subscription_tier_benefits_statement = (
-            select(SubscriptionBenefit.id)
-            .join(SubscriptionTierBenefit)
-            .where(
-                SubscriptionTierBenefit.subscription_tier_id
-                == current_subscription_tier.id
+        *,
+        subscription_id: UUID | None = None,
+        subscription_tier_id: UUID | None = None,
+        organization_id: UUID | None = None,
+    ) -> str:
+        """
+        Enqueue the grants and revokes bringing the benefits
+        of the matching subscriptions to their expected state.
+
+        The expected grants, i.e. each benefit of the tier for each beneficiary
+        of the subscription, are diffed against the existing ones in a single query.
+        Missing grants of active subscriptions are granted; grants which are not
+        expected anymore, because the subscription is not active, the benefit
+        was removed from the tier or the user left the subscribing organization,
+        are revoked. They're processed by batches of grants of the same benefit.
+
+        Returns:
+            The ID of the run, to follow its progress with `get_grants_progress`.
+        """
+        statement = self._get_grants_diff_statement(
+            subscription_id=subscription_id,
+            subscription_tier_id=subscription_tier_id,
+            organization_id=organization_id,
+        )
+
+        run_id = str(generate_uuid())
+        batch_size = settings.SUBSCRIPTION_BENEFIT_GRANTS_BATCH_SIZE
+        batches: dict[tuple[str, UUID], list[tuple[UUID, UUID]]] = {}
+        jobs: dict[str, list[BulkJob]] = {"grant": [], "revoke": []}
+        total = 0
+
+        result = await session.stream(statement)
+        async for row in result:
+            key = (row.action, row.subscription_benefit_id)
+            batch = batches.setdefault(key, [])
+            batch.append((row.subscription_id, row.user_id))
+            total += 1
+            if len(batch) >= batch_size:
+                jobs[row.action].append(
+                    self._build_batch_job(
+                        row.subscription_benefit_id, batches.pop(key), run_id
+                    )
+                )
+        for (action, subscription_benefit_id), batch in batches.items():
+            jobs[action].append(
+                self._build_batch_job(subscription_benefit_id, batch, run_id)
+            )
+
+        # Set before enqueuing, so the jobs can't report before it's initialized
+        await redis.set(self._get_progress_key(run_id), total, ex=_PROGRESS_TTL_SECONDS)
+        for action, action_jobs in jobs.items():
+            await enqueue_jobs(
+                f"subscription.subscription_benefit.{action}_many", action_jobs
             )
+
+        log.info(
+            "subscription.benefit_grants.enqueued",
+            run_id=run_id,
+            total=total,
+            grant_jobs=len(jobs["grant"]),
+            revoke_jobs=len(jobs["revoke"]),
         )
 
-        statement = select(SubscriptionBenefitGrant).where(
-            SubscriptionBenefitGrant.subscription_id == subscription.id,
-            SubscriptionBenefitGrant.subscription_benefit_id.not_in(
-                subscription_tier_benefits_statement
-            ),
-            SubscriptionBenefitGrant.is_granted.is_(True),
-            SubscriptionBenefitGrant.deleted_at.is_(None),
+        return run_id
+
+    async def grant_benefits(
+        self,
+        session: AsyncSession,
+        subscription_benefit: SubscriptionBenefit,
+        targets: Sequence[tuple[UUID, UUID]],
+        *,
+        run_id: str | None = None,
+        attempt: int = 1,
+        last_attempt: bool = True,
+    ) -> Sequence[SubscriptionBenefitGrant]:
+        """
+        Grant a benefit to a batch of subscription and user pairs.
+
+        Already granted ones are skipped, so a batch can safely be retried.
+        Grants failing temporarily are only reported in the progress
+        of the run on the `last_attempt`.
+
+        Raises:
+            SubscriptionBenefitRetriableError: Some grants failed temporarily.
+            The other ones are saved.
+        """
+        grants = await self._get_or_build_grants(session, subscription_benefit, targets)
+        pending = [grant for grant in grants if not grant.is_granted]
+
+        benefit_service = get_subscription_benefit_service(
+            subscription_benefit.type, session
+        )
+        results = await benefit_service.grant_many(
+            subscription_benefit, pending, attempt=attempt
         )
 
-        result = await session.execute(statement)
-        return result.scalars().all()
+        retriable_error = await self._save_batch(
+            session, subscription_benefit, pending, results, granted=True
+        )
+        await self._report_progress(
+            run_id,
+            subscription_benefit,
+            targets,
+            pending,
+            results,
+            last_attempt=last_attempt,
+        )
+        if retriable_error is not None:
+            raise retriable_error
+
+        return grants
+
+    async def revoke_benefits(
+        self,
+        session: AsyncSession,
+        subscription_benefit: SubscriptionBenefit,
+        targets: Sequence[tuple[UUID, UUID]],
+        *,
+        run_id: str | None = None,
+        attempt: int = 1,
+        last_attempt: bool = True,
+    ) -> Sequence[SubscriptionBenefitGrant]:
+        """
+        Revoke a benefit from a batch of subscription and user pairs.
+
+        Already revoked ones are skipped, so a batch can safely be retried.
+        Revokes failing temporarily are only reported in the progress
+        of the run on the `last_attempt`.
+
+        Raises:
+            SubscriptionBenefitRetriableError: Some revokes failed temporarily.
+            The other ones are saved.
+        """
+        grants = await self._get_or_build_grants(session, subscription_benefit, targets)
+        pending = [grant for grant in grants if not grant.is_revoked]
+
+        benefit_service = get_subscription_benefit_service(
+            subscription_benefit.type, session
+        )
+        results = await benefit_service.revoke_many(
+            subscription_benefit, pending, attempt=attempt
+        )
+
+        retriable_error = await self._save_batch(
+            session, subscription_benefit, pending, results, granted=False
+        )
+        await self._report_progress(
+            run_id,
+            subscription_benefit,
+            targets,
+            pending,
+            results,
+            last_attempt=last_attempt,
+        )
+        if retriable_error is not None:
+            raise retriable_error
+
+        return grants
+
+    async def get_grants_progress(self, run_id: str) -> BenefitGrantsProgress | None:
+        key = self._get_progress_key(run_id)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.scard(f"{key}:processed")
+            pipe.scard(f"{key}:errors")
+            total, processed, errors = await pipe.execute()
+        if total is None:
+            return None
+        return BenefitGrantsProgress(
+            total=int(total), processed=processed, errors=errors
+        )
 
     async def get_by_subscription_user_and_benefit(
         self,
@@ -367,5 +540,358 @@ class SubscriptionBenefitGrantService(ResourceServiceReader[SubscriptionBenefitG
         result = await session.execute(statement)
         return result.scalars().all()
 
+    def _get_grants_diff_statement(
+        self,
+        *,
+        subscription_id: UUID | None,
+        subscription_tier_id: UUID | None,
+        organization_id: UUID | None,
+    ) -> Select[tuple[str, UUID, UUID, UUID]]:
+        scope_statement = select(
+            Subscription.id,
+            Subscription.user_id,
+            Subscription.organization_id,
+            Subscription.subscription_tier_id,
+            Subscription.active.label("active"),
+        ).where(
+            Subscription.deleted_at.is_(None),
+            Subscription.status.not_in(
+                [SubscriptionStatus.incomplete, SubscriptionStatus.incomplete_expired]
+            ),
+        )
+        if subscription_id is not None:
+            scope_statement = scope_statement.where(Subscription.id == subscription_id)
+        if subscription_tier_id is not None:
+            scope_statement = scope_statement.where(
+                Subscription.subscription_tier_id == subscription_tier_id
+            )
+        if organization_id is not None:
+            scope_statement = scope_statement.where(
+                Subscription.organization_id == organization_id
+            )
+        scope = scope_statement.cte("scope")
+
+        # Organization subscriptions benefit to all its members
+        beneficiaries = union_all(
+            select(
+                scope.c.id.label("subscription_id"), scope.c.user_id.label("user_id")
+            ).where(scope.c.organization_id.is_(None)),
+            select(scope.c.id, UserOrganization.user_id).join(
+                UserOrganization,
+                and_(
+                    UserOrganization.organization_id == scope.c.organization_id,
+                    UserOrganization.deleted_at.is_(None),
+                ),
+            ),
+        ).cte("beneficiaries")
+
+        # Tiers without articles benefit always give access to the public articles
+        articles_tier_benefit = aliased(SubscriptionTierBenefit)
+        articles_benefit = aliased(SubscriptionBenefit)
+        has_articles_benefit = (
+            select(articles_tier_benefit.id)
+            .join(
+                articles_benefit,
+                articles_benefit.id == articles_tier_benefit.subscription_benefit_id,
+            )
+            .where(
+                articles_tier_benefit.subscription_tier_id == SubscriptionTier.id,
+                articles_benefit.type == SubscriptionBenefitType.articles,
+            )
+            .exists()
+        )
+        tier_benefits = union_all(
+            select(
+                SubscriptionTierBenefit.subscription_tier_id.label(
+                    "subscription_tier_id"
+                ),
+                SubscriptionTierBenefit.subscription_benefit_id.label(
+                    "subscription_benefit_id"
+                ),
+            ).where(
+                SubscriptionTierBenefit.subscription_tier_id.in_(
+                    select(scope.c.subscription_tier_id)
+                )
+            ),
+            select(SubscriptionTier.id, SubscriptionBenefit.id)
+            .join(
+                SubscriptionBenefit,
+                and_(
+                    SubscriptionBenefit.organization_id.is_not_distinct_from(
+                        SubscriptionTier.organization_id
+                    ),
+                    SubscriptionBenefit.repository_id.is_not_distinct_from(
+                        SubscriptionTier.repository_id
+                    ),
+                ),
+            )
+            .where(
+                SubscriptionTier.id.in_(select(scope.c.subscription_tier_id)),
+                SubscriptionBenefit.type == SubscriptionBenefitType.articles,
+                type_coerce(SubscriptionBenefit.properties, JSONB)["paid_articles"]
+                .as_boolean()
+                .is_(False),
+                SubscriptionBenefit.deleted_at.is_(None),
+                ~has_articles_benefit,
+            ),
+        ).cte("tier_benefits")
+
+        expected = (
+            select(
+                scope.c.id.label("subscription_id"),
+                beneficiaries.c.user_id,
+                tier_benefits.c.subscription_benefit_id,
+                scope.c.active,
+            )
+            .join(beneficiaries, beneficiaries.c.subscription_id == scope.c.id)
+            .join(
+                tier_benefits,
+                tier_benefits.c.subscription_tier_id == scope.c.subscription_tier_id,
+            )
+            .cte("expected")
+        )
+
+        to_grant = select(
+            literal("grant").label("action"),
+            expected.c.subscription_benefit_id,
+            expected.c.subscription_id,
+            expected.c.user_id,
+        ).where(
+            expected.c.active.is_(True),
+            ~select(SubscriptionBenefitGrant.id)
+            .where(
+                SubscriptionBenefitGrant.subscription_id == expected.c.subscription_id,
+                SubscriptionBenefitGrant.user_id == expected.c.user_id,
+                SubscriptionBenefitGrant.subscription_benefit_id
+                == expected.c.subscription_benefit_id,
+                SubscriptionBenefitGrant.is_granted.is_(True),
+                SubscriptionBenefitGrant.deleted_at.is_(None),
+            )
+            .exists(),
+        )
+        to_revoke = select(
+            literal("revoke"),
+            SubscriptionBenefitGrant.subscription_benefit_id,
+            SubscriptionBenefitGrant.subscription_id,
+            SubscriptionBenefitGrant.user_id,
+        ).where(
+            SubscriptionBenefitGrant.subscription_id.in_(select(scope.c.id)),
+            SubscriptionBenefitGrant.is_revoked.is_(False),
+            SubscriptionBenefitGrant.deleted_at.is_(None),
+            ~select(expected.c.subscription_id)
+            .where(
+                expected.c.subscription_id == SubscriptionBenefitGrant.subscription_id,
+                expected.c.user_id == SubscriptionBenefitGrant.user_id,
+                expected.c.subscription_benefit_id
+                == SubscriptionBenefitGrant.subscription_benefit_id,
+                expected.c.active.is_(True),
+            )
+            .exists(),
+        )
+
+        diff = union_all(to_grant, to_revoke).subquery("diff")
+        return select(
+            diff.c.action,
+            diff.c.subscription_benefit_id,
+            diff.c.subscription_id,
+            diff.c.user_id,
+        ).order_by(diff.c.action, diff.c.subscription_benefit_id)
+
+    def _build_batch_job(
+        self,
+        subscription_benefit_id: UUID,
+        targets: list[tuple[UUID, UUID]],
+        run_id: str,
+    ) -> BulkJob:
+        return BulkJob(
+            kwargs={
+                "subscription_benefit_id": subscription_benefit_id,
+                "targets": targets,
+                "run_id": run_id,
+            }
+        )
+
+    async def _get_or_build_grants(
+        self,
+        session: AsyncSession,
+        subscription_benefit: SubscriptionBenefit,
+        targets: Sequence[tuple[UUID, UUID]],
+    ) -> list[SubscriptionBenefitGrant]:
+        subscriptions_result = await session.execute(
+            select(Subscription).where(
+                Subscription.id.in_({subscription_id for subscription_id, _ in targets})
+            )
+        )
+        subscriptions = {
+            subscription.id: subscription
+            for subscription in subscriptions_result.scalars().all()
+        }
+        users_result = await session.execute(
+            select(User).where(User.id.in_({user_id for _, user_id in targets}))
+        )
+        users = {user.id: user for user in users_result.unique().scalars().all()}
+
+        grants_result = await session.execute(
+            select(SubscriptionBenefitGrant)
+            .where(
+                SubscriptionBenefitGrant.subscription_benefit_id
+                == subscription_benefit.id,
+                SubscriptionBenefitGrant.subscription_id.in_(subscriptions.keys()),
+                SubscriptionBenefitGrant.user_id.in_(users.keys()),
+                SubscriptionBenefitGrant.deleted_at.is_(None),
+            )
+            .options(
+                joinedload(SubscriptionBenefitGrant.subscription),
+                joinedload(SubscriptionBenefitGrant.user),
+            )
+        )
+        existing_grants = {
+            (grant.subscription_id, grant.user_id): grant
+            for grant in grants_result.unique().scalars().all()
+        }
+
+        grants: list[SubscriptionBenefitGrant] = []
+        for subscription_id, user_id in targets:
+            subscription = subscriptions.get(subscription_id)
+            user = users.get(user_id)
+            # Deleted since the batch was enqueued
+            if subscription is None or user is None:
+                continue
+
+            grant = existing_grants.get((subscription_id, user_id))
+            if grant is None:
+                grant = SubscriptionBenefitGrant(
+                    subscription=subscription,
+                    user=user,
+                    subscription_benefit=subscription_benefit,
+                )
+            grants.append(grant)
+
+        return grants
+
+    async def _save_batch(
+        self,
+        session: AsyncSession,
+        subscription_benefit: SubscriptionBenefit,
+        grants: Sequence[SubscriptionBenefitGrant],
+        results: Sequence[dict[str, Any] | SubscriptionBenefitServiceError],
+        *,
+        granted: bool,
+    ) -> SubscriptionBenefitRetriableError | None:
+        """
+        Save the grants from the results of their benefit service.
+
+        Returns:
+            The retriable error with the longest delay, if any: the whole batch
+            should be retried, the saved grants will be skipped.
+        """
+        retriable_error: SubscriptionBenefitRetriableError | None = None
+        for grant, result in zip(grants, results, strict=True):
+            if isinstance(result, SubscriptionBenefitRetriableError):
+                if (
+                    retriable_error is None
+                    or result.defer_seconds > retriable_error.defer_seconds
+                ):
+                    retriable_error = result
+                continue
+
+            if isinstance(result, SubscriptionBenefitPreconditionError):
+                await self.handle_precondition_error(
+                    session,
+                    result,
+                    grant.subscription,
+                    grant.user,
+                    subscription_benefit,
+                )
+                grant.granted_at = None
+            elif isinstance(result, SubscriptionBenefitServiceError):
+                log.error(
+                    "subscription.benefit_grants.error",
+                    subscription_id=str(grant.subscription_id),
+                    user_id=str(grant.user_id),
+                    subscription_benefit_id=str(subscription_benefit.id),
+                    error=str(result),
+                )
+                continue
+            else:
+                grant.properties = result
+                if granted:
+                    grant.set_granted()
+                else:
+                    grant.set_revoked()
+
+            session.add(grant)
+
+        await session.commit()
+
+        return retriable_error
+
+    async def _report_progress(
+        self,
+        run_id: str | None,
+        subscription_benefit: SubscriptionBenefit,
+        targets: Sequence[tuple[UUID, UUID]],
+        pending: Sequence[SubscriptionBenefitGrant],
+        results: Sequence[dict[str, Any] | SubscriptionBenefitServiceError],
+        *,
+        last_attempt: bool,
+    ) -> None:
+        """
+        Count the targets of the batch whose outcome is final in the progress.
+
+        Targets are stored in sets, so the ones seen by several attempts
+        of a batch are only counted once, with their last outcome.
+        """
+        if run_id is None:
+            return
+
+        pending_results = {
+            (grant.subscription.id, grant.user.id): result
+            for grant, result in zip(pending, results)
+        }
+        processed: list[str] = []
+        errors: list[str] = []
+        successes: list[str] = []
+        for subscription_id, user_id in targets:
+            member = f"{subscription_benefit.id}:{subscription_id}:{user_id}"
+            # Already processed or skipped targets are successes
+            result = pending_results.get((subscription_id, user_id), {})
+            if (
+                isinstance(result, SubscriptionBenefitRetriableError)
+                and not last_attempt
+            ):
+                continue
+            processed.append(member)
+            if isinstance(result, SubscriptionBenefitServiceError):
+                errors.append(member)
+            else:
+                successes.append(member)
+
+        if not processed:
+            return
+
+        key = self._get_progress_key(run_id)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(f"{key}:processed", *processed)
+            if errors:
+                pipe.sadd(f"{key}:errors", *errors)
+            if successes:
+                pipe.srem(f"{key}:errors", *successes)
+            for suffix in ("processed", "errors"):
+                pipe.expire(f"{key}:{suffix}", _PROGRESS_TTL_SECONDS)
+            await pipe.execute()
+
+        progress = await self.get_grants_progress(run_id)
+        log.info(
+            "subscription.benefit_grants.progress",
+            run_id=run_id,
+            total=progress.total if progress else None,
+            processed=progress.processed if progress else None,
+            errors=progress.errors if progress else None,
+        )
+
+    def _get_progress_key(self, run_id: str) -> str:
+        return f"subscription:benefit_grants:{run_id}"
+
 
 subscription_benefit_grant = SubscriptionBenefitGrantService(SubscriptionBenefitGrant)
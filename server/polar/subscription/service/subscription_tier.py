@@ -224,7 +224,7 @@ class SubscriptionTierService(
                 metadata["repository_id"] = str(repository.id)
                 metadata["repository_name"] = repository.name
 
-            product = stripe_service.create_product_with_price(
+            product = await stripe_service.create_product_with_price(
                 subscription_tier.get_stripe_name(),
                 price_amount=subscription_tier.price_amount,
                 price_currency=subscription_tier.price_currency,
@@ -272,7 +272,7 @@ class SubscriptionTierService(
             product_update["description"] = update_schema.description
 
         if product_update and subscription_tier.stripe_product_id is not None:
-            stripe_service.update_product(
+            await stripe_service.update_product(
                 subscription_tier.stripe_product_id, **product_update
             )
 
@@ -282,13 +282,13 @@ class SubscriptionTierService(
             and subscription_tier.stripe_price_id is not None
             and update_schema.price_amount != subscription_tier.price_amount
         ):
-            new_price = stripe_service.create_price_for_product(
+            new_price = await stripe_service.create_price_for_product(
                 subscription_tier.stripe_product_id,
                 update_schema.price_amount,
                 subscription_tier.price_currency,
                 set_default=True,
             )
-            stripe_service.archive_price(subscription_tier.stripe_price_id)
+            await stripe_service.archive_price(subscription_tier.stripe_price_id)
             subscription_tier.stripe_price_id = new_price.id
 
         if update_schema.is_highlighted:
@@ -427,7 +427,7 @@ class SubscriptionTierService(
             raise FreeTierIsNotArchivable(subscription_tier.id)
 
         if subscription_tier.stripe_product_id is not None:
-            stripe_service.archive_product(subscription_tier.stripe_product_id)
+            await stripe_service.archive_product(subscription_tier.stripe_product_id)
 
         return await subscription_tier.update(session, is_archived=True)
 
@@ -21,6 +21,9 @@ from .service.subscription_benefit_grant import (
 )
 from .service.subscription_tier import subscription_tier as subscription_tier_service
 
+# Attempts of a batch of grants or revokes failing with retriable errors
+BATCH_MAX_TRIES = 5
+
 
 class SubscriptionTaskError(PolarError):
     ...
@@ -167,6 +170,62 @@ async def subscription_benefit_revoke(
             raise Retry(e.defer_seconds) from e
 
 
+@task("subscription.subscription_benefit.grant_many", max_tries=BATCH_MAX_TRIES)
+async def subscription_benefit_grant_many(
+    ctx: JobContext,
+    subscription_benefit_id: uuid.UUID,
+    targets: list[tuple[uuid.UUID, uuid.UUID]],
+    run_id: str,
+    polar_context: PolarWorkerContext,
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        subscription_benefit = await subscription_benefit_service.get(
+            session, subscription_benefit_id
+        )
+        if subscription_benefit is None:
+            raise SubscriptionBenefitDoesNotExist(subscription_benefit_id)
+
+        try:
+            await subscription_benefit_grant_service.grant_benefits(
+                session,
+                subscription_benefit,
+                targets,
+                run_id=run_id,
+                attempt=ctx["job_try"],
+                last_attempt=ctx["job_try"] >= BATCH_MAX_TRIES,
+            )
+        except SubscriptionBenefitRetriableError as e:
+            raise Retry(e.defer_seconds) from e
+
+
+@task("subscription.subscription_benefit.revoke_many", max_tries=BATCH_MAX_TRIES)
+async def subscription_benefit_revoke_many(
+    ctx: JobContext,
+    subscription_benefit_id: uuid.UUID,
+    targets: list[tuple[uuid.UUID, uuid.UUID]],
+    run_id: str,
+    polar_context: PolarWorkerContext,
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        subscription_benefit = await subscription_benefit_service.get(
+            session, subscription_benefit_id
+        )
+        if subscription_benefit is None:
+            raise SubscriptionBenefitDoesNotExist(subscription_benefit_id)
+
+        try:
+            await subscription_benefit_grant_service.revoke_benefits(
+                session,
+                subscription_benefit,
+                targets,
+                run_id=run_id,
+                attempt=ctx["job_try"],
+                last_attempt=ctx["job_try"] >= BATCH_MAX_TRIES,
+            )
+        except SubscriptionBenefitRetriableError as e:
+            raise Retry(e.defer_seconds) from e
+
+
 @task("subscription.subscription_benefit.update")
 async def subscription_benefit_update(
     ctx: JobContext,
@@ -3,19 +3,25 @@ from polar.article import tasks as article
 from polar.integrations.github import tasks as github
 from polar.integrations.loops import tasks as loops
 from polar.integrations.stripe import tasks as stripe
+from polar.issue import tasks as issue
 from polar.magic_link import tasks as magic_link
 from polar.notifications import tasks as notifications
 from polar.organization import tasks as organization
+from polar.personal_access_token import tasks as personal_access_token
+from polar.pledge import tasks as pledge
 from polar.subscription import tasks as subscription
 
 __all__ = [
     "account",
     "article",
     "github",
+    "issue",
     "loops",
     "stripe",
     "magic_link",
     "notifications",
     "organization",
+    "personal_access_token",
+    "pledge",
     "subscription",
 ]
@@ -7,7 +7,7 @@ from polar.account.service import account as account_service
 from polar.auth.dependencies import UserRequiredAuth
 from polar.authz.service import Authz
 from polar.exceptions import ResourceNotFound
-from polar.kit.pagination import ListResource, PaginationParamsQuery
+from polar.kit.pagination import CursorPaginationParamsQuery, ListResource
 from polar.kit.sorting import Sorting, SortingGetter
 from polar.models.transaction import TransactionType
 from polar.postgres import AsyncSession, get_db_session
@@ -28,7 +28,7 @@ SearchSorting = Annotated[
 
 @router.get("/search", response_model=ListResource[Transaction], tags=[Tags.PUBLIC])
 async def search_transactions(
-    pagination: PaginationParamsQuery,
+    pagination: CursorPaginationParamsQuery,
     sorting: SearchSorting,
     auth: UserRequiredAuth,
     type: TransactionType | None = Query(None),
@@ -37,7 +37,7 @@ async def search_transactions(
     payment_organization_id: UUID4 | None = Query(None),
     session: AsyncSession = Depends(get_db_session),
 ) -> ListResource[Transaction]:
-    results, count = await transaction_service.search(
+    results, count, next_cursor = await transaction_service.search(
         session,
         auth.subject,
         type=type,
@@ -52,6 +52,7 @@ async def search_transactions(
         [Transaction.model_validate(result) for result in results],
         count,
         pagination,
+        next_cursor,
     )
 
 
@@ -67,7 +67,7 @@ class PaymentTransactionService(BaseTransactionService):
         tax_country = None
         tax_state = None
         if charge.invoice:
-            stripe_invoice = stripe_service.get_invoice(
+            stripe_invoice = await stripe_service.get_invoice(
                 get_expandable_id(charge.invoice)
             )
             if stripe_invoice.tax is not None:
@@ -106,7 +106,7 @@ class PaymentTransactionService(BaseTransactionService):
         # Retrieve Stripe fee
         processor_fee_amount = 0
         if charge.balance_transaction:
-            stripe_balance_transaction = stripe_service.get_balance_transaction(
+            stripe_balance_transaction = await stripe_service.get_balance_transaction(
                 get_expandable_id(charge.balance_transaction)
             )
             processor_fee_amount = stripe_balance_transaction.fee
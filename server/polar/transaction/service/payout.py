@@ -80,7 +80,7 @@ class PayoutTransactionService(BaseTransactionService):
         balance_transactions = stripe_service.list_balance_transactions(
             account_id=account.stripe_id, payout=payout.id
         )
-        for balance_transaction in balance_transactions:
+        async for balance_transaction in balance_transactions:
             source = balance_transaction.source
             if source is not None:
                 source_transfer: str | None = getattr(source, "source_transfer", None)
@@ -39,7 +39,7 @@ class RefundTransactionService(BaseTransactionService):
 
         refund_transactions: list[Transaction] = []
         # Handle each individual refund
-        for refund in refunds:
+        async for refund in refunds:
             if refund.status != "succeeded":
                 continue
 
@@ -53,7 +53,7 @@ class RefundTransactionService(BaseTransactionService):
             # Retrieve Stripe fee
             processor_fee_amount = 0
             if refund.balance_transaction is not None:
-                balance_transaction = stripe_service.get_balance_transaction(
+                balance_transaction = await stripe_service.get_balance_transaction(
                     get_expandable_id(refund.balance_transaction)
                 )
                 processor_fee_amount = balance_transaction.fee
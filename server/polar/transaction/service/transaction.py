@@ -8,7 +8,7 @@ from sqlalchemy.orm import aliased, joinedload, subqueryload
 
 from polar.authz.service import AccessType, Authz
 from polar.exceptions import NotPermitted, ResourceNotFound
-from polar.kit.pagination import PaginationParams, paginate
+from polar.kit.pagination import PaginationParams, keyset_paginate
 from polar.kit.sorting import Sorting
 from polar.models import (
     Account,
@@ -50,7 +50,7 @@ class TransactionService(BaseTransactionService):
         sorting: list[Sorting[SearchSortProperty]] = [
             (SearchSortProperty.created_at, True)
         ],
-    ) -> tuple[Sequence[Transaction], int]:
+    ) -> tuple[Sequence[Transaction], int, str | None]:
         statement = self._get_readable_transactions_statement(user)
 
         statement = statement.options(
@@ -92,9 +92,13 @@ class TransactionService(BaseTransactionService):
             elif criterion == SearchSortProperty.amount:
                 order_by_clauses.append(clause_function(Transaction.amount))
 
-        results, count = await paginate(session, statement, pagination=pagination)
-
-        return results, count
+        return await keyset_paginate(
+            session,
+            statement,
+            pagination=pagination,
+            order_by=order_by_clauses,
+            id_column=Transaction.id,
+        )
 
     async def lookup(
         self, session: AsyncSession, id: uuid.UUID, user: User
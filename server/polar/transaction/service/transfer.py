@@ -8,7 +8,6 @@ from polar.account.service import account as account_service
 from polar.enums import AccountType
 from polar.integrations.stripe.service import stripe as stripe_service
 from polar.integrations.stripe.utils import get_expandable_id
-from polar.kit.utils import generate_uuid
 from polar.logging import Logger
 from polar.models import (
     Account,
@@ -94,6 +93,63 @@ class PaymentTransactionForChargeDoesNotExist(TransferTransactionError):
         super().__init__(message)
 
 
+_TRANSACTION_ID_NAMESPACE = uuid.UUID("5a0e23c9-8388-49dd-9a7e-aaef0c4b6e0f")
+
+
+def _get_metadata_suffix(metadata: dict[str, str] | None) -> str:
+    return "".join(f":{key}={value}" for key, value in sorted((metadata or {}).items()))
+
+
+def _get_transfer_idempotency_key(
+    payment_transaction: Transaction,
+    destination_account: Account,
+    amount: int,
+    *,
+    pledge: Pledge | None,
+    subscription: Subscription | None,
+    issue_reward: IssueReward | None,
+    transfer_metadata: dict[str, str] | None,
+) -> str:
+    """
+    Build an idempotency key from the inputs of the transfer,
+    so a retried job or request doesn't transfer the funds twice.
+    """
+    key = f"transfer:{payment_transaction.id}:{destination_account.id}:{amount}"
+    for obj in (pledge, subscription, issue_reward):
+        if obj is not None:
+            key += f":{obj.id}"
+    return key + _get_metadata_suffix(transfer_metadata)
+
+
+def _get_reversal_idempotency_key(
+    incoming: Transaction,
+    amount: int,
+    *,
+    reversal_transfer_metadata: dict[str, str] | None,
+) -> str:
+    """
+    Build an idempotency key from the inputs of the reversal.
+
+    The metadata holds the refund or dispute triggering it,
+    so two partial refunds of the same amount get their own reversal.
+    """
+    key = f"reversal:{incoming.transfer_id}:{amount}"
+    return key + _get_metadata_suffix(reversal_transfer_metadata)
+
+
+def _get_transaction_ids(idempotency_key: str) -> tuple[uuid.UUID, uuid.UUID]:
+    """
+    Derive the IDs of the outgoing and incoming transactions from the idempotency key.
+
+    They're sent in the metadata of the Stripe request,
+    which has to be the same when it's retried.
+    """
+    return (
+        uuid.uuid5(_TRANSACTION_ID_NAMESPACE, f"{idempotency_key}:outgoing"),
+        uuid.uuid5(_TRANSACTION_ID_NAMESPACE, f"{idempotency_key}:incoming"),
+    )
+
+
 class TransferTransactionService(BaseTransactionService):
     async def create_transfer(
         self,
@@ -137,10 +193,23 @@ class TransferTransactionService(BaseTransactionService):
         source_currency = payment_transaction.currency.lower()
         destination_currency = destination_account.currency.lower()
 
+        idempotency_key = _get_transfer_idempotency_key(
+            payment_transaction,
+            destination_account,
+            amount,
+            pledge=pledge,
+            subscription=subscription,
+            issue_reward=issue_reward,
+            transfer_metadata=transfer_metadata,
+        )
+        outgoing_transaction_id, incoming_transaction_id = _get_transaction_ids(
+            idempotency_key
+        )
+
         transfer_correlation_key = str(uuid.uuid4())
 
         outgoing_transaction = Transaction(
-            id=generate_uuid(),
+            id=outgoing_transaction_id,
             account=None,  # Polar account
             type=TransactionType.transfer,
             processor=processor,
@@ -157,7 +226,7 @@ class TransferTransactionService(BaseTransactionService):
             payment_transaction=payment_transaction,
         )
         incoming_transaction = Transaction(
-            id=generate_uuid(),
+            id=incoming_transaction_id,
             account=destination_account,  # User account
             type=TransactionType.transfer,
             processor=processor,
@@ -176,7 +245,7 @@ class TransferTransactionService(BaseTransactionService):
 
         if processor == PaymentProcessor.stripe:
             assert destination_account.stripe_id is not None
-            stripe_transfer = stripe_service.transfer(
+            stripe_transfer = await stripe_service.transfer(
                 destination_account.stripe_id,
                 amount,
                 source_transaction=payment_transaction.charge_id,
@@ -185,12 +254,13 @@ class TransferTransactionService(BaseTransactionService):
                     "incoming_transaction_id": str(incoming_transaction.id),
                     **(transfer_metadata or {}),
                 },
+                idempotency_key=idempotency_key,
             )
 
             # Different source and destination currencies: get the converted amount
             if source_currency != destination_currency:
                 assert stripe_transfer.destination_payment is not None
-                stripe_destination_charge = stripe_service.get_charge(
+                stripe_destination_charge = await stripe_service.get_charge(
                     get_expandable_id(stripe_transfer.destination_payment),
                     stripe_account=destination_account.stripe_id,
                     expand=["balance_transaction"],
@@ -274,7 +344,7 @@ class TransferTransactionService(BaseTransactionService):
         issue_reward: IssueReward | None = None,
         transfer_metadata: dict[str, str] | None = None,
     ) -> tuple[Transaction, Transaction]:
-        payment_intent = stripe_service.retrieve_intent(payment_intent_id)
+        payment_intent = await stripe_service.retrieve_intent(payment_intent_id)
         assert payment_intent.latest_charge is not None
         charge_id = get_expandable_id(payment_intent.latest_charge)
 
@@ -313,10 +383,17 @@ class TransferTransactionService(BaseTransactionService):
 
         processor = outgoing.processor
 
+        idempotency_key = _get_reversal_idempotency_key(
+            incoming, amount, reversal_transfer_metadata=reversal_transfer_metadata
+        )
+        outgoing_reversal_id, incoming_reversal_id = _get_transaction_ids(
+            idempotency_key
+        )
+
         transfer_correlation_key = str(uuid.uuid4())
 
         outgoing_reversal = Transaction(
-            id=generate_uuid(),
+            id=outgoing_reversal_id,
             account=source_account,  # User account
             type=TransactionType.transfer,
             processor=processor,
@@ -333,7 +410,7 @@ class TransferTransactionService(BaseTransactionService):
             transfer_reversal_transaction=incoming,
         )
         incoming_reversal = Transaction(
-            id=generate_uuid(),
+            id=incoming_reversal_id,
             account=None,  # Polar account
             type=TransactionType.transfer,
             processor=processor,
@@ -352,7 +429,7 @@ class TransferTransactionService(BaseTransactionService):
 
         if processor == PaymentProcessor.stripe:
             assert source_account.stripe_id is not None
-            stripe_reversal = stripe_service.reverse_transfer(
+            stripe_reversal = await stripe_service.reverse_transfer(
                 cast(str, incoming.transfer_id),
                 amount,
                 metadata={
@@ -360,12 +437,13 @@ class TransferTransactionService(BaseTransactionService):
                     "incoming_transaction_id": str(incoming_reversal.id),
                     **(reversal_transfer_metadata or {}),
                 },
+                idempotency_key=idempotency_key,
             )
 
             # Different source and destination currencies: get the converted amount
             if source_currency != destination_currency:
                 assert stripe_reversal.destination_payment_refund is not None
-                stripe_destination_payment_refund = stripe_service.get_refund(
+                stripe_destination_payment_refund = await stripe_service.get_refund(
                     get_expandable_id(stripe_reversal.destination_payment_refund),
                     stripe_account=source_account.stripe_id,
                     expand=["balance_transaction"],
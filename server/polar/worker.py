@@ -1,8 +1,9 @@
 import functools
 import uuid
-from collections.abc import AsyncIterator, Awaitable, Callable
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
 from contextlib import asynccontextmanager
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from typing import (
     Any,
     ParamSpec,
@@ -15,14 +16,19 @@ import structlog
 from arq import cron, func
 from arq.connections import ArqRedis, RedisSettings
 from arq.connections import create_pool as arq_create_pool
+from arq.constants import job_key_prefix, result_key_prefix
 from arq.cron import CronJob
-from arq.jobs import Job
+from arq.jobs import Job, serialize_job
 from arq.typing import OptionType, SecondsTimedelta, WeekdayOptionType
+from arq.utils import timestamp_ms, to_ms
 from arq.worker import Function
 from pydantic import BaseModel
 
 from polar.config import settings
 from polar.context import ExecutionContext
+from polar.eventstream.publisher import close_publisher
+from polar.http_client import close_http_clients
+from polar.integrations.stripe.gateway import close_stripe_gateway
 from polar.kit.db.postgres import (
     AsyncEngine,
     AsyncSession,
@@ -69,9 +75,13 @@ class JobContext(WorkerContext):
 
 class PolarWorkerContext(BaseModel):
     is_during_installation: bool = False
+    is_low_priority: bool = False
 
     def to_execution_context(self) -> ExecutionContext:
-        return ExecutionContext(is_during_installation=self.is_during_installation)
+        return ExecutionContext(
+            is_during_installation=self.is_during_installation,
+            is_low_priority=self.is_low_priority,
+        )
 
 
 class WorkerSettings:
@@ -94,6 +104,10 @@ class WorkerSettings:
 
     @staticmethod
     async def on_shutdown(ctx: WorkerContext) -> None:
+        await close_publisher()
+        await close_http_clients()
+        close_stripe_gateway()
+
         global arq_pool
         if arq_pool:
             await arq_pool.close(True)
@@ -135,6 +149,7 @@ async def enqueue_job(name: str, *args: Any, **kwargs: Any) -> Job | None:
     ctx = ExecutionContext.current()
     polar_context = PolarWorkerContext(
         is_during_installation=ctx.is_during_installation,
+        is_low_priority=ctx.is_low_priority,
     )
 
     request_correlation_id = structlog.contextvars.get_contextvars().get(
@@ -161,6 +176,119 @@ async def _enqueue_job(name: str, *args: Any, **kwargs: Any) -> Job | None:
     return await arq_pool.enqueue_job(name, *args, **kwargs)
 
 
+@dataclass
+class BulkJob:
+    """
+    A job to enqueue with `enqueue_jobs`.
+    """
+
+    args: tuple[Any, ...] = ()
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    job_id: str | None = None
+    defer_by: timedelta | None = None
+
+
+async def enqueue_jobs(name: str, jobs: Sequence[BulkJob]) -> int:
+    """
+    Enqueue many jobs of the same task in a single Redis script,
+    instead of a transaction per job.
+
+    As `enqueue_job`, jobs whose ID already exists are skipped.
+
+    Returns:
+        The number of enqueued jobs.
+    """
+    if not jobs:
+        return 0
+
+    ctx = ExecutionContext.current()
+    polar_context = PolarWorkerContext(
+        is_during_installation=ctx.is_during_installation,
+        is_low_priority=ctx.is_low_priority,
+    )
+
+    request_correlation_id = structlog.contextvars.get_contextvars().get(
+        "correlation_id"
+    )
+
+    return await _enqueue_jobs(
+        name,
+        [
+            BulkJob(
+                args=job.args,
+                kwargs={
+                    **job.kwargs,
+                    "request_correlation_id": request_correlation_id,
+                    "polar_context": polar_context,
+                },
+                # Prefix job ID by task name by default
+                job_id=job.job_id or f"{name}:{uuid.uuid4().hex}",
+                defer_by=job.defer_by,
+            )
+            for job in jobs
+        ],
+    )
+
+
+# Enqueues the jobs whose ID isn't already taken, like `ArqRedis.enqueue_job`.
+# KEYS: the queue, then the job keys, then the result keys.
+# ARGV: for each job, its ID, score, expiration and serialized payload.
+# Atomic, so concurrent calls can't enqueue the same job twice.
+_ENQUEUE_JOBS_SCRIPT = """
+local count = 0
+local n = (#KEYS - 1) / 2
+for i = 1, n do
+    local job_key = KEYS[1 + i]
+    local result_key = KEYS[1 + n + i]
+    local offset = (i - 1) * 4
+    if redis.call('EXISTS', job_key, result_key) == 0 then
+        redis.call('PSETEX', job_key, ARGV[offset + 3], ARGV[offset + 4])
+        redis.call('ZADD', KEYS[1], ARGV[offset + 2], ARGV[offset + 1])
+        count = count + 1
+    end
+end
+return count
+"""
+
+
+async def _enqueue_jobs(name: str, jobs: Sequence[BulkJob]) -> int:
+    if not arq_pool:
+        raise Exception("arq_pool is not initialized")
+
+    job_ids = [cast(str, job.job_id) for job in jobs]
+
+    enqueue_time_ms = timestamp_ms()
+    args: list[str | int | bytes] = []
+    for job, job_id in zip(jobs, job_ids):
+        score = enqueue_time_ms + (to_ms(job.defer_by) or 0)
+        args.extend(
+            [
+                job_id,
+                score,
+                score - enqueue_time_ms + arq_pool.expires_extra_ms,
+                serialize_job(
+                    name,
+                    job.args,
+                    job.kwargs,
+                    None,
+                    enqueue_time_ms,
+                    serializer=arq_pool.job_serializer,
+                ),
+            ]
+        )
+
+    enqueue_jobs_script = arq_pool.register_script(_ENQUEUE_JOBS_SCRIPT)
+    count = await enqueue_jobs_script(
+        keys=[
+            arq_pool.default_queue_name,
+            *(job_key_prefix + job_id for job_id in job_ids),
+            *(result_key_prefix + job_id for job_id in job_ids),
+        ],
+        args=args,
+    )
+    return int(count)
+
+
 Params = ParamSpec("Params")
 ReturnValue = TypeVar("ReturnValue")
 
@@ -279,6 +407,8 @@ __all__ = [
     "task",
     "lifespan",
     "enqueue_job",
+    "enqueue_jobs",
+    "BulkJob",
     "JobContext",
     "AsyncSessionMaker",
 ]
@@ -0,0 +1,120 @@
+import asyncio
+import logging.config
+import time
+from collections.abc import AsyncIterator
+from functools import wraps
+from typing import Any
+
+import httpx
+import structlog
+import typer
+
+from polar.app import app
+from polar.integrations.github import badge_svg
+from polar.postgres import create_engine, create_sessionmaker, get_db_sessionmaker
+from polar.redis import redis
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+async def clear_badge_cache() -> None:
+    badge_svg._local_cache.clear()
+    keys = [key async for key in redis.scan_iter("github:badge:svg:*")]
+    if keys:
+        await redis.delete(*keys)
+
+
+async def run(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    requests: int,
+    concurrency: int,
+    cold: bool,
+) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    lock = asyncio.Lock()
+
+    async def _request() -> None:
+        async with semaphore:
+            if cold:
+                # Each request has to render the badge again
+                async with lock:
+                    await clear_badge_cache()
+                    response = await client.get(url)
+            else:
+                response = await client.get(url)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_request() for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+@cli.command()
+@typer_async
+async def serve(
+    organization: str = typer.Argument(..., help="GitHub organization name."),
+    repository: str = typer.Argument(..., help="GitHub public repository name."),
+    number: int = typer.Argument(..., help="Issue number."),
+    requests: int = typer.Option(1_000, help="Number of requests per run."),
+    concurrency: int = typer.Option(20, help="Concurrent requests."),
+) -> None:
+    """
+    Benchmark the pledge badge endpoint on a cold versus a warm cache.
+
+    The API is called in-process, so the results don't include the network.
+    """
+    engine = create_engine("app")
+    sessionmaker = create_sessionmaker(engine)
+
+    async def _get_db_sessionmaker() -> AsyncIterator[Any]:
+        yield sessionmaker
+
+    app.dependency_overrides[get_db_sessionmaker] = _get_db_sessionmaker
+    url = (
+        f"/api/v1/integrations/github/{organization}/{repository}"
+        f"/issues/{number}/pledge.svg"
+    )
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),  # type: ignore
+        base_url="http://benchmark",
+    ) as client:
+        for cold in (True, False):
+            await clear_badge_cache()
+            duration = await run(
+                client, url, requests=requests, concurrency=concurrency, cold=cold
+            )
+            typer.echo(
+                f"{'Cold' if cold else 'Warm'} cache: {requests} requests "
+                f"in {duration:.2f}s, {requests / duration:.0f} requests/s"
+            )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,81 @@
+import asyncio
+import logging.config
+import statistics
+import time
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+
+from polar.email.sender import EmailMessage, FakeEmailSender
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+@cli.command()
+@typer_async
+async def send_batch(
+    messages: int = typer.Option(10_000, help="Number of emails to send."),
+    batch_size: int = typer.Option(100, help="Number of emails per provider call."),
+    max_concurrency: int = typer.Option(4, help="Concurrent provider calls."),
+    latency: float = typer.Option(0.2, help="Simulated provider latency (s)."),
+    error_rate: float = typer.Option(0.0, help="Simulated provider error rate."),
+) -> None:
+    """
+    Benchmark the email sending throughput against a fake, local, provider.
+    """
+    sender = FakeEmailSender(
+        latency=latency,
+        error_rate=error_rate,
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        retry_base_delay=latency,
+    )
+    emails = [
+        EmailMessage(
+            to_email_addr=f"user{i}@example.com",
+            subject="Benchmark",
+            html_content="<p>Benchmark</p>",
+        )
+        for i in range(messages)
+    ]
+
+    start = time.perf_counter()
+    results = await sender.send_batch(emails)
+    duration = time.perf_counter() - start
+
+    failed = sum(1 for result in results if not result.success)
+    typer.echo(f"Sent {len(results) - failed} emails in {duration:.2f}s")
+    typer.echo(f"Failed: {failed}")
+    typer.echo(f"Throughput: {len(results) / duration:.0f} emails/s")
+    typer.echo(
+        f"Provider calls: {len(sender.timings)}, "
+        f"mean {statistics.mean(sender.timings) * 1000:.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    cli()
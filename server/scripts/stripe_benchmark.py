@@ -0,0 +1,206 @@
+import asyncio
+import logging.config
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Any
+
+import stripe as stripe_lib
+import structlog
+import typer
+
+from polar.integrations.stripe.gateway import StripeGateway
+from polar.integrations.stripe.replay import (
+    RecordingHTTPClient,
+    ReplayHTTPClient,
+    StripeFixtures,
+    dump_fixtures,
+    load_fixtures,
+)
+from polar.integrations.stripe.service import StripeService
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+def echo_stats(gateway: StripeGateway) -> None:
+    for endpoint, stats in sorted(gateway.stats.items()):
+        typer.echo(
+            f"  {endpoint}: {stats.count} calls, {stats.errors} errors, "
+            f"mean {stats.mean_seconds * 1000:.1f}ms, "
+            f"max {stats.max_seconds * 1000:.1f}ms"
+        )
+
+
+async def reconcile_payout(
+    stripe_service: StripeService, payout_id: str, account_id: str
+) -> int:
+    count = 0
+    async for _ in stripe_service.list_balance_transactions(
+        account_id=account_id, payout=payout_id
+    ):
+        count += 1
+    return count
+
+
+@cli.command()
+@typer_async
+async def record(
+    stripe_api_key: str,
+    payout_id: str = typer.Argument(..., help="Stripe payout ID."),
+    account_id: str = typer.Argument(..., help="Stripe connected account ID."),
+    output: Path = typer.Option(Path("stripe_fixtures.json")),
+) -> None:
+    """
+    Record the responses of a payout reconciliation from the Stripe API.
+    """
+    stripe_lib.api_key = stripe_api_key
+    recorder = RecordingHTTPClient(stripe_lib.http_client.RequestsClient())
+    stripe_lib.default_http_client = recorder
+
+    gateway = StripeGateway(max_workers=1)
+    stripe_service = StripeService(gateway)
+    count = await reconcile_payout(stripe_service, payout_id, account_id)
+    gateway.close()
+
+    dump_fixtures(recorder.fixtures, output)
+    typer.echo(f"Recorded {len(recorder.fixtures)} responses, {count} transactions")
+
+
+@cli.command()
+def generate(
+    payout_id: str = typer.Option("po_benchmark"),
+    transactions: int = typer.Option(1_000, help="Balance transactions in payout."),
+    output: Path = typer.Option(Path("stripe_fixtures.json")),
+) -> None:
+    """
+    Generate the responses of a payout reconciliation with fake data.
+    """
+    fixtures: StripeFixtures = {}
+    ids = [f"txn_{i:08d}" for i in range(transactions)]
+    pages = [ids[i : i + 100] for i in range(0, len(ids), 100)] or [[]]
+    for i, page in enumerate(pages):
+        query = f"expand%5B0%5D=data.source&limit=100&payout={payout_id}"
+        if i > 0:
+            query += f"&starting_after={pages[i - 1][-1]}"
+        fixtures[f"GET /v1/balance_transactions?{query}"] = {
+            "status": 200,
+            "body": {
+                "object": "list",
+                "url": "/v1/balance_transactions",
+                "has_more": i < len(pages) - 1,
+                "data": [
+                    {
+                        "id": id,
+                        "object": "balance_transaction",
+                        "amount": 1000,
+                        "currency": "usd",
+                        "type": "payment",
+                        "source": {"id": f"py_{id}", "object": "charge"},
+                    }
+                    for id in page
+                ],
+            },
+        }
+
+    fixtures["GET /v1/balance_transactions/txn_00000000"] = {
+        "status": 200,
+        "body": {"id": "txn_00000000", "object": "balance_transaction"},
+    }
+
+    dump_fixtures(fixtures, output)
+    typer.echo(f"Generated {len(fixtures)} responses")
+
+
+@cli.command()
+@typer_async
+async def payout(
+    fixtures: Path = typer.Argument(..., help="Recorded responses."),
+    payout_id: str = typer.Option("po_benchmark"),
+    account_id: str = typer.Option("acct_benchmark"),
+    runs: int = typer.Option(10),
+    latency: float = typer.Option(0.2, help="Simulated latency in seconds."),
+) -> None:
+    """
+    Benchmark the reconciliation of a payout against recorded responses.
+    """
+    stripe_lib.api_key = "sk_test_benchmark"
+    stripe_lib.default_http_client = ReplayHTTPClient(
+        load_fixtures(fixtures), latency=latency
+    )
+    gateway = StripeGateway(max_workers=runs)
+    stripe_service = StripeService(gateway)
+
+    start = time.perf_counter()
+    counts = await asyncio.gather(
+        *(reconcile_payout(stripe_service, payout_id, account_id) for _ in range(runs))
+    )
+    duration = time.perf_counter() - start
+    gateway.close()
+
+    typer.echo(
+        f"{runs} concurrent reconciliations of {counts[0]} transactions "
+        f"in {duration:.2f}s"
+    )
+    echo_stats(gateway)
+
+
+@cli.command()
+@typer_async
+async def throughput(
+    fixtures: Path = typer.Argument(..., help="Recorded responses."),
+    balance_transaction_id: str = typer.Option("txn_00000000"),
+    requests: int = typer.Option(500, help="Number of requests per run."),
+    latency: float = typer.Option(0.2, help="Simulated latency in seconds."),
+) -> None:
+    """
+    Benchmark the number of Stripe calls per second by size of the thread pool.
+    """
+    stripe_lib.api_key = "sk_test_benchmark"
+    stripe_lib.default_http_client = ReplayHTTPClient(
+        load_fixtures(fixtures), latency=latency
+    )
+
+    for max_workers in (1, 4, 16, 64):
+        gateway = StripeGateway(max_workers=max_workers)
+        stripe_service = StripeService(gateway)
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                stripe_service.get_balance_transaction(balance_transaction_id)
+                for _ in range(requests)
+            )
+        )
+        duration = time.perf_counter() - start
+        gateway.close()
+
+        typer.echo(
+            f"{max_workers} workers: {requests} requests in {duration:.2f}s, "
+            f"{requests / duration:.0f} requests/s"
+        )
+        echo_stats(gateway)
+
+
+if __name__ == "__main__":
+    cli()
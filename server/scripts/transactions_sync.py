@@ -82,8 +82,8 @@ async def sync_transactions(
 
             typer.secho("HANDLING CHARGES", bg="green")
             charges_params: stripe_lib.Charge.ListParams = {"limit": 100}
-            charges = stripe._list_all(stripe_lib.Charge.list, charges_params)
-            for charge in charges:
+            charges = stripe.gateway.stream(stripe_lib.Charge.list, **charges_params)
+            async for charge in charges:
                 if charge.status != "succeeded":
                     continue
 
@@ -148,7 +148,7 @@ async def sync_transactions(
                 transfer_correlation_key = str(uuid.uuid4())
 
                 assert pledge.payment_id is not None
-                payment_intent = stripe.retrieve_intent(pledge.payment_id)
+                payment_intent = await stripe.retrieve_intent(pledge.payment_id)
                 transfer_payment_transaction = await payment_transaction_service.get_by(
                     session,
                     type=TransactionType.payment,
@@ -197,7 +197,7 @@ async def sync_transactions(
                 destination_currency = account.currency.lower()
                 if source_currency != destination_currency:
                     assert stripe_transfer.destination_payment is not None
-                    stripe_destination_charge = stripe.get_charge(
+                    stripe_destination_charge = await stripe.get_charge(
                         get_expandable_id(stripe_transfer.destination_payment),
                         stripe_account=account.stripe_id,
                         expand=["balance_transaction"],
@@ -255,8 +255,10 @@ async def sync_transactions(
                     "limit": 100,
                     "stripe_account": account.stripe_id,
                 }
-                payouts = stripe._list_all(stripe_lib.Payout.list, payouts_params)
-                for payout in payouts:
+                payouts = stripe.gateway.stream(
+                    stripe_lib.Payout.list, **payouts_params
+                )
+                async for payout in payouts:
                     payout_transaction = (
                         await payout_transaction_service.create_payout_from_stripe(
                             session,
@@ -0,0 +1,151 @@
+import httpx
+import pytest
+import respx
+
+from polar.article.renderer import (
+    UNSUBSCRIBE_LINK_PLACEHOLDER,
+    ArticleEmailRenderer,
+    get_article_email_renderer,
+)
+from polar.config import settings
+from polar.models import Article, Organization, User
+from polar.postgres import AsyncSession
+from tests.article.test_service import create_article
+
+
+@pytest.fixture
+def renderer() -> ArticleEmailRenderer:
+    return get_article_email_renderer()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skip_db_asserts
+class TestRender:
+    async def test_render_once(
+        self,
+        session: AsyncSession,
+        respx_mock: respx.MockRouter,
+        renderer: ArticleEmailRenderer,
+        user: User,
+        organization: Organization,
+    ) -> None:
+        article = await create_article(
+            session,
+            created_by_user=user,
+            organization=organization,
+            visibility=Article.Visibility.public,
+            paid_subscribers_only=False,
+        )
+        route = respx_mock.post(
+            f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}"
+        ).mock(return_value=httpx.Response(200, text="<p>Hello</p>"))
+
+        async with httpx.AsyncClient() as client:
+            for _ in range(3):
+                template = await renderer.render(
+                    client, article, user, paid_content=False, unsubscribe=True
+                )
+                assert template == "<p>Hello</p>"
+
+        assert route.call_count == 1
+
+    async def test_render_variants(
+        self,
+        session: AsyncSession,
+        respx_mock: respx.MockRouter,
+        renderer: ArticleEmailRenderer,
+        user: User,
+        organization: Organization,
+    ) -> None:
+        article = await create_article(
+            session,
+            created_by_user=user,
+            organization=organization,
+            visibility=Article.Visibility.public,
+            paid_subscribers_only=False,
+        )
+        route = respx_mock.post(
+            f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}"
+        ).mock(return_value=httpx.Response(200, text="<p>Hello</p>"))
+
+        async with httpx.AsyncClient() as client:
+            for paid_content in (False, True):
+                for unsubscribe in (False, True):
+                    await renderer.render(
+                        client,
+                        article,
+                        user,
+                        paid_content=paid_content,
+                        unsubscribe=unsubscribe,
+                    )
+
+        assert route.call_count == 4
+
+    async def test_render_no_cache(
+        self,
+        session: AsyncSession,
+        respx_mock: respx.MockRouter,
+        renderer: ArticleEmailRenderer,
+        user: User,
+        organization: Organization,
+    ) -> None:
+        article = await create_article(
+            session,
+            created_by_user=user,
+            organization=organization,
+            visibility=Article.Visibility.public,
+            paid_subscribers_only=False,
+        )
+        route = respx_mock.post(
+            f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}"
+        ).mock(return_value=httpx.Response(200, text="<p>Hello</p>"))
+
+        async with httpx.AsyncClient() as client:
+            for _ in range(2):
+                await renderer.render(
+                    client,
+                    article,
+                    user,
+                    paid_content=False,
+                    unsubscribe=False,
+                    use_cache=False,
+                )
+
+        assert route.call_count == 2
+
+    async def test_render_error(
+        self,
+        session: AsyncSession,
+        respx_mock: respx.MockRouter,
+        renderer: ArticleEmailRenderer,
+        user: User,
+        organization: Organization,
+    ) -> None:
+        article = await create_article(
+            session,
+            created_by_user=user,
+            organization=organization,
+            visibility=Article.Visibility.public,
+            paid_subscribers_only=False,
+        )
+        route = respx_mock.post(
+            f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}"
+        ).mock(return_value=httpx.Response(500))
+
+        async with httpx.AsyncClient() as client:
+            template = await renderer.render(
+                client, article, user, paid_content=False, unsubscribe=False
+            )
+
+        assert template is None
+
+
+def test_personalize(renderer: ArticleEmailRenderer) -> None:
+    template = f'<a href="{UNSUBSCRIBE_LINK_PLACEHOLDER}">Unsubscribe</a>'
+    assert (
+        renderer.personalize(
+            template, unsubscribe_link="https://polar.sh/unsubscribe?org=a&id=b"
+        )
+        == '<a href="https://polar.sh/unsubscribe?org=a&amp;id=b">Unsubscribe</a>'
+    )
+    assert renderer.personalize(template, unsubscribe_link=None) == template
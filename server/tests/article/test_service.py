@@ -6,6 +6,7 @@ from datetime import datetime
 
 import pytest
 import pytest_asyncio
+from pytest_mock import MockerFixture
 
 from polar.article.service import article_service
 from polar.authz.service import Anonymous, Subject
@@ -19,6 +20,7 @@ from polar.models import (
     UserOrganization,
 )
 from polar.postgres import AsyncSession
+from polar.redis import redis
 from tests.fixtures.random_objects import create_organization, create_user
 
 
@@ -754,3 +756,244 @@ class TestListReceivers:
         receivers = await article_service.list_receivers(session, organization.id, True)
         assert len(receivers) == 1
         assert receivers[0] == (user.id, True, True)
+
+
+@pytest.mark.asyncio
+class TestStreamReceiverChunks:
+    async def test_chunks(
+        self,
+        session: AsyncSession,
+        organization: Organization,
+        user: User,
+        user_organization: UserOrganization,
+    ) -> None:
+        users = [user]
+        for _ in range(4):
+            subscriber = await create_user(session)
+            await create_articles_subscription(
+                session,
+                user=subscriber,
+                organization=organization,
+                paid_subscriber=False,
+            )
+            users.append(subscriber)
+
+        # then
+        session.expunge_all()
+
+        chunks = [
+            list(chunk)
+            async for chunk in article_service.stream_receiver_chunks(
+                session, organization.id, False, chunk_size=2
+            )
+        ]
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [user_id for chunk in chunks for user_id in chunk] == sorted(
+            u.id for u in users
+        )
+
+    async def test_after(
+        self, session: AsyncSession, organization: Organization
+    ) -> None:
+        users = []
+        for _ in range(3):
+            subscriber = await create_user(session)
+            await create_articles_subscription(
+                session,
+                user=subscriber,
+                organization=organization,
+                paid_subscriber=False,
+            )
+            users.append(subscriber)
+        user_ids = sorted(u.id for u in users)
+
+        # then
+        session.expunge_all()
+
+        chunks = [
+            list(chunk)
+            async for chunk in article_service.stream_receiver_chunks(
+                session, organization.id, False, after=user_ids[0]
+            )
+        ]
+        assert chunks == [user_ids[1:]]
+
+
+@pytest.mark.asyncio
+class TestSendToSubscribers:
+    async def test_enqueue_send(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        article_public_free_published: Article,
+    ) -> None:
+        enqueue_job_mock = mocker.patch("polar.article.service.enqueue_job")
+        article_public_free_published.notify_subscribers = True
+        session.add(article_public_free_published)
+        await session.commit()
+
+        # then
+        session.expunge_all()
+
+        await article_service.send_to_subscribers(
+            session, article_public_free_published
+        )
+
+        assert article_public_free_published.notifications_sent_at is not None
+        enqueue_job_mock.assert_called_once_with(
+            "articles.send_to_subscribers",
+            article_id=article_public_free_published.id,
+            _job_id=f"articles.send_to_subscribers:{article_public_free_published.id}",
+        )
+
+
+@pytest.mark.asyncio
+class TestEnqueueSendChunks:
+    async def test_enqueue_chunks(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        organization: Organization,
+        article_public_free_published: Article,
+    ) -> None:
+        enqueue_job_mock = mocker.patch("polar.article.service.enqueue_job")
+        users = []
+        for _ in range(3):
+            subscriber = await create_user(session)
+            await create_articles_subscription(
+                session,
+                user=subscriber,
+                organization=organization,
+                paid_subscriber=False,
+            )
+            users.append(subscriber)
+        user_ids = sorted(u.id for u in users)
+
+        # then
+        session.expunge_all()
+
+        article = await article_service.get_loaded(
+            session, article_public_free_published.id
+        )
+        assert article is not None
+        await article_service.enqueue_send_chunks(session, article, chunk_size=2)
+
+        assert enqueue_job_mock.call_count == 2
+        assert enqueue_job_mock.call_args_list[0].kwargs["user_ids"] == user_ids[:2]
+        assert enqueue_job_mock.call_args_list[1].kwargs["user_ids"] == user_ids[2:]
+        assert article.email_sent_to_count == 3
+
+    async def test_resume_from_checkpoint(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        organization: Organization,
+        article_public_free_published: Article,
+    ) -> None:
+        enqueue_job_mock = mocker.patch("polar.article.service.enqueue_job")
+        users = []
+        for _ in range(3):
+            subscriber = await create_user(session)
+            await create_articles_subscription(
+                session,
+                user=subscriber,
+                organization=organization,
+                paid_subscriber=False,
+            )
+            users.append(subscriber)
+        user_ids = sorted(u.id for u in users)
+
+        await redis.hset(
+            f"articles:send:{article_public_free_published.id}:checkpoint",
+            mapping={"cursor": str(user_ids[1]), "count": 2},
+        )
+
+        # then
+        session.expunge_all()
+
+        article = await article_service.get_loaded(
+            session, article_public_free_published.id
+        )
+        assert article is not None
+        await article_service.enqueue_send_chunks(session, article, chunk_size=2)
+
+        enqueue_job_mock.assert_called_once()
+        assert enqueue_job_mock.call_args.kwargs["user_ids"] == user_ids[2:]
+        assert article.email_sent_to_count == 3
+
+
+@pytest.mark.asyncio
+class TestFilterUnsentReceivers:
+    async def test_filter(
+        self, session: AsyncSession, article_public_free_published: Article
+    ) -> None:
+        user_ids = [uuid.uuid4() for _ in range(3)]
+        await article_service.mark_receivers_sent(
+            article_public_free_published, [user_ids[1]]
+        )
+
+        # then
+        session.expunge_all()
+
+        unsent = await article_service.filter_unsent_receivers(
+            article_public_free_published, user_ids
+        )
+        assert unsent == [user_ids[0], user_ids[2]]
+
+
+@pytest.mark.asyncio
+class TestFlushViewCounts:
+    async def test_flush(
+        self,
+        session: AsyncSession,
+        article_public_free_published: Article,
+        article_public_paid_published: Article,
+    ) -> None:
+        articles = [article_public_free_published, article_public_paid_published]
+        for article, views in zip(articles, (3, 1)):
+            for _ in range(views):
+                await article_service.track_view(article.id)
+
+        # then
+        session.expunge_all()
+
+        pending = await article_service.get_pending_view_counts(
+            [article.id for article in articles]
+        )
+        assert pending == {articles[0].id: 3, articles[1].id: 1}
+
+        assert await article_service.flush_view_counts(session, chunk_size=1) >= 4
+
+        for article, views in zip(articles, (3, 1)):
+            updated_article = await session.get(
+                Article, article.id, populate_existing=True
+            )
+            assert updated_article is not None
+            assert updated_article.web_view_count == views
+
+        pending = await article_service.get_pending_view_counts(
+            [article.id for article in articles]
+        )
+        assert pending == {articles[0].id: 0, articles[1].id: 0}
+
+    async def test_flush_failed(
+        self,
+        session: AsyncSession,
+        article_public_free_published: Article,
+        mocker: MockerFixture,
+    ) -> None:
+        article = article_public_free_published
+        await article_service.flush_view_counts(session)
+        await article_service.track_view(article.id)
+        await article_service.track_view(article.id)
+
+        # then
+        session.expunge_all()
+
+        mocker.patch.object(session, "commit", side_effect=Exception("Commit failed"))
+        with pytest.raises(Exception, match="Commit failed"):
+            await article_service.flush_view_counts(session)
+
+        # Views are kept for the next flush
+        pending = await article_service.get_pending_view_counts([article.id])
+        assert pending == {article.id: 2}
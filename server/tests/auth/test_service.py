@@ -0,0 +1,144 @@
+import hashlib
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.auth.service import AuthService
+from polar.authz.service import Scope
+from polar.models import PersonalAccessToken, User
+from polar.personal_access_token.service import personal_access_token_service
+from polar.postgres import AsyncSession
+from polar.redis import redis
+from polar.user.service import user as user_service
+
+
+@pytest.mark.asyncio
+class TestGetUserFromCookie:
+    async def test_not_cached(
+        self,
+        session: AsyncSession,
+        mocker: MockerFixture,
+        user: User,
+        auth_jwt: str,
+    ) -> None:
+        user_service_get_spy = mocker.spy(user_service, "get")
+
+        # then
+        session.expunge_all()
+
+        for _ in range(2):
+            cookie_user = await AuthService.get_user_from_cookie(
+                session, cookie=auth_jwt
+            )
+            assert cookie_user is not None
+            assert cookie_user.id == user.id
+            session.expunge_all()
+
+        # Validated without a query, the user is loaded by its primary key
+        assert user_service_get_spy.call_count == 2
+        token_hash = hashlib.sha256(auth_jwt.encode()).hexdigest()
+        assert await redis.get(f"auth:cache:{token_hash}") is None
+
+    async def test_updated(
+        self,
+        session: AsyncSession,
+        user: User,
+        auth_jwt: str,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        cookie_user = await AuthService.get_user_from_cookie(session, cookie=auth_jwt)
+        assert cookie_user is not None
+
+        cookie_user.username = "updated"
+        session.add(cookie_user)
+        await session.commit()
+
+        session.expunge_all()
+
+        updated_user = await AuthService.get_user_from_cookie(session, cookie=auth_jwt)
+        assert updated_user is not None
+        assert updated_user.username == "updated"
+
+    async def test_invalid(self, session: AsyncSession) -> None:
+        # then
+        session.expunge_all()
+
+        assert await AuthService.get_user_from_cookie(session, cookie="foo") is None
+
+
+@pytest.mark.asyncio
+class TestGetUserFromAuthHeader:
+    async def _create_token(
+        self, session: AsyncSession, user: User
+    ) -> tuple[PersonalAccessToken, str]:
+        pat = await personal_access_token_service.create(
+            session, user_id=user.id, comment="test"
+        )
+        token = AuthService.generate_pat_token(
+            pat.id, pat.expires_at, [Scope.articles_read]
+        )
+        return pat, token
+
+    async def test_personal_access_token_cached(
+        self, session: AsyncSession, mocker: MockerFixture, user: User
+    ) -> None:
+        pat, token = await self._create_token(session, user)
+        pat_service_get_spy = mocker.spy(personal_access_token_service, "get")
+
+        # then
+        session.expunge_all()
+
+        for _ in range(2):
+            scoped_subject = await AuthService.get_user_from_auth_header(
+                session, token=token
+            )
+            assert scoped_subject is not None
+            assert isinstance(scoped_subject.subject, User)
+            assert scoped_subject.subject.id == user.id
+            assert scoped_subject.scopes == [Scope.articles_read]
+            session.expunge_all()
+
+        pat_service_get_spy.assert_called_once()
+
+        # Usage is recorded in batches
+        assert await personal_access_token_service.flush_usage(session) >= 1
+        updated_pat = await personal_access_token_service.get(session, pat.id)
+        assert updated_pat is not None
+        assert updated_pat.last_used_at is not None
+        assert updated_pat.last_used_at > datetime.now(UTC) - timedelta(minutes=1)
+
+    async def test_flush_usage_failed(
+        self, session: AsyncSession, mocker: MockerFixture, user: User
+    ) -> None:
+        pat, _ = await self._create_token(session, user)
+        await personal_access_token_service.record_usage(pat.id)
+
+        # then
+        session.expunge_all()
+
+        mocker.patch.object(session, "commit", side_effect=Exception("Failed"))
+        with pytest.raises(Exception, match="Failed"):
+            await personal_access_token_service.flush_usage(session)
+
+        # Usage is kept for the next flush
+        assert await redis.hexists("personal_access_token:usage", str(pat.id))
+
+    async def test_personal_access_token_revoked(
+        self, session: AsyncSession, user: User
+    ) -> None:
+        pat, token = await self._create_token(session, user)
+
+        # then
+        session.expunge_all()
+
+        assert (
+            await AuthService.get_user_from_auth_header(session, token=token)
+            is not None
+        )
+
+        await personal_access_token_service.delete(session, pat.id)
+
+        assert await AuthService.get_user_from_auth_header(session, token=token) is None
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from typing import Any
 
 import pytest
+from pytest_mock import MockerFixture
 
 from polar.authz.service import AccessType, Anonymous, Authz, Subject
 from polar.models.issue import Issue
@@ -12,6 +13,10 @@ from polar.models.repository import Repository
 from polar.models.user import User
 from polar.models.user_organization import UserOrganization
 from polar.postgres import AsyncSession
+from polar.repository.service import repository as repository_service
+from polar.user_organization.service import (
+    user_organization as user_organization_service,
+)
 from tests.fixtures.random_objects import (
     create_issue,
     create_organization,
@@ -715,3 +720,50 @@ async def test_can_write_pledge(
                 )
                 is tc.expected
             )
+
+
+@pytest.mark.asyncio
+async def test_can_many(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    organization: Organization,
+    public_repository: Repository,
+    user: User,
+    user_second: User,
+    user_organization: UserOrganization,
+) -> None:
+    private_repository = await create_repository(session, organization)
+    issues = [
+        await create_issue(session, organization, repository)
+        for repository in [private_repository, public_repository] * 3
+    ]
+
+    # then
+    session.expunge_all()
+
+    list_by_user_id_spy = mocker.spy(user_organization_service, "list_by_user_id")
+    repository_get_spy = mocker.spy(repository_service, "get")
+
+    authz = Authz(session)
+
+    assert await authz.can_many(user, AccessType.read, issues) == [True] * 6
+    assert (
+        await authz.can_many(user_second, AccessType.read, issues)
+        == [
+            False,
+            True,
+        ]
+        * 3
+    )
+    assert (
+        await authz.can_many(Anonymous(), AccessType.read, issues)
+        == [
+            False,
+            True,
+        ]
+        * 3
+    )
+
+    # Memberships are loaded once per user, repositories in bulk
+    assert list_by_user_id_spy.call_count == 2
+    repository_get_spy.assert_not_called()
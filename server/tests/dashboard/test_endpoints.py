@@ -1,9 +1,12 @@
 from datetime import UTC, datetime
+from typing import Any
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
 
 from polar.config import settings
+from polar.kit.db.postgres import AsyncEngine
 from polar.models.issue import Issue
 from polar.models.organization import Organization
 from polar.models.pledge import Pledge, PledgeState
@@ -11,6 +14,7 @@ from polar.models.repository import Repository
 from polar.models.user import User
 from polar.models.user_organization import UserOrganization
 from polar.postgres import AsyncSession
+from tests.fixtures.random_objects import create_issue, create_pledge
 
 
 @pytest.mark.asyncio
@@ -267,3 +271,60 @@ async def test_get_only_badged_is_badged(
     res = response.json()
 
     assert len(res["data"]) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.skip_db_asserts
+async def test_get_query_count(
+    engine: AsyncEngine,
+    user: User,
+    organization: Organization,
+    repository: Repository,
+    user_organization: UserOrganization,  # makes User a member of Organization
+    pledging_organization: Organization,
+    auth_jwt: str,
+    session: AsyncSession,
+    client: AsyncClient,
+) -> None:
+    statements: list[str] = []
+
+    def before_cursor_execute(
+        conn: Any, cursor: Any, statement: str, *args: Any
+    ) -> None:
+        statements.append(statement)
+
+    async def get_dashboard() -> tuple[int, int]:
+        session.expunge_all()
+        statements.clear()
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = await client.get(
+                f"/api/v1/dashboard/github/{organization.name}",
+                cookies={settings.AUTH_COOKIE_KEY: auth_jwt},
+            )
+        finally:
+            event.remove(
+                engine.sync_engine, "before_cursor_execute", before_cursor_execute
+            )
+        assert response.status_code == 200
+        return len(response.json()["data"]), len(statements)
+
+    async def create_issues(count: int) -> None:
+        for _ in range(count):
+            issue = await create_issue(session, organization, repository)
+            for _ in range(3):
+                await create_pledge(
+                    session, organization, repository, issue, pledging_organization
+                )
+
+    # Authenticate once, the subject is cached afterwards
+    await get_dashboard()
+
+    await create_issues(1)
+    small_issue_count, small_query_count = await get_dashboard()
+
+    await create_issues(20)
+    large_issue_count, large_query_count = await get_dashboard()
+
+    assert (small_issue_count, large_issue_count) == (1, 21)
+    assert large_query_count == small_query_count
@@ -0,0 +1,130 @@
+import httpx
+import pytest
+import respx
+
+from polar.email.sender import (
+    EmailMessage,
+    EmailSenderError,
+    FakeEmailSender,
+    ResendEmailSender,
+)
+
+
+def get_messages(count: int) -> list[EmailMessage]:
+    return [
+        EmailMessage(
+            to_email_addr=f"user{i}@example.com",
+            subject="Hello",
+            html_content="<p>Hello</p>",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+class TestFakeEmailSender:
+    async def test_send_batch(self) -> None:
+        sender = FakeEmailSender(batch_size=10)
+        messages = get_messages(25)
+
+        results = await sender.send_batch(messages)
+
+        assert [result.message for result in results] == messages
+        assert all(result.success for result in results)
+        assert sender.sent == messages
+        assert len(sender.timings) == 3
+
+    async def test_retry_exhausted(self) -> None:
+        sender = FakeEmailSender(error_rate=1.0, max_retries=2, retry_base_delay=0)
+
+        results = await sender.send_batch(get_messages(3))
+
+        assert all(not result.success for result in results)
+        assert len(sender.timings) == 3
+        assert sender.sent == []
+
+    async def test_send_to_user_error(self) -> None:
+        sender = FakeEmailSender(error_rate=1.0, max_retries=0)
+
+        with pytest.raises(EmailSenderError):
+            await sender.send_to_user(
+                to_email_addr="user@example.com",
+                subject="Hello",
+                html_content="<p>Hello</p>",
+            )
+
+
+@pytest.mark.asyncio
+class TestResendEmailSender:
+    async def test_send_single(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post("https://api.resend.com/emails").mock(
+            return_value=httpx.Response(200, json={"id": "EMAIL_ID"})
+        )
+        sender = ResendEmailSender()
+
+        results = await sender.send_batch(get_messages(1))
+
+        assert route.call_count == 1
+        assert results[0].id == "EMAIL_ID"
+
+    async def test_send_batch(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post("https://api.resend.com/emails/batch").mock(
+            return_value=httpx.Response(
+                200, json={"data": [{"id": "EMAIL_ID_0"}, {"id": "EMAIL_ID_1"}]}
+            )
+        )
+        sender = ResendEmailSender(batch_size=2)
+
+        results = await sender.send_batch(get_messages(4))
+
+        assert route.call_count == 2
+        assert [result.id for result in results] == [
+            "EMAIL_ID_0",
+            "EMAIL_ID_1",
+            "EMAIL_ID_0",
+            "EMAIL_ID_1",
+        ]
+
+    async def test_retry_on_rate_limit(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post("https://api.resend.com/emails/batch").mock(
+            side_effect=[
+                httpx.Response(429, headers={"Retry-After": "0"}),
+                httpx.Response(503),
+                httpx.Response(200, json={"data": [{"id": "A"}, {"id": "B"}]}),
+            ]
+        )
+        sender = ResendEmailSender(retry_base_delay=0)
+
+        results = await sender.send_batch(get_messages(2))
+
+        assert route.call_count == 3
+        assert [result.id for result in results] == ["A", "B"]
+
+        # Retries of a batch are sent with the same idempotency key
+        idempotency_keys = {
+            call.request.headers["Idempotency-Key"] for call in route.calls
+        }
+        assert len(idempotency_keys) == 1
+
+    async def test_ids_mismatch(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post("https://api.resend.com/emails/batch").mock(
+            return_value=httpx.Response(200, json={"data": [{"id": "A"}]})
+        )
+        sender = ResendEmailSender(retry_base_delay=0)
+
+        results = await sender.send_batch(get_messages(2))
+
+        assert route.call_count == 1
+        assert all(not result.success for result in results)
+        assert all(result.id is None for result in results)
+
+    async def test_no_retry_on_client_error(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post("https://api.resend.com/emails/batch").mock(
+            return_value=httpx.Response(422, json={"message": "Invalid"})
+        )
+        sender = ResendEmailSender(retry_base_delay=0)
+
+        results = await sender.send_batch(get_messages(2))
+
+        assert route.call_count == 1
+        assert all(not result.success for result in results)
@@ -0,0 +1,60 @@
+import contextlib
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import cast
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.eventstream.endpoints import listen_while_member
+from polar.eventstream.service import Receivers
+from polar.models import Organization, User, UserOrganization
+from polar.postgres import AsyncSession, AsyncSessionMaker
+from polar.user_organization.service import (
+    user_organization as user_organization_service,
+)
+
+
+class FakeMultiplexer:
+    def __init__(self, messages: list[str]) -> None:
+        self.messages = messages
+        self.closed = False
+
+    async def listen(self, channels: list[str]) -> AsyncGenerator[str, None]:
+        try:
+            for message in self.messages:
+                yield message
+        finally:
+            self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_listen_while_member(
+    mocker: MockerFixture,
+    session: AsyncSession,
+    user: User,
+    organization: Organization,
+    user_organization: UserOrganization,
+) -> None:
+    multiplexer = FakeMultiplexer(["A", "B", "C"])
+    mocker.patch(
+        "polar.eventstream.endpoints.get_multiplexer", return_value=multiplexer
+    )
+    mocker.patch("polar.eventstream.endpoints.MEMBERSHIP_CHECK_INTERVAL", 0)
+
+    @contextlib.asynccontextmanager
+    async def sessionmaker() -> AsyncIterator[AsyncSession]:
+        yield session
+
+    receivers = Receivers(user_id=user.id, member_organization_ids=[organization.id])
+
+    # then
+    session.expunge_all()
+
+    stream = listen_while_member(receivers, cast(AsyncSessionMaker, sessionmaker))
+    assert await anext(stream) == "A"
+
+    await user_organization_service.remove_member(session, user.id, organization.id)
+
+    # The stream is closed instead of delivering the next message
+    assert [message async for message in stream] == []
+    assert multiplexer.closed
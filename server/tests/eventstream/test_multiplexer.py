@@ -0,0 +1,101 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+
+from polar.eventstream.multiplexer import EventStreamMultiplexer
+from polar.kit.utils import generate_uuid
+from polar.redis import Redis, get_redis
+
+
+@pytest.fixture
+def redis() -> Redis:
+    return get_redis()
+
+
+@pytest_asyncio.fixture
+async def multiplexer(redis: Redis) -> AsyncIterator[EventStreamMultiplexer]:
+    multiplexer = EventStreamMultiplexer(redis, max_queue_size=2)
+    yield multiplexer
+    await multiplexer.close()
+
+
+async def wait_for_subscribers(redis: Redis, channel: str, count: int) -> None:
+    for _ in range(50):
+        result = await redis.pubsub_numsub(channel)
+        if result[0][1] == count:
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Expected {count} subscribers on {channel}")
+
+
+@pytest.mark.asyncio
+class TestEventStreamMultiplexer:
+    async def test_fan_out(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        channel = f"user:{generate_uuid()}"
+        client_1 = await multiplexer.connect([channel])
+        client_2 = await multiplexer.connect([channel])
+
+        # A single Redis subscription is shared between the clients
+        await wait_for_subscribers(redis, channel, 1)
+        assert multiplexer.stats.connected_clients == 2
+        assert multiplexer.stats.subscribed_channels == 1
+
+        await redis.publish(channel, "EVENT")
+
+        assert await asyncio.wait_for(client_1.queue.get(), 1) == "EVENT"
+        assert await asyncio.wait_for(client_2.queue.get(), 1) == "EVENT"
+
+    async def test_unsubscribe_last_client(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        channel = f"user:{generate_uuid()}"
+        client_1 = await multiplexer.connect([channel])
+        client_2 = await multiplexer.connect([channel])
+        await wait_for_subscribers(redis, channel, 1)
+
+        await multiplexer.disconnect(client_1)
+        await wait_for_subscribers(redis, channel, 1)
+
+        await multiplexer.disconnect(client_2)
+        await wait_for_subscribers(redis, channel, 0)
+        assert multiplexer.stats.connected_clients == 0
+        assert multiplexer.stats.subscribed_channels == 0
+
+    async def test_slow_consumer_eviction(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        channel = f"user:{generate_uuid()}"
+        slow_client = await multiplexer.connect([channel])
+        await wait_for_subscribers(redis, channel, 1)
+
+        for i in range(3):
+            await redis.publish(channel, f"EVENT_{i}")
+
+        for _ in range(50):
+            if slow_client.evicted:
+                break
+            await asyncio.sleep(0.02)
+
+        assert slow_client.evicted
+        assert slow_client.queue.qsize() == 2
+        assert multiplexer.stats.dropped_messages == 1
+        assert multiplexer.stats.evicted_clients == 1
+
+    async def test_listen(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        channel = f"user:{generate_uuid()}"
+        stream = multiplexer.listen([channel])
+        next_message = asyncio.ensure_future(anext(stream))
+        await wait_for_subscribers(redis, channel, 1)
+
+        await redis.publish(channel, "EVENT")
+
+        assert await asyncio.wait_for(next_message, 1) == "EVENT"
+
+        await stream.aclose()
+        await wait_for_subscribers(redis, channel, 0)
@@ -0,0 +1,90 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+
+from polar.eventstream.multiplexer import EventStreamMultiplexer
+from polar.eventstream.publisher import EventPublisher
+from polar.kit.utils import generate_uuid
+from polar.redis import Redis, get_redis
+
+from .test_multiplexer import wait_for_subscribers
+
+
+@pytest.fixture
+def redis() -> Redis:
+    return get_redis()
+
+
+@pytest_asyncio.fixture
+async def multiplexer(redis: Redis) -> AsyncIterator[EventStreamMultiplexer]:
+    multiplexer = EventStreamMultiplexer(redis)
+    yield multiplexer
+    await multiplexer.close()
+
+
+async def drain(queue: asyncio.Queue[str]) -> list[str]:
+    messages = [await asyncio.wait_for(queue.get(), 1)]
+    # Let the rest of the batch arrive
+    await asyncio.sleep(0.1)
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+
+@pytest.mark.asyncio
+class TestEventPublisher:
+    async def test_batch(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        publisher = EventPublisher(redis, window=0.05, max_batch_size=100)
+        channel_1 = f"org:{generate_uuid()}"
+        channel_2 = f"user:{generate_uuid()}"
+        client = await multiplexer.connect([channel_1, channel_2])
+        await wait_for_subscribers(redis, channel_1, 1)
+
+        await publisher.publish([channel_1, channel_2], "EVENT_1")
+        await publisher.publish([channel_1], "EVENT_2")
+
+        # Not sent before the end of the window
+        await asyncio.sleep(0.01)
+        assert client.queue.empty()
+
+        assert await drain(client.queue) == ["EVENT_1", "EVENT_1", "EVENT_2"]
+        assert publisher.stats.batches == 1
+        assert publisher.stats.published_messages == 3
+
+    async def test_coalesce(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        publisher = EventPublisher(redis, window=0.05, max_batch_size=100)
+        channel = f"org:{generate_uuid()}"
+        client = await multiplexer.connect([channel])
+        await wait_for_subscribers(redis, channel, 1)
+
+        for i in range(10):
+            await publisher.publish([channel], f"PROGRESS_{i}", coalesce_key="sync")
+        await publisher.publish([channel], "OTHER")
+        await publisher.publish([channel], "PROGRESS_10", coalesce_key="sync")
+
+        assert await drain(client.queue) == ["OTHER", "PROGRESS_10"]
+        assert publisher.stats.coalesced_messages == 10
+
+    async def test_max_batch_size(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        publisher = EventPublisher(redis, window=60, max_batch_size=2)
+        channel = f"org:{generate_uuid()}"
+        client = await multiplexer.connect([channel])
+        await wait_for_subscribers(redis, channel, 1)
+
+        await publisher.publish([channel], "EVENT_1")
+        await publisher.publish([channel], "EVENT_2")
+        await publisher.publish([channel], "EVENT_3")
+
+        assert await drain(client.queue) == ["EVENT_1", "EVENT_2"]
+
+        await publisher.flush()
+        assert await drain(client.queue) == ["EVENT_3"]
+        await publisher.close()
@@ -36,6 +36,9 @@ from polar.models.subscription_benefit_grant import SubscriptionBenefitGrant
 from polar.models.subscription_tier import SubscriptionTierType
 from polar.models.user import OAuthAccount
 from polar.organization.schemas import OrganizationCreate
+from polar.pledge.summary_service import (
+    issue_pledge_summary as issue_pledge_summary_service,
+)
 from polar.repository.schemas import RepositoryCreate
 
 
@@ -224,8 +227,9 @@ async def create_pledge(
         fee=fee,
         state=state,
         type=type,
-    ).save(session=session)
+    ).save(session=session, autocommit=False)
 
+    await issue_pledge_summary_service.update(session, [issue.id])
     await session.commit()
     return pledge
 
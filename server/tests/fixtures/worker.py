@@ -37,3 +37,8 @@ def polar_worker_context() -> PolarWorkerContext:
 @pytest.fixture(autouse=True)
 def mock_enqueue_job(mocker: MockerFixture) -> MagicMock:
     return mocker.patch("polar.worker._enqueue_job")
+
+
+@pytest.fixture(autouse=True)
+def mock_enqueue_jobs(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("polar.worker._enqueue_jobs")
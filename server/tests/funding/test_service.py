@@ -6,7 +6,6 @@ from polar.authz.service import Anonymous
 from polar.funding.schemas import FundingResultType
 from polar.funding.service import ListFundingSortBy
 from polar.funding.service import funding as funding_service
-from polar.issue.service import issue as issue_service
 from polar.kit.pagination import PaginationParams
 from polar.models import Issue, Organization, Pledge, User, UserOrganization
 from polar.models.pledge import PledgeState, PledgeType
@@ -37,12 +36,14 @@ async def issue_row_assertions(
         pledge for pledge in pledges if pledge.state in PledgeState.active_states()
     ]
 
-    # load issue with relations
-    issue_loaded = await issue_service.get_loaded(session, issue.id)
-    assert issue_loaded
-    issue = issue_loaded
-
-    assert len(issue.pledges) == len(active_pledges)
+    # pledgers are read from the summary
+    summary = issue_object.pledge_summary
+    top_pledgers_count = (
+        sum(len(pledgers) for pledgers in summary.top_pledgers.values())
+        if summary is not None
+        else 0
+    )
+    assert top_pledgers_count == len(active_pledges)
 
     assert total == sum([pledge.amount for pledge in active_pledges])
     assert last_pledged_at == (
@@ -0,0 +1,71 @@
+from collections.abc import AsyncIterator
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from polar.http_client import HTTPClientRegistry
+
+
+@pytest_asyncio.fixture
+async def registry() -> AsyncIterator[HTTPClientRegistry]:
+    registry = HTTPClientRegistry(
+        timeout=10.0,
+        connect_timeout=1.0,
+        max_connections=5,
+        max_keepalive_connections=2,
+    )
+    yield registry
+    await registry.close()
+
+
+def mock_transport(client: httpx.AsyncClient) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/error":
+            return httpx.Response(503)
+        if request.url.path == "/timeout":
+            raise httpx.ConnectTimeout("Timeout", request=request)
+        return httpx.Response(
+            200, json={}, headers={"Set-Cookie": "session=SECRET; Path=/"}
+        )
+
+    # Keep the stats transport, mock the network
+    client._transport.transport = httpx.MockTransport(handler)  # type: ignore
+
+
+@pytest.mark.asyncio
+class TestHTTPClientRegistry:
+    async def test_get_client_by_host(self, registry: HTTPClientRegistry) -> None:
+        client = registry.get_client("https://discord.com/api/v10")
+        assert registry.get_client("https://discord.com/api/v10/users") is client
+        assert registry.get_client("https://app.loops.so/api/v1") is not client
+        assert registry.get_client("http://discord.com") is not client
+
+    async def test_closed_client(self, registry: HTTPClientRegistry) -> None:
+        client = registry.get_client("https://discord.com")
+        await registry.close()
+
+        assert client.is_closed
+        assert registry.get_client("https://discord.com") is not client
+
+    async def test_stats(self, registry: HTTPClientRegistry) -> None:
+        client = registry.get_client("https://example.com")
+        mock_transport(client)
+
+        await client.get("https://example.com/")
+        await client.get("https://example.com/error")
+        with pytest.raises(httpx.ConnectTimeout):
+            await client.get("https://example.com/timeout")
+
+        stats = registry.stats["https://example.com"]
+        assert stats.count == 3
+        assert stats.errors == 2
+        assert stats.max_seconds >= stats.mean_seconds > 0
+
+    async def test_cookies_not_stored(self, registry: HTTPClientRegistry) -> None:
+        client = registry.get_client("https://example.com")
+        mock_transport(client)
+
+        await client.get("https://example.com/")
+
+        assert len(client.cookies.jar) == 0
@@ -0,0 +1,129 @@
+import uuid
+from collections.abc import Callable
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.discord.client import DiscordClient
+
+
+def build_client(handler: Callable[[httpx.Request], httpx.Response]) -> DiscordClient:
+    # Rate limits are stored by token, don't share them between tests
+    return DiscordClient(
+        "Bot",
+        f"TOKEN_{uuid.uuid4()}",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+@pytest.fixture
+def sleep_mock(mocker: MockerFixture) -> AsyncMock:
+    return mocker.patch(
+        "polar.integrations.discord.client.asyncio.sleep", new_callable=AsyncMock
+    )
+
+
+@pytest.mark.asyncio
+class TestDiscordClient:
+    async def test_retry_rate_limited(self, sleep_mock: AsyncMock) -> None:
+        responses = iter(
+            [
+                httpx.Response(
+                    429,
+                    headers={"Retry-After": "2", "X-RateLimit-Bucket": "bucket"},
+                    json={"message": "You are being rate limited."},
+                ),
+                httpx.Response(200, json={"id": "123"}),
+            ]
+        )
+        client = build_client(lambda request: next(responses))
+
+        guild = await client.get_guild("123", exclude_bot_roles=False)
+
+        assert guild == {"id": "123"}
+        sleep_mock.assert_awaited_once_with(pytest.approx(2, abs=0.1))
+
+    async def test_rate_limited_too_long(self, sleep_mock: AsyncMock) -> None:
+        client = build_client(
+            lambda request: httpx.Response(
+                429, headers={"Retry-After": "3600"}, json={}
+            )
+        )
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_me()
+        sleep_mock.assert_not_awaited()
+
+    async def test_exhausted_bucket(self, sleep_mock: AsyncMock) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(
+                204,
+                headers={
+                    "X-RateLimit-Bucket": "roles",
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset-After": "1.5",
+                },
+            )
+
+        client = build_client(handler)
+
+        await client.add_member_role("123", "456", "1")
+        sleep_mock.assert_not_awaited()
+
+        # Same bucket and guild: waits for the reset
+        await client.add_member_role("123", "789", "1")
+        sleep_mock.assert_awaited_once_with(pytest.approx(1.5, abs=0.1))
+
+        # Another guild has its own limits
+        sleep_mock.reset_mock()
+        await client.add_member_role("999", "456", "1")
+        sleep_mock.assert_not_awaited()
+
+        assert len(requests) == 3
+
+    async def test_shared_limits(self, sleep_mock: AsyncMock) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                204,
+                headers={
+                    "X-RateLimit-Bucket": "roles",
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset-After": "1.5",
+                },
+            )
+
+        token = f"TOKEN_{uuid.uuid4()}"
+        transport = httpx.MockTransport(handler)
+        client = DiscordClient("Bot", token, httpx.AsyncClient(transport=transport))
+        await client.add_member_role("123", "456", "1")
+
+        # Another process with the same token waits for the reset
+        other_client = DiscordClient(
+            "Bot", token, httpx.AsyncClient(transport=transport)
+        )
+        await other_client.add_member_role("123", "789", "1")
+        sleep_mock.assert_awaited_once_with(pytest.approx(1.5, abs=0.1))
+
+    async def test_list_members(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            after = int(request.url.params["after"])
+            count = 1000 if after == 0 else 2
+            return httpx.Response(
+                200,
+                json=[
+                    {"user": {"id": str(after + i + 1)}, "roles": []}
+                    for i in range(count)
+                ],
+            )
+
+        client = build_client(handler)
+
+        members = [member async for member in client.list_members("123")]
+
+        assert len(members) == 1002
+        assert members[-1]["user"]["id"] == "1002"
@@ -1,8 +1,18 @@
+import datetime
+import uuid
+
+import httpx
 import pytest
+from pytest_mock import MockerFixture
 
-from polar.integrations.github.client import get_client
-from polar.integrations.github.service.issue import github_issue
+from polar.config import settings
+from polar.integrations.github.cache import HTTPCacheTransport, get_http_cache
+from polar.integrations.github.client import CachedGitHub, TokenAuthStrategy, get_client
+from polar.integrations.github.service.issue import _rank_recommendations, github_issue
+from polar.models import Issue, Organization, Repository, User
 from polar.postgres import AsyncSession
+from polar.redis import redis
+from tests.fixtures.random_objects import create_issue
 
 
 @pytest.mark.asyncio
@@ -35,3 +45,158 @@ async def test_sync_external_org_with_repo_and_issue(
     )
 
     assert issue is not None
+
+
+@pytest.mark.asyncio
+async def test_list_issues_from_starred_cached(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    user: User,
+    organization: Organization,
+    public_repository: Repository,
+) -> None:
+    enqueue_job_mock = mocker.patch(
+        "polar.integrations.github.service.issue.enqueue_job"
+    )
+    refresh_mock = mocker.patch.object(github_issue, "refresh_recommendations")
+
+    issues = [
+        await create_issue(session, organization, public_repository) for _ in range(3)
+    ]
+    cache_key = f"recommendations:{user.id}"
+    await redis.delete(cache_key)
+    await redis.rpush(cache_key, *[str(i.id) for i in reversed(issues)])
+    await redis.expire(cache_key, settings.GITHUB_RECOMMENDATIONS_TTL_SECONDS)
+
+    # then
+    session.expunge_all()
+
+    recommended = await github_issue.list_issues_from_starred(
+        session, mocker.MagicMock(), user
+    )
+
+    assert [i.id for i in recommended] == [i.id for i in reversed(issues)]
+    assert recommended[0].repository.organization.id == organization.id
+    refresh_mock.assert_not_called()
+    enqueue_job_mock.assert_not_called()
+
+    # Refreshed in the background when close to expiration
+    await redis.expire(cache_key, 60)
+
+    recommended = await github_issue.list_issues_from_starred(
+        session, mocker.MagicMock(), user
+    )
+
+    assert len(recommended) == 3
+    refresh_mock.assert_not_called()
+    enqueue_job_mock.assert_called_once_with(
+        "github.issue.recommendations.refresh",
+        user_id=user.id,
+        _job_id=f"github.issue.recommendations.refresh:{user.id}",
+    )
+
+
+def test_rank_recommendations() -> None:
+    repository_a = uuid.uuid4()
+    repository_b = uuid.uuid4()
+
+    def _issue(repository_id: uuid.UUID, plus_one: int) -> Issue:
+        return Issue(repository_id=repository_id, reactions={"plus_one": plus_one})
+
+    issues_a = [_issue(repository_a, plus_one) for plus_one in (10, 9, 8)]
+    issues_b = [_issue(repository_b, plus_one) for plus_one in (2, 1, 0)]
+
+    ranked = _rank_recommendations([issues_a, issues_b])
+
+    assert [i.repository_id for i in ranked] == [
+        repository_a,
+        repository_b,
+        repository_a,
+        repository_b,
+        repository_a,
+        repository_b,
+    ]
+    assert ranked[0] is issues_a[0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skip_db_asserts
+async def test_get_recommendations_response_refresh(
+    mocker: MockerFixture, user: User
+) -> None:
+    enqueue_job_mock = mocker.patch(
+        "polar.integrations.github.service.issue.enqueue_job"
+    )
+    cache_key = f"recommendations:{user.id}"
+    await redis.delete(cache_key)
+    await redis.rpush(cache_key, "ISSUE_ID")
+    await redis.expire(cache_key, settings.GITHUB_RECOMMENDATIONS_TTL_SECONDS)
+    await github_issue.set_recommendations_response(user.id, "[]")
+
+    assert await github_issue.get_recommendations_response(user.id) == "[]"
+    enqueue_job_mock.assert_not_called()
+    # Holds the issues data, so it expires long before the ranked IDs
+    assert await redis.ttl(f"recommendations:response:{user.id}") <= 60 * 5
+
+    # Served from the cached response, but still refreshed when due
+    await redis.expire(cache_key, 60)
+
+    assert await github_issue.get_recommendations_response(user.id) == "[]"
+    enqueue_job_mock.assert_called_once_with(
+        "github.issue.recommendations.refresh",
+        user_id=user.id,
+        _job_id=f"github.issue.recommendations.refresh:{user.id}",
+    )
+
+
+@pytest.mark.asyncio
+async def test_sync_issue_not_modified(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    organization: Organization,
+    public_repository: Repository,
+) -> None:
+    etag = f'"{uuid.uuid4()}"'
+    namespace = str(uuid.uuid4())
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, json={"id": 1}, headers={"ETag": etag})
+
+    class MockedGitHub(CachedGitHub[TokenAuthStrategy]):
+        def _create_async_client(self) -> httpx.AsyncClient:
+            return httpx.AsyncClient(
+                **self._get_client_defaults(),
+                transport=HTTPCacheTransport(
+                    httpx.MockTransport(handler),
+                    get_http_cache(),
+                    namespace,
+                ),
+            )
+
+    client = MockedGitHub("")
+    mocker.patch(
+        "polar.integrations.github.service.issue.github.get_app_installation_client",
+        return_value=client,
+    )
+    store_mock = mocker.patch.object(github_issue, "store")
+
+    issue = await create_issue(session, organization, public_repository)
+    issue.github_issue_etag = etag
+    fetched_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    issue.github_issue_fetched_at = fetched_at
+    await issue.save(session)
+
+    # Cache the response, as a previous crawl would have
+    await client.rest.issues.async_get(
+        organization.name, public_repository.name, issue.number
+    )
+
+    # then
+    session.expunge_all()
+
+    await github_issue.sync_issue(session, organization, public_repository, issue)
+
+    store_mock.assert_not_called()
+    assert issue.github_issue_fetched_at == fetched_at
@@ -0,0 +1,146 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from types import SimpleNamespace
+from typing import Any, cast
+from unittest.mock import MagicMock
+
+import pytest
+from githubkit import Response
+
+from polar.integrations.github.service.paginated import (
+    github_paginated_service,
+    iterate_pages,
+)
+from polar.kit.hook import Hook
+from polar.models import Organization, Repository
+from polar.postgres import AsyncSession
+from polar.repository.hooks import SyncCompletedHook, SyncedHook
+
+
+def get_request(
+    pages: list[list[Any]], requests: list[dict[str, Any]] | None = None
+) -> Callable[..., Awaitable[Response[list[Any]]]]:
+    async def request(**kwargs: Any) -> Response[list[Any]]:
+        if requests is not None:
+            requests.append(kwargs)
+        page = kwargs["page"]
+        data = pages[page - 1] if page <= len(pages) else []
+        # Our fake response directly holds the items, no need to parse it
+        return cast(Response[list[Any]], SimpleNamespace(parsed_data=data))
+
+    return request
+
+
+def get_item(id: int) -> MagicMock:
+    item = MagicMock()
+    item.id = id
+    return item
+
+
+@pytest.mark.asyncio
+async def test_iterate_pages() -> None:
+    requests: list[dict[str, Any]] = []
+    request = get_request([[1, 2], [3, 4], [5]], requests)
+    pages = [
+        page async for page in iterate_pages(request, per_page=2, owner="polarsource")
+    ]
+    assert pages == [[1, 2], [3, 4], [5]]
+    assert requests == [
+        {"page": page, "per_page": 2, "owner": "polarsource"} for page in range(1, 5)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_iterate_pages_stopped() -> None:
+    pages = iterate_pages(get_request([[1, 2], [3, 4], [5]]), per_page=2)
+    assert await anext(pages) == [1, 2]
+
+    tasks_before_close = asyncio.all_tasks()
+    await pages.aclose()
+
+    # The prefetch of the next page is done when the iteration is stopped
+    assert all(task.done() for task in tasks_before_close - {asyncio.current_task()})
+
+
+@pytest.mark.asyncio
+@pytest.mark.skip_db_asserts
+class TestStorePaginatedResource:
+    async def test_store_per_page(
+        self,
+        session: AsyncSession,
+        organization: Organization,
+        repository: Repository,
+    ) -> None:
+        items = [get_item(i) for i in range(5)]
+        pages = iterate_pages(
+            get_request([items[0:2], items[2:4], items[4:5]]), per_page=2
+        )
+
+        stored: list[list[Any]] = []
+
+        async def store_many(
+            session: AsyncSession, *, data: list[Any], **kwargs: Any
+        ) -> Sequence[Any]:
+            stored.append(data)
+            return [MagicMock(external_id=d.id) for d in data]
+
+        synced_hooks: list[SyncedHook] = []
+        on_sync_signal: Hook[SyncedHook] = Hook()
+
+        async def on_sync(hook: SyncedHook) -> None:
+            synced_hooks.append(hook)
+
+        on_sync_signal.add(on_sync)
+
+        completed_hooks: list[SyncCompletedHook] = []
+        on_completed_signal: Hook[SyncCompletedHook] = Hook()
+
+        async def on_completed(hook: SyncCompletedHook) -> None:
+            completed_hooks.append(hook)
+
+        on_completed_signal.add(on_completed)
+
+        synced, errors = await github_paginated_service.store_paginated_resource(
+            session,
+            pages=pages,
+            store_many_resource_method=store_many,
+            organization=organization,
+            repository=repository,
+            resource_type="issue",
+            skip_condition=lambda d: d.id == 3,
+            on_sync_signal=on_sync_signal,
+            on_completed_signal=on_completed_signal,
+        )
+
+        assert synced == 5
+        assert errors == 0
+        assert stored == [items[0:2], items[2:3], items[4:5]]
+        assert [hook.synced for hook in synced_hooks] == [2, 4, 5]
+        assert len(completed_hooks) == 1
+        assert completed_hooks[0].synced == 5
+
+    async def test_store_errors(
+        self,
+        session: AsyncSession,
+        organization: Organization,
+        repository: Repository,
+    ) -> None:
+        items = [get_item(i) for i in range(3)]
+        pages = iterate_pages(get_request([items]))
+
+        async def store_many(
+            session: AsyncSession, *, data: list[Any], **kwargs: Any
+        ) -> Sequence[Any]:
+            return [MagicMock(external_id=data[0].id)]
+
+        synced, errors = await github_paginated_service.store_paginated_resource(
+            session,
+            pages=pages,
+            store_many_resource_method=store_many,
+            organization=organization,
+            repository=repository,
+            resource_type="issue",
+        )
+
+        assert synced == 3
+        assert errors == 2
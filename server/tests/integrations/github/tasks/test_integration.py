@@ -61,6 +61,8 @@ async def test_installation_no_notifications(
             )
         elif name == "github.issue.sync.issue_dependencies":
             return None  # skip
+        elif name == "issue.body.render_pending":
+            return None  # skip
         else:
             raise Exception(f"unexpected job: {name}")
 
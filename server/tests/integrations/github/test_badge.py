@@ -23,8 +23,8 @@ BADGED_BODY = """Hello my issue
 
 <a href="http://127.0.0.1:3000/testorg/testrepo/issues/123">
 <picture>
-  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
-  <img alt="Fund with Polar" src="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg">
+  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
+  <img alt="Fund with Polar" src="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg">
 </picture>
 </a>
 <!-- POLAR PLEDGE BADGE END -->
@@ -78,8 +78,8 @@ Hello, please sponsor me.
 
 <a href="http://127.0.0.1:3000/testorg/testrepo/issues/123">
 <picture>
-  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
-  <img alt="Fund with Polar" src="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg">
+  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
+  <img alt="Fund with Polar" src="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg">
 </picture>
 </a>
 <!-- POLAR PLEDGE BADGE END -->
@@ -120,8 +120,8 @@ Default message from organization.
 
 <a href="http://127.0.0.1:3000/testorg/testrepo/issues/123">
 <picture>
-  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
-  <img alt="Fund with Polar" src="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg">
+  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
+  <img alt="Fund with Polar" src="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg">
 </picture>
 </a>
 <!-- POLAR PLEDGE BADGE END -->
@@ -165,8 +165,8 @@ Anything can go here!
 
 <a href="http://127.0.0.1:3000/testorg/testrepo/issues/123">
 <picture>
-  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
-  <img alt="Fund with Polar" src="http://127.0.0.1:3000/api/github/testorg/testrepo/issues/123/pledge.svg">
+  <source media="(prefers-color-scheme: dark)" srcset="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg?darkmode=1">
+  <img alt="Fund with Polar" src="http://127.0.0.1:8000/api/v1/integrations/github/testorg/testrepo/issues/123/pledge.svg">
 </picture>
 </a>
 <!-- POLAR PLEDGE BADGE END -->
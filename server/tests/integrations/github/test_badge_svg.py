@@ -0,0 +1,251 @@
+import dataclasses
+import datetime
+import uuid
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from polar.integrations.github.badge_svg import (
+    BadgeSVGCache,
+    BadgeSVGData,
+    get_badge_svg_cache,
+    render_badge_svg,
+    render_issue_badges,
+)
+from polar.integrations.github.service.organization import github_organization
+from polar.kit.cache import LocalCache
+from polar.models import Issue, Organization, Repository
+from polar.postgres import AsyncSession
+from polar.redis import get_redis
+from tests.fixtures.random_objects import create_issue, create_pledge
+
+
+def _badge_data(**kwargs: Any) -> BadgeSVGData:
+    data = BadgeSVGData(
+        organization_name="polarsource",
+        pledges_sum=123400,
+        funding_goal=None,
+        show_amount_raised=False,
+        upfront_split_to_contributors=None,
+        avatars=[],
+        avatars_count=0,
+    )
+    return dataclasses.replace(data, **kwargs)
+
+
+class TestRenderBadgeSVG:
+    def test_default(self) -> None:
+        svg = render_badge_svg(_badge_data(), darkmode=False)
+        assert svg.startswith("<svg")
+        assert "Fund this issue" in svg
+        assert "pledged" not in svg
+        assert 'height="40"' in svg
+
+    def test_amount(self) -> None:
+        svg = render_badge_svg(_badge_data(show_amount_raised=True), darkmode=False)
+        assert "$1,234 </tspan>" in svg
+
+    def test_funding_goal(self) -> None:
+        svg = render_badge_svg(_badge_data(funding_goal=200000), darkmode=True)
+        assert "/ $2,000 pledged" in svg
+        assert "#1D1E27" in svg
+
+    def test_avatars(self) -> None:
+        svg = render_badge_svg(
+            _badge_data(avatars=["data:image/png;base64,AAAA", None], avatars_count=6),
+            darkmode=False,
+        )
+        assert svg.count("data:image/png;base64,AAAA") == 1
+        assert "+4" in svg
+
+    def test_upfront_split_to_contributors(self) -> None:
+        svg = render_badge_svg(
+            _badge_data(
+                upfront_split_to_contributors=50, organization_name="<polarsource>"
+            ),
+            darkmode=False,
+        )
+        assert 'height="64"' in svg
+        assert "@&lt;polarsource&gt;" in svg
+        assert "rewards contributors 50% after fees" in svg
+
+
+@pytest.mark.asyncio
+async def test_badge_svg_cache() -> None:
+    local_cache = LocalCache(10)
+    cache = BadgeSVGCache(
+        get_redis(),
+        local_cache,
+        ttl=datetime.timedelta(minutes=5),
+        local_ttl=datetime.timedelta(minutes=1),
+    )
+    repository_name = str(uuid.uuid4())
+
+    assert await cache.get_etag("Org", repository_name, 1, False) is None
+
+    badge = await cache.set("Org", repository_name, 1, False, "<svg></svg>")
+
+    local_cache.clear()
+    assert await cache.get_etag("org", repository_name.upper(), 1, False) == (
+        badge.etag
+    )
+    assert await cache.get_etag("org", repository_name, 1, True) is None
+    assert await cache.get_content(badge.etag) == "<svg></svg>"
+
+
+@pytest.mark.asyncio
+@pytest.mark.http_auto_expunge
+class TestBadgeSVGEndpoint:
+    async def test_unknown_issue(
+        self, client: AsyncClient, organization: Organization
+    ) -> None:
+        response = await client.get(
+            f"/api/v1/integrations/github/{organization.name}/unknown/issues/1/pledge.svg"
+        )
+
+        assert response.status_code == 404
+        assert response.headers["Content-Type"] == "image/svg+xml"
+
+    async def test_private_repository(
+        self,
+        client: AsyncClient,
+        organization: Organization,
+        repository: Repository,
+        issue: Issue,
+    ) -> None:
+        assert repository.is_private
+        response = await client.get(
+            f"/api/v1/integrations/github/{organization.name}/{repository.name}"
+            f"/issues/{issue.number}/pledge.svg"
+        )
+
+        assert response.status_code == 404
+
+    async def test_cached(
+        self,
+        session: AsyncSession,
+        client: AsyncClient,
+        mocker: MockerFixture,
+        mock_enqueue_job: MagicMock,
+        organization: Organization,
+        public_repository: Repository,
+        pledging_organization: Organization,
+    ) -> None:
+        fetch_avatar_mock = mocker.patch(
+            "polar.integrations.github.badge_svg._fetch_avatar",
+            return_value="data:image/png;base64,AAAA",
+        )
+        get_by_name_spy = mocker.spy(github_organization, "get_by_name")
+
+        # Avatars are cached by URL
+        pledging_organization.avatar_url = f"https://example.com/{uuid.uuid4()}"
+        await pledging_organization.save(session)
+
+        issue = await create_issue(session, organization, public_repository)
+        await create_pledge(
+            session, organization, public_repository, issue, pledging_organization
+        )
+        url = (
+            f"/api/v1/integrations/github/{organization.name}/{public_repository.name}"
+            f"/issues/{issue.number}/pledge.svg"
+        )
+
+        response = await client.get(url)
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "image/svg+xml"
+        assert "stale-while-revalidate" in response.headers["Cache-Control"]
+        etag = response.headers["ETag"]
+
+        # Avatars aren't fetched while serving the request, but in the background
+        fetch_avatar_mock.assert_not_called()
+        mock_enqueue_job.assert_called_once()
+        assert mock_enqueue_job.call_args[0] == ("github.badge.render_svg", issue.id)
+
+        response = await client.get(url)
+        assert response.status_code == 200
+        assert response.headers["ETag"] == etag
+
+        response = await client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        # Dark mode badges were rendered at the same time
+        response = await client.get(url, params={"darkmode": 1})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+        get_by_name_spy.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_render_issue_badges_avatars(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    mock_enqueue_job: MagicMock,
+    organization: Organization,
+    public_repository: Repository,
+    pledging_organization: Organization,
+) -> None:
+    fetch_avatar_mock = mocker.patch(
+        "polar.integrations.github.badge_svg._fetch_avatar",
+        return_value="data:image/png;base64,AAAA",
+    )
+    # Avatars are cached by URL
+    pledging_organization.avatar_url = f"https://example.com/{uuid.uuid4()}"
+    await pledging_organization.save(session)
+
+    issue = await create_issue(session, organization, public_repository)
+    await create_pledge(
+        session, organization, public_repository, issue, pledging_organization
+    )
+    cache = get_badge_svg_cache()
+
+    # then
+    session.expunge_all()
+
+    badges = await render_issue_badges(
+        session,
+        cache,
+        organization=organization,
+        repository=public_repository,
+        issue=issue,
+    )
+    assert "data:image/png;base64,AAAA" in badges[False].content
+    fetch_avatar_mock.assert_called_once()
+
+    # Avatars are cached
+    badges = await render_issue_badges(
+        session,
+        cache,
+        organization=organization,
+        repository=public_repository,
+        issue=issue,
+        fetch_avatars=False,
+    )
+    assert "data:image/png;base64,AAAA" in badges[False].content
+    fetch_avatar_mock.assert_called_once()
+    mock_enqueue_job.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skip_db_asserts
+async def test_invalidate_organization() -> None:
+    cache = BadgeSVGCache(
+        get_redis(),
+        LocalCache(10),
+        ttl=datetime.timedelta(minutes=1),
+        local_ttl=datetime.timedelta(seconds=10),
+    )
+    organization_name = f"org-{uuid.uuid4()}"
+    await cache.set(organization_name, "repo", 1, False, "<svg></svg>")
+    await cache.set(organization_name, "repo", 2, True, "<svg></svg>")
+    await cache.set("other", "repo", 1, False, "<svg></svg>")
+
+    await cache.invalidate_organization(organization_name)
+
+    assert await cache.get_etag(organization_name, "repo", 1, False) is None
+    assert await cache.get_etag(organization_name, "repo", 2, True) is None
+    assert await cache.get_etag("other", "repo", 1, False) is not None
@@ -0,0 +1,187 @@
+import datetime
+import uuid
+
+import httpx
+import pytest
+
+from polar.integrations.github.cache import (
+    HTTPCache,
+    HTTPCacheTransport,
+    RedisCache,
+    get_endpoint,
+)
+from polar.kit.cache import LocalCache
+from polar.redis import Redis, get_redis
+
+
+@pytest.fixture
+def redis() -> Redis:
+    return get_redis()
+
+
+@pytest.fixture
+def http_cache(redis: Redis) -> HTTPCache:
+    return HTTPCache(
+        redis,
+        LocalCache(10),
+        ttl=datetime.timedelta(minutes=5),
+        local_ttl=datetime.timedelta(minutes=1),
+        max_size=1024,
+    )
+
+
+def test_local_cache_eviction() -> None:
+    cache = LocalCache(2)
+    ex = datetime.timedelta(minutes=1)
+    cache.set("a", "1", ex)
+    cache.set("b", "2", ex)
+    assert cache.get("a") == "1"
+
+    cache.set("c", "3", ex)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_local_cache_ttl() -> None:
+    cache = LocalCache(2)
+    cache.set("a", "1", datetime.timedelta(seconds=-1))
+    assert cache.get("a") is None
+
+
+@pytest.mark.parametrize(
+    "path,endpoint",
+    [
+        ("/repos/polarsource/polar/issues/12", "/repos/{owner}/{repo}/issues/{id}"),
+        ("/orgs/polarsource/members", "/orgs/{name}/members"),
+        ("/user", "/user"),
+    ],
+)
+def test_get_endpoint(path: str, endpoint: str) -> None:
+    assert get_endpoint(path) == endpoint
+
+
+@pytest.mark.asyncio
+async def test_redis_cache() -> None:
+    local_cache = LocalCache(10)
+    cache = RedisCache(local_cache)
+    key = str(uuid.uuid4())
+
+    await cache.aset(key, "token", datetime.timedelta(minutes=1))
+    assert cache.get(key) == "token"
+
+    # Read from Redis when the process doesn't have it
+    local_cache.clear()
+    assert cache.get(key) is None
+    assert await cache.aget(key) == "token"
+    assert cache.get(key) == "token"
+
+
+@pytest.mark.asyncio
+class TestHTTPCacheTransport:
+    async def test_conditional_request(self, http_cache: HTTPCache) -> None:
+        requests: list[httpx.Request] = []
+        etag = '"abc"'
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304, headers={"X-RateLimit-Remaining": "10"})
+            return httpx.Response(
+                200,
+                json={"id": 1},
+                headers={"ETag": etag, "X-RateLimit-Remaining": "11"},
+            )
+
+        transport = HTTPCacheTransport(
+            httpx.MockTransport(handler), http_cache, str(uuid.uuid4())
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            url = "https://api.github.com/repos/polarsource/polar/issues/1"
+            response = await client.get(url)
+            assert response.status_code == 200
+            assert response.json() == {"id": 1}
+
+            response = await client.get(url)
+            assert response.status_code == 200
+            assert response.json() == {"id": 1}
+            assert response.headers["X-RateLimit-Remaining"] == "10"
+
+        assert "If-None-Match" not in requests[0].headers
+        assert requests[1].headers["If-None-Match"] == etag
+
+        stats = await http_cache.get_stats()
+        assert stats["/repos/{owner}/{repo}/issues/{id}"]["hit"] >= 1
+        assert stats["/repos/{owner}/{repo}/issues/{id}"]["miss"] >= 1
+
+    async def test_modified(self, http_cache: HTTPCache) -> None:
+        versions = iter([("1", '"v1"'), ("2", '"v2"')])
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            content, etag = next(versions)
+            return httpx.Response(200, text=content, headers={"ETag": etag})
+
+        transport = HTTPCacheTransport(
+            httpx.MockTransport(handler), http_cache, str(uuid.uuid4())
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            url = "https://api.github.com/user"
+            assert (await client.get(url)).text == "1"
+            assert (await client.get(url)).text == "2"
+
+    async def test_namespace(self, http_cache: HTTPCache) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, text="{}", headers={"ETag": '"abc"'})
+
+        url = "https://api.github.com/user"
+        for namespace in (str(uuid.uuid4()), str(uuid.uuid4())):
+            transport = HTTPCacheTransport(
+                httpx.MockTransport(handler), http_cache, namespace
+            )
+            async with httpx.AsyncClient(transport=transport) as client:
+                await client.get(url)
+
+        assert all("If-None-Match" not in request.headers for request in requests)
+
+    async def test_uncacheable(self, http_cache: HTTPCache) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, text="x" * 2048, headers={"ETag": '"abc"'})
+
+        transport = HTTPCacheTransport(
+            httpx.MockTransport(handler), http_cache, str(uuid.uuid4())
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(2):
+                await client.get("https://api.github.com/user")
+            await client.post("https://api.github.com/user")
+
+        # Too large to be cached
+        assert all("If-None-Match" not in request.headers for request in requests)
+
+    async def test_caller_conditional_request(self, http_cache: HTTPCache) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text="2", headers={"ETag": '"v2"'})
+
+        transport = HTTPCacheTransport(
+            httpx.MockTransport(handler), http_cache, str(uuid.uuid4())
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            url = "https://api.github.com/user"
+            assert (await client.get(url)).text == "2"
+
+            response = await client.get(url, headers={"If-None-Match": '"v1"'})
+            assert response.status_code == 304
+
+        assert requests[1].headers["If-None-Match"] == '"v1"'
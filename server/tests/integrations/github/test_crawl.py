@@ -0,0 +1,156 @@
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from polar.config import settings
+from polar.integrations.github.crawl import CrawlKind, CrawlScheduler
+from polar.integrations.github.rate_limit import RateLimitBudget, RateLimitScheduler
+from polar.kit.utils import utc_now
+from polar.models import Issue, Organization, Repository
+from polar.postgres import AsyncSession
+from polar.redis import get_redis
+from tests.fixtures.random_objects import create_issue
+
+
+@pytest.fixture
+def crawl_scheduler() -> CrawlScheduler:
+    redis = get_redis()
+    return CrawlScheduler(redis, RateLimitScheduler(redis))
+
+
+async def create_stale_issue(
+    session: AsyncSession,
+    organization: Organization,
+    repository: Repository,
+    *,
+    stale_for: timedelta,
+    **kwargs: int | bool,
+) -> Issue:
+    issue = await create_issue(session, organization, repository)
+    issue.github_issue_fetched_at = (
+        utc_now()
+        - timedelta(seconds=settings.GITHUB_CRAWL_STALE_AFTER_SECONDS)
+        - stale_for
+    )
+    for key, value in kwargs.items():
+        setattr(issue, key, value)
+    await issue.save(session)
+    return issue
+
+
+@pytest.mark.asyncio
+async def test_schedule(
+    session: AsyncSession,
+    mock_enqueue_jobs: MagicMock,
+    crawl_scheduler: CrawlScheduler,
+    organization: Organization,
+    repository: Repository,
+) -> None:
+    fresh = await create_issue(session, organization, repository)
+    fresh.github_issue_fetched_at = utc_now()
+    await fresh.save(session)
+
+    inactive = await create_stale_issue(
+        session, organization, repository, stale_for=timedelta(hours=2)
+    )
+    pledged = await create_stale_issue(
+        session,
+        organization,
+        repository,
+        stale_for=timedelta(hours=1),
+        pledged_amount_sum=1000,
+    )
+    engaged = await create_stale_issue(
+        session,
+        organization,
+        repository,
+        stale_for=timedelta(hours=1),
+        total_engagement_count=3,
+    )
+    await session.commit()
+
+    # then
+    session.expunge_all()
+
+    await crawl_scheduler.schedule(session, CrawlKind.issue)
+
+    name, jobs = mock_enqueue_jobs.call_args.args
+    assert name == "github.issue.sync"
+
+    issue_ids = [job.args[0] for job in jobs]
+    assert fresh.id not in issue_ids
+    organization_issue_ids = [
+        id for id in issue_ids if id in {inactive.id, pledged.id, engaged.id}
+    ]
+    assert organization_issue_ids == [pledged.id, engaged.id, inactive.id]
+
+    # Spread over the interval
+    defers = [job.defer_by for job in jobs if job.args[0] in organization_issue_ids]
+    assert defers == sorted(defers)
+    assert defers[0] == timedelta(0)
+    assert defers[-1] < timedelta(seconds=settings.GITHUB_CRAWL_INTERVAL_SECONDS)
+
+    lags = await crawl_scheduler.get_lags(CrawlKind.issue)
+    lag = lags[organization.id]
+    assert lag.backlog == 3
+    assert lag.lag >= settings.GITHUB_CRAWL_STALE_AFTER_SECONDS + 2 * 60 * 60
+
+
+@pytest.mark.asyncio
+async def test_schedule_budget_exhausted(
+    session: AsyncSession,
+    mock_enqueue_jobs: MagicMock,
+    crawl_scheduler: CrawlScheduler,
+    organization: Organization,
+    repository: Repository,
+) -> None:
+    issue = await create_stale_issue(
+        session, organization, repository, stale_for=timedelta(hours=1)
+    )
+    await session.commit()
+    await get_redis().hset(
+        f"github:rate-limit:{organization.installation_id}",
+        mapping={
+            "remaining": settings.GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE,
+            "limit": 5000,
+            "reset": int(time.time()) + 60,
+        },
+    )
+
+    # then
+    session.expunge_all()
+
+    await crawl_scheduler.schedule(session, CrawlKind.timeline)
+
+    for call in mock_enqueue_jobs.call_args_list:
+        _, jobs = call.args
+        assert issue.id not in [job.args[0] for job in jobs]
+
+    # Still reported as lagging
+    lags = await crawl_scheduler.get_lags(CrawlKind.timeline)
+    assert lags[organization.id].backlog >= 1
+
+
+@pytest.mark.parametrize(
+    "remaining,reset_in,expected",
+    [
+        (0, 3600, 0),
+        (settings.GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE + 600, 3600, 50),
+        (settings.GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE + 600, 0, 100),
+        (settings.GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE + 100, 60, 50),
+    ],
+)
+def test_get_interval_budget(
+    crawl_scheduler: CrawlScheduler, remaining: int, reset_in: int, expected: int
+) -> None:
+    budget = RateLimitBudget(remaining, int(time.time()) + reset_in)
+    assert crawl_scheduler._get_interval_budget(budget) == expected
+
+
+def test_get_interval_budget_unknown(crawl_scheduler: CrawlScheduler) -> None:
+    assert (
+        crawl_scheduler._get_interval_budget(None)
+        == settings.GITHUB_CRAWL_MAX_ISSUES_PER_INTERVAL
+    )
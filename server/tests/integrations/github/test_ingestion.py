@@ -0,0 +1,205 @@
+import asyncio
+import json
+import random
+import uuid
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.github.ingestion import WebhookEvent, WebhookIngestion
+from polar.redis import Redis, get_redis
+
+
+@pytest.fixture
+def redis() -> Redis:
+    return get_redis()
+
+
+@pytest.fixture
+def enqueue_job_mock(mocker: MockerFixture) -> AsyncMock:
+    return mocker.patch(
+        "polar.integrations.github.ingestion.enqueue_job",
+        new=AsyncMock(side_effect=lambda *args, **kwargs: MagicMock(job_id="job")),
+    )
+
+
+def get_event(
+    action: str,
+    *,
+    issue_id: int,
+    label: str | None = None,
+    delivery_id: str | None = None,
+) -> WebhookEvent:
+    payload: dict[str, Any] = {
+        "action": action,
+        "installation": {"id": 1},
+        "repository": {"id": 2},
+        "issue": {"id": issue_id},
+    }
+    if label is not None:
+        payload["label"] = {"name": label}
+    return WebhookEvent(
+        delivery_id=delivery_id or str(uuid.uuid4()),
+        scope="issues",
+        action=action,
+        payload=payload,
+    )
+
+
+@pytest.mark.asyncio
+class TestIngest:
+    async def test_duplicate_delivery(
+        self, redis: Redis, enqueue_job_mock: AsyncMock
+    ) -> None:
+        ingestion = WebhookIngestion(redis)
+        issue_id = random.randint(1, 2**31)
+        event = get_event("opened", issue_id=issue_id)
+
+        result = await ingestion.ingest(event)
+        assert result is not None
+        assert result.job_id == "job"
+
+        result = await ingestion.ingest(event)
+        assert result is not None
+        assert result.duplicate
+
+        enqueue_job_mock.assert_awaited_once()
+
+    async def test_failed_enqueue_releases_delivery(
+        self, redis: Redis, enqueue_job_mock: AsyncMock
+    ) -> None:
+        ingestion = WebhookIngestion(redis)
+        event = get_event("opened", issue_id=random.randint(1, 2**31))
+
+        enqueue_job_mock.side_effect = None
+        enqueue_job_mock.return_value = None
+        assert await ingestion.ingest(event) is None
+
+        enqueue_job_mock.return_value = MagicMock(job_id="job")
+        result = await ingestion.ingest(event)
+        assert result is not None
+        assert result.job_id == "job"
+
+    async def test_coalesce(self, redis: Redis, enqueue_job_mock: AsyncMock) -> None:
+        ingestion = WebhookIngestion(redis, window=60)
+        issue_id = random.randint(1, 2**31)
+
+        results = [
+            await ingestion.ingest(get_event("edited", issue_id=issue_id))
+            for _ in range(3)
+        ]
+        assert [result.coalesced for result in results if result] == [
+            False,
+            True,
+            True,
+        ]
+
+        enqueue_job_mock.assert_awaited_once()
+        assert enqueue_job_mock.call_args.args[0] == "github.webhook.flush_coalesced"
+        issue_key, group = enqueue_job_mock.call_args.args[1:]
+        assert enqueue_job_mock.call_args.kwargs["_defer_by"] == 60
+
+        enqueue_job_mock.reset_mock()
+        jobs = await ingestion.flush(issue_key, group)
+        assert len(jobs) == 1
+        enqueue_job_mock.assert_awaited_once()
+        assert enqueue_job_mock.call_args.args[0] == "github.webhook.issues.edited"
+
+        # Nothing left to flush
+        enqueue_job_mock.reset_mock()
+        assert await ingestion.flush(issue_key, group) == []
+
+        # A new window is started
+        result = await ingestion.ingest(get_event("edited", issue_id=issue_id))
+        assert result is not None
+        assert not result.coalesced
+
+    async def test_coalesce_label_groups(
+        self, redis: Redis, enqueue_job_mock: AsyncMock
+    ) -> None:
+        ingestion = WebhookIngestion(redis, window=60)
+        issue_id = random.randint(1, 2**31)
+
+        for action, label in [
+            ("labeled", "Fund"),
+            ("labeled", "bug"),
+            ("unlabeled", "fund"),
+        ]:
+            await ingestion.ingest(get_event(action, issue_id=issue_id, label=label))
+
+        # One window per label, labeled/unlabeled of the same label are merged
+        assert enqueue_job_mock.await_count == 2
+
+        enqueue_job_mock.reset_mock()
+        await ingestion.flush("1:2:" + str(issue_id), "label:fund")
+        enqueue_job_mock.assert_awaited_once()
+        assert enqueue_job_mock.call_args.args[0] == "github.webhook.issues.unlabeled"
+
+    async def test_other_event_flushes_pending(
+        self, redis: Redis, enqueue_job_mock: AsyncMock
+    ) -> None:
+        ingestion = WebhookIngestion(redis, window=60)
+        issue_id = random.randint(1, 2**31)
+
+        await ingestion.ingest(get_event("edited", issue_id=issue_id))
+        await ingestion.ingest(get_event("assigned", issue_id=issue_id))
+        enqueue_job_mock.reset_mock()
+
+        await ingestion.ingest(get_event("closed", issue_id=issue_id))
+
+        task_names = [call.args[0] for call in enqueue_job_mock.call_args_list]
+        assert sorted(task_names[:2]) == [
+            "github.webhook.issues.assigned",
+            "github.webhook.issues.edited",
+        ]
+        assert task_names[2] == "github.webhook.issues.closed"
+
+    async def test_no_window(self, redis: Redis, enqueue_job_mock: AsyncMock) -> None:
+        ingestion = WebhookIngestion(redis, window=0)
+        issue_id = random.randint(1, 2**31)
+
+        for _ in range(2):
+            await ingestion.ingest(get_event("edited", issue_id=issue_id))
+
+        assert enqueue_job_mock.await_count == 2
+
+    async def test_coalesce_concurrent(
+        self, redis: Redis, enqueue_job_mock: AsyncMock
+    ) -> None:
+        ingestion = WebhookIngestion(redis, window=60)
+        issue_id = random.randint(1, 2**31)
+
+        results = await asyncio.gather(
+            *(
+                ingestion.ingest(get_event("edited", issue_id=issue_id))
+                for _ in range(10)
+            )
+        )
+        assert sum(not result.coalesced for result in results if result) == 1
+
+        enqueue_job_mock.assert_awaited_once()
+        issue_key, group = enqueue_job_mock.call_args.args[1:]
+        value = await redis.hget(ingestion._get_pending_key(issue_key), group)
+        assert value is not None
+        data = json.loads(value)
+        assert data["count"] == 10
+        assert data["payload"]["issue"]["id"] == issue_id
+
+    async def test_coalesce_not_enqueued(
+        self, redis: Redis, enqueue_job_mock: AsyncMock
+    ) -> None:
+        ingestion = WebhookIngestion(redis, window=60)
+        issue_id = random.randint(1, 2**31)
+
+        enqueue_job_mock.side_effect = None
+        enqueue_job_mock.return_value = None
+        assert await ingestion.ingest(get_event("edited", issue_id=issue_id)) is None
+
+        # The next event starts a new window
+        enqueue_job_mock.return_value = MagicMock(job_id="job")
+        result = await ingestion.ingest(get_event("edited", issue_id=issue_id))
+        assert result is not None
+        assert not result.coalesced
+        assert result.job_id == "job"
@@ -0,0 +1,160 @@
+import asyncio
+import contextlib
+import datetime
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.exceptions import ResourceNotFound
+from polar.integrations.github.lookup import IssueLookup
+from polar.integrations.github.service.issue import github_issue
+from polar.models import Issue
+from polar.postgres import AsyncSession, AsyncSessionMaker
+from polar.redis import get_redis
+
+
+def _get_sessionmaker(session: AsyncSession) -> AsyncSessionMaker:
+    @contextlib.asynccontextmanager
+    async def sessionmaker() -> AsyncIterator[AsyncSession]:
+        yield session
+
+    return sessionmaker  # type: ignore[return-value]
+
+
+def _get_issue_lookup(fresh_ttl: datetime.timedelta) -> IssueLookup:
+    return IssueLookup(
+        get_redis(), fresh_ttl=fresh_ttl, stale_ttl=datetime.timedelta(minutes=5)
+    )
+
+
+@pytest.mark.asyncio
+async def test_lookup_coalesced(
+    session: AsyncSession, mocker: MockerFixture, issue: Issue
+) -> None:
+    async def _sync(*args: Any, **kwargs: Any) -> Issue:
+        await asyncio.sleep(0.1)
+        return issue
+
+    sync_mock = mocker.patch.object(
+        github_issue, "sync_external_org_with_repo_and_issue", side_effect=_sync
+    )
+    enqueue_job_mock = mocker.patch("polar.integrations.github.lookup.enqueue_job")
+
+    issue_lookup = _get_issue_lookup(datetime.timedelta(minutes=1))
+    repo_name = str(uuid.uuid4())
+    stats = await issue_lookup.get_stats()
+
+    # then
+    session.expunge_all()
+
+    issue_ids = await asyncio.gather(
+        *(
+            issue_lookup.lookup(
+                _get_sessionmaker(session),
+                mocker.MagicMock(),
+                org_name="polarsource",
+                repo_name=repo_name,
+                issue_number=1,
+            )
+            for _ in range(5)
+        )
+    )
+
+    assert issue_ids == [issue.id] * 5
+    sync_mock.assert_called_once()
+
+    # Fresh, GitHub isn't called
+    issue_id = await issue_lookup.lookup(
+        _get_sessionmaker(session),
+        mocker.MagicMock(),
+        org_name="POLARSOURCE",
+        repo_name=repo_name,
+        issue_number=1,
+    )
+
+    assert issue_id == issue.id
+    sync_mock.assert_called_once()
+    enqueue_job_mock.assert_not_called()
+
+    new_stats = await issue_lookup.get_stats()
+    assert new_stats["synced"] - stats.get("synced", 0) == 1
+    assert new_stats["coalesced"] - stats.get("coalesced", 0) == 4
+    assert new_stats["fresh"] - stats.get("fresh", 0) == 1
+
+
+@pytest.mark.asyncio
+async def test_lookup_stale(
+    session: AsyncSession, mocker: MockerFixture, issue: Issue
+) -> None:
+    sync_mock = mocker.patch.object(
+        github_issue, "sync_external_org_with_repo_and_issue", return_value=issue
+    )
+    enqueue_job_mock = mocker.patch("polar.integrations.github.lookup.enqueue_job")
+
+    issue_lookup = _get_issue_lookup(datetime.timedelta(0))
+    repo_name = str(uuid.uuid4())
+
+    # then
+    session.expunge_all()
+
+    for _ in range(2):
+        issue_id = await issue_lookup.lookup(
+            _get_sessionmaker(session),
+            mocker.MagicMock(),
+            org_name="polarsource",
+            repo_name=repo_name,
+            issue_number=1,
+        )
+        assert issue_id == issue.id
+
+    # Served right away, while refreshed in the background
+    sync_mock.assert_called_once()
+    enqueue_job_mock.assert_called_once_with(
+        "github.issue.lookup.refresh",
+        org_name="polarsource",
+        repo_name=repo_name,
+        issue_number=1,
+        _job_id=f"github.issue.lookup.refresh:github:issue:lookup:polarsource/{repo_name}/1",
+    )
+
+    await issue_lookup.refresh(
+        _get_sessionmaker(session),
+        mocker.MagicMock(),
+        org_name="polarsource",
+        repo_name=repo_name,
+        issue_number=1,
+    )
+
+    assert sync_mock.call_count == 2
+    assert sync_mock.call_args.kwargs["refresh"] is True
+
+
+@pytest.mark.asyncio
+async def test_lookup_not_found(session: AsyncSession, mocker: MockerFixture) -> None:
+    sync_mock = mocker.patch.object(
+        github_issue,
+        "sync_external_org_with_repo_and_issue",
+        side_effect=ResourceNotFound(),
+    )
+
+    issue_lookup = _get_issue_lookup(datetime.timedelta(minutes=1))
+    repo_name = str(uuid.uuid4())
+
+    # then
+    session.expunge_all()
+
+    for _ in range(2):
+        with pytest.raises(ResourceNotFound):
+            await issue_lookup.lookup(
+                _get_sessionmaker(session),
+                mocker.MagicMock(),
+                org_name="polarsource",
+                repo_name=repo_name,
+                issue_number=1,
+            )
+
+    # Errors aren't cached
+    assert sync_mock.call_count == 2
@@ -0,0 +1,126 @@
+import random
+import time
+
+import httpx
+import pytest
+
+from polar.config import settings
+from polar.context import ExecutionContext
+from polar.integrations.github.rate_limit import (
+    RateLimitBudgetExhausted,
+    RateLimitedAuth,
+    RateLimitScheduler,
+)
+from polar.redis import Redis, get_redis
+
+
+@pytest.fixture
+def redis() -> Redis:
+    return get_redis()
+
+
+@pytest.fixture
+def scheduler(redis: Redis) -> RateLimitScheduler:
+    return RateLimitScheduler(redis)
+
+
+@pytest.fixture
+def installation_id() -> int:
+    return random.randint(1, 2**31)
+
+
+def get_headers(remaining: int, reset: int) -> httpx.Headers:
+    return httpx.Headers(
+        {
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Reset": str(reset),
+        }
+    )
+
+
+@pytest.mark.asyncio
+class TestRateLimitScheduler:
+    async def test_unknown_budget(
+        self, scheduler: RateLimitScheduler, installation_id: int
+    ) -> None:
+        await scheduler.acquire(installation_id, low_priority=True)
+        assert await scheduler.get_remaining(installation_id) is None
+
+    async def test_acquire(
+        self, scheduler: RateLimitScheduler, installation_id: int
+    ) -> None:
+        reset = int(time.time()) + 600
+        await scheduler.update(installation_id, get_headers(2, reset))
+
+        await scheduler.acquire(installation_id, low_priority=False)
+        await scheduler.acquire(installation_id, low_priority=False)
+        assert await scheduler.get_remaining(installation_id) == 0
+
+        with pytest.raises(RateLimitBudgetExhausted) as e:
+            await scheduler.acquire(installation_id, low_priority=False)
+        assert 600 <= e.value.retry_after.total_seconds() <= 602
+
+    async def test_low_priority_reserve(
+        self, scheduler: RateLimitScheduler, installation_id: int
+    ) -> None:
+        reset = int(time.time()) + 600
+        remaining = settings.GITHUB_RATE_LIMIT_LOW_PRIORITY_RESERVE
+        await scheduler.update(installation_id, get_headers(remaining, reset))
+
+        with pytest.raises(RateLimitBudgetExhausted):
+            await scheduler.acquire(installation_id, low_priority=True)
+
+        await scheduler.acquire(installation_id, low_priority=False)
+
+    async def test_reset(
+        self, scheduler: RateLimitScheduler, installation_id: int
+    ) -> None:
+        reset = int(time.time()) - 1
+        await scheduler.update(installation_id, get_headers(0, reset))
+
+        await scheduler.acquire(installation_id, low_priority=True)
+        assert await scheduler.get_remaining(installation_id) is None
+
+    async def test_update_out_of_order(
+        self, scheduler: RateLimitScheduler, installation_id: int
+    ) -> None:
+        reset = int(time.time()) + 600
+        await scheduler.update(installation_id, get_headers(10, reset))
+        await scheduler.update(installation_id, get_headers(20, reset))
+        assert await scheduler.get_remaining(installation_id) == 10
+
+        # New window
+        await scheduler.update(installation_id, get_headers(4999, reset + 3600))
+        assert await scheduler.get_remaining(installation_id) == 4999
+
+    async def test_update_no_headers(
+        self, scheduler: RateLimitScheduler, installation_id: int
+    ) -> None:
+        await scheduler.update(installation_id, httpx.Headers())
+        assert await scheduler.get_remaining(installation_id) is None
+
+
+@pytest.mark.asyncio
+class TestRateLimitedAuth:
+    async def test_auth_flow(
+        self, scheduler: RateLimitScheduler, installation_id: int
+    ) -> None:
+        reset = int(time.time()) + 600
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, headers=get_headers(1, reset))
+
+        auth = RateLimitedAuth(httpx.Auth(), installation_id, scheduler)
+        async with httpx.AsyncClient(
+            auth=auth, transport=httpx.MockTransport(handler)
+        ) as client:
+            await client.get("https://api.github.com/")
+            assert await scheduler.get_remaining(installation_id) == 1
+
+            with ExecutionContext(is_low_priority=True):
+                with pytest.raises(RateLimitBudgetExhausted):
+                    await client.get("https://api.github.com/")
+
+            await client.get("https://api.github.com/")
+            assert await scheduler.get_remaining(installation_id) == 0
@@ -0,0 +1,58 @@
+from collections.abc import Iterator
+
+import pytest
+import stripe as stripe_lib
+
+from polar.integrations.stripe.gateway import StripeGateway
+from polar.integrations.stripe.replay import ReplayHTTPClient, StripeFixtures
+
+
+def build_list(ids: list[str], has_more: bool) -> dict[str, object]:
+    return {
+        "status": 200,
+        "body": {
+            "object": "list",
+            "url": "/v1/refunds",
+            "has_more": has_more,
+            "data": [{"id": id, "object": "refund"} for id in ids],
+        },
+    }
+
+
+FIXTURES: StripeFixtures = {
+    "GET /v1/refunds?limit=2": build_list(["re_1", "re_2"], True),
+    "GET /v1/refunds?limit=2&starting_after=re_2": build_list(["re_3"], False),
+    "GET /v1/refunds/re_1": {"status": 200, "body": {"id": "re_1", "object": "refund"}},
+}
+
+
+@pytest.fixture
+def gateway(monkeypatch: pytest.MonkeyPatch) -> Iterator[StripeGateway]:
+    monkeypatch.setattr(stripe_lib, "api_key", "sk_test_gateway")
+    monkeypatch.setattr(stripe_lib, "default_http_client", ReplayHTTPClient(FIXTURES))
+    gateway = StripeGateway(max_workers=2)
+    yield gateway
+    gateway.close()
+
+
+@pytest.mark.asyncio
+class TestStripeGateway:
+    async def test_call(self, gateway: StripeGateway) -> None:
+        refund = await gateway.call(stripe_lib.Refund.retrieve, "re_1")
+        assert refund.id == "re_1"
+
+        with pytest.raises(stripe_lib.error.InvalidRequestError):
+            await gateway.call(stripe_lib.Refund.retrieve, "re_unknown")
+
+        stats = gateway.stats["Refund.retrieve"]
+        assert stats.count == 2
+        assert stats.errors == 1
+        assert stats.max_seconds >= stats.mean_seconds > 0
+
+    async def test_stream(self, gateway: StripeGateway) -> None:
+        refunds = [
+            refund.id
+            async for refund in gateway.stream(stripe_lib.Refund.list, limit=2)
+        ]
+        assert refunds == ["re_1", "re_2", "re_3"]
+        assert gateway.stats["Refund.list"].count == 2
@@ -0,0 +1,160 @@
+import datetime
+import hashlib
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from polar.integrations.github.rate_limit import RateLimitBudgetExhausted
+from polar.issue.body import IssueBodyRenderer
+from polar.issue.service import issue as issue_service
+from polar.models import Issue, IssueRenderedBody, Repository
+from polar.models.issue_rendered_body import RendererType
+from polar.postgres import AsyncSession
+from polar.redis import get_redis
+
+
+@pytest.fixture
+def issue_body_renderer(mocker: MockerFixture) -> IssueBodyRenderer:
+    mocker.patch("polar.issue.body.enqueue_job")
+    return IssueBodyRenderer(get_redis())
+
+
+async def get_rendered_body(
+    session: AsyncSession, issue: Issue
+) -> IssueRenderedBody | None:
+    return await session.get(IssueRenderedBody, issue.id, populate_existing=True)
+
+
+@pytest.mark.asyncio
+async def test_render_many(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    issue_body_renderer: IssueBodyRenderer,
+    issue: Issue,
+) -> None:
+    render_github_mock = mocker.patch.object(
+        issue_body_renderer, "_render_github", return_value="<p>GitHub</p>"
+    )
+    issue.body = "**Body**"
+    await issue.save(session)
+
+    # then
+    session.expunge_all()
+
+    issues = await issue_service.list_loaded(session, [issue.id])
+    assert await issue_body_renderer.render_many(session, issues) == 1
+
+    rendered_body = await get_rendered_body(session, issue)
+    assert rendered_body is not None
+    assert rendered_body.html == "<p>GitHub</p>"
+    assert rendered_body.renderer == RendererType.github
+
+    # Unchanged body, not rendered again
+    assert await issue_body_renderer.render_many(session, issues) == 0
+    render_github_mock.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_render_many_local_fallback(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    issue_body_renderer: IssueBodyRenderer,
+    issue: Issue,
+) -> None:
+    render_github_mock = mocker.patch.object(
+        issue_body_renderer,
+        "_render_github",
+        side_effect=RateLimitBudgetExhausted(1, datetime.timedelta(seconds=60)),
+    )
+    issue.body = "**Body**"
+    await issue.save(session)
+
+    # then
+    session.expunge_all()
+
+    issues = await issue_service.list_loaded(session, [issue.id])
+    assert await issue_body_renderer.render_many(session, issues) == 1
+
+    rendered_body = await get_rendered_body(session, issue)
+    assert rendered_body is not None
+    assert rendered_body.html == "<p><strong>Body</strong></p>"
+    assert rendered_body.renderer == RendererType.local
+
+    # Rendered again by GitHub when it's available
+    render_github_mock.side_effect = None
+    render_github_mock.return_value = "<p>GitHub</p>"
+    assert await issue_body_renderer.render_many(session, issues) == 1
+
+    rendered_body = await get_rendered_body(session, issue)
+    assert rendered_body is not None
+    assert rendered_body.html == "<p>GitHub</p>"
+    assert rendered_body.renderer == RendererType.github
+
+
+@pytest.mark.asyncio
+async def test_render_pending(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    issue_body_renderer: IssueBodyRenderer,
+    issue: Issue,
+) -> None:
+    mocker.patch.object(
+        issue_body_renderer, "_render_github", return_value="<p>GitHub</p>"
+    )
+    issue.body = "**Body**"
+    await issue.save(session)
+
+    # then
+    session.expunge_all()
+
+    await issue_body_renderer.schedule([issue.id, issue.id])
+    assert await issue_body_renderer.render_pending(session) >= 1
+
+    rendered_body = await get_rendered_body(session, issue)
+    assert rendered_body is not None
+    assert rendered_body.html == "<p>GitHub</p>"
+
+
+@pytest.mark.asyncio
+@pytest.mark.http_auto_expunge
+async def test_get_body(
+    session: AsyncSession,
+    mocker: MockerFixture,
+    client: AsyncClient,
+    public_repository: Repository,
+    issue: Issue,
+) -> None:
+    enqueue_job_mock = mocker.patch("polar.issue.body.enqueue_job")
+    issue.repository_id = public_repository.id
+    issue.body = "**Body**"
+    await issue.save(session)
+
+    # Not rendered yet: rendered locally and scheduled
+    response = await client.get(f"/api/v1/issues/{issue.id}/body")
+
+    assert response.status_code == 200
+    assert response.text == "<p><strong>Body</strong></p>"
+    assert response.headers["ETag"].endswith('-local"')
+    enqueue_job_mock.assert_called_once()
+
+    await IssueRenderedBody(
+        issue_id=issue.id,
+        body_hash=hashlib.sha256(b"**Body**").hexdigest(),
+        html="<p>GitHub</p>",
+        renderer=RendererType.github,
+    ).save(session)
+    session.expunge_all()
+
+    response = await client.get(f"/api/v1/issues/{issue.id}/body")
+
+    assert response.status_code == 200
+    assert response.text == "<p>GitHub</p>"
+    etag = response.headers["ETag"]
+
+    response = await client.get(
+        f"/api/v1/issues/{issue.id}/body", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    enqueue_job_mock.assert_called_once()
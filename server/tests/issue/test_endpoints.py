@@ -2,7 +2,9 @@ import pytest
 from httpx import AsyncClient
 from pytest_mock import MockerFixture
 
+from polar.app import app
 from polar.config import settings
+from polar.integrations.github.service.issue import github_issue as github_issue_service
 from polar.issue.schemas import Reactions
 from polar.issue.service import issue as issue_service
 from polar.models.issue import Issue
@@ -11,7 +13,9 @@ from polar.models.pledge import Pledge
 from polar.models.repository import Repository
 from polar.models.user import User
 from polar.models.user_organization import UserOrganization
-from polar.postgres import AsyncSession
+from polar.postgres import AsyncSession, get_db_sessionmaker
+from polar.redis import redis
+from tests.fixtures.random_objects import create_issue
 
 
 @pytest.mark.asyncio
@@ -333,3 +337,44 @@ async def test_confirm_solved(
     assert pledges_response.status_code == 200
     assert len(pledges_response.json()["items"]) == 1
     assert pledges_response.json()["items"][0]["state"] == "pending"
+
+
+@pytest.mark.asyncio
+async def test_for_you(
+    organization: Organization,
+    public_repository: Repository,
+    user: User,
+    auth_jwt: str,
+    session: AsyncSession,
+    client: AsyncClient,
+    mocker: MockerFixture,
+) -> None:
+    issue = await create_issue(session, organization, public_repository)
+    mocker.patch("polar.integrations.github.service.issue.enqueue_job")
+    # Recommendations are cached, GitHub isn't crawled
+    mocker.patch.dict(
+        app.dependency_overrides, {get_db_sessionmaker: lambda: mocker.MagicMock()}
+    )
+    list_issues_spy = mocker.spy(github_issue_service, "list_issues_from_starred")
+
+    await redis.delete(f"recommendations:response:{user.id}")
+    await redis.delete(f"recommendations:{user.id}")
+    await redis.rpush(f"recommendations:{user.id}", str(issue.id))
+
+    # then
+    session.expunge_all()
+
+    for _ in range(2):
+        response = await client.get(
+            "/api/v1/issues/for_you",
+            cookies={settings.AUTH_COOKIE_KEY: auth_jwt},
+        )
+
+        assert response.status_code == 200
+        json = response.json()
+        assert json["pagination"]["total_count"] == 1
+        assert json["items"][0]["id"] == str(issue.id)
+        assert json["items"][0]["repository"]["id"] == str(public_repository.id)
+
+    # The second response was served from the cache
+    list_issues_spy.assert_called_once()
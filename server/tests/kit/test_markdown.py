@@ -0,0 +1,45 @@
+import pytest
+
+from polar.kit.markdown import render_markdown
+
+
+@pytest.mark.parametrize(
+    "markdown,expected",
+    [
+        ("# Title ##", "<h1>Title</h1>"),
+        ("### Learn C#", "<h3>Learn C#</h3>"),
+        ("Hello\nWorld", "<p>Hello<br>\nWorld</p>"),
+        ("Hello\n\nWorld", "<p>Hello</p>\n<p>World</p>"),
+        (
+            "**bold** *em* ~~del~~ `a <b>`",
+            "<p><strong>bold</strong> <em>em</em> <del>del</del> "
+            "<code>a &lt;b&gt;</code></p>",
+        ),
+        ("snake_case_name", "<p>snake_case_name</p>"),
+        ("<script>alert(1)</script>", "<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>"),
+        (
+            "[Polar](https://polar.sh/?a=1&b=2)",
+            '<p><a href="https://polar.sh/?a=1&amp;b=2">Polar</a></p>',
+        ),
+        ("[click](javascript:void)", "<p>click</p>"),
+        (
+            "See https://polar.sh.",
+            '<p>See <a href="https://polar.sh">https://polar.sh</a>.</p>',
+        ),
+        ("- a\n- b", "<ul><li>a</li><li>b</li></ul>"),
+        ("1. a\n2. b", "<ol><li>a</li><li>b</li></ol>"),
+        (
+            "- [x] done",
+            '<ul><li class="task-list-item">'
+            '<input type="checkbox" disabled checked> done</li></ul>',
+        ),
+        ("> quote", "<blockquote><p>quote</p></blockquote>"),
+        (
+            "```python\nprint('<a>')\n```",
+            "<pre><code class=\"language-python\">print('&lt;a&gt;')</code></pre>",
+        ),
+        ("---", "<hr>"),
+    ],
+)
+def test_render_markdown(markdown: str, expected: str) -> None:
+    assert render_markdown(markdown) == expected
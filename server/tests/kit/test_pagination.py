@@ -0,0 +1,41 @@
+import uuid
+from datetime import UTC, datetime
+from typing import Any
+
+import pytest
+
+from polar.kit.pagination import InvalidCursor, decode_cursor, encode_cursor
+from polar.models.subscription_tier import SubscriptionTierType
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [None],
+        [True, 1, "a"],
+        [datetime(2024, 1, 1, 12, 30, tzinfo=UTC), uuid.uuid4()],
+    ],
+)
+def test_cursor_round_trip(values: list[Any]) -> None:
+    cursor = encode_cursor(values, "SORT")
+    assert decode_cursor(cursor, "SORT", len(values)) == values
+
+
+def test_cursor_enum() -> None:
+    cursor = encode_cursor([SubscriptionTierType.individual], "SORT")
+    assert decode_cursor(cursor, "SORT", 1) == [SubscriptionTierType.individual.value]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "invalid",
+        encode_cursor([1, 2], "SORT"),
+        encode_cursor([1], "OTHER_SORT"),
+        "W1siZm9vIiwgMV1d",  # [["foo", 1]]
+    ],
+)
+def test_decode_invalid_cursor(cursor: str) -> None:
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "SORT", 1)
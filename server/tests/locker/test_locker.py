@@ -0,0 +1,29 @@
+import uuid
+
+import pytest
+
+from polar.locker import ExpiredLockError, Locker
+from polar.redis import get_redis
+
+
+@pytest.mark.asyncio
+class TestLocker:
+    async def test_expired(self) -> None:
+        locker = Locker(get_redis())
+
+        with pytest.raises(ExpiredLockError):
+            async with locker.lock(
+                f"test-{uuid.uuid4()}", timeout=1, blocking_timeout=1
+            ) as lock:
+                await lock.do_release(lock.local.token)
+
+    async def test_expired_with_error(self) -> None:
+        locker = Locker(get_redis())
+
+        # The error raised while holding the lock is kept
+        with pytest.raises(ValueError):
+            async with locker.lock(
+                f"test-{uuid.uuid4()}", timeout=1, blocking_timeout=1
+            ) as lock:
+                await lock.do_release(lock.local.token)
+                raise ValueError()
@@ -1,7 +1,7 @@
 import os
 from collections.abc import Callable, Coroutine
 from datetime import UTC, datetime, timedelta
-from unittest.mock import ANY, MagicMock
+from unittest.mock import ANY, AsyncMock
 from uuid import UUID
 
 import pytest
@@ -92,7 +92,7 @@ async def test_send(
     mocker: MockerFixture,
     session: AsyncSession,
 ) -> None:
-    email_sender_mock = MagicMock()
+    email_sender_mock = AsyncMock()
     mocker.patch(
         "polar.magic_link.service.get_email_sender", return_value=email_sender_mock
     )
@@ -104,8 +104,8 @@ async def test_send(
 
     await magic_link_service.send(magic_link, "TOKEN", "BASE_URL")
 
-    send_to_user_mock: MagicMock = email_sender_mock.send_to_user
-    assert send_to_user_mock.called
+    send_to_user_mock: AsyncMock = email_sender_mock.send_to_user
+    send_to_user_mock.assert_awaited()
 
     send_to_user_mock.assert_called_once_with(
         to_email_addr="user@example.com",
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import select
+
+from polar.models import Notification, Organization, User, UserOrganization
+from polar.notifications.notification import (
+    MaintainerAccountUnderReviewNotificationPayload,
+    NotificationType,
+)
+from polar.notifications.service import PartialNotification
+from polar.notifications.service import notifications as notifications_service
+from polar.postgres import AsyncSession
+
+
+@pytest.mark.asyncio
+async def test_send_to_org_admins(
+    session: AsyncSession,
+    organization: Organization,
+    user: User,
+    user_second: User,
+    user_organization_admin: UserOrganization,
+    user_organization_second: UserOrganization,
+    mock_enqueue_job: MagicMock,
+) -> None:
+    user_organization_second.is_admin = True
+    await user_organization_second.save(session)
+
+    # then
+    session.expunge_all()
+
+    await notifications_service.send_to_org_admins(
+        session,
+        organization.id,
+        PartialNotification(
+            type=NotificationType.maintainer_account_under_review,
+            payload=MaintainerAccountUnderReviewNotificationPayload(
+                account_type="stripe"
+            ),
+        ),
+    )
+
+    result = await session.execute(select(Notification))
+    notifications = result.scalars().all()
+    assert {notification.user_id for notification in notifications} == {
+        user.id,
+        user_second.id,
+    }
+
+    mock_enqueue_job.assert_called_once()
+    assert mock_enqueue_job.call_args[0][0] == "notifications.send_batch"
+    assert set(mock_enqueue_job.call_args[1]["notification_ids"]) == {
+        notification.id for notification in notifications
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.skip_db_asserts
+async def test_send_to_users_empty(
+    session: AsyncSession, mock_enqueue_job: MagicMock
+) -> None:
+    await notifications_service.send_to_users(
+        session,
+        [],
+        PartialNotification(
+            type=NotificationType.maintainer_account_under_review,
+            payload=MaintainerAccountUnderReviewNotificationPayload(
+                account_type="stripe"
+            ),
+        ),
+    )
+
+    mock_enqueue_job.assert_not_called()
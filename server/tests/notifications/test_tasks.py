@@ -0,0 +1,145 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.email.renderer import EmailRenderer
+from polar.email.sender import EmailSendResult
+from polar.models import Notification, User
+from polar.notifications.notification import (
+    MaintainerAccountReviewedNotificationPayload,
+    MaintainerAccountUnderReviewNotificationPayload,
+    NotificationType,
+)
+from polar.notifications.tasks.email import (
+    SEND_BATCH_MAX_RETRIES,
+    notifications_send_batch,
+)
+from polar.postgres import AsyncSession
+from polar.worker import JobContext, PolarWorkerContext
+
+
+@pytest.mark.asyncio
+async def test_notifications_send_batch(
+    job_context: JobContext,
+    polar_worker_context: PolarWorkerContext,
+    mocker: MockerFixture,
+    session: AsyncSession,
+    user: User,
+    user_second: User,
+) -> None:
+    send_batch_mock = mocker.patch(
+        "polar.notifications.tasks.email.sender.send_batch",
+        new_callable=AsyncMock,
+        side_effect=lambda messages: [
+            EmailSendResult(message=message) for message in messages
+        ],
+    )
+    compile_spy = mocker.spy(EmailRenderer, "compile_from_string")
+
+    under_review_payload = MaintainerAccountUnderReviewNotificationPayload(
+        account_type="stripe"
+    ).model_dump(mode="json")
+    notifications = [
+        Notification(
+            user_id=user_id,
+            type=NotificationType.maintainer_account_under_review,
+            payload=under_review_payload,
+        )
+        for user_id in (user.id, user_second.id)
+    ]
+    notifications.append(
+        Notification(
+            user_id=user.id,
+            type=NotificationType.maintainer_account_reviewed,
+            payload=MaintainerAccountReviewedNotificationPayload(
+                account_type="stripe"
+            ).model_dump(mode="json"),
+        )
+    )
+    session.add_all(notifications)
+    await session.commit()
+
+    # then
+    session.expunge_all()
+
+    await notifications_send_batch(
+        job_context,
+        [notification.id for notification in notifications],
+        polar_worker_context,
+    )
+
+    # Rendered once by distinct notification
+    assert compile_spy.call_count == 2
+
+    send_batch_mock.assert_awaited_once()
+    messages = send_batch_mock.call_args[0][0]
+    assert sorted(message.to_email_addr for message in messages) == sorted(
+        [user.email, user_second.email, user.email]
+    )
+    for message in messages:
+        assert message.subject.startswith("[Polar] ")
+
+
+@pytest.mark.asyncio
+async def test_notifications_send_batch_failed(
+    job_context: JobContext,
+    polar_worker_context: PolarWorkerContext,
+    mocker: MockerFixture,
+    session: AsyncSession,
+    user: User,
+    user_second: User,
+) -> None:
+    mocker.patch(
+        "polar.notifications.tasks.email.sender.send_batch",
+        new_callable=AsyncMock,
+        side_effect=lambda messages: [
+            EmailSendResult(
+                message=message,
+                error="Provider error",
+                retriable=message.to_email_addr == user.email,
+            )
+            for message in messages
+        ],
+    )
+    enqueue_job_mock = mocker.patch(
+        "polar.notifications.tasks.email.enqueue_job", new_callable=AsyncMock
+    )
+
+    payload = MaintainerAccountUnderReviewNotificationPayload(
+        account_type="stripe"
+    ).model_dump(mode="json")
+    notifications = [
+        Notification(
+            user_id=user_id,
+            type=NotificationType.maintainer_account_under_review,
+            payload=payload,
+        )
+        for user_id in (user.id, user_second.id)
+    ]
+    session.add_all(notifications)
+    await session.commit()
+
+    # then
+    session.expunge_all()
+
+    await notifications_send_batch(
+        job_context,
+        [notification.id for notification in notifications],
+        polar_worker_context,
+    )
+
+    # Only the notification failing with a retriable error is sent again
+    enqueue_job_mock.assert_awaited_once()
+    assert enqueue_job_mock.call_args[0][0] == "notifications.send_batch"
+    assert enqueue_job_mock.call_args[1]["notification_ids"] == [notifications[0].id]
+    assert enqueue_job_mock.call_args[1]["attempt"] == 1
+
+    enqueue_job_mock.reset_mock()
+    await notifications_send_batch(
+        job_context,
+        [notifications[0].id],
+        polar_worker_context,
+        attempt=SEND_BATCH_MAX_RETRIES,
+    )
+    enqueue_job_mock.assert_not_awaited()
@@ -0,0 +1,171 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.currency.schemas import CurrencyAmount
+from polar.models import IssuePledgeSummary
+from polar.models.issue import Issue
+from polar.models.organization import Organization
+from polar.models.pledge import Pledge, PledgeState, PledgeType
+from polar.models.repository import Repository
+from polar.pledge.service import pledge as pledge_service
+from polar.pledge.summary_service import (
+    issue_pledge_summary as issue_pledge_summary_service,
+)
+from polar.postgres import AsyncSession
+from tests.fixtures.random_objects import create_issue, create_pledge
+
+
+async def get_summary(session: AsyncSession, issue: Issue) -> IssuePledgeSummary:
+    summary = await session.get(IssuePledgeSummary, issue.id, populate_existing=True)
+    assert summary is not None
+    return summary
+
+
+@pytest.mark.asyncio
+async def test_updated_on_transitions(
+    session: AsyncSession,
+    organization: Organization,
+    repository: Repository,
+    issue: Issue,
+    pledging_organization: Organization,
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch("polar.worker._enqueue_job")
+
+    existing_pledge = await create_pledge(
+        session,
+        organization,
+        repository,
+        issue,
+        pledging_organization,
+        type=PledgeType.pay_on_completion,
+    )
+    pledge = await Pledge(
+        issue_id=issue.id,
+        repository_id=repository.id,
+        organization_id=organization.id,
+        amount=12300,
+        fee=123,
+        by_organization_id=organization.id,
+        state=PledgeState.initiated,
+        type=PledgeType.pay_upfront,
+        payment_id="xxx-summary",
+    ).save(session)
+
+    # then
+    session.expunge_all()
+
+    summary = await get_summary(session, issue)
+    assert summary.total == existing_pledge.amount
+    assert summary.pay_upfront_total == 0
+    assert summary.pledgers_count == 1
+
+    await pledge_service.mark_created_by_payment_id(
+        session, "xxx-summary", pledge.amount, "trx-id"
+    )
+
+    summary = await get_summary(session, issue)
+    assert summary.total == existing_pledge.amount + pledge.amount
+    assert summary.pay_upfront_total == pledge.amount
+    assert summary.pay_on_completion_total == existing_pledge.amount
+    assert summary.pledgers_count == 2
+    assert summary.top_pledgers[PledgeType.pay_upfront][0]["name"] == (
+        organization.name
+    )
+    assert summary.last_pledged_at is not None
+
+    await pledge_service.refund_by_payment_id(
+        session, "xxx-summary", pledge.amount, "trx-id-refund"
+    )
+
+    summary = await get_summary(session, issue)
+    assert summary.total == existing_pledge.amount
+    assert summary.pay_upfront_total == 0
+    assert summary.top_pledgers[PledgeType.pay_upfront] == []
+    assert summary.pledgers_count == 1
+
+
+@pytest.mark.asyncio
+async def test_rebuild(
+    session: AsyncSession,
+    organization: Organization,
+    repository: Repository,
+    issue: Issue,
+    pledging_organization: Organization,
+) -> None:
+    pledge = await create_pledge(
+        session, organization, repository, issue, pledging_organization
+    )
+    summary = await get_summary(session, issue)
+    await summary.delete(session)
+
+    # then
+    session.expunge_all()
+
+    assert await issue_pledge_summary_service.rebuild(session, batch_size=1) >= 1
+
+    summary = await get_summary(session, issue)
+    assert summary.total == pledge.amount
+    assert summary.pay_upfront_total == pledge.amount
+    assert summary.pledgers_count == 1
+
+
+@pytest.mark.asyncio
+async def test_issues_pledge_summaries(
+    session: AsyncSession,
+    organization: Organization,
+    repository: Repository,
+    issue: Issue,
+    pledging_organization: Organization,
+    mocker: MockerFixture,
+) -> None:
+    pay_upfront_pledge = await create_pledge(
+        session, organization, repository, issue, pledging_organization
+    )
+    pay_on_completion_pledge = await create_pledge(
+        session,
+        organization,
+        repository,
+        issue,
+        pledging_organization,
+        type=PledgeType.pay_on_completion,
+    )
+    issue_without_pledges = await create_issue(session, organization, repository)
+
+    list_by_spy = mocker.spy(pledge_service, "list_by")
+
+    # then
+    session.expunge_all()
+
+    issues = [issue, issue_without_pledges]
+
+    summaries = await pledge_service.issues_pledge_summary(session, issues)
+    pledges_sum = summaries[issue.id].funding.pledges_sum
+    assert pledges_sum is not None
+    assert pledges_sum.amount == (
+        pay_upfront_pledge.amount + pay_on_completion_pledge.amount
+    )
+    assert sorted(p.type for p in summaries[issue.id].pledges) == [
+        PledgeType.pay_on_completion,
+        PledgeType.pay_upfront,
+    ]
+    assert summaries[issue_without_pledges.id].funding.pledges_sum == (
+        CurrencyAmount(currency="USD", amount=0)
+    )
+    assert summaries[issue_without_pledges.id].pledges == []
+
+    type_summaries = await pledge_service.issues_pledge_type_summary(session, issues)
+    assert type_summaries[issue.id].pay_upfront.total.amount == (
+        pay_upfront_pledge.amount
+    )
+    assert type_summaries[issue.id].pay_on_completion.total.amount == (
+        pay_on_completion_pledge.amount
+    )
+    assert type_summaries[issue.id].pay_directly.total.amount == 0
+    assert [p.name for p in type_summaries[issue.id].pay_upfront.pledgers] == [
+        pledging_organization.pretty_name or pledging_organization.name
+    ]
+    assert type_summaries[issue_without_pledges.id].pay_upfront.total.amount == 0
+
+    # Read from the summaries, without loading the pledges
+    list_by_spy.assert_not_called()
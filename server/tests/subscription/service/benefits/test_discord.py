@@ -0,0 +1,220 @@
+import asyncio
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.discord.service import DiscordAccountNotConnected
+from polar.integrations.discord.service import discord_bot as discord_bot_service
+from polar.models import OAuthAccount, SubscriptionBenefitGrant, User
+from polar.models.subscription_benefit import SubscriptionBenefitDiscord
+from polar.models.user import OAuthPlatform
+from polar.postgres import AsyncSession
+from polar.subscription.service.benefits.base import (
+    SubscriptionBenefitPreconditionError,
+    SubscriptionBenefitRetriableError,
+)
+from polar.subscription.service.benefits.discord import (
+    SubscriptionBenefitDiscordService,
+)
+
+
+def build_grant(account_id: str | None, properties: dict[str, Any]) -> MagicMock:
+    user = User(id=uuid.uuid4(), username=f"user-{account_id}", email="")
+    if account_id is not None:
+        user.oauth_accounts = [
+            OAuthAccount(
+                platform=OAuthPlatform.discord,
+                access_token="TOKEN",
+                account_id=account_id,
+                account_email="",
+            )
+        ]
+    else:
+        user.oauth_accounts = []
+    grant = MagicMock(spec=SubscriptionBenefitGrant)
+    grant.user = user
+    grant.properties = properties
+    return grant
+
+
+async def get_oauth_account(session: AsyncSession, user: User) -> OAuthAccount:
+    if not user.oauth_accounts:
+        raise DiscordAccountNotConnected(user)
+    return user.oauth_accounts[0]
+
+
+@pytest.fixture
+def guild_id() -> str:
+    return str(uuid.uuid4().int)
+
+
+@pytest.fixture
+def benefit(guild_id: str) -> SubscriptionBenefitDiscord:
+    return SubscriptionBenefitDiscord(
+        id=uuid.uuid4(), properties={"guild_id": guild_id, "role_id": "ROLE"}
+    )
+
+
+@pytest.fixture
+def bot_client_mock(mocker: MockerFixture) -> MagicMock:
+    bot_client = mocker.patch("polar.integrations.discord.service.bot_client")
+    bot_client.add_member = AsyncMock()
+    bot_client.add_member_role = AsyncMock()
+    bot_client.remove_member_role = AsyncMock()
+    return bot_client
+
+
+def set_members(bot_client_mock: MagicMock, members: dict[str, list[str]]) -> None:
+    async def list_members(guild_id: str) -> AsyncIterator[dict[str, Any]]:
+        for account_id, roles in members.items():
+            yield {"user": {"id": account_id}, "roles": roles}
+
+    bot_client_mock.list_members = list_members
+
+
+@pytest.mark.asyncio
+class TestGrantMany:
+    async def test_diff_members(
+        self,
+        benefit: SubscriptionBenefitDiscord,
+        bot_client_mock: MagicMock,
+        mocker: MockerFixture,
+    ) -> None:
+        mocker.patch(
+            "polar.subscription.service.benefits.discord.discord_user_service.get_oauth_account",
+            side_effect=get_oauth_account,
+        )
+        mocker.patch(
+            "polar.integrations.discord.service.DiscordUserService.get_oauth_account",
+            side_effect=get_oauth_account,
+        )
+        set_members(bot_client_mock, {"WITH_ROLE": ["ROLE"], "WITHOUT_ROLE": ["OTHER"]})
+
+        grants = [
+            build_grant(None, {}),
+            build_grant("WITH_ROLE", {}),
+            build_grant("WITHOUT_ROLE", {}),
+            build_grant("ABSENT", {}),
+        ]
+
+        service = SubscriptionBenefitDiscordService(MagicMock(spec=AsyncSession))
+        results = await service.grant_many(benefit, grants)
+
+        assert isinstance(results[0], SubscriptionBenefitPreconditionError)
+        for result, account_id in zip(
+            results[1:], ["WITH_ROLE", "WITHOUT_ROLE", "ABSENT"]
+        ):
+            assert result == {
+                "guild_id": benefit.properties["guild_id"],
+                "role_id": "ROLE",
+                "account_id": account_id,
+            }
+
+        # Members get the role, even if the snapshot says they already have it
+        assert bot_client_mock.add_member_role.await_count == 2
+        assert {
+            call.kwargs["discord_user_id"]
+            for call in bot_client_mock.add_member_role.await_args_list
+        } == {"WITH_ROLE", "WITHOUT_ROLE"}
+        bot_client_mock.add_member.assert_awaited_once()
+        assert (
+            bot_client_mock.add_member.call_args.kwargs["discord_user_id"] == "ABSENT"
+        )
+
+        # The snapshot is kept up to date: added members are now known
+        bot_client_mock.add_member.reset_mock()
+        results = await service.grant_many(benefit, grants[1:])
+        bot_client_mock.add_member.assert_not_awaited()
+
+    async def test_members_forbidden(
+        self,
+        benefit: SubscriptionBenefitDiscord,
+        bot_client_mock: MagicMock,
+        mocker: MockerFixture,
+    ) -> None:
+        mocker.patch(
+            "polar.subscription.service.benefits.discord.discord_user_service.get_oauth_account",
+            side_effect=get_oauth_account,
+        )
+        mocker.patch(
+            "polar.integrations.discord.service.DiscordUserService.get_oauth_account",
+            side_effect=get_oauth_account,
+        )
+
+        async def list_members(guild_id: str) -> AsyncIterator[dict[str, Any]]:
+            request = httpx.Request("GET", "/")
+            raise httpx.HTTPStatusError(
+                "Forbidden", request=request, response=httpx.Response(403)
+            )
+            yield {}
+
+        bot_client_mock.list_members = list_members
+        bot_client_mock.add_member.side_effect = [None, httpx.ConnectError("")]
+
+        grants = [build_grant("ACCOUNT_1", {}), build_grant("ACCOUNT_2", {})]
+
+        service = SubscriptionBenefitDiscordService(MagicMock(spec=AsyncSession))
+        results = await service.grant_many(benefit, grants, attempt=2)
+
+        assert results[0] == {
+            "guild_id": benefit.properties["guild_id"],
+            "role_id": "ROLE",
+            "account_id": "ACCOUNT_1",
+        }
+        assert isinstance(results[1], SubscriptionBenefitRetriableError)
+        assert results[1].defer_seconds == 4
+        assert bot_client_mock.add_member.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_revoke_many(
+    guild_id: str,
+    benefit: SubscriptionBenefitDiscord,
+    bot_client_mock: MagicMock,
+) -> None:
+    grants = [
+        build_grant("NEVER_GRANTED", {}),
+        *(
+            build_grant(
+                account_id,
+                {"guild_id": guild_id, "role_id": "ROLE", "account_id": account_id},
+            )
+            for account_id in ["WITH_ROLE", "WITHOUT_ROLE", "ABSENT"]
+        ),
+    ]
+
+    service = SubscriptionBenefitDiscordService(MagicMock(spec=AsyncSession))
+    results = await service.revoke_many(benefit, grants)
+
+    assert results == [{}, {}, {}, {}]
+    # Not skipped from the members snapshot, which may be stale
+    assert bot_client_mock.remove_member_role.await_count == 3
+    for account_id in ["WITH_ROLE", "WITHOUT_ROLE", "ABSENT"]:
+        bot_client_mock.remove_member_role.assert_any_await(
+            guild_id=guild_id, discord_user_id=account_id, role_id="ROLE"
+        )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_roles_update(
+    guild_id: str, bot_client_mock: MagicMock
+) -> None:
+    set_members(bot_client_mock, {"MEMBER": ["ROLE"]})
+    assert await discord_bot_service.get_members_roles(guild_id, ["MEMBER"]) == {
+        "MEMBER": {"ROLE"}
+    }
+
+    await asyncio.gather(
+        discord_bot_service.add_member_role(guild_id, "ROLE_1", "MEMBER"),
+        discord_bot_service.add_member_role(guild_id, "ROLE_2", "MEMBER"),
+        discord_bot_service.remove_member_role(guild_id, "ROLE", "MEMBER"),
+    )
+
+    assert await discord_bot_service.get_members_roles(guild_id, ["MEMBER"]) == {
+        "MEMBER": {"ROLE_1", "ROLE_2"}
+    }
@@ -1,6 +1,6 @@
 import uuid
 from datetime import UTC, date, datetime, timedelta
-from unittest.mock import MagicMock, call
+from unittest.mock import MagicMock
 
 import pytest
 import stripe as stripe_lib
@@ -678,6 +678,43 @@ class TestTransferSubscriptionPaidInvoice:
         stripe_service_mock.update_invoice.assert_called_once()
 
 
+def get_enqueued_grants(
+    mock_enqueue_jobs: MagicMock,
+) -> set[tuple[str, uuid.UUID, uuid.UUID, uuid.UUID]]:
+    enqueued: set[tuple[str, uuid.UUID, uuid.UUID, uuid.UUID]] = set()
+    for enqueue_call in mock_enqueue_jobs.call_args_list:
+        name, jobs = enqueue_call.args
+        action = name.removeprefix("subscription.subscription_benefit.")
+        for job in jobs:
+            for subscription_id, user_id in job.kwargs["targets"]:
+                enqueued.add(
+                    (
+                        action,
+                        subscription_id,
+                        user_id,
+                        job.kwargs["subscription_benefit_id"],
+                    )
+                )
+    return enqueued
+
+
+async def create_grant(
+    session: AsyncSession,
+    subscription: Subscription,
+    user: User,
+    subscription_benefit: SubscriptionBenefit,
+) -> SubscriptionBenefitGrant:
+    grant = SubscriptionBenefitGrant(
+        subscription_id=subscription.id,
+        user_id=user.id,
+        subscription_benefit_id=subscription_benefit.id,
+    )
+    grant.set_granted()
+    session.add(grant)
+    await session.commit()
+    return grant
+
+
 @pytest.mark.asyncio
 class TestEnqueueBenefitsGrants:
     @pytest.mark.parametrize(
@@ -686,29 +723,27 @@ class TestEnqueueBenefitsGrants:
     async def test_incomplete_subscription(
         self,
         status: SubscriptionStatus,
-        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
         session: AsyncSession,
         subscription_tier_organization: SubscriptionTier,
         subscription_benefits: list[SubscriptionBenefit],
         subscription: Subscription,
     ) -> None:
-        enqueue_job_mock = mocker.patch(
-            "polar.subscription.service.subscription.enqueue_job"
-        )
-
         subscription_tier_organization = await add_subscription_benefits(
             session,
             subscription_tier=subscription_tier_organization,
             subscription_benefits=subscription_benefits,
         )
         subscription.status = status
+        session.add(subscription)
+        await session.commit()
 
         # then
         session.expunge_all()
 
         await subscription_service.enqueue_benefits_grants(session, subscription)
 
-        enqueue_job_mock.assert_not_called()
+        mock_enqueue_jobs.assert_not_called()
 
     @pytest.mark.parametrize(
         "status", [SubscriptionStatus.trialing, SubscriptionStatus.active]
@@ -716,39 +751,74 @@ class TestEnqueueBenefitsGrants:
     async def test_active_subscription(
         self,
         status: SubscriptionStatus,
-        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
         session: AsyncSession,
         subscription_tier_organization: SubscriptionTier,
         subscription_benefits: list[SubscriptionBenefit],
         subscription: Subscription,
     ) -> None:
-        enqueue_job_mock = mocker.patch(
-            "polar.subscription.service.subscription.enqueue_job"
-        )
-
         subscription_tier_organization = await add_subscription_benefits(
             session,
             subscription_tier=subscription_tier_organization,
             subscription_benefits=subscription_benefits,
         )
         subscription.status = status
+        session.add(subscription)
+        await session.commit()
 
         # then
         session.expunge_all()
 
         await subscription_service.enqueue_benefits_grants(session, subscription)
 
-        enqueue_job_mock.assert_has_awaits(
-            [
-                call(
-                    "subscription.subscription_benefit.grant",
-                    subscription_id=subscription.id,
-                    user_id=subscription.user_id,
-                    subscription_benefit_id=benefit.id,
-                )
-                for benefit in subscription_benefits
-            ]
+        enqueued = get_enqueued_grants(mock_enqueue_jobs)
+        # Benefits + public articles
+        assert len(enqueued) == len(subscription_benefits) + 1
+        for benefit in subscription_benefits:
+            assert (
+                "grant_many",
+                subscription.id,
+                subscription.user_id,
+                benefit.id,
+            ) in enqueued
+
+    async def test_already_granted(
+        self,
+        mock_enqueue_jobs: MagicMock,
+        session: AsyncSession,
+        subscription_tier_organization: SubscriptionTier,
+        subscription_benefits: list[SubscriptionBenefit],
+        subscription: Subscription,
+        user: User,
+    ) -> None:
+        subscription_tier_organization = await add_subscription_benefits(
+            session,
+            subscription_tier=subscription_tier_organization,
+            subscription_benefits=subscription_benefits,
         )
+        await create_grant(session, subscription, user, subscription_benefits[0])
+        subscription.status = SubscriptionStatus.active
+        session.add(subscription)
+        await session.commit()
+
+        # then
+        session.expunge_all()
+
+        await subscription_service.enqueue_benefits_grants(session, subscription)
+
+        enqueued = get_enqueued_grants(mock_enqueue_jobs)
+        assert (
+            "grant_many",
+            subscription.id,
+            user.id,
+            subscription_benefits[0].id,
+        ) not in enqueued
+        assert (
+            "grant_many",
+            subscription.id,
+            user.id,
+            subscription_benefits[1].id,
+        ) in enqueued
 
     @pytest.mark.parametrize(
         "status",
@@ -761,61 +831,43 @@ class TestEnqueueBenefitsGrants:
     async def test_canceled_subscription(
         self,
         status: SubscriptionStatus,
-        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
         session: AsyncSession,
         subscription_tier_organization: SubscriptionTier,
         subscription_benefits: list[SubscriptionBenefit],
         subscription: Subscription,
+        user: User,
     ) -> None:
-        enqueue_job_mock = mocker.patch(
-            "polar.subscription.service.subscription.enqueue_job"
-        )
-
         subscription_tier_organization = await add_subscription_benefits(
             session,
             subscription_tier=subscription_tier_organization,
             subscription_benefits=subscription_benefits,
         )
+        await create_grant(session, subscription, user, subscription_benefits[0])
         subscription.status = status
+        session.add(subscription)
+        await session.commit()
 
         # then
         session.expunge_all()
 
         await subscription_service.enqueue_benefits_grants(session, subscription)
 
-        enqueue_job_mock.assert_has_awaits(
-            [
-                call(
-                    "subscription.subscription_benefit.revoke",
-                    subscription_id=subscription.id,
-                    user_id=subscription.user_id,
-                    subscription_benefit_id=benefit.id,
-                )
-                for benefit in subscription_benefits
-            ]
-        )
+        # Only the existing grants are revoked
+        assert get_enqueued_grants(mock_enqueue_jobs) == {
+            ("revoke_many", subscription.id, user.id, subscription_benefits[0].id)
+        }
 
     async def test_outdated_grants(
         self,
-        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
         session: AsyncSession,
         subscription_tier_organization: SubscriptionTier,
         subscription_benefits: list[SubscriptionBenefit],
         subscription: Subscription,
         user: User,
     ) -> None:
-        enqueue_job_mock = mocker.patch(
-            "polar.subscription.service.subscription.enqueue_job"
-        )
-
-        grant = SubscriptionBenefitGrant(
-            subscription_id=subscription.id,
-            user_id=user.id,
-            subscription_benefit_id=subscription_benefits[0].id,
-        )
-        grant.set_granted()
-        session.add(grant)
-        await session.commit()
+        await create_grant(session, subscription, user, subscription_benefits[0])
 
         subscription_tier_organization = await add_subscription_benefits(
             session,
@@ -823,22 +875,25 @@ class TestEnqueueBenefitsGrants:
             subscription_benefits=subscription_benefits[1:],
         )
         subscription.status = SubscriptionStatus.active
+        session.add(subscription)
+        await session.commit()
 
         # then
         session.expunge_all()
 
         await subscription_service.enqueue_benefits_grants(session, subscription)
 
-        enqueue_job_mock.assert_any_await(
-            "subscription.subscription_benefit.revoke",
-            subscription_id=subscription.id,
-            user_id=subscription.user_id,
-            subscription_benefit_id=subscription_benefits[0].id,
-        )
+        enqueued = get_enqueued_grants(mock_enqueue_jobs)
+        assert (
+            "revoke_many",
+            subscription.id,
+            user.id,
+            subscription_benefits[0].id,
+        ) in enqueued
 
     async def test_subscription_organization(
         self,
-        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
         session: AsyncSession,
         subscription_tier_organization: SubscriptionTier,
         subscription_benefits: list[SubscriptionBenefit],
@@ -846,16 +901,20 @@ class TestEnqueueBenefitsGrants:
         organization_subscriber_admin: User,
         organization_subscriber_members: list[User],
     ) -> None:
-        enqueue_job_mock = mocker.patch(
-            "polar.subscription.service.subscription.enqueue_job"
-        )
-
         subscription_tier_organization = await add_subscription_benefits(
             session,
             subscription_tier=subscription_tier_organization,
             subscription_benefits=subscription_benefits,
         )
         subscription_organization.status = SubscriptionStatus.active
+        session.add(subscription_organization)
+        await session.commit()
+
+        # A former member of the organization
+        former_member = await create_user(session)
+        await create_grant(
+            session, subscription_organization, former_member, subscription_benefits[0]
+        )
 
         # then
         session.expunge_all()
@@ -864,25 +923,65 @@ class TestEnqueueBenefitsGrants:
             session, subscription_organization
         )
 
+        enqueued = get_enqueued_grants(mock_enqueue_jobs)
+
         members_count = len(organization_subscriber_members) + 1  # Members + admin
         benefits_count = len(subscription_benefits) + 1  # Benefits + articles
-        assert enqueue_job_mock.call_count == members_count * benefits_count
+        assert len(enqueued) == members_count * benefits_count + 1
 
         for user_id in [
             organization_subscriber_admin.id,
             *[member.id for member in organization_subscriber_members],
         ]:
-            enqueue_job_mock.assert_has_awaits(
-                [
-                    call(
-                        "subscription.subscription_benefit.grant",
-                        subscription_id=subscription_organization.id,
-                        user_id=user_id,
-                        subscription_benefit_id=benefit.id,
-                    )
-                    for benefit in subscription_benefits
-                ]
-            )
+            for benefit in subscription_benefits:
+                assert (
+                    "grant_many",
+                    subscription_organization.id,
+                    user_id,
+                    benefit.id,
+                ) in enqueued
+
+        assert (
+            "revoke_many",
+            subscription_organization.id,
+            former_member.id,
+            subscription_benefits[0].id,
+        ) in enqueued
+
+    async def test_batches(
+        self,
+        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
+        session: AsyncSession,
+        subscription_tier_organization: SubscriptionTier,
+        subscription_benefits: list[SubscriptionBenefit],
+        subscription_organization: Subscription,
+        organization_subscriber_admin: User,
+        organization_subscriber_members: list[User],
+    ) -> None:
+        mocker.patch.object(settings, "SUBSCRIPTION_BENEFIT_GRANTS_BATCH_SIZE", 4)
+        subscription_tier_organization = await add_subscription_benefits(
+            session,
+            subscription_tier=subscription_tier_organization,
+            subscription_benefits=subscription_benefits[:1],
+        )
+        subscription_organization.status = SubscriptionStatus.active
+        session.add(subscription_organization)
+        await session.commit()
+
+        # then
+        session.expunge_all()
+
+        await subscription_service.enqueue_benefits_grants(
+            session, subscription_organization
+        )
+
+        name, jobs = mock_enqueue_jobs.call_args.args
+        assert name == "subscription.subscription_benefit.grant_many"
+
+        # Members + admin, for the benefit and the public articles
+        assert sorted(len(job.kwargs["targets"]) for job in jobs) == [2, 2, 4, 4]
+        assert len({job.kwargs["run_id"] for job in jobs}) == 1
 
 
 @pytest.mark.asyncio
@@ -890,21 +989,28 @@ class TestUpdateSubscriptionTierBenefitsGrants:
     async def test_valid(
         self,
         session: AsyncSession,
-        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
         user: User,
         subscription_tier_organization: SubscriptionTier,
         subscription_tier_organization_second: SubscriptionTier,
+        subscription_benefit_organization: SubscriptionBenefit,
     ) -> None:
-        enqueue_job_mock = mocker.patch(
-            "polar.subscription.service.subscription.enqueue_job"
-        )
-        subscription_1 = await create_subscription(
+        for subscription_tier in (
+            subscription_tier_organization,
+            subscription_tier_organization_second,
+        ):
+            await add_subscription_benefits(
+                session,
+                subscription_tier=subscription_tier,
+                subscription_benefits=[subscription_benefit_organization],
+            )
+        subscription_1 = await create_active_subscription(
             session, subscription_tier=subscription_tier_organization, user=user
         )
-        subscription_2 = await create_subscription(
+        subscription_2 = await create_active_subscription(
             session, subscription_tier=subscription_tier_organization, user=user
         )
-        await create_subscription(
+        subscription_3 = await create_active_subscription(
             session, subscription_tier=subscription_tier_organization_second, user=user
         )
 
@@ -915,16 +1021,12 @@ class TestUpdateSubscriptionTierBenefitsGrants:
             session, subscription_tier_organization
         )
 
-        assert enqueue_job_mock.call_count == 2
-
-        enqueue_job_mock.assert_any_await(
-            "subscription.subscription.enqueue_benefits_grants",
-            subscription_1.id,
-        )
-        enqueue_job_mock.assert_any_await(
-            "subscription.subscription.enqueue_benefits_grants",
-            subscription_2.id,
-        )
+        subscription_ids = {
+            subscription_id
+            for _, subscription_id, _, _ in get_enqueued_grants(mock_enqueue_jobs)
+        }
+        assert subscription_ids == {subscription_1.id, subscription_2.id}
+        assert subscription_3.id not in subscription_ids
 
 
 @pytest.mark.asyncio
@@ -932,30 +1034,35 @@ class TestUpdateOrganizationBenefitsGrants:
     async def test_valid(
         self,
         session: AsyncSession,
-        mocker: MockerFixture,
+        mock_enqueue_jobs: MagicMock,
         user: User,
         organization_subscriber: Organization,
         subscription_tier_organization: SubscriptionTier,
         subscription_tier_organization_second: SubscriptionTier,
     ) -> None:
-        enqueue_job_mock = mocker.patch(
-            "polar.subscription.service.subscription.enqueue_job"
-        )
-        subscription_1 = await create_subscription(
+        subscription_1 = await create_active_subscription(
             session,
             subscription_tier=subscription_tier_organization,
             user=user,
             organization=organization_subscriber,
         )
-        subscription_2 = await create_subscription(
+        subscription_2 = await create_active_subscription(
             session,
             subscription_tier=subscription_tier_organization_second,
             user=user,
             organization=organization_subscriber,
         )
-        await create_subscription(
+        await create_active_subscription(
             session, subscription_tier=subscription_tier_organization, user=user
         )
+        session.add(
+            UserOrganization(
+                user_id=user.id,
+                organization_id=organization_subscriber.id,
+                is_admin=False,
+            )
+        )
+        await session.commit()
 
         # then
         session.expunge_all()
@@ -964,16 +1071,11 @@ class TestUpdateOrganizationBenefitsGrants:
             session, organization_subscriber
         )
 
-        assert enqueue_job_mock.call_count == 2
-
-        enqueue_job_mock.assert_any_await(
-            "subscription.subscription.enqueue_benefits_grants",
-            subscription_1.id,
-        )
-        enqueue_job_mock.assert_any_await(
-            "subscription.subscription.enqueue_benefits_grants",
-            subscription_2.id,
-        )
+        subscription_ids = {
+            subscription_id
+            for _, subscription_id, _, _ in get_enqueued_grants(mock_enqueue_jobs)
+        }
+        assert subscription_ids == {subscription_1.id, subscription_2.id}
 
 
 @pytest.mark.asyncio
@@ -1009,7 +1111,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await subscription_service.search(
+        results, count, _ = await subscription_service.search(
             session,
             user_second,
             organization=organization,
@@ -1038,7 +1140,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await subscription_service.search(
+        results, count, _ = await subscription_service.search(
             session, user, organization=organization, pagination=PaginationParams(1, 10)
         )
 
@@ -1065,7 +1167,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await subscription_service.search(
+        results, count, _ = await subscription_service.search(
             session, user, organization=organization, pagination=PaginationParams(1, 10)
         )
 
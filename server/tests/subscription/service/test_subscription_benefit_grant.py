@@ -1,3 +1,4 @@
+import contextlib
 from unittest.mock import MagicMock
 
 import pytest
@@ -7,8 +8,10 @@ from polar.models import (
     Subscription,
     SubscriptionBenefit,
     SubscriptionBenefitGrant,
+    SubscriptionTier,
     User,
 )
+from polar.models.subscription import SubscriptionStatus
 from polar.notifications.notification import (
     SubscriptionBenefitPreconditionErrorNotificationContextualPayload,
 )
@@ -16,6 +19,7 @@ from polar.notifications.service import NotificationsService
 from polar.postgres import AsyncSession
 from polar.subscription.service.benefits import (
     SubscriptionBenefitPreconditionError,
+    SubscriptionBenefitRetriableError,
     SubscriptionBenefitServiceProtocol,
 )
 from polar.subscription.service.subscription import subscription as subscription_service
@@ -25,6 +29,7 @@ from polar.subscription.service.subscription_benefit_grant import (  # type: ign
 from polar.subscription.service.subscription_benefit_grant import (
     subscription_benefit_grant as subscription_benefit_grant_service,
 )
+from tests.fixtures.random_objects import add_subscription_benefits
 
 
 @pytest.fixture(autouse=True)
@@ -638,3 +643,232 @@ class TestEnqueueGrantsAfterPreconditionFulfilled:
             user_id=user.id,
             subscription_benefit_id=pending_grant.subscription_benefit_id,
         )
+
+
+@pytest.mark.asyncio
+class TestGrantBenefits:
+    async def test_valid(
+        self,
+        session: AsyncSession,
+        subscription: Subscription,
+        user: User,
+        user_second: User,
+        subscription_benefit_organization: SubscriptionBenefit,
+        subscription_benefit_service_mock: MagicMock,
+    ) -> None:
+        granted_grant = SubscriptionBenefitGrant(
+            subscription_id=subscription.id,
+            user_id=user.id,
+            subscription_benefit_id=subscription_benefit_organization.id,
+        )
+        granted_grant.set_granted()
+        session.add(granted_grant)
+        await session.commit()
+
+        subscription_benefit_service_mock.grant_many.return_value = [
+            {"external_id": "abc"}
+        ]
+
+        # then
+        session.expunge_all()
+
+        grants = await subscription_benefit_grant_service.grant_benefits(
+            session,
+            subscription_benefit_organization,
+            [(subscription.id, user.id), (subscription.id, user_second.id)],
+        )
+
+        assert len(grants) == 2
+        assert grants[0].id == granted_grant.id
+        assert grants[1].user_id == user_second.id
+        assert grants[1].is_granted
+        assert grants[1].properties == {"external_id": "abc"}
+
+        # Already granted ones are skipped
+        _, pending = subscription_benefit_service_mock.grant_many.call_args.args
+        assert [grant.user_id for grant in pending] == [user_second.id]
+
+    async def test_errors(
+        self,
+        session: AsyncSession,
+        subscription: Subscription,
+        user: User,
+        user_second: User,
+        subscription_benefit_organization: SubscriptionBenefit,
+        subscription_benefit_service_mock: MagicMock,
+    ) -> None:
+        subscription_benefit_service_mock.grant_many.return_value = [
+            SubscriptionBenefitPreconditionError("Error"),
+            SubscriptionBenefitRetriableError(10),
+        ]
+
+        # then
+        session.expunge_all()
+
+        with pytest.raises(SubscriptionBenefitRetriableError):
+            await subscription_benefit_grant_service.grant_benefits(
+                session,
+                subscription_benefit_organization,
+                [(subscription.id, user.id), (subscription.id, user_second.id)],
+            )
+
+        # The precondition error is saved, the retriable one will be retried
+        precondition_grant = await subscription_benefit_grant_service.get_by_subscription_user_and_benefit(
+            session, subscription, user, subscription_benefit_organization
+        )
+        assert precondition_grant is not None
+        assert not precondition_grant.is_granted
+        assert (
+            await subscription_benefit_grant_service.get_by_subscription_user_and_benefit(
+                session, subscription, user_second, subscription_benefit_organization
+            )
+            is None
+        )
+
+
+@pytest.mark.asyncio
+class TestRevokeBenefits:
+    async def test_valid(
+        self,
+        session: AsyncSession,
+        subscription: Subscription,
+        user: User,
+        user_second: User,
+        subscription_benefit_organization: SubscriptionBenefit,
+        subscription_benefit_service_mock: MagicMock,
+    ) -> None:
+        for target_user in (user, user_second):
+            grant = SubscriptionBenefitGrant(
+                subscription_id=subscription.id,
+                user_id=target_user.id,
+                subscription_benefit_id=subscription_benefit_organization.id,
+            )
+            if target_user == user:
+                grant.set_revoked()
+            else:
+                grant.set_granted()
+            session.add(grant)
+        await session.commit()
+
+        subscription_benefit_service_mock.revoke_many.return_value = [{}]
+
+        # then
+        session.expunge_all()
+
+        grants = await subscription_benefit_grant_service.revoke_benefits(
+            session,
+            subscription_benefit_organization,
+            [(subscription.id, user.id), (subscription.id, user_second.id)],
+        )
+
+        assert all(grant.is_revoked for grant in grants)
+        _, pending = subscription_benefit_service_mock.revoke_many.call_args.args
+        assert [grant.user_id for grant in pending] == [user_second.id]
+
+
+@pytest.mark.asyncio
+async def test_grants_progress(
+    session: AsyncSession,
+    subscription_tier_organization: SubscriptionTier,
+    subscription: Subscription,
+    user: User,
+    subscription_benefit_organization: SubscriptionBenefit,
+    subscription_benefit_service_mock: MagicMock,
+) -> None:
+    subscription.status = SubscriptionStatus.active
+    session.add(subscription)
+    await session.commit()
+    await add_subscription_benefits(
+        session,
+        subscription_tier=subscription_tier_organization,
+        subscription_benefits=[subscription_benefit_organization],
+    )
+
+    # then
+    session.expunge_all()
+
+    run_id = await subscription_benefit_grant_service.enqueue_grants_diff(
+        session, subscription_id=subscription.id
+    )
+    progress = await subscription_benefit_grant_service.get_grants_progress(run_id)
+    assert progress is not None
+    assert progress.total == 1
+    assert not progress.done
+
+    subscription_benefit_service_mock.grant_many.return_value = [
+        SubscriptionBenefitPreconditionError("Error")
+    ]
+    await subscription_benefit_grant_service.grant_benefits(
+        session,
+        subscription_benefit_organization,
+        [(subscription.id, user.id)],
+        run_id=run_id,
+    )
+
+    progress = await subscription_benefit_grant_service.get_grants_progress(run_id)
+    assert progress is not None
+    assert progress.done
+    assert progress.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_grants_progress_retried(
+    session: AsyncSession,
+    subscription_tier_organization: SubscriptionTier,
+    subscription: Subscription,
+    user: User,
+    subscription_benefit_organization: SubscriptionBenefit,
+    subscription_benefit_service_mock: MagicMock,
+) -> None:
+    subscription.status = SubscriptionStatus.active
+    session.add(subscription)
+    await session.commit()
+    await add_subscription_benefits(
+        session,
+        subscription_tier=subscription_tier_organization,
+        subscription_benefits=[subscription_benefit_organization],
+    )
+
+    # then
+    session.expunge_all()
+
+    run_id = await subscription_benefit_grant_service.enqueue_grants_diff(
+        session, subscription_id=subscription.id
+    )
+    targets = [(subscription.id, user.id)]
+
+    # A precondition error is a final outcome, a retriable error is not
+    for result in (
+        SubscriptionBenefitPreconditionError("Error"),
+        SubscriptionBenefitRetriableError(10),
+    ):
+        subscription_benefit_service_mock.grant_many.return_value = [result]
+        with contextlib.suppress(SubscriptionBenefitRetriableError):
+            await subscription_benefit_grant_service.grant_benefits(
+                session,
+                subscription_benefit_organization,
+                targets,
+                run_id=run_id,
+                last_attempt=False,
+            )
+
+    progress = await subscription_benefit_grant_service.get_grants_progress(run_id)
+    assert progress is not None
+    assert progress.processed == 1
+    assert progress.errors == 1
+
+    # The grant is counted once, with its final outcome
+    subscription_benefit_service_mock.grant_many.return_value = [{}]
+    await subscription_benefit_grant_service.grant_benefits(
+        session,
+        subscription_benefit_organization,
+        targets,
+        run_id=run_id,
+        last_attempt=False,
+    )
+
+    progress = await subscription_benefit_grant_service.get_grants_progress(run_id)
+    assert progress is not None
+    assert progress.done
+    assert progress.processed == 1
+    assert progress.errors == 0
@@ -26,9 +26,11 @@ from polar.subscription.tasks import (  # type: ignore[attr-defined]
     UserDoesNotExist,
     subscription_benefit_delete,
     subscription_benefit_grant,
+    subscription_benefit_grant_many,
     subscription_benefit_grant_service,
     subscription_benefit_precondition_fulfilled,
     subscription_benefit_revoke,
+    subscription_benefit_revoke_many,
     subscription_benefit_update,
     subscription_enqueue_benefits_grants,
     subscription_service,
@@ -359,6 +361,122 @@ class TestSubscriptionBenefitRevoke:
             )
 
 
+@pytest.mark.asyncio
+class TestSubscriptionBenefitGrantMany:
+    async def test_not_existing_benefit(
+        self,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        subscription: Subscription,
+        user: User,
+        session: AsyncSession,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        with pytest.raises(SubscriptionBenefitDoesNotExist):
+            await subscription_benefit_grant_many(
+                job_context,
+                uuid.uuid4(),
+                [(subscription.id, user.id)],
+                "RUN_ID",
+                polar_worker_context,
+            )
+
+    async def test_existing_benefit(
+        self,
+        mocker: MockerFixture,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        subscription: Subscription,
+        user: User,
+        subscription_benefit_organization: SubscriptionBenefit,
+        session: AsyncSession,
+    ) -> None:
+        grant_benefits_mock = mocker.patch.object(
+            subscription_benefit_grant_service,
+            "grant_benefits",
+            spec=SubscriptionBenefitGrantService.grant_benefits,
+        )
+
+        # then
+        session.expunge_all()
+
+        await subscription_benefit_grant_many(
+            job_context,
+            subscription_benefit_organization.id,
+            [(subscription.id, user.id)],
+            "RUN_ID",
+            polar_worker_context,
+        )
+
+        grant_benefits_mock.assert_called_once()
+        _, _, targets = grant_benefits_mock.call_args.args
+        assert targets == [(subscription.id, user.id)]
+        assert grant_benefits_mock.call_args.kwargs["run_id"] == "RUN_ID"
+
+    async def test_retry(
+        self,
+        mocker: MockerFixture,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        subscription: Subscription,
+        user: User,
+        subscription_benefit_organization: SubscriptionBenefit,
+        session: AsyncSession,
+    ) -> None:
+        grant_benefits_mock = mocker.patch.object(
+            subscription_benefit_grant_service,
+            "grant_benefits",
+            spec=SubscriptionBenefitGrantService.grant_benefits,
+        )
+        grant_benefits_mock.side_effect = SubscriptionBenefitRetriableError(10)
+
+        # then
+        session.expunge_all()
+
+        with pytest.raises(Retry):
+            await subscription_benefit_grant_many(
+                job_context,
+                subscription_benefit_organization.id,
+                [(subscription.id, user.id)],
+                "RUN_ID",
+                polar_worker_context,
+            )
+
+
+@pytest.mark.asyncio
+class TestSubscriptionBenefitRevokeMany:
+    async def test_existing_benefit(
+        self,
+        mocker: MockerFixture,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        subscription: Subscription,
+        user: User,
+        subscription_benefit_organization: SubscriptionBenefit,
+        session: AsyncSession,
+    ) -> None:
+        revoke_benefits_mock = mocker.patch.object(
+            subscription_benefit_grant_service,
+            "revoke_benefits",
+            spec=SubscriptionBenefitGrantService.revoke_benefits,
+        )
+
+        # then
+        session.expunge_all()
+
+        await subscription_benefit_revoke_many(
+            job_context,
+            subscription_benefit_organization.id,
+            [(subscription.id, user.id)],
+            "RUN_ID",
+            polar_worker_context,
+        )
+
+        revoke_benefits_mock.assert_called_once()
+
+
 @pytest.mark.asyncio
 class TestSubscriptionBenefitUpdate:
     async def test_not_existing_grant(
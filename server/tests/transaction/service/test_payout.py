@@ -146,9 +146,8 @@ class TestCreatePayoutFromStripe:
             balance_transactions.append(balance_transaction)
         await session.commit()
 
-        stripe_service_mock.list_balance_transactions.return_value = (
-            balance_transactions
-        )
+        stream = stripe_service_mock.list_balance_transactions.return_value
+        stream.__aiter__.return_value = balance_transactions
 
         stripe_payout = build_stripe_payout(
             amount=sum(transaction.amount for transaction in transactions)
@@ -207,9 +206,8 @@ class TestCreatePayoutFromStripe:
             balance_transactions.append(balance_transaction)
         await session.commit()
 
-        stripe_service_mock.list_balance_transactions.return_value = (
-            balance_transactions
-        )
+        stream = stripe_service_mock.list_balance_transactions.return_value
+        stream.__aiter__.return_value = balance_transactions
 
         stripe_payout = build_stripe_payout(
             amount=sum(transaction.account_amount for transaction in transactions),
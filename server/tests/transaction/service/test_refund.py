@@ -117,7 +117,8 @@ class TestCreateRefunds:
             balance_transaction=balance_transaction.id,
         )
 
-        stripe_service_mock.list_refunds.return_value = [
+        stream = stripe_service_mock.list_refunds.return_value
+        stream.__aiter__.return_value = [
             new_refund,
             handled_refund,
             failed_refund,
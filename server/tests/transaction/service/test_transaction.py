@@ -3,11 +3,13 @@ import uuid
 import pytest
 
 from polar.authz.service import Authz
-from polar.exceptions import NotPermitted, ResourceNotFound
+from polar.exceptions import BadRequest, NotPermitted, ResourceNotFound
 from polar.kit.pagination import PaginationParams
+from polar.kit.sorting import Sorting
 from polar.models import Account, Organization, Transaction, User, UserOrganization
 from polar.models.transaction import TransactionType
 from polar.postgres import AsyncSession
+from polar.transaction.service.transaction import SearchSortProperty
 from polar.transaction.service.transaction import transaction as transaction_service
 
 
@@ -27,7 +29,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await transaction_service.search(
+        results, count, _ = await transaction_service.search(
             session, user_second, pagination=PaginationParams(1, 10)
         )
 
@@ -45,7 +47,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await transaction_service.search(
+        results, count, _ = await transaction_service.search(
             session, user, pagination=PaginationParams(1, 10)
         )
 
@@ -77,7 +79,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await transaction_service.search(
+        results, count, _ = await transaction_service.search(
             session,
             user,
             type=TransactionType.payout,
@@ -106,7 +108,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await transaction_service.search(
+        results, count, _ = await transaction_service.search(
             session, user, account_id=account.id, pagination=PaginationParams(1, 10)
         )
 
@@ -129,7 +131,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await transaction_service.search(
+        results, count, _ = await transaction_service.search(
             session, user, payment_user_id=user.id, pagination=PaginationParams(1, 10)
         )
 
@@ -153,7 +155,7 @@ class TestSearch:
         # then
         session.expunge_all()
 
-        results, count = await transaction_service.search(
+        results, count, _ = await transaction_service.search(
             session,
             user,
             payment_organization_id=organization.id,
@@ -168,6 +170,81 @@ class TestSearch:
         for result in results:
             assert result.id in organization_transactions_id
 
+    @pytest.mark.parametrize(
+        "sorting",
+        [
+            [(SearchSortProperty.created_at, True)],
+            [(SearchSortProperty.amount, False)],
+            [(SearchSortProperty.amount, True), (SearchSortProperty.created_at, False)],
+        ],
+    )
+    async def test_cursor(
+        self,
+        sorting: list[Sorting[SearchSortProperty]],
+        session: AsyncSession,
+        user: User,
+        user_organization: UserOrganization,
+        readable_user_transactions: list[Transaction],
+        all_transactions: list[Transaction],
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        all_results, _, _ = await transaction_service.search(
+            session, user, pagination=PaginationParams(1, 100), sorting=sorting
+        )
+
+        cursor_results: list[Transaction] = []
+        cursor: str | None = None
+        while True:
+            results, count, cursor = await transaction_service.search(
+                session,
+                user,
+                pagination=PaginationParams(1, 2, cursor),
+                sorting=sorting,
+            )
+            assert count == len(readable_user_transactions)
+            cursor_results.extend(results)
+            if cursor is None:
+                break
+
+        assert [t.id for t in cursor_results] == [t.id for t in all_results]
+
+    async def test_invalid_cursor(self, session: AsyncSession, user: User) -> None:
+        # then
+        session.expunge_all()
+
+        with pytest.raises(BadRequest):
+            await transaction_service.search(
+                session, user, pagination=PaginationParams(1, 10, "invalid")
+            )
+
+    async def test_cursor_other_sorting(
+        self,
+        session: AsyncSession,
+        user: User,
+        user_organization: UserOrganization,
+        readable_user_transactions: list[Transaction],
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        _, _, cursor = await transaction_service.search(
+            session,
+            user,
+            pagination=PaginationParams(1, 1),
+            sorting=[(SearchSortProperty.amount, True)],
+        )
+        assert cursor is not None
+
+        with pytest.raises(BadRequest):
+            await transaction_service.search(
+                session,
+                user,
+                pagination=PaginationParams(1, 1, cursor),
+                sorting=[(SearchSortProperty.created_at, True)],
+            )
+
 
 @pytest.mark.asyncio
 class TestGetSummary:
@@ -229,6 +229,61 @@ class TestCreateTransfer:
         assert stripe_service_mock.transfer.call_args[1]["metadata"][
             "incoming_transaction_id"
         ] == str(incoming.id)
+        # Stable across retries
+        assert (
+            stripe_service_mock.transfer.call_args[1]["idempotency_key"]
+            == f"transfer:{payment_transaction.id}:{account.id}:1000"
+        )
+
+    async def test_stripe_retry(
+        self, session: AsyncSession, user: User, stripe_service_mock: MagicMock
+    ) -> None:
+        account = Account(
+            status=Account.Status.ACTIVE,
+            account_type=AccountType.stripe,
+            admin_id=user.id,
+            country="US",
+            currency="usd",
+            is_details_submitted=True,
+            is_charges_enabled=True,
+            is_payouts_enabled=True,
+            stripe_id="STRIPE_ACCOUNT_ID",
+        )
+        session.add(account)
+        await session.commit()
+        payment_transaction = await create_payment_transaction(session)
+
+        stripe_service_mock.transfer.side_effect = [
+            Exception("Connection error"),
+            SimpleNamespace(
+                id="STRIPE_TRANSFER_ID",
+                balance_transaction="STRIPE_BALANCE_TRANSACTION_ID",
+            ),
+        ]
+
+        # then
+        session.expunge_all()
+
+        with pytest.raises(Exception, match="Connection error"):
+            await transfer_transaction_service.create_transfer(
+                session,
+                destination_account=account,
+                payment_transaction=payment_transaction,
+                amount=1000,
+            )
+
+        outgoing, _ = await transfer_transaction_service.create_transfer(
+            session,
+            destination_account=account,
+            payment_transaction=payment_transaction,
+            amount=1000,
+        )
+
+        # Same request, so Stripe returns the original transfer
+        first_call, second_call = stripe_service_mock.transfer.call_args_list
+        assert first_call[1]["idempotency_key"] == second_call[1]["idempotency_key"]
+        assert first_call[1]["metadata"] == second_call[1]["metadata"]
+        assert second_call[1]["metadata"]["outgoing_transaction_id"] == str(outgoing.id)
 
     async def test_stripe_different_currencies(
         self, session: AsyncSession, user: User, stripe_service_mock: MagicMock
@@ -601,6 +656,54 @@ class TestCreateReversalTransfer:
         assert stripe_service_mock.reverse_transfer.call_args[1]["metadata"][
             "incoming_transaction_id"
         ] == str(incoming.id)
+        # Stable across retries
+        assert (
+            stripe_service_mock.reverse_transfer.call_args[1]["idempotency_key"]
+            == f"reversal:{transfer_incoming.transfer_id}:1000"
+        )
+
+    async def test_stripe_partial_refunds(
+        self, session: AsyncSession, user: User, stripe_service_mock: MagicMock
+    ) -> None:
+        account = Account(
+            status=Account.Status.ACTIVE,
+            account_type=AccountType.stripe,
+            admin_id=user.id,
+            country="US",
+            currency="usd",
+            is_details_submitted=True,
+            is_charges_enabled=True,
+            is_payouts_enabled=True,
+            stripe_id="STRIPE_ACCOUNT_ID",
+        )
+        session.add(account)
+        await session.commit()
+
+        stripe_service_mock.reverse_transfer.return_value = SimpleNamespace(
+            id="STRIPE_REVERSAL_TRANSFER_ID"
+        )
+
+        # then
+        session.expunge_all()
+
+        transfer_transactions = await create_transfer_transactions(
+            session, destination_account=account
+        )
+
+        for refund_id in ("STRIPE_REFUND_1", "STRIPE_REFUND_2"):
+            await transfer_transaction_service.create_reversal_transfer(
+                session,
+                transfer_transactions=transfer_transactions,
+                destination_currency="usd",
+                amount=500,
+                reversal_transfer_metadata={
+                    "stripe_charge_id": "STRIPE_CHARGE_ID",
+                    "stripe_refund_id": refund_id,
+                },
+            )
+
+        first_call, second_call = stripe_service_mock.reverse_transfer.call_args_list
+        assert first_call[1]["idempotency_key"] != second_call[1]["idempotency_key"]
 
     async def test_stripe_different_currencies(
         self, session: AsyncSession, user: User, stripe_service_mock: MagicMock
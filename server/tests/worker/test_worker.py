@@ -0,0 +1,45 @@
+import uuid
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from arq.connections import ArqRedis
+from arq.connections import create_pool as arq_create_pool
+from arq.jobs import Job, JobStatus
+from pytest_mock import MockerFixture
+
+from polar.worker import BulkJob, WorkerSettings, _enqueue_jobs
+
+
+@pytest_asyncio.fixture
+async def arq_pool(mocker: MockerFixture) -> AsyncIterator[ArqRedis]:
+    queue_name = f"test:queue:{uuid.uuid4()}"
+    pool = await arq_create_pool(
+        WorkerSettings.redis_settings, default_queue_name=queue_name
+    )
+    mocker.patch("polar.worker.arq_pool", new=pool)
+    yield pool
+    await pool.delete(queue_name)
+    await pool.close(True)
+
+
+@pytest.mark.asyncio
+@pytest.mark.skip_db_asserts
+class TestEnqueueJobs:
+    async def test_existing(self, arq_pool: ArqRedis) -> None:
+        existing_job_id = f"test:{uuid.uuid4()}"
+        await arq_pool.enqueue_job("test", _job_id=existing_job_id)
+
+        new_job_id = f"test:{uuid.uuid4()}"
+        jobs = [
+            BulkJob(args=(1,), job_id=existing_job_id),
+            BulkJob(args=(2,), job_id=new_job_id),
+        ]
+        assert await _enqueue_jobs("test", jobs) == 1
+
+        assert await arq_pool.zcard(arq_pool.default_queue_name) == 2
+        job = Job(new_job_id, arq_pool, arq_pool.default_queue_name)
+        assert await job.status() == JobStatus.queued
+        job_info = await job.info()
+        assert job_info is not None
+        assert job_info.args == (2,)